@@ -4,16 +4,25 @@ from PIL import Image, ImageDraw, ImageFont
 import io
 import pandas as pd
 import os
-import requests
 import datetime
 from pdf2image import convert_from_bytes
-import tempfile
 import sys
 import subprocess
 import fitz  # PyMuPDF
 from pdf2image.exceptions import PDFPageCountError
 import uuid
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 import numpy as np
+import image_transport
+from response_cache import cached_post
+from drawing_image import DrawingImage
+from upscale import describe_decision, enhance_for_analysis
+from pipeline import run_pipeline
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Load environment variables from .env file
 try:
@@ -29,103 +38,101 @@ try:
 except ImportError:
     TESSERACT_AVAILABLE = False
 
-# Try to import gradio_client for image upscaling
-try:
-    from gradio_client import Client
-    GRADIO_AVAILABLE = True
-except ImportError:
-    GRADIO_AVAILABLE = False
-    # st.warning("Gradio client not available. Image upscaling will be disabled. Install with: pip install gradio_client")
-    ""
+# Point pytesseract at a local Windows install only where that path exists
+TESSERACT_WINDOWS_CMD = r"C:\Users\shrey\Downloads\tesseract-ocr-w64-setup-v5.3.0.20221214.exe"
+if TESSERACT_AVAILABLE and os.path.exists(TESSERACT_WINDOWS_CMD):
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_WINDOWS_CMD
+
+API_URL = "https://api.openai.com/v1/chat/completions"
+
+# The 12 parameters extracted from every cylinder drawing, in display order
+CYLINDER_PARAMETERS = [
+    "CYLINDER ACTION",
+    "BORE DIAMETER",
+    "ROD DIAMETER",
+    "STROKE LENGTH",
+    "CLOSE LENGTH",
+    "OPERATING PRESSURE",
+    "OPERATING TEMPERATURE",
+    "MOUNTING",
+    "ROD END",
+    "FLUID",
+    "DRAWING NUMBER",
+    "REVISION"
+]
+
+# Multi-page PDFs: pages analysed at the same time, and at most this many pages per file
+CYLINDER_PAGE_CONCURRENCY = max(1, int(os.getenv("CYLINDER_PAGE_CONCURRENCY", "4")))
+CYLINDER_MAX_PAGES = int(os.getenv("CYLINDER_MAX_PAGES", "12"))
+
+# Page roles, and which role wins when several pages give a value for a parameter
+PAGE_ROLE_LABELS = {
+    "spec_table": "Specification table",
+    "general_arrangement": "General arrangement",
+    "detail": "Detail sheet",
+}
+DEFAULT_ROLE_PRECEDENCE = ["spec_table", "general_arrangement", "detail"]
+FIELD_ROLE_PRECEDENCE = {
+    # The title block of the main (GA) sheet identifies the drawing set
+    "DRAWING NUMBER": ["general_arrangement", "spec_table", "detail"],
+    "REVISION": ["general_arrangement", "spec_table", "detail"],
+    # Mounting and rod end are drawn on the GA more often than tabulated
+    "MOUNTING": ["general_arrangement", "spec_table", "detail"],
+    "ROD END": ["general_arrangement", "spec_table", "detail"],
+}
+
+# A page whose text layer has at least this many specification terms is a spec table page
+SPEC_TABLE_MIN_KEYWORDS = 4
+SPEC_TABLE_KEYWORDS = (
+    "TECHNICAL DATA", "SPECIFICATION", "BORE", "ROD DIA", "STROKE", "CLOSED LENGTH",
+    "WORKING PRESSURE", "OPERATING PRESSURE", "TEST PRESSURE", "MEDIUM", "FLUID",
+    "TEMPERATURE", "MOUNTING", "ROD END", "CUSHION"
+)
+
+
+# Focused re-extraction: critical parameters asked for again, one query each, when the
+# main analysis leaves them as NA. Queries run in parallel under an overall deadline.
+CRITICAL_PARAMETERS = ["BORE DIAMETER", "FLUID", "MOUNTING"]
+FOCUSED_REEXTRACTION = os.getenv("FOCUSED_REEXTRACTION", "1") not in ("0", "false", "False")
+FOCUSED_CONCURRENCY = max(1, int(os.getenv("FOCUSED_CONCURRENCY", "3")))
+FOCUSED_DEADLINE_SECONDS = float(os.getenv("FOCUSED_DEADLINE_SECONDS", "60"))
+
+
+def script_ctx_initializer():
+    """Thread initializer that attaches the current Streamlit script context (None outside Streamlit)"""
+    script_ctx = get_script_run_ctx()
+    if script_ctx is None:
+        return None
 
-# Set tesseract path if available
-if TESSERACT_AVAILABLE:
-    pytesseract.pytesseract.tesseract_cmd = r"C:\Users\shrey\Downloads\tesseract-ocr-w64-setup-v5.3.0.20221214.exe"
+    def attach_script_ctx():
+        add_script_run_ctx(threading.current_thread(), script_ctx)
+    return attach_script_ctx
 
-# Add your imgbb API key here (get one from https://api.imgbb.com/)
-IMGBB_API_KEY = "02b10ba01695e9bb477f0155e4b7a3a0"
 
-def upload_to_imgbb(image_bytes):
-    """Upload image bytes to imgbb and return the public URL"""
-    try:
-        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-            temp_file.write(image_bytes)
-            temp_path = temp_file.name
-        with open(temp_path, "rb") as file:
-            response = requests.post(
-                "https://api.imgbb.com/1/upload",
-                params={"key": IMGBB_API_KEY},
-                files={"image": file}
-            )
-        os.unlink(temp_path)
-        if response.status_code == 200:
-            data = response.json()
-            return data["data"]["url"]
-        else:
-            st.error(f"imgbb upload failed: {response.text}")
-            return None
-    except Exception as e:
-        st.error(f"imgbb upload error: {str(e)}")
-        return None
+def normalize_fluid(value):
+    """Strict fluid processing - only convert "Mineral Oil" and air; keep all other specifications as found"""
+    if "mineral oil" in value.lower():
+        return "HYD. OIL MINERAL"
+    if any(air_keyword in value.lower() for air_keyword in ["air", "pneumatic", "compressed air"]):
+        return "AIR"
+    return value
 
 
 def upscale_image(image_bytes):
-    """Upscale the image using Gradio API"""
-    if not GRADIO_AVAILABLE:
-        return image_bytes
-    
+    """
+    Upscale and enhance the image locally when it is too small to read.
+
+    Returns:
+        (image_bytes, decision) - decision records whether the image was
+        upscaled, why, and how long it took (see upscale.py)
+    """
     try:
-        with st.spinner("Upscaling image for better analysis..."):
-            # Save image to a temporary file
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                temp_file.write(image_bytes)
-                temp_path = temp_file.name
-            
-            # Create Gradio client with updated parameters to avoid the headers issue
-            client = Client(
-                "https://bookbot-image-upscaling-playground.hf.space/",
-                output_dir=tempfile.gettempdir()
-            )
-            
-            # Use a simpler predict call to avoid connection issues
-            try:
-                result = client.predict(
-                    temp_path,
-                    "modelx2",  # Use x2 upscaling mode
-                    api_name="/predict"
-                )
-            except TypeError as e:
-                if "extra_headers" in str(e):
-                    # Downgrade gradio-client if this error occurs
-                    # st.warning("Your gradio-client version might be incompatible. Try: pip install gradio-client==0.6.1")
-                    ""
-                    return image_bytes
-                else:
-                    raise e
-            
-            # Read the upscaled image
-            if result and os.path.exists(result):
-                with open(result, "rb") as f:
-                    upscaled_image_bytes = f.read()
-                
-                # Clean up temporary files
-                try:
-                    os.unlink(temp_path)
-                    os.unlink(result)
-                except:
-                    pass
-                
-                # st.success("Image successfully upscaled for better analysis")
-                ""
-                return upscaled_image_bytes
-            else:
-                # st.warning("Upscaling failed, using original image")
-                ""
-                return image_bytes
+        image_bytes, decision = enhance_for_analysis(image_bytes)
+        print(f"[upscale] {describe_decision(decision)}")
+        return image_bytes, decision
     except Exception as e:
-        # st.warning(f"Error during image upscaling: {str(e)}. Using original image.")
-        ""
-        return image_bytes
+        print(f"Error during image upscaling: {str(e)}. Using original image.")
+        return image_bytes, None
 
 
 def parse_ai_response(response_text):
@@ -134,8 +141,20 @@ def parse_ai_response(response_text):
     return response_text
 
 
-def analyze_engineering_drawing(image_bytes, component_type="cylinder"):
-    """Analyze the uploaded drawing for cylinder-specific parameters with ultra-precise prompts"""
+def analyze_engineering_drawing(image_bytes, component_type="cylinder", refresh=False, apply_defaults=True,
+                                focused=FOCUSED_REEXTRACTION):
+    """
+    Analyze the uploaded drawing for cylinder-specific parameters with ultra-precise prompts.
+
+    refresh=True bypasses the response cache so the model is asked again.
+    apply_defaults=False leaves missing parameters as "NA" (used for single
+    pages of a multi-page set, whose values are merged before defaults apply).
+    focused=True re-queries critical parameters the analysis left as "NA" (see
+    focused_reextraction); the outcome is recorded under "focused".
+    The result's "cites_table" tells whether the model read its values from a
+    table or specification, "found" how many parameters the model gave
+    (before defaults) and "error" why the analysis failed, or None.
+    """
     parameters = {
         "CYLINDER ACTION": "NA",
         "BORE DIAMETER": "NA",
@@ -151,11 +170,19 @@ def analyze_engineering_drawing(image_bytes, component_type="cylinder"):
         "REVISION": "NA"
     }
     
-    # Upload image to imgbb and get public URL
-    image_url = upload_to_imgbb(image_bytes)
-    if not image_url:
-        st.error("Failed to upload image to imgbb. Analysis cannot proceed.")
-        return {"component_type": component_type, "parameters": parameters}
+    cites_table = False
+    focused_report = None
+    error = None
+    
+    # One handle for the page so the cache key hash is computed once
+    image = DrawingImage.of(image_bytes)
+
+    # Hand the image to the model (inline data URL by default, see image_transport.py)
+    try:
+        image_url = image_transport.image_url(image)
+    except Exception as e:
+        st.error(f"Failed to prepare image for analysis: {str(e)}. Analysis cannot proceed.")
+        return {"component_type": component_type, "parameters": parameters, "found": 0, "error": str(e)}
     
     system_content = """You are an elite mechanical drawing interpreter with 50 years of experience as a hydraulic cylinder engineer. 
     Your expertise lies in analyzing technical drawings of hydraulic and pneumatic cylinders with unparalleled precision. 
@@ -437,9 +464,6 @@ NOW ANALYZE THIS CYLINDER DRAWING AND EXTRACT ONLY THE 12 PARAMETERS LISTED ABOV
 
 """
 
-    API_URL = "https://api.openai.com/v1/chat/completions"
-    API_KEY = os.getenv("OPENAI_API_KEY")
-    print(f"[API Key]: {API_KEY}")
 
     payload = {
         "model": "gpt-5.2", 
@@ -455,8 +479,8 @@ NOW ANALYZE THIS CYLINDER DRAWING AND EXTRACT ONLY THE 12 PARAMETERS LISTED ABOV
         ],
     }
 
+    # Authorization is added per request from the API key pool (api_keys.py)
     headers = {
-        "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json"
     }
 
@@ -470,7 +494,7 @@ NOW ANALYZE THIS CYLINDER DRAWING AND EXTRACT ONLY THE 12 PARAMETERS LISTED ABOV
             pprint.pprint(payload, width=120)
             print("=== SERIALISED ===")
             print(json.dumps(payload, ensure_ascii=False, indent=2)[:2000], "…")
-            response = requests.post(API_URL, headers=headers, json=payload)
+            response = cached_post("cylinder_analysis", API_URL, headers, payload, image, refresh=refresh)
             print("HTTP", response.status_code)
             print("HEADERS", response.headers)
             print("BODY", response.text)
@@ -482,6 +506,7 @@ NOW ANALYZE THIS CYLINDER DRAWING AND EXTRACT ONLY THE 12 PARAMETERS LISTED ABOV
                 print("[OpenAI API Main Response]", response_json)
                 if "choices" in response_json:
                     content = response_json["choices"][0]["message"]["content"]
+                    cites_table = any(indicator in content.lower() for indicator in ["table", "specification", "spec", "labeled", "marked"])
                     
                     lines = content.strip().split('\n')
                     for line in lines:
@@ -498,7 +523,7 @@ NOW ANALYZE THIS CYLINDER DRAWING AND EXTRACT ONLY THE 12 PARAMETERS LISTED ABOV
                                 # Special handling for specific parameters
                                 if key in ["BORE DIAMETER"]:
                                     # Only accept if it's clearly from a table/label specification
-                                    if any(indicator in content.lower() for indicator in ["table", "specification", "spec", "labeled", "marked"]):
+                                    if cites_table:
                                         if key in parameters:
                                             parameters[key] = value
                                 elif key in parameters:
@@ -506,50 +531,43 @@ NOW ANALYZE THIS CYLINDER DRAWING AND EXTRACT ONLY THE 12 PARAMETERS LISTED ABOV
 
                     # Strict fluid processing - only convert "Mineral Oil"
                     if parameters.get("FLUID", "NA") != "NA":
-                        fluid_value = parameters["FLUID"]
-                        if "mineral oil" in fluid_value.lower():
-                            parameters["FLUID"] = "HYD. OIL MINERAL"
-                        elif any(air_keyword in fluid_value.lower() for air_keyword in ["air", "pneumatic", "compressed air"]):
-                            parameters["FLUID"] = "AIR"
-                        # Keep all other fluid specifications exactly as found
-
-        # Enhanced validation with focused re-extraction for critical missing parameters
-        critical_missing = []
-        for param in ["BORE DIAMETER", "FLUID", "MOUNTING"]:
-            if parameters.get(param, "NA") == "NA":
-                critical_missing.append(param)
+                        parameters["FLUID"] = normalize_fluid(parameters["FLUID"])
+                else:
+                    error = "No choices in the API response"
+            else:
+                error = f"API returned HTTP {response.status_code}"
 
         # Focused re-extraction for missing critical parameters
-        # if critical_missing:
-        #     for param in critical_missing:
-        #         focused_result = focused_parameter_extraction(image_bytes, param, API_URL, headers)
-        #         if focused_result and focused_result != "NA":
-        #             # Apply same strict rules
-        #             if param == "FLUID":
-        #                 if "mineral oil" in focused_result.lower():
-        #                     parameters["FLUID"] = "HYD. OIL MINERAL"
-        #                 elif any(air_keyword in focused_result.lower() for air_keyword in ["air", "pneumatic", "compressed air"]):
-        #                     parameters["FLUID"] = "AIR"
-        #                 else:
-        #                     parameters["FLUID"] = focused_result
-        #             else:
-        #                 parameters[param] = focused_result
+        if focused:
+            focused_report = focused_reextraction(image, parameters, API_URL, headers, refresh=refresh)
+
+        found = count_found(parameters)
 
         # Apply intelligent defaults only for non-critical parameters
-        apply_conservative_defaults(parameters)
+        if apply_defaults:
+            apply_conservative_defaults(parameters)
 
     except Exception as e:
         st.error(f"Error during analysis: {str(e)}")
+        error = str(e)
+        found = count_found(parameters)
         # Apply conservative defaults even on error
-        apply_conservative_defaults(parameters)
+        if apply_defaults:
+            apply_conservative_defaults(parameters)
     
-    return {"component_type": component_type, "parameters": parameters}
+    return {
+        "component_type": component_type,
+        "parameters": parameters,
+        "cites_table": cites_table,
+        "focused": focused_report,
+        "found": found,
+        "error": error,
+    }
 
 
-def focused_parameter_extraction(image_bytes, parameter, api_url, headers):
-    """Focused extraction for specific critical parameters"""
-    focused_prompts = {
-        "BORE DIAMETER": """
+# One ultra-focused prompt per critical parameter
+FOCUSED_PROMPTS = {
+    "BORE DIAMETER": """
 ULTRA-FOCUSED TASK: Find BORE DIAMETER from specification table or explicit label ONLY.
 
 STRICT RULES:
@@ -565,7 +583,7 @@ Search locations:
 
 Output: [number only] or "NA"
 """,
-        "FLUID": """
+    "FLUID": """
 ULTRA-FOCUSED TASK: Find exact FLUID specification as written.
 
 SEARCH LOCATIONS:
@@ -582,7 +600,7 @@ EXTRACT EXACTLY AS WRITTEN:
 
 Output: [exact fluid specification as found]
 """,
-        "MOUNTING": """
+    "MOUNTING": """
 ULTRA-FOCUSED TASK: Identify MOUNTING type from visual structure and any text labels.
 
 VISUAL IDENTIFICATION:
@@ -596,7 +614,13 @@ Also check for text mentioning mounting type.
 
 Output: [Clevis/Flange/Lug/Rod Eye/Trunnion]
 """
-    }
+}
+
+
+def focused_parameter_extraction(image_bytes, parameter, api_url, headers, refresh=False):
+    """Focused extraction for specific critical parameters"""
+    # Same handle (and memoized transport URL) as the main analysis
+    image = DrawingImage.of(image_bytes)
 
     payload = {
         "model": "gpt-5.2",
@@ -606,8 +630,8 @@ Output: [Clevis/Flange/Lug/Rod Eye/Trunnion]
             {
                 "role": "user", 
                 "content": [
-                    {"type": "text", "text": focused_prompts},
-                    {"type": "image_url", "image_url": {"url": upload_to_imgbb(image_bytes), "detail": "high"}}
+                    {"type": "text", "text": FOCUSED_PROMPTS[parameter]},
+                    {"type": "image_url", "image_url": {"url": image_transport.image_url(image), "detail": "high"}}
                 ]
             }
         ],
@@ -618,7 +642,7 @@ Output: [Clevis/Flange/Lug/Rod Eye/Trunnion]
     st.write(f"[Model being used for focused extraction ({parameter})]: {payload['model']}")
 
     try:
-        response = requests.post(api_url, headers=headers, json=payload)
+        response = cached_post(f"focused:{parameter}", api_url, headers, payload, image, refresh=refresh)
         st.write(f"[OpenAI API Focused Extraction: {parameter}]", response)
         print(f"[OpenAI API Focused Extraction: {parameter}]", response)
         if response.status_code == 200:
@@ -642,6 +666,70 @@ Output: [Clevis/Flange/Lug/Rod Eye/Trunnion]
     return None
 
 
+def focused_reextraction(image, parameters, api_url, headers, refresh=False,
+                         deadline=FOCUSED_DEADLINE_SECONDS, max_concurrency=FOCUSED_CONCURRENCY):
+    """
+    Re-query every critical parameter still "NA" in parameters, in parallel.
+
+    All queries share one image handle (so the image is encoded or uploaded
+    once) and run at most max_concurrency at a time. Answers arriving after
+    the overall deadline are ignored; parameters is updated in place with the
+    values found.
+
+    Returns:
+        {"fields": [...], "found": {param: value}, "timed_out": [...], "seconds": float},
+        or None if no critical parameter was missing
+    """
+    missing = [param for param in CRITICAL_PARAMETERS if parameters.get(param, "NA") == "NA"]
+    if not missing:
+        return None
+
+    start = time.perf_counter()
+    image = DrawingImage.of(image)
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_concurrency, len(missing)),
+        thread_name_prefix="focused",
+        initializer=script_ctx_initializer()
+    )
+    try:
+        futures = {
+            executor.submit(focused_parameter_extraction, image, param, api_url, headers, refresh): param
+            for param in missing
+        }
+        done, not_done = wait(futures, timeout=deadline)
+    finally:
+        # Late queries finish in the background (their responses are still cached)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    found = {}
+    for future in done:
+        param = futures[future]
+        try:
+            value = future.result()
+        except Exception as e:
+            print(f"Focused extraction of {param} failed: {str(e)}")
+            continue
+        if value and value != "NA":
+            # Apply same strict rules
+            found[param] = normalize_fluid(value) if param == "FLUID" else value
+    parameters.update(found)
+
+    report = {
+        "fields": missing,
+        "found": found,
+        "timed_out": [futures[future] for future in not_done],
+        "seconds": time.perf_counter() - start,
+    }
+    print(f"[Focused re-extraction] {len(found)}/{len(missing)} found in {report['seconds']:.1f}s"
+          + (f", timed out: {', '.join(report['timed_out'])}" if report["timed_out"] else ""))
+    return report
+
+
+def count_found(parameters):
+    """Number of parameters with a value"""
+    return sum(1 for value in parameters.values() if value not in ("NA", ""))
+
+
 def apply_conservative_defaults(parameters):
     """Apply conservative intelligent defaults for non-critical parameters only"""
     
@@ -667,16 +755,23 @@ def apply_conservative_defaults(parameters):
     #         parameters["OPERATING TEMPERATURE"] = "60"
 
 
-def process_uploaded_file(uploaded_file):
-    """Process the uploaded file for cylinder analysis"""
+def process_uploaded_file(uploaded_file, upscale=True):
+    """
+    Process the uploaded file for cylinder analysis.
+
+    Returns:
+        (image_bytes, upscale_decision), or (None, None) if the file could not be read
+    """
     if uploaded_file is not None:
+        uploaded_file.seek(0)
         file_bytes = uploaded_file.read()
         if uploaded_file.type == "application/pdf":
-            images = convert_pdf_to_images(file_bytes, uploaded_file.name)
+            images = convert_pdf_to_images(file_bytes, uploaded_file.name, max_pages=1)
             if images and images[0]:
+                if not upscale:
+                    return images[0], None
                 # Upscale the first page of the PDF
-                upscaled_image = upscale_image(images[0])
-                return upscaled_image
+                return upscale_image(images[0])
         else:
             # For direct image uploads, return the bytes
             try:
@@ -686,26 +781,251 @@ def process_uploaded_file(uploaded_file):
                 image = image.convert('RGB')  # Convert to RGB mode for consistency
                 image.save(img_byte_arr, format='JPEG', quality=95)
                 image_bytes = img_byte_arr.getvalue()
+                if not upscale:
+                    return image_bytes, None
                 
                 # Upscale the image
-                upscaled_image = upscale_image(image_bytes)
-                return upscaled_image
+                return upscale_image(image_bytes)
             except Exception as e:
                 # st.error(f"Error processing image: {str(e)}")
                 ""
-                return None
-    return None
+                return None, None
+    return None, None
 
 
-def convert_pdf_to_images(pdf_bytes, filename=""):
-    """Convert PDF bytes to images"""
+def pdf_page_texts(pdf_bytes):
+    """Text layer of every PDF page (empty strings for scanned pages or on failure)"""
+    try:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+            return [page.get_text() for page in pdf_document]
+    except Exception as e:
+        print(f"Could not read PDF text layer: {str(e)}")
+        return []
+
+
+def classify_cylinder_page(page_index, text, cites_table):
+    """
+    Role of a page in a cylinder drawing set: spec_table, general_arrangement or detail.
+
+    Pages with a text layer are classified by the specification terms they
+    contain; scanned pages fall back to whether the model cited a table.
+    """
+    if text.strip():
+        upper_text = text.upper()
+        hits = sum(1 for keyword in SPEC_TABLE_KEYWORDS if keyword in upper_text)
+        if hits >= SPEC_TABLE_MIN_KEYWORDS:
+            return "spec_table"
+    elif cites_table:
+        return "spec_table"
+    return "general_arrangement" if page_index == 0 else "detail"
+
+
+def merge_page_parameters(pages):
+    """
+    Merge per-page parameters using per-field page-role precedence.
+
+    Args:
+        pages: List of {"page": 1-based number, "role": str, "parameters": dict}
+
+    Returns:
+        (parameters, sources) - sources maps each found parameter to
+        {"page": number, "role": role} of the page its value came from
+    """
+    parameters = {param: "NA" for param in CYLINDER_PARAMETERS}
+    sources = {}
+    for param in CYLINDER_PARAMETERS:
+        precedence = FIELD_ROLE_PRECEDENCE.get(param, DEFAULT_ROLE_PRECEDENCE)
+        candidates = [
+            page for page in pages
+            if page["parameters"].get(param, "NA") not in ("NA", "")
+        ]
+        if not candidates:
+            continue
+        best = min(candidates, key=lambda page: (precedence.index(page["role"]), page["page"]))
+        parameters[param] = best["parameters"][param]
+        sources[param] = {"page": best["page"], "role": best["role"]}
+    return parameters, sources
+
+
+def analyze_pdf_pages(pdf_bytes, file_name="", upscale=True, refresh=False, focused=FOCUSED_REEXTRACTION):
+    """
+    Analyze every page of a PDF concurrently and merge the parameters.
+
+    Pages are analysed CYLINDER_PAGE_CONCURRENCY at a time (at most
+    CYLINDER_MAX_PAGES pages). Each value in the merged result comes from the
+    page whose role ranks highest for that parameter, e.g. the specification
+    table page beats the general arrangement for bore and stroke. Focused
+    re-extraction runs once, after the merge, on the first spec table page
+    (or the first page).
+
+    Returns:
+        (first_page_image, results) where results has "parameters" (merged,
+        with conservative defaults), "sources", a "pages" summary and the
+        document's "page_count", or (None, None) if the PDF could not be converted
+    """
+    # Pages past the limit are never rendered
+    images = convert_pdf_to_images(pdf_bytes, file_name, max_pages=CYLINDER_MAX_PAGES)
+    if not images:
+        return None, None
+    texts = pdf_page_texts(pdf_bytes)
+    page_count = max(len(texts), len(images))
+    if page_count > len(images):
+        print(f"{file_name}: analysing the first {len(images)} of {page_count} pages")
+
+    def analyze_page(page_index):
+        image_bytes = images[page_index]
+        upscale_decision = None
+        if upscale:
+            image_bytes, upscale_decision = upscale_image(image_bytes)
+        result = analyze_engineering_drawing(image_bytes, refresh=refresh, apply_defaults=False, focused=False)
+        text = texts[page_index] if page_index < len(texts) else ""
+        return {
+            "page": page_index + 1,
+            "role": classify_cylinder_page(page_index, text, result["cites_table"]),
+            "parameters": result["parameters"],
+            "preprocessing": upscale_decision,
+            "image": image_bytes,
+            "error": result["error"],
+        }
+
+    # Worker threads need the script context for st.spinner / st.error
+    outcomes = run_pipeline(
+        range(len(images)),
+        analyze_page,
+        max_concurrency=CYLINDER_PAGE_CONCURRENCY,
+        thread_initializer=script_ctx_initializer()
+    )
+
+    pages = []
+    errors = []
+    for outcome in outcomes:
+        if outcome["error"] is not None:
+            print(f"{file_name} page {outcome['index'] + 1}: analysis failed: {outcome['error']}")
+            st.error(f"Page {outcome['index'] + 1} could not be analysed: {outcome['error']}")
+            errors.append(f"Page {outcome['index'] + 1}: {outcome['error']}")
+            continue
+        if outcome["value"]["error"]:
+            errors.append(f"Page {outcome['index'] + 1}: {outcome['value']['error']}")
+        pages.append(outcome["value"])
+    if not pages:
+        return images[0], None
+
+    parameters, sources = merge_page_parameters(pages)
+    focused_report = None
+    if focused:
+        focus_page = next((page for page in pages if page["role"] == "spec_table"), pages[0])
+        headers = {"Content-Type": "application/json"}
+        focused_report = focused_reextraction(
+            focus_page["image"], parameters, API_URL, headers, refresh=refresh
+        )
+        if focused_report:
+            for param in focused_report["found"]:
+                sources[param] = {"page": focus_page["page"], "role": focus_page["role"], "focused": True}
+    found = count_found(parameters)
+    apply_conservative_defaults(parameters)
+    first_page = pages[0]
+    results = {
+        "component_type": "cylinder",
+        "parameters": parameters,
+        "sources": sources,
+        "pages": [
+            {"page": page["page"], "role": page["role"],
+             "found": count_found(page["parameters"]),
+             "preprocessing": page["preprocessing"]}
+            for page in pages
+        ],
+        "page_count": page_count,
+        "preprocessing": first_page["preprocessing"],
+        "focused": focused_report,
+        "found": found,
+        "error": "; ".join(errors) or None,
+    }
+    return first_page["image"], results
+
+
+# Number of analysed uploads kept in the result store (least recently used are dropped)
+RESULT_STORE_MAX_ENTRIES = 64
+
+
+@st.cache_resource
+def get_result_store():
+    """
+    Analysis results by upload content hash, shared by every rerun and session.
+
+    Returns:
+        (OrderedDict of entries, lock guarding it)
+    """
+    return OrderedDict(), threading.Lock()
+
+
+def analyze_upload(uploaded_file, upscale=True, refresh=False, multi_page=False, focused=FOCUSED_REEXTRACTION):
+    """
+    Analyze an uploaded file once per content hash.
+
+    Reruns (any widget interaction, including the CSV download) return the
+    stored entry instead of upscaling and calling the model again. Only
+    successful analyses are stored: one that failed (an API error, or no
+    parameter found at all) runs again on the next rerun. refresh=True
+    forces a fresh analysis that also bypasses the response cache.
+    multi_page=True analyzes every page of a PDF (see analyze_pdf_pages)
+    instead of only the first; focused toggles focused re-extraction of
+    missing critical parameters.
+
+    Returns:
+        {"file_hash", "image", "results", "analyzed_at", "cached"}, or None if the file could not be read
+    """
+    file_bytes = uploaded_file.getvalue()
+    file_hash = hashlib.sha256(file_bytes).hexdigest()
+    multi_page = multi_page and uploaded_file.type == "application/pdf"
+    key = (file_hash, upscale, multi_page, focused)
+    store, lock = get_result_store()
+
+    with lock:
+        entry = store.get(key)
+        if entry is not None and not refresh:
+            store.move_to_end(key)
+            return dict(entry, cached=True)
+
+    if multi_page:
+        image_data, results = analyze_pdf_pages(
+            file_bytes, uploaded_file.name, upscale=upscale, refresh=refresh, focused=focused
+        )
+        if not image_data or results is None:
+            return None
+    else:
+        image_data, upscale_decision = process_uploaded_file(uploaded_file, upscale=upscale)
+        if not image_data:
+            return None
+        results = analyze_engineering_drawing(image_data, refresh=refresh, focused=focused)
+        # Keep the preprocessing decision and its timing with the result
+        results["preprocessing"] = upscale_decision
+    entry = {
+        "file_hash": file_hash,
+        "image": image_data,
+        "results": results,
+        "analyzed_at": datetime.datetime.now(),
+    }
+
+    if results.get("error") or not results.get("found"):
+        return dict(entry, cached=False)
+
+    with lock:
+        store[key] = entry
+        store.move_to_end(key)
+        while len(store) > RESULT_STORE_MAX_ENTRIES:
+            store.popitem(last=False)
+    return dict(entry, cached=False)
+
+
+def convert_pdf_to_images(pdf_bytes, filename="", max_pages=None):
+    """Convert PDF bytes to images (only the first max_pages pages, if given)"""
     try:
         # Try using PyMuPDF first (faster and more reliable)
         try:
             pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
             image_list = []
             
-            for page_num in range(len(pdf_document)):
+            for page_num in range(min(len(pdf_document), max_pages or len(pdf_document))):
                 page = pdf_document[page_num]
                 pix = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))  # Higher quality
                 img_data = pix.tobytes("jpeg")
@@ -718,7 +1038,7 @@ def convert_pdf_to_images(pdf_bytes, filename=""):
             # st.warning(f"PyMuPDF conversion failed, trying alternative method: {str(mupdf_error)}")
             
         # Fall back to pdf2image if PyMuPDF fails
-        images = convert_from_bytes(pdf_bytes, dpi=200)
+        images = convert_from_bytes(pdf_bytes, dpi=200, last_page=max_pages)
         image_list = []
         
         for image in images:
@@ -759,80 +1079,94 @@ def main():
     uploaded_file = st.file_uploader("Upload a cylinder drawing (PDF or image)", type=["pdf", "png", "jpg", "jpeg"])
 
     if uploaded_file:
-        # Process the uploaded file
-        image_data = process_uploaded_file(uploaded_file)
+        multi_page = False
+        if uploaded_file.type == "application/pdf":
+            multi_page = st.checkbox(
+                "Analyze all pages", value=True,
+                help="Analyze every PDF page and merge the parameters (specification table pages take precedence)"
+            )
         
-        # Skip upscaling if disabled
-        if not enable_upscaling and image_data:
-            # Re-process without upscaling
-            file_bytes = uploaded_file.read()
-            if uploaded_file.type == "application/pdf":
-                images = convert_pdf_to_images(file_bytes, uploaded_file.name)
-                if images and images[0]:
-                    image_data = images[0]
-            else:
-                image = Image.open(io.BytesIO(file_bytes))
-                img_byte_arr = io.BytesIO()
-                image = image.convert('RGB')
-                image.save(img_byte_arr, format='JPEG', quality=95)
-                image_data = img_byte_arr.getvalue()
+        focused = st.checkbox(
+            "Focused re-extraction of missing critical fields", value=FOCUSED_REEXTRACTION,
+            help=f"Ask again, in parallel, for {', '.join(CRITICAL_PARAMETERS).lower()} when the main analysis misses them"
+        )
+        
+        # Re-analyze must be read before the stored result is looked up
+        reanalyze = st.button("Re-analyze", help="Ignore the stored result and ask the model again")
+        
+        # Process the uploaded file (once per file content; reruns reuse the stored result)
+        with st.spinner("Conducting detailed cylinder analysis..."):
+            entry = analyze_upload(
+                uploaded_file, upscale=enable_upscaling, refresh=reanalyze, multi_page=multi_page, focused=focused
+            )
         
-        if image_data:
+        if entry:
+            image_data = entry["image"]
+            results = entry["results"]
+            upscale_decision = results.get("preprocessing")
+            
             # Create columns for image and results
             col1, col2 = st.columns([1, 1])
             
             # Display the image
             with col1:
                 st.image(image_data, caption="Uploaded Drawing", use_container_width=True)
+                if upscale_decision:
+                    st.caption(describe_decision(upscale_decision))
+                if results.get("page_count", 0) > CYLINDER_MAX_PAGES:
+                    st.warning(
+                        f"Only the first {CYLINDER_MAX_PAGES} of {results['page_count']} pages were analysed "
+                        "(CYLINDER_MAX_PAGES)"
+                    )
+                if results.get("pages"):
+                    with st.expander(f"Pages analysed ({len(results['pages'])})"):
+                        for page in results["pages"]:
+                            st.write(f"Page {page['page']}: {PAGE_ROLE_LABELS[page['role']]}, {page['found']} parameters found")
             
-            # Analyze the drawing and display results
+            # Display results
             with col2:
-                with st.spinner("Conducting detailed cylinder analysis..."):
-                    results = analyze_engineering_drawing(image_data)
-                    
-                    st.markdown("### Extracted Parameters")
-                    
-                    # Create a DataFrame for better display
-                    params = results["parameters"]
-                    df_data = []
-                    
-                    # Use exactly the specified parameters in the exact sequence
-                    parameter_list = [
-                        "CYLINDER ACTION",
-                        "BORE DIAMETER",
-                        "ROD DIAMETER",
-                        "STROKE LENGTH",
-                        "CLOSE LENGTH",
-                        "OPERATING PRESSURE",
-                        "OPERATING TEMPERATURE",
-                        "MOUNTING",
-                        "ROD END",
-                        "FLUID",
-                        "DRAWING NUMBER",
-                        "REVISION"
-                    ]
-                    
-                    # Add all parameters to the data list in the exact sequence specified
-                    for param in parameter_list:
-                        value = params.get(param, "NA")
-                        if value == "":
-                            value = "NA"
-                        df_data.append({"Parameter": param, "Value": value})
-                    
-                    # Create DataFrame
-                    df = pd.DataFrame(df_data)
-                    
-                    # Display all results in a single table
-                    st.table(df)
-                    
-                    # Add download button for results
-                    csv = df.to_csv(index=False)
-                    st.download_button(
-                        label="Download Results as CSV",
-                        data=csv,
-                        file_name=f"cylinder_analysis_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv",
+                if entry["cached"]:
+                    st.caption(f"Stored result from {entry['analyzed_at'].strftime('%Y-%m-%d %H:%M:%S')} - use Re-analyze to run again")
+                st.markdown("### Extracted Parameters")
+                focused_report = results.get("focused")
+                if focused_report:
+                    timed_out = f", timed out: {', '.join(focused_report['timed_out'])}" if focused_report["timed_out"] else ""
+                    st.caption(
+                        f"Focused re-extraction found {len(focused_report['found'])} of {len(focused_report['fields'])} "
+                        f"missing critical fields in {focused_report['seconds']:.1f}s{timed_out}"
                     )
+                
+                # Create a DataFrame for better display
+                params = results["parameters"]
+                df_data = []
+                
+                # Use exactly the specified parameters in the exact sequence
+                sources = results.get("sources")
+                for param in CYLINDER_PARAMETERS:
+                    value = params.get(param, "NA")
+                    if value == "":
+                        value = "NA"
+                    row = {"Parameter": param, "Value": value}
+                    if sources is not None:
+                        # Multi-page result: record which page each value came from
+                        source = sources.get(param)
+                        row["Source Page"] = str(source["page"]) if source else "-"
+                    df_data.append(row)
+                
+                # Create DataFrame
+                df = pd.DataFrame(df_data)
+                
+                # Display all results in a single table
+                st.table(df)
+                
+                # Add download button for results
+                csv = df.to_csv(index=False)
+                st.download_button(
+                    label="Download Results as CSV",
+                    data=csv,
+                    file_name=f"cylinder_analysis_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv",
+                )
 
 
 if __name__ == "__main__":
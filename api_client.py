@@ -0,0 +1,220 @@
+"""
+Shared HTTP client for every outbound API call.
+
+All stages post through one pooled requests.Session so TLS connections to the
+API are kept alive and reused. Each stage has its own connect/read timeouts so
+a hung socket can never stall a Streamlit worker, and transient failures
+(429, 5xx, connection errors, timeouts) are retried in a loop with exponential
+backoff and jitter. Server hints in Retry-After / retry-after-ms and the
+x-ratelimit-reset-* headers take precedence over the computed backoff. Retries
+are bounded by a retry budget: a maximum number of retries and a maximum total
+time spent waiting. OpenAI requests are spread across the API key pool.
+
+The module has no Streamlit dependency.
+"""
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api_keys import estimate_tokens, get_key_pool
+
+# (connect, read) timeouts in seconds per pipeline stage
+STAGE_TIMEOUTS = {
+    "orientation": (5, 30),
+    "identification": (5, 30),
+    "analysis": (5, 120),
+    "second_pass": (5, 120),
+    "cylinder_analysis": (5, 180),
+    "focused": (5, 90),
+    "upload": (5, 60),
+}
+DEFAULT_TIMEOUT = (5, 90)
+
+# Retry budget per call: at most this many retries and this many seconds spent waiting
+API_MAX_RETRIES = 4
+API_RETRY_BUDGET_SECONDS = 60.0
+
+# Exponential backoff parameters (seconds) used when the server gives no hint
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 20.0
+
+# Connections kept alive per host
+API_POOL_SIZE = 16
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def get_session():
+    """Process-wide pooled session shared by every stage"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Retries are handled by post() so urllib3 must not retry on its own
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=API_POOL_SIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def stage_timeout(stage):
+    """Connect/read timeouts for a stage; 'focused:BORE DIAMETER' uses the 'focused' entry"""
+    return STAGE_TIMEOUTS.get(stage.split(":", 1)[0], DEFAULT_TIMEOUT)
+
+
+def parse_duration(value):
+    """Parse an x-ratelimit-reset-* duration such as '20ms', '1s' or '6m0s' into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def server_retry_delay(headers):
+    """
+    Seconds the server asked us to wait, or None if it gave no hint.
+
+    Retry-After (seconds or HTTP date) and retry-after-ms win; otherwise the
+    reset time of whichever x-ratelimit bucket is exhausted is used.
+    """
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    resets = []
+    for bucket in ("requests", "tokens"):
+        reset = parse_duration(headers.get(f"x-ratelimit-reset-{bucket}"))
+        if reset is None:
+            continue
+        remaining = headers.get(f"x-ratelimit-remaining-{bucket}")
+        if remaining is None or remaining.strip() == "0":
+            resets.append(reset)
+    return max(resets) if resets else None
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def post(stage, url, max_retries=API_MAX_RETRIES, retry_budget=API_RETRY_BUDGET_SECONDS, key_pool=None, **kwargs):
+    """
+    POST through the shared session with stage timeouts and bounded retries.
+
+    Args:
+        stage: Pipeline stage name, used to pick timeouts (and for logging)
+        url: Request URL
+        max_retries: Maximum number of retries after the first attempt
+        retry_budget: Maximum total seconds spent waiting between attempts
+        key_pool: Optional api_keys.KeyPool; each attempt is then authorised
+            with the key that has the most headroom, usage is recorded against
+            it, and a 429 parks that key and retries on another one at once
+        **kwargs: Passed through to requests (json, headers, params, files, ...)
+
+    Returns:
+        The final requests.Response. Retryable errors that exhaust the budget
+        return the last response; connection errors and timeouts re-raise the
+        last exception, and api_keys.KeyPoolTimeout is raised if no key gets
+        capacity in time.
+    """
+    session = get_session()
+    kwargs.setdefault("timeout", stage_timeout(stage))
+    estimate = estimate_tokens(kwargs.get("json") or {}) if key_pool is not None else 0
+    waited = 0.0
+    attempt = 0
+
+    while True:
+        lease = None
+        if key_pool is not None:
+            lease = key_pool.acquire(estimate)
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "Authorization": f"Bearer {lease.key}"}
+
+        try:
+            response = session.post(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            if lease is not None:
+                key_pool.record_usage(lease)
+            delay = backoff_delay(attempt)
+            if attempt >= max_retries or waited + delay > retry_budget:
+                raise
+            print(f"[{stage}] {type(error).__name__}, retrying in {delay:.1f}s")
+        else:
+            hinted = server_retry_delay(response.headers)
+            if lease is not None:
+                if response.status_code == 429:
+                    key_pool.park(lease, hinted)
+                else:
+                    key_pool.record_usage(lease, _response_usage(response), response.headers)
+
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                return response
+            if response.status_code == 429 and key_pool is not None and key_pool.available_now():
+                # Another key has headroom: switch to it without waiting
+                delay = 0.0
+            elif hinted is not None:
+                # Small jitter on top of server hints so parallel callers do not wake together
+                delay = hinted + random.uniform(0, 0.25)
+            else:
+                delay = backoff_delay(attempt)
+            if attempt >= max_retries or waited + delay > retry_budget:
+                return response
+            print(f"[{stage}] HTTP {response.status_code}, retrying in {delay:.1f}s")
+            response.close()
+
+        time.sleep(delay)
+        waited += delay
+        attempt += 1
+
+
+def _response_usage(response):
+    """The `usage` block of a successful JSON response, if any"""
+    if response.status_code != 200:
+        return None
+    try:
+        return response.json().get("usage")
+    except ValueError:
+        return None
+
+
+def post_json(stage, url, headers, payload, key_pool=None, **kwargs):
+    """
+    POST a JSON payload (e.g. a chat-completion request) through post().
+
+    Requests whose headers carry no Authorization are authorised from the
+    shared API key pool (see api_keys.py).
+    """
+    if key_pool is None and "Authorization" not in (headers or {}):
+        key_pool = get_key_pool()
+    return post(stage, url, headers=headers, json=payload, key_pool=key_pool, **kwargs)
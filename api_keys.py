@@ -0,0 +1,249 @@
+"""
+OpenAI API key pool with per-key token-bucket rate limiting.
+
+Keys are read from the environment (OPENAI_API_KEYS as a comma-separated list,
+OPENAI_API_KEY, and OPENAI_API_KEY_1 ... OPENAI_API_KEY_N). Every key has two
+token buckets, one for requests per minute and one for tokens per minute.
+A request reserves an estimate of its token spend up front; once the response
+arrives the estimate is corrected with the actual `usage.total_tokens`.
+
+Requests are routed to the key with the most headroom. A key that returns 429
+is parked until its reset time while the other keys keep serving, so batch
+throughput scales with the number of keys.
+
+The module has no Streamlit dependency.
+"""
+import os
+import threading
+import time
+
+# Default per-key limits (override with OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT)
+DEFAULT_RPM_LIMIT = float(os.getenv("OPENAI_RPM_LIMIT", "500"))
+DEFAULT_TPM_LIMIT = float(os.getenv("OPENAI_TPM_LIMIT", "30000"))
+
+# Rough token cost of one high-detail drawing image, used for estimates only
+IMAGE_TOKEN_ESTIMATE = 1105
+
+# Longest a caller waits for any key to have capacity before giving up
+MAX_ACQUIRE_WAIT = 120.0
+
+# Park a rate-limited key this long when the server gives no reset time
+DEFAULT_PARK_SECONDS = 20.0
+
+
+def load_api_keys(environ=None):
+    """All distinct OpenAI keys configured in the environment, in a stable order"""
+    environ = os.environ if environ is None else environ
+    keys = [key.strip() for key in environ.get("OPENAI_API_KEYS", "").split(",")]
+    keys.append(environ.get("OPENAI_API_KEY", ""))
+    numbered = sorted(
+        (name for name in environ if name.startswith("OPENAI_API_KEY_") and name[15:].isdigit()),
+        key=lambda name: int(name[15:])
+    )
+    keys.extend(environ[name] for name in numbered)
+
+    unique = []
+    for key in keys:
+        key = key.strip()
+        if key and key not in unique:
+            unique.append(key)
+    return unique
+
+
+def estimate_tokens(payload):
+    """Upper-bound estimate of the tokens a chat-completion payload will spend"""
+    characters = 0
+    images = 0
+    for message in payload.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            characters += len(content)
+            continue
+        for item in content:
+            if item.get("type") == "text":
+                characters += len(item.get("text", ""))
+            elif item.get("type") == "image_url":
+                images += 1
+    completion = payload.get("max_tokens") or payload.get("max_completion_tokens") or 1000
+    return characters // 4 + images * IMAGE_TOKEN_ESTIMATE + completion
+
+
+class KeyPoolTimeout(RuntimeError):
+    """No key had capacity within MAX_ACQUIRE_WAIT"""
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to `capacity` units per minute"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def headroom(self, now):
+        """Fraction of the bucket currently available (may be negative after overspend)"""
+        self._refill(now)
+        return self.level / self.capacity
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` units are available"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+    def clamp(self, remaining, now):
+        """Lower the level to what the server says is left, never raise it"""
+        self._refill(now)
+        self.level = min(self.level, float(remaining))
+
+
+class ApiKey:
+    """One key with its request and token buckets and parking state"""
+
+    def __init__(self, key, rpm_limit=DEFAULT_RPM_LIMIT, tpm_limit=DEFAULT_TPM_LIMIT):
+        self.key = key
+        self.requests = TokenBucket(rpm_limit)
+        self.tokens = TokenBucket(tpm_limit)
+        self.parked_until = 0.0
+        self.total_requests = 0
+        self.total_tokens = 0
+        self.rate_limited = 0
+
+    @property
+    def label(self):
+        """Key identifier that is safe to log"""
+        return f"...{self.key[-4:]}"
+
+    def wait_time(self, estimate, now):
+        return max(
+            self.parked_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimate, now),
+            0.0
+        )
+
+    def headroom(self, now):
+        return min(self.requests.headroom(now), self.tokens.headroom(now))
+
+
+class KeyLease:
+    """A key reserved for one request, together with the tokens reserved on it"""
+
+    def __init__(self, api_key, estimate):
+        self.api_key = api_key
+        self.estimate = estimate
+
+    @property
+    def key(self):
+        return self.api_key.key
+
+
+class KeyPool:
+    """Routes requests across API keys by available rate-limit headroom"""
+
+    def __init__(self, keys, rpm_limit=DEFAULT_RPM_LIMIT, tpm_limit=DEFAULT_TPM_LIMIT):
+        self.keys = [ApiKey(key, rpm_limit, tpm_limit) for key in keys]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def acquire(self, estimate):
+        """
+        Reserve one request and `estimate` tokens on the key with the most headroom,
+        waiting (up to MAX_ACQUIRE_WAIT) if every key is exhausted or parked.
+
+        Raises KeyPoolTimeout if no key has capacity by then; a request is
+        never sent on a key that is known to be over its limit.
+        """
+        if not self.keys:
+            raise RuntimeError("No OpenAI API keys configured")
+
+        deadline = time.monotonic() + MAX_ACQUIRE_WAIT
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                best = min(self.keys, key=lambda api_key: (api_key.wait_time(estimate, now), -api_key.headroom(now)))
+                wait = best.wait_time(estimate, now)
+                if wait <= 0:
+                    best.requests.consume(1, now)
+                    best.tokens.consume(estimate, now)
+                    best.total_requests += 1
+                    return KeyLease(best, estimate)
+                if now >= deadline:
+                    raise KeyPoolTimeout(
+                        f"No API key had capacity within {MAX_ACQUIRE_WAIT:.0f}s "
+                        f"(next available in {wait:.0f}s)"
+                    )
+            time.sleep(min(wait, 1.0, deadline - now))
+
+    def record_usage(self, lease, usage=None, headers=None):
+        """Correct the reserved estimate with the actual usage and any x-ratelimit-remaining-* headers"""
+        with self._lock:
+            now = time.monotonic()
+            api_key = lease.api_key
+            if usage and usage.get("total_tokens") is not None:
+                actual = usage["total_tokens"]
+                api_key.tokens.consume(actual - lease.estimate, now)
+                api_key.total_tokens += actual
+            if headers:
+                for bucket, header in ((api_key.requests, "x-ratelimit-remaining-requests"),
+                                       (api_key.tokens, "x-ratelimit-remaining-tokens")):
+                    try:
+                        bucket.clamp(float(headers[header]), now)
+                    except (KeyError, TypeError, ValueError):
+                        pass
+
+    def park(self, lease, seconds=None):
+        """Take a rate-limited key out of rotation until its reset time"""
+        with self._lock:
+            api_key = lease.api_key
+            seconds = DEFAULT_PARK_SECONDS if seconds is None else seconds
+            api_key.parked_until = max(api_key.parked_until, time.monotonic() + seconds)
+            api_key.rate_limited += 1
+            # The reserved tokens were never spent
+            api_key.tokens.consume(-lease.estimate, time.monotonic())
+
+    def available_now(self):
+        """Whether some key could take a request without waiting"""
+        with self._lock:
+            now = time.monotonic()
+            return any(api_key.wait_time(1, now) <= 0 for api_key in self.keys)
+
+    def status(self):
+        """Per-key counters for display; keys are masked"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "key": api_key.label,
+                    "requests": api_key.total_requests,
+                    "tokens": api_key.total_tokens,
+                    "rate_limited": api_key.rate_limited,
+                    "parked_for": max(0.0, api_key.parked_until - now),
+                    "headroom": max(0.0, api_key.headroom(now)),
+                }
+                for api_key in self.keys
+            ]
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_key_pool():
+    """Process-wide key pool built from the environment on first use"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = KeyPool(load_api_keys())
+        return _default_pool
@@ -0,0 +1,265 @@
+"""
+Headless batch extraction over directories or globs of drawings.
+
+Every page of every PDF and image found goes through the same chain as the
+Streamlit app (extraction_core.analyze_page: orientation, identification,
+extraction with second pass) on a worker pool, and one row per page is
+written to the output file with its status:
+
+  Completed / Needs Review  extraction succeeded (at least / under 70% of fields found)
+  Failed                    the API returned an error for the page
+  Error                     the page or the whole file could not be processed
+
+The output format follows the extension of --output: .csv, .parquet or
+.jsonl. JSONL rows are appended and flushed as pages finish, so a long run
+can be followed (or salvaged) while it is going; CSV and Parquet are written
+once at the end, sorted by file and page. The exit status is 1 if any page
+or file did not complete.
+
+Every completed page is also journaled to a checkpoint file (by default the
+output path plus ".checkpoint.jsonl", see checkpoint.py). Running the same
+command again after a crash or an interrupted run skips the pages in the
+journal - matched by file content, not name - and writes their rows from the
+journal, so only unfinished pages reach the API. Pages that failed are
+retried. --fresh discards the journal and starts over.
+
+Usage:
+    python batch_extract.py archive/ 'incoming/**/*.pdf' --output results.jsonl
+        [--workers 8] [--mode "Cylinder, Hyd/Pneumatic"] [--parameters "BORE DIAMETER,STROKE"]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from checkpoint import CheckpointJournal, settings_fingerprint
+from extraction_core import (
+    API_KEY_POOL, IMAGE_EXTENSIONS, PARAMETER_MODES, ExtractionSettings, analyze_page,
+    iter_file_pages, new_drawing_id, summarize_extraction
+)
+from pipeline import PIPELINE_CONCURRENCY, run_pipeline
+from quantities import column_kind, normalize_value
+
+INPUT_EXTENSIONS = (".pdf",) + IMAGE_EXTENSIONS
+OUTPUT_FORMATS = (".csv", ".parquet", ".jsonl")
+
+# Columns written before the extracted parameters
+STATUS_COLUMNS = [
+    "file", "page", "page_count", "status", "error", "drawing_type", "drawing_number",
+    "confidence", "extracted_fields", "total_fields", "seconds",
+]
+INTEGER_COLUMNS = ["page", "page_count", "confidence", "extracted_fields", "total_fields"]
+# Row statuses written to the checkpoint journal (anything else is retried on the next run)
+JOURNALED_STATUSES = ("Completed", "Needs Review")
+
+
+def find_input_files(inputs):
+    """Sorted, de-duplicated drawing files from directories (searched recursively), globs and paths"""
+    found = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            for root, _, names in os.walk(entry):
+                found.extend(os.path.join(root, name) for name in names)
+        else:
+            found.extend(glob.glob(entry, recursive=True) or [entry])
+    files = {os.path.normpath(path) for path in found if path.lower().endswith(INPUT_EXTENSIONS)}
+    return sorted(files)
+
+
+def read_files(paths, on_error):
+    """Yield (path, bytes), reading each file only when the pipeline reaches it"""
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            on_error(path, e)
+            continue
+        yield path, data
+
+
+def page_row(outcome, settings):
+    """One output row for a finished page"""
+    file_name, img_idx, image_data = outcome["item"]
+    has_page_info = isinstance(image_data, tuple) and len(image_data) >= 3
+    row = {
+        "file": file_name,
+        "page": image_data[1] if has_page_info else img_idx + 1,
+        "page_count": image_data[2] if has_page_info else None,
+        "seconds": round(outcome["seconds"], 2),
+    }
+    if outcome["error"] is not None:
+        row.update(status="Error", error=str(outcome["error"]))
+        return row
+
+    extraction = outcome["value"]
+    summary = summarize_extraction(extraction, settings, new_drawing_id())
+    if summary is None:
+        row.update(status="Failed", drawing_type=extraction["drawing_type"], error=extraction["result"])
+        return row
+
+    row.update(
+        status=summary["status"],
+        error="",
+        drawing_type=summary["drawing_type"],
+        drawing_number=summary["drawing_number"],
+        confidence=round(summary["confidence"]),
+        extracted_fields=summary["extracted_fields"],
+        total_fields=summary["total_fields"],
+    )
+    for key, value in summary["results"].items():
+        if key.endswith("_JUSTIFICATION") or key == "COMPONENT_TYPE" or key in row:
+            continue
+        kind = column_kind(key)
+        row[key] = normalize_value(value, kind) if kind and value else value
+    return row
+
+
+def write_table(rows, path):
+    """Write all rows as CSV or Parquet, status columns first"""
+    df = pd.DataFrame(rows)
+    columns = [column for column in STATUS_COLUMNS if column in df.columns]
+    df = df[columns + sorted(column for column in df.columns if column not in columns)]
+    df = df.sort_values(["file", "page"], na_position="first", kind="stable")
+    # Whole-number columns stay integers although file-level error rows leave them empty
+    for column in INTEGER_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("Int64")
+    if path.lower().endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="Directories, globs or files (PDF, PNG, JPG)")
+    parser.add_argument("--output", required=True, help="Result file: .csv, .parquet or .jsonl")
+    parser.add_argument("--workers", type=int, default=PIPELINE_CONCURRENCY,
+                        help="Pages processed at the same time")
+    parser.add_argument("--mode", choices=PARAMETER_MODES, default="Default", help="Parameter extraction mode")
+    parser.add_argument("--parameters", default="",
+                        help="Comma-separated parameters to extract (implies --mode Custom)")
+    parser.add_argument("--text-output", action="store_true",
+                        help="Ask for KEY: value text instead of schema-constrained JSON")
+    parser.add_argument("--checkpoint", help="Checkpoint journal (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Discard the checkpoint journal instead of resuming from it")
+    args = parser.parse_args()
+
+    output_format = os.path.splitext(args.output)[1].lower()
+    if output_format not in OUTPUT_FORMATS:
+        parser.error(f"--output must end in one of {', '.join(OUTPUT_FORMATS)}")
+    if not len(API_KEY_POOL):
+        parser.error("No API key provided! Please set OPENAI_API_KEY (or OPENAI_API_KEYS) in the environment.")
+
+    paths = find_input_files(args.inputs)
+    if not paths:
+        print("No PDF or image files found")
+        return 1
+
+    custom_parameters = [name.strip() for name in args.parameters.split(",") if name.strip()]
+    settings = ExtractionSettings(
+        parameter_mode="Custom" if custom_parameters else args.mode,
+        custom_parameters={"GENERIC": custom_parameters} if custom_parameters else {},
+        structured_output=not args.text_output
+    )
+    print(f"{len(paths)} file(s), {args.workers} worker(s), {settings}")
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint.jsonl"
+    if args.fresh and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    journal = CheckpointJournal(checkpoint_path)
+    fingerprint = settings_fingerprint(settings)
+    if len(journal):
+        print(f"Resuming: {len(journal)} page(s) journaled in {checkpoint_path}")
+    digests = {}  # path -> SHA-256 of the file, for files that still have pages to run
+
+    rows = []
+    rows_lock = threading.Lock()  # file errors are reported from the thread reading the input
+    jsonl = open(args.output, "w", encoding="utf-8") if output_format == ".jsonl" else None
+
+    def emit(row):
+        with rows_lock:
+            rows.append(row)
+            if jsonl is not None:
+                jsonl.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+                jsonl.flush()
+
+    def file_error(file_name, error):
+        print(f"❌ {file_name}: {str(error)}")
+        emit({"file": file_name, "status": "Error", "error": str(error)})
+
+    def emit_journaled(path, row):
+        row = dict(row, file=path)
+        emit(row)
+        print(f"[journal] {path} page {row['page']}: {row['status']}")
+
+    def pending_files(files):
+        """Files with pages left to run; the rows of fully journaled files are written straight away"""
+        for path, data in files:
+            digest = hashlib.sha256(data).hexdigest()
+            journaled_rows = journal.completed_file(digest, fingerprint)
+            if journaled_rows is not None:
+                for row in journaled_rows:
+                    emit_journaled(path, row)
+                continue
+            digests[path] = digest
+            yield path, data
+
+    def pending_pages(pages):
+        """Pages not in the journal; the rows of journaled pages are written straight away"""
+        for page in pages:
+            file_name, img_idx, _ = page
+            row = journal.get(digests[file_name], img_idx, fingerprint)
+            if row is not None:
+                emit_journaled(file_name, row)
+                continue
+            yield page
+
+    def page_done(outcome, completed):
+        row = page_row(outcome, settings)
+        file_name, img_idx, _ = outcome["item"]
+        # Drop the page image and extraction so memory stays flat over long runs
+        outcome["item"] = outcome["value"] = None
+        if row["status"] in JOURNALED_STATUSES:
+            journal.record_page(digests[file_name], img_idx, row["page_count"] or 1, fingerprint, row, file_name)
+        emit(row)
+        print(f"[{completed}] {row['file']} page {row['page']}: {row['status']} ({row['seconds']:.1f}s)")
+
+    start = time.perf_counter()
+    try:
+        run_pipeline(
+            pending_pages(iter_file_pages(pending_files(read_files(paths, file_error)), on_error=file_error)),
+            lambda page: analyze_page(page, settings),
+            max_concurrency=args.workers,
+            on_complete=page_done
+        )
+    finally:
+        journal.close()
+        if jsonl is not None:
+            jsonl.close()
+    if jsonl is None and rows:
+        write_table(rows, args.output)
+
+    elapsed = time.perf_counter() - start
+    statuses = {}
+    for row in rows:
+        statuses[row["status"]] = statuses.get(row["status"], 0) + 1
+    failed_files = sorted({row["file"] for row in rows if row["status"] in ("Failed", "Error")})
+    print(f"{len(rows)} row(s) in {elapsed:.1f}s: "
+          + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items())))
+    print(f"{len(paths) - len(failed_files)}/{len(paths)} file(s) completed without errors; results in {args.output}")
+    for file_name in failed_files:
+        print(f"  not completed: {file_name}")
+    return 1 if failed_files else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Microbenchmark for PDF page rasterisation.
+
+Builds a synthetic A1 drawing set (dimension lines, hatching and title-block
+text on every sheet) and compares pages/sec for the old PNG -> PIL -> JPEG
+path with the direct Pixmap -> JPEG encode in pdf_render.render_page.
+Run it on a machine with several cores to see the effect of the render pool.
+
+Usage:
+    python bench_pdf_render.py [--pages 50] [--zoom 2.5]
+"""
+import argparse
+import io
+import time
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw, ImageFont
+
+from pdf_render import iter_pdf_pages, render_page
+
+# A1 landscape in PDF points
+A1_WIDTH, A1_HEIGHT = 2384, 1684
+
+
+def build_drawing_set(page_count):
+    """Create an in-memory PDF that looks roughly like a vendor drawing submittal"""
+    doc = fitz.open()
+    for page_num in range(page_count):
+        page = doc.new_page(width=A1_WIDTH, height=A1_HEIGHT)
+        shape = page.new_shape()
+
+        # Sheet border and title block
+        shape.draw_rect(fitz.Rect(40, 40, A1_WIDTH - 40, A1_HEIGHT - 40))
+        shape.draw_rect(fitz.Rect(A1_WIDTH - 900, A1_HEIGHT - 300, A1_WIDTH - 40, A1_HEIGHT - 40))
+
+        # Cylinder body, rod and hatched section
+        shape.draw_rect(fitz.Rect(300, 600, 1500, 900))
+        shape.draw_rect(fitz.Rect(1500, 700, 2000, 800))
+        for x in range(300, 1500, 20):
+            shape.draw_line(fitz.Point(x, 900), fitz.Point(x + 60, 600))
+
+        # Dimension lines
+        for y in range(400, 560, 40):
+            shape.draw_line(fitz.Point(300, y), fitz.Point(2000, y))
+        shape.finish(color=(0, 0, 0), width=1)
+        shape.commit()
+
+        page.insert_text((320, 390), "STROKE 900", fontsize=28)
+        page.insert_text((320, 1000), "BORE Ø160  ROD Ø110", fontsize=28)
+        page.insert_text((A1_WIDTH - 880, A1_HEIGHT - 240),
+                         f"DRAWING NUMBER: BENCH-{page_num + 1:03d}", fontsize=30)
+        page.insert_text((A1_WIDTH - 880, A1_HEIGHT - 190), "REVISION: 00", fontsize=30)
+        page.insert_text((A1_WIDTH - 880, A1_HEIGHT - 140), "WORKING PRESSURE: 160 BAR", fontsize=30)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def render_page_legacy(page, page_count, zoom):
+    """The previous render path: PNG encode, PIL decode, overlay, JPEG re-encode"""
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    img = Image.open(io.BytesIO(pix.tobytes("png"))).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.truetype("arial.ttf", 24)
+    except IOError:
+        font = ImageFont.load_default()
+    page_text = f"Page {page.number + 1}/{page_count}"
+    text_width = draw.textlength(page_text, font=font)
+    draw.rectangle(
+        [(img.width - text_width - 20, img.height - 40), (img.width - 5, img.height - 5)],
+        fill=(50, 50, 50, 180)
+    )
+    draw.text((img.width - text_width - 10, img.height - 35), page_text, fill=(255, 255, 255), font=font)
+    out = io.BytesIO()
+    img.save(out, format='JPEG', quality=90, optimize=True)
+    return out.getvalue()
+
+
+def time_sequential(pdf_bytes, render):
+    """Render every page in-process and return (seconds, total output bytes)"""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    total_bytes = 0
+    start = time.perf_counter()
+    for page in doc:
+        total_bytes += len(render(page))
+    elapsed = time.perf_counter() - start
+    doc.close()
+    return elapsed, total_bytes
+
+
+def time_streaming(pdf_bytes, zoom):
+    """Render through the pooled generator and return (seconds, total output bytes)"""
+    total_bytes = 0
+    start = time.perf_counter()
+    for image_bytes, _, _, _ in iter_pdf_pages(pdf_bytes, zoom=zoom):
+        total_bytes += len(image_bytes)
+    return time.perf_counter() - start, total_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50, help="Number of A1 sheets to render")
+    parser.add_argument("--zoom", type=float, default=2.5, help="Render zoom factor")
+    args = parser.parse_args()
+
+    pdf_bytes = build_drawing_set(args.pages)
+    runs = [
+        ("legacy png->pil->jpeg", lambda: time_sequential(
+            pdf_bytes, lambda page: render_page_legacy(page, args.pages, args.zoom))),
+        ("direct pixmap->jpeg", lambda: time_sequential(
+            pdf_bytes, lambda page: render_page(page, args.zoom))),
+        ("direct + process pool", lambda: time_streaming(pdf_bytes, args.zoom)),
+    ]
+
+    print(f"{args.pages} A1 pages at zoom {args.zoom}")
+    for name, run in runs:
+        elapsed, total_bytes = run()
+        print(f"  {name:<24} {args.pages / elapsed:7.2f} pages/sec  "
+              f"{elapsed:7.2f} s  {total_bytes / args.pages / 1024:8.1f} KiB/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Microbenchmark for parsing "KEY: value" extraction replies.
+
+Compares lines/sec of the previous two-pass tokenizer of parse_ai_response
+(split twice, `import re` and the unit pattern dict rebuilt inside the line
+loop) with the single-pass response_parser.tokenize_response, and reports
+the throughput of the full response_parser.parse_response.
+
+The corpus is every reply recorded in cylinder_analysis.log, every reply in
+the API response cache, and any text files given with --corpus. Recorded
+replies are short, so --synthetic adds long chain-of-thought style replies
+built from them.
+
+Usage:
+    python bench_response_parser.py [--corpus 'responses/*.txt'] [--synthetic 200] [--repeat 5]
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sqlite3
+import time
+
+from bench_structured_output import load_recorded_responses
+from response_cache import RESPONSE_CACHE_PATH
+from response_parser import parse_response, tokenize_response
+
+
+def tokenize_legacy(response_text):
+    """The previous tokenizer of parse_ai_response: two passes, per-value regex dict"""
+    results = {}
+    justifications = {}
+    document_info = {}
+    lines = response_text.split('\n')
+
+    for line in lines:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            key = key.strip().upper()
+            value = value.strip()
+            if key == "DOCUMENT_TYPE":
+                document_info["DOCUMENT_TYPE"] = value
+            elif key == "COMPONENT_TYPE":
+                document_info["COMPONENT_TYPE"] = value
+    results.update(document_info)
+
+    for line in lines:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            key = key.strip().upper().replace('*', '')
+            value = value.strip()
+            if value.startswith('**'):
+                value = value[2:].strip()
+            if key in ["DOCUMENT_TYPE", "COMPONENT_TYPE"]:
+                continue
+            if key.endswith('_JUSTIFICATION'):
+                justifications[key.replace('_JUSTIFICATION', '')] = value
+            else:
+                if '[value]' in value.lower() or '[values]' in value.lower():
+                    value = ""
+                if any(not_spec in value.upper() for not_spec in [
+                        "NOT SPECIFIED", "NOT AVAILABLE", "NOT VISIBLE", "UNKNOWN", "N/A", "NONE",
+                        "NOT FOUND", "NOT INDICATED", "NOT MARKED", "NOT GIVEN", "MISSING"]):
+                    value = ""
+                if value:
+                    value = value.replace('ø', 'Ø')
+                    unit_mappings = {
+                        r'\bmm\b': 'mm', r'\bcm\b': 'cm', r'\bm\b': 'm', r'\bkg\b': 'kg',
+                        r'\bg\b': 'g', r'\bt\b': 'tons', r'\bbar\b': 'BAR', r'\bBAR\b': 'BAR',
+                        r'\bpsi\b': 'PSI', r'\bPSI\b': 'PSI', r'\bmpa\b': 'MPa', r'\bMPa\b': 'MPa',
+                        r'\bMPA\b': 'MPa', r'\bC\b': '°C', r'\bF\b': '°F', r'\b°C\b': '°C',
+                        r'\b°F\b': '°F', r'\bDEG C\b': '°C', r'\bDEG F\b': '°F'
+                    }
+                    import re
+                    for pattern, replacement in unit_mappings.items():
+                        value = re.sub(pattern, replacement, value)
+                results[key] = value if value else ""
+    return results, justifications
+
+
+def load_corpus(patterns, log_path):
+    corpus = [content for _, content, _ in load_recorded_responses(log_path)] if os.path.exists(log_path) else []
+    if os.path.exists(RESPONSE_CACHE_PATH):
+        with sqlite3.connect(RESPONSE_CACHE_PATH) as conn:
+            for (body,) in conn.execute("SELECT body FROM responses"):
+                try:
+                    corpus.append(json.loads(body)["choices"][0]["message"]["content"])
+                except (ValueError, KeyError, IndexError, TypeError):
+                    pass
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                corpus.append(f.read())
+    return [content for content in corpus if isinstance(content, str) and content]
+
+
+def synthetic_replies(corpus, count, lines_per_reply=400, seed=0):
+    """Long replies mixing reasoning prose with KEY: value and justification lines from the corpus"""
+    rng = random.Random(seed)
+    pairs = [line for content in corpus for line in content.splitlines() if ':' in line] or [
+        "BORE_DIAMETER: 110mm", "OPERATING_PRESSURE_MAX: 160 bar", "FLUID_TYPE: Mineral Oil"]
+    prose = [
+        "Looking at the title block in the lower right corner of the sheet",
+        "The section view shows the piston seal arrangement and the cushioning sleeve",
+        "Cross-checking the dimension against the specification table",
+    ]
+    replies = []
+    for _ in range(count):
+        lines = []
+        for _ in range(lines_per_reply):
+            roll = rng.random()
+            if roll < 0.5:
+                lines.append(rng.choice(prose))
+            elif roll < 0.8:
+                lines.append(rng.choice(pairs))
+            else:
+                key = rng.choice(pairs).split(':', 1)[0]
+                lines.append(f"{key}_JUSTIFICATION: Read from the spec table, row 3")
+        replies.append("\n".join(lines))
+    return replies
+
+
+def lines_per_second(parse, corpus, repeat):
+    line_count = sum(content.count('\n') + 1 for content in corpus) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for content in corpus:
+            parse(content)
+    return line_count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", action="append", default=[], help="Glob of saved reply text files (repeatable)")
+    parser.add_argument("--log", default="cylinder_analysis.log")
+    parser.add_argument("--synthetic", type=int, default=200, help="Number of long synthetic replies to add")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    recorded = load_corpus(args.corpus, args.log)
+    corpus = recorded + synthetic_replies(recorded, args.synthetic)
+    if not corpus:
+        print("Empty corpus")
+        return
+    line_count = sum(content.count('\n') + 1 for content in corpus)
+    print(f"{len(recorded)} recorded + {len(corpus) - len(recorded)} synthetic replies, {line_count} lines")
+
+    legacy = lines_per_second(tokenize_legacy, corpus, args.repeat)
+    single_pass = lines_per_second(tokenize_response, corpus, args.repeat)
+    full = lines_per_second(parse_response, corpus, args.repeat)
+    print(f"legacy two-pass tokenizer: {legacy:>12,.0f} lines/s")
+    print(f"single-pass tokenizer:     {single_pass:>12,.0f} lines/s  ({single_pass / legacy:.1f}x)")
+    print(f"full parse_response:       {full:>12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Parse-time and parse-failure benchmark for the structured-output mode.
+
+Reads the chat-completion responses recorded in cylinder_analysis.log and,
+for each one, compares:
+
+  text (logged)    - parameters the text pipeline actually recovered, taken
+                     from the "Final extracted parameters" log line
+  structured       - the same reply as schema JSON (what the model returns
+                     with response_format set), parsed by
+                     structured_output.parse_structured_response
+  raw as JSON      - the recorded free-text reply fed to the structured
+                     parser, i.e. how often the text fallback is needed for
+                     replies recorded before structured mode
+
+Usage:
+    python bench_structured_output.py [--log cylinder_analysis.log] [--repeat 2000]
+"""
+import argparse
+import json
+import re
+import time
+
+from structured_output import StructuredOutputError, parse_structured_response
+
+_LOG_ENTRY = re.compile(r"^\S+ \S+ - INFO - (API Response|Final extracted parameters) for analysis (\w+): (.*)$")
+_KEY_VALUE = re.compile(r"^\s*([A-Z][A-Z0-9_ /().-]*?)\s*:\s*(.*?)\s*$")
+_EMPTY = {"", "NA", "N/A", "NONE", "UNKNOWN", "NOT SPECIFIED"}
+
+
+def load_recorded_responses(path):
+    """[(analysis id, reply content, logged final parameters or None)] in log order"""
+    replies = {}
+    finals = {}
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = _LOG_ENTRY.match(line.rstrip("\n"))
+            if not match:
+                continue
+            kind, analysis_id, body = match.groups()
+            try:
+                data = json.loads(body)
+            except ValueError:
+                continue
+            if kind == "API Response":
+                replies[analysis_id] = data["choices"][0]["message"]["content"]
+            else:
+                finals[analysis_id] = data
+    return [(analysis_id, content, finals.get(analysis_id)) for analysis_id, content in replies.items()]
+
+
+def reply_values(content):
+    """KEY: value pairs with a real value in a free-text reply"""
+    values = {}
+    for line in content.splitlines():
+        match = _KEY_VALUE.match(line)
+        if match and match.group(2).upper() not in _EMPTY:
+            values[match.group(1)] = match.group(2)
+    return values
+
+
+def as_structured_reply(values):
+    """The reply the model gives for the same values in structured-output mode"""
+    return json.dumps({
+        "document_type": "ENGINEERING_DRAWING",
+        "component_type": "CYLINDER",
+        "parameters": [
+            {"name": key, "value": value, "justification": "Recorded reply"} for key, value in values.items()
+        ],
+    })
+
+
+def time_parse(content, repeat):
+    """(seconds per parse, result or None on failure)"""
+    result = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            result = parse_structured_response(content)
+        except StructuredOutputError:
+            result = None
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default="cylinder_analysis.log")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    responses = load_recorded_responses(args.log)
+    if not responses:
+        print(f"No recorded responses in {args.log}")
+        return
+
+    totals = {"values": 0, "text": 0, "structured": 0, "structured_failed": 0, "raw_failed": 0,
+              "structured_seconds": 0.0}
+    print(f"{'analysis':<10} {'values':>6} {'text':>6} {'struct':>6} {'parse us':>9} {'raw as JSON':>12}")
+    for analysis_id, content, final in responses:
+        values = reply_values(content)
+        text_found = sum(1 for value in (final or {}).values() if str(value).upper() not in _EMPTY)
+
+        seconds, result = time_parse(as_structured_reply(values), args.repeat)
+        structured_found = sum(1 for value in result.values.values() if value) if result else 0
+        _, raw_result = time_parse(content, 1)
+
+        totals["values"] += len(values)
+        totals["text"] += text_found
+        totals["structured"] += structured_found
+        totals["structured_failed"] += result is None
+        totals["raw_failed"] += raw_result is None
+        totals["structured_seconds"] += seconds
+        print(f"{analysis_id:<10} {len(values):>6} {text_found:>6} {structured_found:>6} "
+              f"{seconds * 1e6:>9.1f} {'fallback' if raw_result is None else 'parsed':>12}")
+
+    count = len(responses)
+    print()
+    print(f"{count} recorded replies, {totals['values']} values present in the replies")
+    print(f"text pipeline (logged): {totals['text']} recovered "
+          f"({1 - totals['text'] / max(totals['values'], 1):.0%} lost)")
+    print(f"structured:             {totals['structured']} recovered, "
+          f"{totals['structured_failed']}/{count} parse failures, "
+          f"{totals['structured_seconds'] / count * 1e6:.1f} us per reply")
+    print(f"recorded text replies needing the text fallback: {totals['raw_failed']}/{count}")
+
+
+if __name__ == "__main__":
+    main()
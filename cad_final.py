@@ -1,1587 +1,38 @@
 import streamlit as st
-import base64
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 import io
 import pandas as pd
-import os
-import requests
 import datetime
-from pdf2image import convert_from_bytes
-import tempfile
-import sys
-import subprocess
-import fitz  # PyMuPDF
-from pdf2image.exceptions import PDFPageCountError
-import uuid
-import numpy as np
-
-# Load environment variables from .env file
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass  # dotenv not installed, will use system environment variables
-
-# Try to import pytesseract, but make it optional
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
-
-import pytesseract
-pytesseract.pytesseract.tesseract_cmd = r"C:\Users\shrey\Downloads\tesseract-ocr-w64-setup-v5.3.0.20221214.exe"
-
-
-
-def check_poppler_installed():
-    """Check if poppler is installed on the system"""
-    try:
-        if sys.platform.startswith('win'):
-            # On Windows, check if path contains poppler
-            return any('poppler' in path.lower() for path in os.environ.get('PATH', '').split(os.pathsep))
-        else:
-            # On Unix-like systems, try to run pdftoppm
-            subprocess.run(['pdftoppm', '-v'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return True
-    except (FileNotFoundError, subprocess.SubprocessError):
-        return False
-
-# === Load API Key from Environment ===
-API_KEY = os.getenv("OPENAI_API_KEY")
-
-if not API_KEY:
-    st.error("❌ No API key provided! Please manually set it in the script.")
-    st.stop()
-
-# Initialize API key in session state
-if 'current_api_key' not in st.session_state:
-    st.session_state.current_api_key = API_KEY
-
-
-def handle_api_response(response_json, retry_func=None, *args, **kwargs):
-    """Handle API response and switch keys if needed"""
-    if 'error' in response_json:
-        error = response_json.get('error', {})
-        if isinstance(error, dict):
-            error_type = error.get('type', '')
-            error_code = error.get('code', '')
-            error_message = error.get('message', '')
-            
-            # Check for rate limit error
-            if error_type == 'rate_limit_exceeded' or 'rate limit' in error_message.lower():
-                if switch_api_key():
-                    st.warning("Switching to alternate API key due to rate limit...")
-                    if retry_func:
-                        return retry_func(*args, **kwargs)
-                    return None
-                else:
-                    st.error("❌ All API keys have reached their rate limits!")
-                    return None
-            # Handle other specific error codes
-            elif error_code == 'invalid_api_key' or error_type == 'invalid_request_error' and 'api key' in error_message.lower():
-                st.error("❌ Authentication failed: Please check your API key")
-                return None
-            elif error_type == 'invalid_request_error':
-                st.error(f"❌ Invalid request: {error_message}")
-                return None
-            elif error_type == 'server_error':
-                st.error(f"❌ Server error: Please try again later. {error_message}")
-                return None
-            else:
-                st.error(f"❌ API Error: {error_message}")
-                return None
-    return response_json
-
-def process_api_response(response, retry_func=None, *args, **kwargs):
-    """Process API response and handle errors"""
-    try:
-        response_json = response.json()
-        
-        # Check if response is successful and contains choices for OpenAI
-        if response.status_code == 200 and "choices" in response_json:
-            content = response_json["choices"][0]["message"]["content"]
-            
-            # First, check if there's a parameter-justification format after the JSON
-            # This is our preferred format as it already has justifications
-            if "DOCUMENT_TYPE:" in content and "DOCUMENT_TYPE_JUSTIFICATION:" in content:
-                # Find where the parameter format starts
-                param_start = content.find("DOCUMENT_TYPE:")
-                if param_start > 0:
-                    return content[param_start:]
-            
-            # If no parameter format, check for JSON
-            if "```json" in content and "```" in content.split("```json", 1)[1]:
-                # Extract JSON content
-                json_content = content.split("```json", 1)[1].split("```", 1)[0].strip()
-                # Try to parse it as JSON
-                try:
-                    import json
-                    parsed_json = json.loads(json_content)
-                    # Convert JSON to parameter format
-                    formatted_content = []
-                    for key, value in parsed_json.items():
-                        # Skip null or N/A values
-                        if value is None or value == "N/A":
-                            continue
-                        # Format key properly
-                        formatted_key = key.upper().replace(" ", "_")
-                        formatted_content.append(f"{formatted_key}: {value}")
-                        # Add justification
-                        if key == "Document Type":
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Determined based on document format and content.")
-                        elif key == "Component Type":
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Identified from component characteristics in the document.")
-                        elif key == "Notes":
-                            continue  # Skip justification for notes
-                        else:
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Extracted from the document. Specific location unspecified.")
-                    return "\n".join(formatted_content)
-                except Exception as e:
-                    # If JSON parsing fails, return the original content
-                    print(f"JSON parsing error: {str(e)}")
-            
-            # If no JSON or parameter format found, return the original content
-            return content
-            
-        # Handle API errors
-        handled_response = handle_api_response(response_json, retry_func, *args, **kwargs)
-        if handled_response and "choices" in handled_response:
-            content = handled_response["choices"][0]["message"]["content"]
-            
-            # First, check if there's a parameter-justification format after the JSON
-            # This is our preferred format as it already has justifications
-            if "DOCUMENT_TYPE:" in content and "DOCUMENT_TYPE_JUSTIFICATION:" in content:
-                # Find where the parameter format starts
-                param_start = content.find("DOCUMENT_TYPE:")
-                if param_start > 0:
-                    return content[param_start:]
-            
-            # If no parameter format, check for JSON
-            if "```json" in content and "```" in content.split("```json", 1)[1]:
-                # Extract JSON content
-                json_content = content.split("```json", 1)[1].split("```", 1)[0].strip()
-                # Try to parse it as JSON
-                try:
-                    import json
-                    parsed_json = json.loads(json_content)
-                    # Convert JSON to parameter format
-                    formatted_content = []
-                    for key, value in parsed_json.items():
-                        # Skip null or N/A values
-                        if value is None or value == "N/A":
-                            continue
-                        # Format key properly
-                        formatted_key = key.upper().replace(" ", "_")
-                        formatted_content.append(f"{formatted_key}: {value}")
-                        # Add justification
-                        if key == "Document Type":
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Determined based on document format and content.")
-                        elif key == "Component Type":
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Identified from component characteristics in the document.")
-                        elif key == "Notes":
-                            continue  # Skip justification for notes
-                        else:
-                            formatted_content.append(f"{formatted_key}_JUSTIFICATION: Extracted from the document. Specific location unspecified.")
-                    return "\n".join(formatted_content)
-                except Exception as e:
-                    # If JSON parsing fails, return the original content
-                    print(f"JSON parsing error: {str(e)}")
-            
-            # If no JSON or parameter format found, return the original content
-            return content
-            
-        # If we get here, something went wrong
-        error_info = response_json.get('error', {})
-        if isinstance(error_info, dict):
-            error_msg = error_info.get('message', 'Unknown error occurred')
-        else:
-            error_msg = str(error_info)
-        
-        return f"❌ API Error: {error_msg}"
-        
-    except Exception as e:
-        return f"❌ Processing Error: {str(e)}"
-
-# OpenAI API URL for GPT-4o
-API_URL = "https://api.openai.com/v1/chat/completions"
-
-def encode_image_to_base64(image_bytes):
-    return "data:image/jpeg;base64," + base64.b64encode(image_bytes).decode("utf-8")
-
-def parse_ai_response(response_text):
-    """Parse the AI response into a structured format with enhanced handling for mixed document types."""
-    results = {}
-    justifications = {}
-    document_info = {}
-    lines = response_text.split('\n')
-    
-    # Debug the raw response
-    print(f"Raw AI response: {response_text[:200]}...")
-    
-    # First pass to extract document type information
-    for line in lines:
-        if ':' in line:
-            key, value = line.split(':', 1)
-            key = key.strip().upper()
-            value = value.strip()
-            
-            # Capture document type information
-            if key == "DOCUMENT_TYPE":
-                document_info["DOCUMENT_TYPE"] = value
-            elif key == "COMPONENT_TYPE":
-                document_info["COMPONENT_TYPE"] = value
-    
-    # Add document info to results if found
-    if document_info:
-        for key, value in document_info.items():
-            results[key] = value
-    
-    # Second pass to extract all parameters and justifications
-    for line in lines:
-        if ':' in line:
-            key, value = line.split(':', 1)
-            key = key.strip().upper()
-            # Remove any ** characters from parameter names
-            key = key.replace('*', '')
-            value = value.strip()
-            # Remove any ** characters from the beginning of values
-            if value.startswith('**'):
-                value = value[2:].strip()
-            
-            # Skip document type keys already processed
-            if key in ["DOCUMENT_TYPE", "COMPONENT_TYPE"]:
-                continue
-                
-            # Check if this is a justification field
-            if key.endswith('_JUSTIFICATION'):
-                base_key = key.replace('_JUSTIFICATION', '')
-                justifications[base_key] = value
-            else:
-                # Check if value contains any variation of [value] and set to empty if it does
-                if '[value]' in value.lower() or '[values]' in value.lower():
-                    value = ""
-                
-                # Handle different forms of "Not Specified" consistently
-                if any(not_spec in value.upper() for not_spec in ["NOT SPECIFIED", "NOT AVAILABLE", "NOT VISIBLE", "UNKNOWN", "N/A", "NONE", "NOT FOUND", "NOT INDICATED", "NOT MARKED", "NOT GIVEN", "MISSING"]):
-                    value = ""
-                    
-                # Parse JSON-like structures into separate lines
-                if (value.startswith('{') and value.endswith('}')) or \
-                   (value.startswith('[{') and value.endswith('}]')) or \
-                   (value.startswith("'") and ":" in value):
-                    try:
-                        # Handle dict format: {'key1': 'value1', 'key2': 'value2'} 
-                        # or list format: [{'key': 'value'}]
-                        # or quoted string format: 'Mounting': 'Rear Clevis'
-                        
-                        # Strip outer brackets for processing
-                        processed_value = value
-                        if value.startswith('[{') and value.endswith('}]'):
-                            processed_value = value[1:-1]  # Remove outer brackets
-                        if value.startswith('{') and value.endswith('}'):
-                            processed_value = value.strip('{}')
-                            
-                        value_parts = []
-                        
-                        # Handle different formats of key-value pairs
-                        import re
-                        
-                        # Try to directly extract key-value pairs
-                        # This handles formats like 'key1': 'value1', 'key2': 'value2'
-                        pairs = re.findall(r'[\'"]([^\'"]*)[\'"]\s*:\s*[\'"]([^\'"]*)[\'"]\s*(?:,|$)', processed_value)
-                        
-                        if pairs:
-                            # Just use the values directly without the keys - this is what we want to display
-                            value_parts = [v for _, v in pairs]
-                            value = v if len(value_parts) == 1 else "\n".join(value_parts)
-                        else:
-                            # Fallback to simple splitting if regex didn't work
-                            if ',' in processed_value:
-                                parts = processed_value.split(',')
-                                for part in parts:
-                                    if ':' in part:
-                                        k, v = part.split(':', 1)
-                                        k = k.strip().strip('\'"')
-                                        v = v.strip().strip('\'"')
-                                        # Just add the value, not the key
-                                        value_parts.append(v)
-                                
-                                if value_parts:
-                                    value = value_parts[0] if len(value_parts) == 1 else "\n".join(value_parts)
-                    except Exception as e:
-                        # If parsing fails, keep the original value but remove quotes and braces
-                        if value.startswith("'") and value.endswith("'"):
-                            value = value.strip("'")
-                        elif value.startswith('"') and value.endswith('"'):
-                            value = value.strip('"')
-                        print(f"Error parsing JSON-like value: {e}")
-                
-                # Clean and standardize common units
-                if value:
-                    # Standardize diameter symbol
-                    value = value.replace('ø', 'Ø')
-                    
-                    # Standardize units for consistency
-                    unit_mappings = {
-                        r'\bmm\b': 'mm',
-                        r'\bcm\b': 'cm',
-                        r'\bm\b': 'm',
-                        r'\bkg\b': 'kg',
-                        r'\bg\b': 'g',
-                        r'\bt\b': 'tons',
-                        r'\bbar\b': 'BAR',
-                        r'\bBAR\b': 'BAR',
-                        r'\bpsi\b': 'PSI',
-                        r'\bPSI\b': 'PSI',
-                        r'\bmpa\b': 'MPa',
-                        r'\bMPa\b': 'MPa',
-                        r'\bMPA\b': 'MPa',
-                        r'\bC\b': '°C',
-                        r'\bF\b': '°F',
-                        r'\b°C\b': '°C',
-                        r'\b°F\b': '°F',
-                        r'\bDEG C\b': '°C',
-                        r'\bDEG F\b': '°F'
-                    }
-                    
-                    import re
-                    for pattern, replacement in unit_mappings.items():
-                        value = re.sub(pattern, replacement, value)
-                
-                # Store the value    
-                results[key] = value if value else ""  # Keep blank if missing
-    
-    # Filter results if in custom mode
-    if st.session_state.parameter_mode == "Custom":
-        # Use generic key for custom parameters
-        if "GENERIC" in st.session_state.custom_parameters:
-            custom_params = st.session_state.custom_parameters["GENERIC"]
-            
-            # Debug info
-            print(f"Custom mode active")
-            print(f"Custom parameters: {custom_params}")
-            print(f"Original results keys: {[k for k in results.keys() if not k.endswith('_JUSTIFICATION')]}")
-            
-            # Create a new filtered results dictionary with only the requested parameters
-            filtered_results = {}
-            # Always keep document type and component type
-            filtered_results["DOCUMENT_TYPE"] = results.get("DOCUMENT_TYPE", "")
-            filtered_results["COMPONENT_TYPE"] = results.get("COMPONENT_TYPE", "")
-            
-            # Add only the requested parameters and their justifications
-            for param in custom_params:
-                param_key = param.strip().upper()
-                # Find the matching key in results (case insensitive)
-                matching_key = None
-                for key in results:
-                    if not key.endswith('_JUSTIFICATION') and key not in ["DOCUMENT_TYPE", "COMPONENT_TYPE"]:
-                        # Normalize both keys for comparison (remove underscores, spaces, etc.)
-                        normalized_key = key.upper().replace('_', ' ').replace('-', ' ')
-                        normalized_param = param_key.replace('_', ' ').replace('-', ' ')
-                        
-                        if normalized_key == normalized_param:
-                            matching_key = key
-                            break
-                
-                if matching_key:
-                    # Add the parameter and its justification
-                    filtered_results[matching_key] = results[matching_key]
-                    just_key = f"{matching_key}_JUSTIFICATION"
-                    if just_key in results:
-                        filtered_results[just_key] = results[just_key]
-                else:
-                    # Add empty parameter if not found
-                    filtered_results[param_key] = ""
-                    filtered_results[f"{param_key}_JUSTIFICATION"] = "Parameter not found in the document."
-            
-            # Debug filtered results
-            print(f"Filtered results keys: {[k for k in filtered_results.keys() if not k.endswith('_JUSTIFICATION')]}")
-            
-            # Replace results with filtered results
-            results = filtered_results
-    
-    # Create a parameter mapping for related parameters to avoid duplication
-    parameter_relationships = {
-        # Standard relationships between similar parameters
-        "HEIGHT": ["HEIGHT", "ITEM HEIGHT", "TOTAL HEIGHT"],
-        "LENGTH": ["LENGTH", "ITEM LENGTH", "TOTAL LENGTH"],
-        "WIDTH": ["WIDTH", "ITEM WIDTH", "TOTAL WIDTH"],
-        "WEIGHT": ["WEIGHT", "ITEM WEIGHT", "UNIT WEIGHT", "PRODUCT WEIGHT"],
-        "CLOSED HEIGHT": ["CLOSED HEIGHT", "MINIMUM HEIGHT", "MIN HEIGHT", "COLLAPSED HEIGHT"],
-        "OPEN HEIGHT": ["OPEN HEIGHT", "MAXIMUM HEIGHT", "MAX HEIGHT", "EXTENDED HEIGHT"],
-        "BORE DIAMETER": ["BORE DIAMETER", "BORE DIA", "INSIDE DIAMETER", "INNER DIAMETER", "BORE"],
-        "ROD DIAMETER": ["ROD DIAMETER", "ROD DIA", "SHAFT DIAMETER", "PISTON ROD DIAMETER"],
-        "LOAD CAPACITY": ["LOAD CAPACITY", "RATED CAPACITY", "RATED CAPACITY/LOAD", "RATED LOAD", "CAPACITY", "MAX LOAD"],
-        "OPERATING PRESSURE": ["OPERATING PRESSURE", "PRESSURE RATING", "WORKING PRESSURE", "MAX PRESSURE"],
-        "DIMENSIONS": ["DIMENSIONS", "ITEM DIMENSIONS", "OVERALL DIMENSIONS", "PRODUCT DIMENSIONS"],
-        "MAKE": ["MAKE", "MANUFACTURER", "MANUFACTURER/MAKE", "BRAND", "MANUFACTURER/BRAND"],
-        "MODEL": ["MODEL", "MODEL NUMBER", "MODEL/PART NUMBER", "PART NUMBER", "MODEL NO", "PART NO"],
-        "MATERIAL": ["MATERIAL", "BODY MATERIAL", "CONSTRUCTION MATERIAL", "HOUSING MATERIAL"]
-    }
-    
-    # Special handling for port-related parameters
-    port_params = ["PORT SIZE", "PORT TYPE", "PORT LOCATION"]
-    all_port_values = {}
-    
-    # Special handling for numeric range values like dimensions
-    # Extract all numeric values with units from dimensions
-    for dim_param in ["DIMENSIONS", "ITEM DIMENSIONS", "OVERALL DIMENSIONS"]:
-        if dim_param in results and results[dim_param]:
-            dimensions = results[dim_param]
-            
-            # Extract L x W x H pattern
-            import re
-            dim_pattern = r'(\d+(?:\.\d+)?)\s*(?:x|×)\s*(\d+(?:\.\d+)?)\s*(?:x|×)\s*(\d+(?:\.\d+)?)'
-            match = re.search(dim_pattern, dimensions.lower())
-            
-            if match:
-                # Extract the values and units
-                length, width, height = match.groups()
-                
-                # Find the unit after the dimensions
-                unit_match = re.search(r'(?:x|×)\s*\d+(?:\.\d+)?\s*([a-zA-Z]+)', dimensions.lower())
-                unit = unit_match.group(1) if unit_match else "cm"  # Default to cm if no unit found
-                
-                # Only set length/width/height if they're not already present
-                if "LENGTH" not in results or not results["LENGTH"]:
-                    results["LENGTH"] = f"{length} {unit}"
-                    results["LENGTH_JUSTIFICATION"] = "Extracted from overall dimensions."
-                
-                if "WIDTH" not in results or not results["WIDTH"]:
-                    results["WIDTH"] = f"{width} {unit}"
-                    results["WIDTH_JUSTIFICATION"] = "Extracted from overall dimensions."
-                
-                if "HEIGHT" not in results or not results["HEIGHT"]:
-                    results["HEIGHT"] = f"{height} {unit}"
-                    results["HEIGHT_JUSTIFICATION"] = "Extracted from overall dimensions."
-    
-    # Process port parameters to combine them if appropriate
-    for port_param in port_params:
-        if port_param in results and results[port_param]:
-            all_port_values[port_param] = results[port_param]
-    
-    # If we have both port type and size, consider creating a combined PORT_SPECIFICATION
-    if "PORT TYPE" in all_port_values and "PORT SIZE" in all_port_values:
-        port_type = all_port_values["PORT TYPE"]
-        port_size = all_port_values["PORT SIZE"]
-        
-        # Only combine if both have values
-        if port_type and port_size:
-            # Create combined port specification
-            results["PORT_SPECIFICATION"] = f"{port_type} {port_size}"
-            results["PORT_SPECIFICATION_JUSTIFICATION"] = "Combined from port type and port size information."
-    
-    # Normalize parameter names to find relations
-    normalized_results = {}
-    for key in list(results.keys()):
-        if not key.endswith("_JUSTIFICATION") and results.get(key, "").strip():
-            # Check if key contains JSON-like structure but wasn't properly parsed yet
-            value = results[key]
-            if isinstance(value, str) and (
-                (value.startswith('{') and value.endswith('}')) or
-                (value.startswith('[{') and value.endswith('}]')) or
-                (value.startswith("'") and ":" in value)
-            ):
-                # Apply the same JSON parsing logic here to ensure consistent display
-                try:
-                    # Process different JSON-like formats
-                    processed_value = value
-                    if value.startswith('[{') and value.endswith('}]'):
-                        processed_value = value[1:-1]
-                    if value.startswith('{') and value.endswith('}'):
-                        processed_value = value.strip('{}')
-                        
-                    import re
-                    pairs = re.findall(r'[\'"]([^\'"]*)[\'"]\s*:\s*[\'"]([^\'"]*)[\'"]\s*(?:,|$)', processed_value)
-                    
-                    if pairs:
-                        # Extract just the values
-                        values = [v for _, v in pairs]
-                        if len(values) == 1:
-                            results[key] = values[0]
-                        else:
-                            results[key] = "\n".join(values)
-                except Exception as e:
-                    # If parsing fails, leave as is
-                    print(f"Error normalizing JSON value: {e}")
-            
-            norm_key = key.upper()
-            normalized_results[norm_key] = results[key]
-            
-            # Find and remove any related parameters that would cause duplication
-            for main_param, related_params in parameter_relationships.items():
-                if norm_key in related_params:
-                    # This is a related parameter, check if main parameter exists with value
-                    main_norm = main_param.upper()
-                    if main_norm in normalized_results and normalized_results[main_norm]:
-                        # If main parameter already has a value, this is a duplicate
-                        if main_norm != norm_key:
-                            # Transfer the justification from this param to the main param
-                            just_key = f"{key}_JUSTIFICATION"
-                            main_just_key = f"{main_param}_JUSTIFICATION"
-                            if just_key in results:
-                                results[main_just_key] = results[just_key]
-                            # Remove this duplicate parameter
-                            results[key] = ""
-    
-    # Handle dimension-related parameters to avoid duplicates
-    if "DIMENSIONS" in results and results["DIMENSIONS"]:
-        # If we have dimensions but no height/width values, try to extract them
-        dimensions = results["DIMENSIONS"]
-        
-        # Try to parse dimensions like "93 x 55 x 29 Centimeters" into height/width/depth
-        if "x" in dimensions.lower() or "×" in dimensions:
-            # Handle both x and × symbols
-            dim_parts = [part.strip() for part in dimensions.lower().replace('×', 'x').split("x")]
-            
-            # Extract unit if present
-            unit = ""
-            last_part = dim_parts[-1]
-            # Find where the numbers end and unit begins
-            for i, char in enumerate(last_part):
-                if not (char.isdigit() or char == "." or char.isspace()):
-                    if i > 0:
-                        unit = last_part[i:].strip()
-                        dim_parts[-1] = last_part[:i].strip()
-                    break
-            
-            # Only set these if they're not already present with values
-            if len(dim_parts) >= 1 and ("LENGTH" not in results or not results["LENGTH"]):
-                length_val = dim_parts[0]
-                if unit:
-                    length_val += " " + unit
-                results["LENGTH"] = length_val
-                results["LENGTH_JUSTIFICATION"] = "Extracted from item dimensions."
-            
-            if len(dim_parts) >= 2 and ("WIDTH" not in results or not results["WIDTH"]):
-                width_val = dim_parts[1]
-                if unit:
-                    width_val += " " + unit
-                results["WIDTH"] = width_val
-                results["WIDTH_JUSTIFICATION"] = "Extracted from item dimensions."
-            
-            if len(dim_parts) >= 3 and ("HEIGHT" not in results or not results["HEIGHT"]):
-                height_val = dim_parts[2]
-                if unit:
-                    height_val += " " + unit
-                results["HEIGHT"] = height_val
-                results["HEIGHT_JUSTIFICATION"] = "Extracted from item dimensions."
-    
-    # Handle structured fields like Closed/Open Heights specifically for jacks/cylinders
-    # For the Hyco jack in the image, we need to recognize the format "height FOR weight"
-    for height_field in ["CLOSED HEIGHT", "OPEN HEIGHT", "MINIMUM HEIGHT", "MAXIMUM HEIGHT"]:
-        if height_field in results and "FOR" in results[height_field].upper():
-            # This might be a height specification that varies by weight/model
-            height_value = results[height_field]
-            
-            # Try to extract structured height data in format "X FOR Y, Z FOR W"
-            import re
-            # Look for pattern like "200mm FOR 1 TON, 750mm FOR 1.5TON"
-            height_matches = re.findall(r'(\d+(?:\.\d+)?(?:\s*[a-zA-Z]+)?)\s+FOR\s+([\d\.]+\s*TON)', height_value, re.IGNORECASE)
-            
-            if height_matches:
-                # Create a structured version with all heights by capacity
-                structured_value = ", ".join([f"{height} @ {capacity}" for height, capacity in height_matches])
-                results[height_field] = structured_value
-                results[f"{height_field}_JUSTIFICATION"] = "Structured from height specifications that vary by capacity."
-    
-    # Add justifications to results using a list of original keys to avoid modification during iteration
-    original_keys = list(results.keys())
-    for key in original_keys:
-        # Skip document metadata fields and justification fields
-        if key in ["DOCUMENT_TYPE", "COMPONENT_TYPE"] or key.endswith("_JUSTIFICATION"):
-            continue
-            
-        # If justification is missing, add a contextual default one
-        if key not in justifications:
-            doc_type = document_info.get("DOCUMENT_TYPE", "").upper()
-            
-            if results[key]:
-                if "PRODUCT_LISTING" in doc_type or "CATALOG" in doc_type:
-                    justifications[key] = "Extracted from the product listing specifications."
-                elif "SPECIFICATION" in doc_type:
-                    justifications[key] = "Extracted from the specification sheet."
-                elif "MIXED" in doc_type:
-                    justifications[key] = "Extracted from the document. Exact location unspecified."
-                else:
-                    justifications[key] = "Extracted directly from the drawing."
-            else:
-                if "PRODUCT_LISTING" in doc_type or "CATALOG" in doc_type:
-                    justifications[key] = "Not provided in the product listing."
-                elif "SPECIFICATION" in doc_type:
-                    justifications[key] = "Not included in the specification sheet."
-                elif "MIXED" in doc_type:
-                    justifications[key] = "Not found in any part of the document."
-                else:
-                    justifications[key] = "Not visible in the drawing."
-        
-        # Add the justification to the results
-        just_key = f"{key}_JUSTIFICATION"
-        if just_key not in results:
-            results[just_key] = justifications.get(key, "")
-    
-    return results
-
-def validate_and_improve_justifications(parsed_results):
-    """
-    Validate that all parameters have proper justifications and improve the quality of the data.
-    Returns the improved parsed_results.
-    """
-    # Make a copy to avoid modifying the original during iteration
-    results = parsed_results.copy()
-    
-    # Get all parameter keys (excluding justifications and component type)
-    param_keys = [k for k in results.keys() if not k.endswith('_JUSTIFICATION') and k != 'COMPONENT_TYPE']
-    
-    # Drawing-specific justifications for common parameters
-    drawing_specific_justifications = {
-        "BORE_DIAMETER": "Measured from the internal diameter dimension line in the cylinder cross-section view.",
-        "OUTSIDE_DIAMETER": "Measured from the external diameter dimension line in the drawing views.",
-        "ROD_DIAMETER": "Extracted from the piston rod dimension line, typically shown in the side view or cross-section.",
-        "STROKE_LENGTH": "Determined from the stroke dimension line between fully retracted and extended positions.",
-        "CLOSED_LENGTH": "Measured from the overall length dimension in the fully retracted position.",
-        "OPEN_LENGTH": "Calculated from the closed length plus stroke distance shown in the drawing.",
-        "CYLINDER_ACTION": "Determined by examining the port configuration in the drawing (single vs. double acting).",
-        "MOUNTING_TYPE": "Identified from the mounting detail view showing the attachment method.",
-        "PORT_TYPE": "Read from the port detail view or cross-section showing the connection type.",
-        "PORT_LOCATION": "Observed from the port positions shown in the main drawing views.",
-        "SEAL_TYPE": "Identified from the seal detail section view showing the seal configuration.",
-        "DIMENSIONS": "Extracted from the primary dimension lines showing length, width, and height.",
-        "WEIGHT": "Inferred from material and volume calculations based on dimensions in the drawing."
-    }
-    
-    for key in param_keys:
-        justification_key = f"{key}_JUSTIFICATION"
-        value = results.get(key, "").strip()
-        justification = results.get(justification_key, "").strip()
-        
-        # Format the key for matching against our dictionary (standardize format)
-        formatted_key = key.upper().replace(' ', '_')
-        
-        # Check if justification exists and is meaningful
-        if not justification or justification.lower() in ["not available", "not specified", "unknown", "not provided", "not visible"]:
-            if value:
-                # If we have a value but no good justification, provide a better default
-                if formatted_key in drawing_specific_justifications:
-                    # Use our specific drawing-based justification
-                    results[justification_key] = drawing_specific_justifications[formatted_key]
-                else:
-                    results[justification_key] = f"Extracted from dimension lines and annotations in the drawing for {key.replace('_', ' ').lower()}."
-            else:
-                # If no value and no good justification, provide a clear explanation
-                results[justification_key] = f"This parameter ({key}) is not visible in any dimension lines or annotations in the drawing."
-        
-        # Check if justification is too generic
-        elif "extracted" in justification.lower() and "from" in justification.lower() and len(justification.split()) < 8:
-            # If we have a specific drawing-based justification, use it
-            if formatted_key in drawing_specific_justifications:
-                results[justification_key] = drawing_specific_justifications[formatted_key]
-            # Otherwise improve generic justifications
-            else:
-                results[justification_key] = f"Extracted from dimension lines and visual elements in the drawing showing {key.replace('_', ' ').lower()} specifications."
-        
-        # If justification mentions tables but we want to emphasize drawings
-        elif "table" in justification.lower() or "specification table" in justification.lower():
-            # If we have a specific drawing-based justification, add it
-            if formatted_key in drawing_specific_justifications:
-                results[justification_key] = f"{justification} Also verified from {drawing_specific_justifications[formatted_key].lower()}"
-            else:
-                results[justification_key] = f"{justification} Also verified from dimension lines in the drawing."
-        
-        # If no specific location is mentioned in the justification, note this
-        elif "top" not in justification.lower() and "bottom" not in justification.lower() and \
-             "left" not in justification.lower() and "right" not in justification.lower() and \
-             "center" not in justification.lower() and "table" not in justification.lower() and \
-             "dimension" not in justification.lower() and "title" not in justification.lower() and \
-             "label" not in justification.lower() and "section" not in justification.lower():
-            if len(justification.split()) < 12:  # If justification is short and lacks location details
-                # If we have a specific drawing-based justification, use it
-                if formatted_key in drawing_specific_justifications:
-                    results[justification_key] = drawing_specific_justifications[formatted_key]
-                else:
-                    results[justification_key] = f"{justification} (Located in the drawing dimension lines and annotations)"
-        
-        # Ensure all values have proper formatting
-        if key in ["OPERATING PRESSURE", "PRESSURE RATING"] and value:
-            if "BAR" not in value.upper():
-                results[key] = f"{value} BAR"
-        
-        elif key in ["OPERATING TEMPERATURE"] and value:
-            if "DEG" not in value.upper() and "°C" not in value:
-                results[key] = f"{value} DEG C"
-        
-        # Remove any values that are clearly guesses
-        if "approximately" in value.lower() or "about" in value.lower() or "around" in value.lower() or \
-           "estimated" in value.lower() or "appears to be" in value.lower():
-            results[key] = ""
-            results[justification_key] = "Unable to determine with certainty from the drawing. No clear dimension line or annotation found."
-    
-    return results
-
-def analyze_engineering_drawing(image_bytes, component_type=None):
-    """Universal analyzer for all types of engineering drawings using mode-specific prompts"""
-    base64_image = encode_image_to_base64(image_bytes)
-    
-    # If component type is provided, use a more targeted prompt
-    system_content = "You are an expert mechanical engineer with extensive experience in engineering design, manufacturing, and technical documentation analysis. Your task is to extract ALL technical specifications and provide insightful engineering analysis based on the design elements in the document. Always assume the document has been properly oriented for reading. Extract parameter names EXACTLY as they appear in the drawing, without categorizing them or using predefined parameter names."
-    
-    # Base prompt parts that are common to all modes
-    base_prompt_part1 = (
-        "TASK: Analyze this engineering document as a professional mechanical engineer. "
-        
-        "STEP 1. DOCUMENT TYPE IDENTIFICATION\n"
-        "  - Determine the document type:\n"
-        "    (A) Engineering Drawing\n"
-        "    (B) Product Listing/Catalog\n"
-        "    (C) Specification Sheet\n"
-        "    (D) Mixed Document (contains both drawings and tables)\n"
-        "  - Document this determination as \"Document Type\" in your output.\n\n"
-        
-        "STEP 2. COMPONENT IDENTIFICATION\n"
-        "  - Determine if the document describes one of these component types:\n"
-        "      • Cylinder (hydraulic, pneumatic)\n"
-        "      • Gearbox/Gear (transmission, reducer)\n"
-        "      • Valve (ball, check, control)\n"
-        "      • Nut/Bolt/Fastener\n"
-        "      • Lifting Ram or Jack (hydraulic, transmission)\n"
-        "      • Bearing\n"
-        "      • Pump\n"
-        "      • Motor\n"
-        "  - If the component type is obvious but not in the list above, specify the exact type.\n"
-        "  - If the type is ambiguous, mark the \"Component Type\" as \"UNKNOWN\" without guessing.\n\n"
+import extraction_core
+from extraction_core import (
+    API_KEY_POOL, STANDARD_COMPONENT_TYPES, TESSERACT_AVAILABLE, ExtractionSettings,
+    extraction_failed, new_drawing_id, summarize_extraction
+)
+from response_cache import get_response_cache
+from pipeline import PIPELINE_CONCURRENCY
+from drawing_records import DrawingRecord, DrawingStore
+from image_store import IMAGE_STORE_MEMORY_MB, get_image_store
+from job_queue import CANCELLED, FAILED, JOB_POLL_SECONDS, content_digest, get_job_queue
+from quantities import normalize_table
+from structured_output import STRUCTURED_OUTPUT, parse_stats
+
+print(f"API key pool: {len(API_KEY_POOL)} key(s) configured")
+
+
+def session_settings():
+    """ExtractionSettings for the current session (shares the session's parameter dicts)"""
+    return ExtractionSettings(
+        parameter_mode=st.session_state.parameter_mode,
+        custom_parameters=st.session_state.custom_parameters,
+        custom_products=st.session_state.custom_products,
+        structured_output=st.session_state.get("structured_output", STRUCTURED_OUTPUT)
     )
-    
-    # Create different prompts based on the parameter mode
-    if st.session_state.parameter_mode == "Cylinder, Hyd/Pneumatic":
-        # Create a cylinder-specific prompt focused on the 23 specified parameters
-        user_content = base_prompt_part1 + (
-            "STEP 3. CYLINDER-SPECIFIC PARAMETER EXTRACTION\n"
-            "  - Extract ONLY these specific parameters for this cylinder:\n"
-            "    1. CYLINDER_TYPE: Identify the exact type of cylinder shown in this drawing (e.g. single action/double action).\n"
-            "    2. STROKE_LENGTH: Extract the total stroke length of the rod or piston in millimeters (e.g., Stroke = 900mm).\n"
-            "    3. ROD_DIAMETER: Find the rod or shaft diameter in millimeters (look for values like 'Rod Seal 150mm').\n"
-            "    4. WORKING_PRESSURE: What is the maximum working pressure rating (in BAR or PSI) of this component?\n"
-            "    5. TEST_PRESSURE: What is the test pressure (in BAR) used for this component, if specified?\n"
-            "    6. OPERATING_TEMPERATURE: Extract the operating temperature range or any specified temperature limits.\n"
-            "    7. MATERIAL_SPECIFICATIONS: List all material specifications used for major parts (e.g., cylinder body, piston rod, seals). Include ASTM, IS codes, or GR grades.\n"
-            "    8. MOUNTING_TYPE: Identify the mounting type used in this assembly (e.g., Flange, Rear Clevis, Foot Mount).\n"
-            "    9. DRAWING_NUMBER: Provide the reference or drawing number (e.g., BHUSHAN REFERENCE DRAWING NO.: 6BRv-71170-A).\n"
-            "    10. STANDARD_CODES: Extract any manufacturing or industry standard codes followed (e.g., IS:2062 GR. B, ASTM A106 GR B).\n"
-            "    11. SPECIAL_FEATURES: List any special features, custom fittings, or non-standard components mentioned (e.g., Banjo fitting, Ball valve, Cushioning).\n"
-            "    12. MANUFACTURER: What is the manufacturer's or vendor's name (e.g., RA SPECTRUM ENGINEERING, SERMCES PVT LTD)?\n"
-            "    13. MODEL_NUMBER: Is there any model number or part number uniquely identifying this configuration?\n"
-            "    14. TECHNICAL_NOTES: Include any additional technical notes, installation requirements, or warnings present in the drawing.\n"
-            "  - EXTREMELY IMPORTANT: Do NOT extract any parameters not in this list\n"
-            "  - Search thoroughly for these specific parameters throughout the document\n"
-            "  - If a parameter in this list is not found, still include it with an empty value\n\n"
-            
-            "STEP 4. COMPREHENSIVE VISUAL SCANNING FOR CYLINDER PARAMETERS\n"
-            "  - Methodically scan EVERY part of the document in this order:\n"
-            "      1. Tables & Specification Boxes (highest priority)\n"
-            "      2. Title Blocks & Headers\n"
-            "      3. Dimensions & Callouts (annotations on drawings)\n"
-            "      4. Notes & Footnotes\n"
-            "      5. Text in Margins & Stamps\n"
-            "  - Extract ALL numeric values along with units EXACTLY as they appear\n"
-            "  - For dimensions, capture the complete value including tolerances\n\n"
-            
-            "STEP 5. ENGINEERING SYMBOL INTERPRETATION\n"
-            "  - Identify engineering symbols relevant to the cylinder parameters:\n"
-            "      • Ø or ⌀: Diameter\n" 
-            "      • R: Radius\n"
-            "      • ±: Tolerance\n"
-            "      • ▭: Square\n"
-            "      • Surface finish marks\n"
-            "      • GD&T symbols\n"
-            "  - Relate symbols to the dimensional values they qualify\n\n"
-            
-            "STEP 6. OUTPUT FORMAT\n"
-            "  - Format your extraction with the EXACT parameter names as they appear in the list above\n"
-            "  - DO NOT add dashes or bullet points before parameter names\n"
-            "  - For each parameter, include a value and detailed justification explaining its source\n"
-            "  - Format as PARAMETER_NAME: value and PARAMETER_NAME_JUSTIFICATION: explanation\n"
-            "  - For empty parameters, explain why the information couldn't be found\n\n"
-            
-            "CRITICAL REMINDER: Your output MUST ONLY include DOCUMENT_TYPE, COMPONENT_TYPE, and the 14 cylinder parameters listed above. DO NOT include any other parameters even if they are clearly visible in the document."
-        )
-    elif st.session_state.parameter_mode == "Custom":
-        # Get custom parameters for this component type or generic parameters
-        custom_params = []
-        if component_type and component_type in st.session_state.custom_parameters:
-            custom_params = st.session_state.custom_parameters[component_type]
-        elif "GENERIC" in st.session_state.custom_parameters:
-            custom_params = st.session_state.custom_parameters["GENERIC"]
-        
-        if custom_params:
-            # Create a custom mode prompt focused only on the specified parameters
-            param_list = "\n".join([f"  - {param}" for param in custom_params])
-            user_content = base_prompt_part1 + (
-                f"STEP 3. CUSTOM PARAMETER EXTRACTION\n"
-                f"  - Extract ONLY these specific parameters:\n{param_list}\n"
-                f"  - EXTREMELY IMPORTANT: Do NOT extract any parameters not in this list\n"
-                f"  - Search thoroughly for these specific parameters throughout the document\n"
-                f"  - If a parameter in this list is not found, still include it with an empty value\n\n"
-                
-                "STEP 4. COMPREHENSIVE VISUAL SCANNING FOR CUSTOM PARAMETERS\n"
-                "  - Methodically scan EVERY part of the document in this order:\n"
-                "      1. Tables & Specification Boxes (highest priority)\n"
-                "      2. Title Blocks & Headers\n"
-                "      3. Dimensions & Callouts (annotations on drawings)\n"
-                "      4. Notes & Footnotes\n"
-                "      5. Text in Margins & Stamps\n"
-                "  - Extract ALL numeric values along with units EXACTLY as they appear\n"
-                "  - For dimensions, capture the complete value including tolerances\n\n"
-                
-                "STEP 5. ENGINEERING SYMBOL INTERPRETATION\n"
-                "  - Identify engineering symbols relevant to the custom parameters:\n"
-                "      • Ø or ⌀: Diameter\n" 
-                "      • R: Radius\n"
-                "      • ±: Tolerance\n"
-                "      • ▭: Square\n"
-                "      • Surface finish marks\n"
-                "      • GD&T symbols\n"
-                "  - Relate symbols to the dimensional values they qualify\n\n"
-                
-                "STEP 6. OUTPUT FORMAT\n"
-                "  - Format your extraction with the EXACT parameter names as they appear in the list above\n"
-                "  - DO NOT add dashes or bullet points before parameter names\n"
-                "  - For each parameter, include a value and detailed justification explaining its source\n"
-                "  - Format as PARAMETER_NAME: value and PARAMETER_NAME_JUSTIFICATION: explanation\n"
-                "  - For empty parameters, explain why the information couldn't be found\n\n"
-                
-                "CRITICAL REMINDER: Your output MUST ONLY include DOCUMENT_TYPE, COMPONENT_TYPE, and the custom parameters listed above. DO NOT include any other parameters even if they are clearly visible in the document."
-            )
-            
-            # Add component type for filtering if available
-            if component_type:
-                user_content += f"\n\nCOMPONENT_TYPE_FOR_FILTERING: {component_type}\n"
-        else:
-            # No custom parameters defined, use extracted mode prompt
-            user_content = create_extracted_mode_prompt()
-    else:
-        # Use extracted mode prompt for any other mode value
-        user_content = create_extracted_mode_prompt()
-    
-    # If component type is provided, use a more targeted prompt
-    if component_type and component_type not in ["UNKNOWN"]:
-        user_content = f"This is a {component_type} drawing. Analyze it as a professional mechanical engineer.\n\n" + user_content
-    
-    # Add component-specific parameter lists
-    component_params = {
-        "CYLINDER": (
-            "For hydraulic/pneumatic Cylinders, look for these parameters using the EXACT names as they appear in the drawing:\n"
-            "- Cylinder action type (single/double acting)\n"
-            "- Bore (sometimes labeled as 'Bore', 'Bore Dia', or similar)\n"
-            "- Outside diameter\n"
-            "- Rod diameter (may be labeled as 'Piston Rod' or similar)\n"
-            "- Stroke (the travel distance)\n"
-            "- Closed length\n"
-            "- Extended/Open length\n"
-            "- Working/Operating pressure\n"
-            "- Test pressure\n"
-            "- Temperature range\n"
-            "- Mounting type/method\n"
-            "- Rod end type\n"
-            "- Fluid medium\n"
-            "- Drawing number\n"
-            "- Materials (body, rod, etc.)\n"
-            "- Load capacity\n"
-            "- Compliance standards\n"
-            "- Surface finishes\n"
-            "- Coating types\n"
-            "- Port specifications (type, size, location)\n"
-            "- Sealing system\n"
-            "- Manufacturer\n"
-            "- Model/part number\n"
-            "- Cushioning features\n"
-            "IMPORTANT: Extract the parameter names EXACTLY as shown in the drawing, not using this list's terminology\n\n"
-        ),
-        "VALVE": (
-            "For Valves, extract these critical parameters:\n"
-            "MODEL/PART NUMBER (specific identifier)\n"
-            "VALVE TYPE (ball, check, control, directional, etc.)\n"
-            "VALVE SIZE/PORT SIZE (connection dimensions)\n"
-            "PRESSURE RATING (max operating pressure)\n"
-            "FLOW CAPACITY (flow rate, Cv)\n"
-            "FLOW DIRECTION (indicated direction)\n"
-            "OPERATING MEDIUM (fluid, gas type)\n"
-            "CONNECTION TYPE (threaded, flanged, etc.)\n"
-            "BODY MATERIAL (valve body material)\n"
-            "SEAT/SEAL MATERIAL (soft seat, metal seat)\n"
-            "OPERATING TEMPERATURE (temperature range)\n"
-            "ACTUATION TYPE (manual, pneumatic, electric)\n"
-            "OPERATION PATTERN (2-way, 3-way, 4-way)\n"
-            "LEAKAGE CLASS (if specified)\n"
-            "MANUFACTURER/MAKE (brand name)\n"
-            "SPECIAL FEATURES (fire safe, anti-static, etc.)\n\n"
-        ),
-        "GEARBOX": (
-            "For Gearboxes, extract these critical parameters:\n"
-            "GEAR TYPE (helical, bevel, planetary, etc.)\n"
-            "INPUT POWER (kW, HP)\n"
-            "INPUT SPEED (RPM)\n"
-            "OUTPUT SPEED (RPM)\n"
-            "GEAR RATIO (reduction ratio)\n"
-            "SERVICE FACTOR (load/duty factor)\n"
-            "MOUNTING ARRANGEMENT (foot, flange, shaft)\n"
-            "SHAFT ORIENTATION (parallel, right angle, etc.)\n"
-            "INPUT SHAFT TYPE (solid, hollow, splined, etc.)\n"
-            "OUTPUT SHAFT TYPE (solid, hollow, splined, etc.)\n"
-            "SHAFT DIAMETER (input and output)\n"
-            "BACKLASH (if specified)\n"
-            "EFFICIENCY (percentage)\n"
-            "COOLING ARRANGEMENT (fan, cooling fins)\n"
-            "LUBRICATION SYSTEM (oil bath, grease, etc.)\n"
-            "HOUSING MATERIAL (cast iron, aluminum, etc.)\n"
-            "SEALING TYPE (lip seal, labyrinth, etc.)\n"
-            "WEIGHT (kg, lbs)\n"
-            "DIMENSIONS (LxWxH)\n"
-            "MANUFACTURER/MAKE (brand name)\n"
-            "MODEL/PART NUMBER (specific identifier)\n\n"
-        ),
-        "NUT": (
-            "For Nuts/Bolts/Fasteners, extract these critical parameters:\n"
-            "TYPE (hex, square, flange, etc.)\n"
-            "SIZE/DIMENSION (thread diameter, length)\n"
-            "THREAD TYPE (metric, imperial, etc.)\n"
-            "THREAD PITCH (thread spacing)\n"
-            "PROPERTY/STRENGTH CLASS (e.g., 8.8, 10.9)\n"
-            "MATERIAL (steel grade, stainless, etc.)\n"
-            "COATING/FINISH (zinc, cadmium, etc.)\n"
-            "STANDARD COMPLIANCE (ISO, DIN, ANSI, etc.)\n"
-            "HEAD DIMENSIONS (across flats, height)\n"
-            "TORQUE SPECIFICATION (if provided)\n"
-            "MANUFACTURER/MAKE (if branded)\n"
-            "SPECIAL FEATURES (locking, self-tapping, etc.)\n\n"
-        ),
-        "LIFTING_RAM": (
-            "For Lifting Rams/Jacks, extract these critical parameters:\n"
-            "LOAD CAPACITY (maximum lifting weight)\n"
-            "MINIMUM HEIGHT (collapsed height)\n"
-            "MAXIMUM HEIGHT (extended height)\n"
-            "CLOSED LENGTH (retracted length)\n"
-            "OPEN LENGTH (extended length)\n"
-            "LIFT RANGE/STROKE (travel distance)\n"
-            "OPERATING PRESSURE (hydraulic pressure)\n"
-            "PISTON DIAMETER (ram diameter)\n"
-            "WEIGHT (unit weight)\n"
-            "DIMENSIONS (LxWxH)\n"
-            "MATERIAL (body material)\n"
-            "ACTIVATION TYPE (manual, hydraulic, pneumatic)\n"
-            "MANUFACTURER/BRAND (make)\n"
-            "MODEL/PART NUMBER (specific identifier)\n"
-            "SPECIAL FEATURES (quick lift, safety valve, etc.)\n"
-            "PRICE (if listed in product catalog)\n\n"
-        ),
-        "BEARING": (
-            "For Bearings, extract these critical parameters:\n"
-            "BEARING TYPE (ball, roller, needle, etc.)\n"
-            "DIMENSIONS (inner dia, outer dia, width)\n"
-            "LOAD RATING (dynamic, static)\n"
-            "SPEED RATING (maximum RPM)\n"
-            "MATERIAL (bearing material)\n"
-            "LUBRICATION TYPE (grease, oil, etc.)\n"
-            "SEAL TYPE (shielded, sealed, open)\n"
-            "MANUFACTURER/BRAND (make)\n"
-            "MODEL/PART NUMBER (specific identifier)\n\n"
-        )
-    }
-    
-    # Only add component-specific parameter lists for non-custom and non-cylinder modes
-    if st.session_state.parameter_mode != "Custom" and st.session_state.parameter_mode != "Cylinder, Hyd/Pneumatic":
-        # Add component-specific parameter lists
-        if component_type and component_type.upper() in component_params:
-            user_content += component_params[component_type.upper()]
-        else:
-            # If component type is not in our standard list or is unknown, add all parameter lists
-            for params in component_params.values():
-                user_content += params
-    
-    # Make the initial API call
-    payload = {
-        "model": "gpt-4o",
-        "messages": [
-            {
-                "role": "system",
-                "content": system_content
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": user_content
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": base64_image
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": 4000,
-        "temperature": 0.1
-    }
-
-    headers = {
-        "Authorization": f"Bearer {st.session_state.current_api_key}",
-        "Content-Type": "application/json"
-    }
 
-    try:
-        response = requests.post(API_URL, headers=headers, json=payload)
-        result = process_api_response(response, analyze_engineering_drawing, image_bytes, component_type)
-        
-        if "❌" not in result:
-            # Parse results from first pass
-            first_pass_results = parse_ai_response(result)
-            
-            # Process pressure ranges for consistent formatting in first pass
-            for pressure_param in ['OPERATING PRESSURE', 'PRESSURE RATING']:
-                if pressure_param in first_pass_results:
-                    pressure = first_pass_results.get(pressure_param, '').strip()
-                    if pressure:
-                        # Standardize pressure range format
-                        if '...' in pressure or '..' in pressure:
-                            # Replace ellipsis with 'to'
-                            pressure = pressure.replace('...', ' to ').replace('..', ' to ')
-                        elif 'TO' in pressure.upper():
-                            # Replace 'TO' with 'to' for consistent formatting
-                            pressure = pressure.upper().replace('TO', 'to').lower()
-                            pressure = pressure.replace('to', ' to ').replace('  to  ', ' to ')
-                        
-                        # Ensure "BAR" format is consistent
-                        if 'BAR' not in pressure.upper():
-                            pressure = pressure + " BAR"
-                        
-                        # Normalize spacing
-                        pressure = ' '.join(pressure.split())
-                        first_pass_results[pressure_param] = pressure
-            
-            # Process temperature ranges in first pass
-            if 'OPERATING TEMPERATURE' in first_pass_results:
-                temp = first_pass_results.get('OPERATING TEMPERATURE', '').strip()
-                if temp:
-                    # Standardize temperature range format
-                    if '...' in temp or '..' in temp:
-                        # Replace ellipsis with 'to'
-                        temp = temp.replace('...', ' to ').replace('..', ' to ')
-                    elif 'TO' in temp.upper():
-                        # Replace 'TO' with 'to' for consistent formatting
-                        temp = temp.upper().replace('TO', 'to').lower()
-                        temp = temp.replace('to', ' to ').replace('  to  ', ' to ')
-                    elif '+' in temp and '-' in temp:
-                        # Handle formats like "-10°C +60°C"
-                        parts = temp.replace('°C', '').replace('DEG C', '').split()
-                        # Extract the numbers
-                        nums = [p for p in parts if any(c.isdigit() for c in p)]
-                        if len(nums) >= 2:
-                            temp = f"{nums[0]} to {nums[1]} DEG C"
-                    
-                    # Ensure "DEG C" format is consistent
-                    if 'DEG C' not in temp.upper():
-                        # Remove any existing temperature units
-                        temp = temp.replace('°C', '').replace('C', '')
-                        # Add DEG C
-                        if 'DEG' not in temp.upper():
-                            temp = temp + " DEG C"
-                    
-                    # Normalize spacing
-                    temp = ' '.join(temp.split())
-                    first_pass_results['OPERATING TEMPERATURE'] = temp
-            
-            # Perform second pass for any missing fields without showing messages
-            # Only perform second pass if params have empty values
-            if st.session_state.parameter_mode == "Custom" and any(not first_pass_results.get(param.strip().upper(), "") for param in (st.session_state.custom_parameters.get("GENERIC", []) or [])):
-                final_results = perform_second_extraction_pass(image_bytes, first_pass_results, component_type)
-            elif st.session_state.parameter_mode == "Cylinder, Hyd/Pneumatic" and any(not first_pass_results.get(param, "") for param in ["BORE_DIAMETER", "MOUNTING", "OPERATING_TEMPERATURE", "OPERATING_PRESSURE", "CLOSE_LENGTH", "DRAWING_NUMBER", "FLUID", "ROD_END", "CYLINDER_ACTION", "STROKE_LENGTH", "ROD_DIAMETER", "OUTSIDE_DIAMETER", "BODY_MATERIAL", "OPEN_LENGTH", "RATED_LOAD", "PISTON_MATERIAL", "STANDARD", "SURFACE_FINISH", "COATING_THICKNESS", "SPECIAL_FEATURES", "CYLINDER_CONFIGURATION", "CYLINDER_STYLE", "CONCENTRICITY_OF_ROD_AND_TUBE"]):
-                final_results = perform_second_extraction_pass(image_bytes, first_pass_results, component_type)
-            else:
-                final_results = first_pass_results
-            
-            # Validate and improve justifications
-            final_results = validate_and_improve_justifications(final_results)
-            
-            # Get component type
-            component_type = final_results.get('COMPONENT_TYPE', '')
-            if not component_type:
-                # Try to determine component type from other parameters
-                if 'CYLINDER ACTION' in final_results:
-                    component_type = 'CYLINDER'
-                elif 'GEAR TYPE' in final_results:
-                    component_type = 'GEARBOX'
-                elif 'MODEL NO' in final_results and 'SIZE OF VALVE' in final_results:
-                    component_type = 'VALVE'
-                elif 'PROPERTY CLASS' in final_results and 'NUT STANDARD' in final_results:
-                    component_type = 'NUT'
-                elif 'PISTON LIFTING FORCE' in final_results:
-                    component_type = 'LIFTING_RAM'
-                else:
-                    component_type = 'UNKNOWN'
-            
-            # Add component type to results
-            final_results['COMPONENT_TYPE'] = component_type
-            
-            # Compare first and second pass results to count how many fields were improved
-            improved_fields = 0
-            for key, value in final_results.items():
-                if not key.endswith("_JUSTIFICATION") and key not in ["DOCUMENT_TYPE", "COMPONENT_TYPE"]:
-                    # If second pass found a value where first pass had none
-                    if value and (key not in first_pass_results or not first_pass_results[key]):
-                        improved_fields += 1
-            
-            return '\n'.join([f"{k}: {v}" for k, v in final_results.items()])
-        return result
-    except Exception as e:
-        return f"❌ Processing Error: {str(e)}"
-
-# Helper function to create the extracted mode prompt
-def create_extracted_mode_prompt():
-    """Create the prompt for extracted mode"""
-    return (
-        "TASK: Analyze this engineering document as a professional mechanical engineer. Extract all technical specifications and provide insightful engineering analysis based on the design elements in the document. The image has been automatically oriented correctly for you.\n\n"
-        
-        "STEP 1. DOCUMENT TYPE IDENTIFICATION\n"
-        "  - Determine the document type:\n"
-        "    (A) Engineering Drawing\n"
-        "    (B) Product Listing/Catalog\n"
-        "    (C) Specification Sheet\n"
-        "    (D) Mixed Document (contains both drawings and tables)\n"
-        "  - Document this determination as \"Document Type\" in your output.\n\n"
-        
-        "STEP 2. COMPREHENSIVE VISUAL SCANNING\n"
-        "  - Methodically scan EVERY part of the document in this order:\n"
-        "      1. Tables & Specification Boxes (highest priority)\n"
-        "      2. Title Blocks & Headers\n"
-        "      3. Dimensions & Callouts (annotations on drawings)\n"
-        "      4. Notes & Footnotes\n"
-        "      5. Text in Margins & Stamps\n"
-        "  - Pay SPECIAL ATTENTION to data in tables, as they often contain the most critical specifications.\n"
-        "  - Extract ALL numeric values along with units EXACTLY as they appear.\n"
-        "  - For dimensions, capture the complete value including tolerances.\n"
-        "  - Look for small text and specification tables that may be placed anywhere in the document.\n"
-        "  - For product listings, examine ALL fields in the specifications section.\n\n"
-        
-        "STEP 3. EXTRACTION OF IDENTIFYING INFORMATION\n"
-        "  - Look for and extract ALL of these identifying details:\n"
-        "      • Manufacturer/Brand name\n"
-        "      • Model numbers & Part numbers\n"
-        "      • Drawing numbers & Revision information\n"
-        "      • Standards & Certification references\n"
-        "      • Serial numbers & Batch codes\n"
-        "  - If a detail appears in multiple places, record it from the most authoritative location.\n\n"
-        
-        "STEP 4. COMPONENT IDENTIFICATION\n"
-        "  - Determine if the document describes one of these component types:\n"
-        "      • Cylinder (hydraulic, pneumatic)\n"
-        "      • Gearbox/Gear (transmission, reducer)\n"
-        "      • Valve (ball, check, control)\n"
-        "      • Nut/Bolt/Fastener\n"
-        "      • Lifting Ram or Jack (hydraulic, transmission)\n"
-        "      • Bearing\n"
-        "      • Pump\n"
-        "      • Motor\n"
-        "  - If the component type is obvious but not in the list above, specify the exact type.\n"
-        "  - If the type is ambiguous, mark the \"Component Type\" as \"UNKNOWN\" without guessing.\n\n"
-        
-        "STEP 5. ENGINEERING SYMBOL INTERPRETATION\n"
-        "  - Identify ALL engineering symbols present in the drawing:\n"
-        "      • Ø or ⌀: Diameter\n" 
-        "      • R: Radius\n"
-        "      • ±: Tolerance\n"
-        "      • ▭: Square\n"
-        "      • Surface finish marks (✓, ✗)\n"
-        "      • Weld symbols\n"
-        "      • GD&T symbols (straightness, flatness, circularity, etc.)\n"
-        "      • Thread symbols and callouts\n"
-        "  - For each symbol found, explain its significance in this specific design\n"
-        "  - Relate symbols to the dimensional values they qualify\n\n"
-        
-        "STEP 6. PARAMETER EXTRACTION\n"
-        "  - Extract each parameter name EXACTLY as it appears in the drawing\n"
-        "  - Do NOT use generic parameter categories like 'PRIMARY PHYSICAL DIMENSIONS'\n"
-        "  - Instead, use the exact labels from the drawing like 'Bore Diameter', 'Rod Diameter', 'Working Pressure', etc.\n"
-        "  - Maintain the exact parameter names shown in the technical document\n"
-        "  - Do not categorize parameters into groups\n\n"
-        
-        "PARAMETER EXTRACTION MODE: Full Extraction\n"
-        "  - Extract ALL parameters visible in the document, even if uncommon or non-standard.\n"
-        "  - Be exhaustive and thorough in your search for any technical specifications.\n\n"
-        
-        "STEP 7. DETAILED PARAMETER EXTRACTION\n"
-        "  - Extract parameters with their EXACT names as they appear in the drawing\n"
-        "  - Do not rename, reformat, or categorize parameters\n"
-        "  - For cylinder drawings, look for parameter names like 'Bore', 'Rod Diameter', 'Stroke', etc.\n"
-        "  - Use the same formatting, capitalization, and terminology as shown in the drawing\n\n"
-        
-        "STEP 8. ENGINEERING INSIGHTS & ANALYSIS\n"
-        "  - After extracting numerical parameters, analyze their engineering implications:\n"
-        "      • What does the bore/rod diameter ratio suggest about stability and load capacity?\n"
-        "      • How do the material choices impact longevity, corrosion resistance, and thermal properties?\n"
-        "      • Based on dimensions and pressure ratings, estimate the operational force capabilities\n"
-        "      • Analyze the safety factor implied by test pressure vs. operating pressure\n"
-        "      • Evaluate the design for maintenance accessibility and service life\n\n"
-        
-        "STEP 9. PERFORMANCE-BASED DESIGN ANALYSIS\n"
-        "  - Based on extracted values and drawing structure, determine:\n"
-        "      • Expected load-bearing capacity and mechanical stress points\n"
-        "      • Sealing mechanism effectiveness and potential failure modes\n"
-        "      • Thermal expansion considerations and temperature management\n"
-        "      • Potential wear points and fatigue-prone areas\n\n"
-        
-        "STEP 10. FUNCTIONALITY MAPPING\n"
-        "  - Based on mounting type, expected movement, and connection points:\n"
-        "      • Infer the component's operational purpose in a larger system\n"
-        "      • Determine if this is a fixed or dynamic system\n"
-        "      • Identify if it allows axial movement or rotational flexibility\n"
-        "      • Analyze operational constraints based on design features\n\n"
-        
-        "STEP 11. MANUFACTURING & ASSEMBLY CONSIDERATIONS\n"
-        "  - Evaluate complexity in manufacturing based on:\n"
-        "      • Tolerance levels and their impact on production costs\n"
-        "      • Thread specifications and special machining requirements\n"
-        "      • Number of unique components and assembly complexity\n"
-        "      • Potential fabrication challenges based on materials and geometries\n\n"
-        
-        "STEP 12. OUTPUT FORMAT\n"
-        "  - Format your extraction with the EXACT parameter names as they appear in the drawing\n"
-        "  - DO NOT use generic category names like 'PRIMARY PHYSICAL DIMENSIONS'\n"
-        "  - DO NOT add dashes or bullet points before parameter names\n"
-        "  - Instead use the drawing's original parameter names like 'Bore Diameter', 'Rod Diameter', etc.\n"
-        "  - For each parameter, include a value and detailed justification explaining its source\n"
-        "  - Use the parameter-justification format where each parameter is followed by its justification\n"
-        "  - Format as PARAMETER_NAME: value and PARAMETER_NAME_JUSTIFICATION: explanation\n"
-        "  - For empty parameters, explain why the information couldn't be found\n"
-    )
-
-def get_parameters_for_type(drawing_type):
-    """Return the list of parameters to extract based on drawing type"""
-    drawing_type = drawing_type.upper() if drawing_type else ""
-    
-    # Handle multiple variations of component types
-    if "CYLINDER" in drawing_type:
-        return [
-            "CYLINDER ACTION",
-            "BORE DIAMETER",
-            "OUTSIDE DIAMETER",
-            "ROD DIAMETER",
-            "STROKE LENGTH",
-            "CLOSED LENGTH",
-            "OPEN LENGTH",
-            "OPERATING PRESSURE",
-            "TEST PRESSURE",
-            "OPERATING TEMPERATURE",
-            "MOUNTING TYPE",
-            "ROD END TYPE",
-            "FLUID TYPE",
-            "DRAWING NUMBER",
-            "BODY MATERIAL",
-            "ROD MATERIAL",
-            "PISTON MATERIAL",
-            "RATED LOAD/CAPACITY",
-            "STANDARD COMPLIANCE",
-            "SURFACE FINISH",
-            "COATING/PLATING",
-            "CONCENTRICITY OF ROD AND TUBE",
-            "PORT TYPE",
-            "PORT SIZE",
-            "PORT LOCATION",
-            "SEAL TYPE",
-            "MANUFACTURER/MAKE",
-            "MODEL/PART NUMBER",
-            "CUSHIONING"
-        ]
-    elif "GEARBOX" in drawing_type:
-        return [
-            "GEAR TYPE",
-            "INPUT POWER",
-            "INPUT SPEED",
-            "OUTPUT SPEED",
-            "GEAR RATIO",
-            "SERVICE FACTOR",
-            "MOUNTING ARRANGEMENT",
-            "SHAFT ORIENTATION",
-            "INPUT SHAFT TYPE",
-            "OUTPUT SHAFT TYPE",
-            "SHAFT DIAMETER",
-            "BACKLASH",
-            "EFFICIENCY",
-            "DUTY",
-            "COOLING ARRANGEMENT",
-            "LUBRICATION SYSTEM",
-            "HOUSING MATERIAL",
-            "SEALING TYPE",
-            "WEIGHT",
-            "DIMENSIONS",
-            "DRAWING NUMBER",
-            "MANUFACTURER/MAKE",
-            "MODEL/PART NUMBER"
-        ]
-    elif "VALVE" in drawing_type:
-        return [
-            "MODEL/PART NUMBER",
-            "VALVE TYPE",
-            "VALVE SIZE/PORT SIZE",
-            "PRESSURE RATING",
-            "FLOW CAPACITY",
-            "FLOW DIRECTION",
-            "OPERATING MEDIUM",
-            "CONNECTION TYPE",
-            "BODY MATERIAL",
-            "SEAT/SEAL MATERIAL",
-            "OPERATING TEMPERATURE",
-            "ACTUATION TYPE",
-            "OPERATION PATTERN",
-            "LEAKAGE CLASS",
-            "MANUFACTURER/MAKE",
-            "SPECIAL FEATURES"
-        ]
-    elif "NUT" in drawing_type or "BOLT" in drawing_type or "FASTENER" in drawing_type:
-        return [
-            "TYPE",
-            "SIZE/DIMENSION",
-            "THREAD TYPE",
-            "THREAD PITCH",
-            "PROPERTY/STRENGTH CLASS",
-            "MATERIAL",
-            "COATING/FINISH",
-            "STANDARD COMPLIANCE",
-            "HEAD DIMENSIONS",
-            "TORQUE SPECIFICATION",
-            "MANUFACTURER/MAKE",
-            "DRAWING NUMBER",
-            "SPECIAL FEATURES"
-        ]
-    elif "LIFTING_RAM" in drawing_type or "JACK" in drawing_type or "TRANSMISSION_JACK" in drawing_type:
-        return [
-            "LOAD CAPACITY",
-            "MINIMUM HEIGHT",
-            "MAXIMUM HEIGHT",
-            "CLOSED HEIGHT",
-            "OPEN HEIGHT",
-            "LIFT RANGE/STROKE",
-            "OPERATING PRESSURE",
-            "PISTON DIAMETER",
-            "WEIGHT",
-            "DIMENSIONS",
-            "MATERIAL",
-            "ACTIVATION TYPE",
-            "MANUFACTURER/BRAND",
-            "MODEL/PART NUMBER",
-            "PRICE",
-            "SPECIAL FEATURES",
-            "HYDRAULIC SYSTEM",
-            "OIL VOLUME",
-            "PRODUCT FEATURES",
-            "WARRANTY INFORMATION",
-            "ITEM DIMENSIONS",
-            "SIZE VARIATIONS",
-            "CONSTRUCTION MATERIAL",
-            "PRODUCT CODE"
-        ]
-    elif "BEARING" in drawing_type:
-        return [
-            "BEARING TYPE",
-            "INNER DIAMETER",
-            "OUTER DIAMETER",
-            "WIDTH/THICKNESS",
-            "LOAD RATING DYNAMIC",
-            "LOAD RATING STATIC",
-            "SPEED RATING",
-            "MATERIAL",
-            "LUBRICATION TYPE",
-            "SEAL TYPE",
-            "MANUFACTURER/BRAND",
-            "MODEL/PART NUMBER",
-            "STANDARD COMPLIANCE"
-        ]
-    elif drawing_type in st.session_state.custom_products and isinstance(st.session_state.custom_products[drawing_type], dict):
-        # Return parameters for custom product type
-        return st.session_state.custom_products[drawing_type].get('parameters', [])
-    else:
-        # For unknown or custom component types, return comprehensive list of parameters
-        return [
-            "MODEL/PART NUMBER",
-            "DIMENSIONS",
-            "MATERIAL",
-            "WEIGHT",
-            "STANDARD/SPECIFICATION",
-            "MANUFACTURER/MAKE",
-            "DRAWING NUMBER",
-            "OPERATING CONDITIONS",
-            "SPECIAL FEATURES",
-            "MOUNTING DETAILS",
-            "CONNECTIONS",
-            "RATED CAPACITY/LOAD",
-            "PRICE",
-            "BRAND",
-            "ITEM DIMENSIONS",
-            "LOAD CAPACITY",
-            "PRODUCT CODE",
-            "WARRANTY INFORMATION",
-            "OPERATING TEMPERATURE",
-            "OPERATING PRESSURE",
-            "CONSTRUCTION MATERIAL"
-        ]
 
 def get_extraction_parameters(drawing_type):
-    """
-    Get the parameters to extract based on the selected parameter mode.
-    
-    Modes:
-    - Custom: Use user-specified parameters
-    - Cylinder, Hyd/Pneumatic: Use 23 specific cylinder parameters
-    """
-    # If in custom mode, use the user-defined parameters
-    if st.session_state.parameter_mode == "Custom":
-        # Use generic custom parameters
-        if "GENERIC" in st.session_state.custom_parameters:
-            return st.session_state.custom_parameters.get("GENERIC", [])
-        else:
-            # If no custom parameters defined, fall back to default
-            return get_parameters_for_type(drawing_type)
-    
-    # If in cylinder mode, use the predefined cylinder parameters
-    elif st.session_state.parameter_mode == "Cylinder, Hyd/Pneumatic":
-        return [
-            "BORE_DIAMETER", "MOUNTING", "OPERATING_TEMPERATURE", "OPERATING_PRESSURE",
-            "CLOSE_LENGTH", "DRAWING_NUMBER", "FLUID", "ROD_END", "CYLINDER_ACTION",
-            "STROKE_LENGTH", "ROD_DIAMETER", "OUTSIDE_DIAMETER", "BODY_MATERIAL",
-            "OPEN_LENGTH", "RATED_LOAD", "PISTON_MATERIAL", "STANDARD", "SURFACE_FINISH",
-            "COATING_THICKNESS", "SPECIAL_FEATURES", "CYLINDER_CONFIGURATION", 
-            "CYLINDER_STYLE", "CONCENTRICITY_OF_ROD_AND_TUBE"
-        ]
-    
-    # Default fallback
-    return get_parameters_for_type(drawing_type)
-
-print("Current API key:", st.session_state.current_api_key)
-
-
-def identify_drawing_type(image_bytes):
-    """Identify the type of technical document and component using AI vision model"""
-    base64_image = encode_image_to_base64(image_bytes)
-    
-    payload = {
-        "model": "gpt-4o",
-        "messages": [
-            {
-                "role": "system",
-                "content": "You are an expert level electrical and mechanical engineer with extensive experience analyzing all types of technical documents including engineering drawings, product listings, and specification sheets. Your task is to accurately identify both document types and component types with high precision and consistency. The image has been automatically oriented correctly for reading. Never guess - only provide definitive answers when certain."
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": (
-                            "TASK: Identify BOTH the document type AND component type in this technical document. The image has been properly oriented for you.\n\n"
-                            
-                            "### CRITICAL INSTRUCTIONS\n"
-                            "1. First determine the DOCUMENT TYPE:\n"
-                            "   - ENGINEERING_DRAWING: Contains technical drawings with dimensions and specifications\n"
-                            "   - PRODUCT_LISTING: Contains product information, pricing, and marketing content\n"
-                            "   - SPECIFICATION_SHEET: Contains organized technical specifications in tables or lists\n"
-                            "   - MIXED_DOCUMENT: Contains multiple document types combined\n\n"
-                            
-                            "2. Then identify the COMPONENT TYPE:\n"
-                            "   - CYLINDER (pneumatic, hydraulic, etc.)\n"
-                            "   - VALVE\n"
-                            "   - GEARBOX\n"
-                            "   - NUT\n"
-                            "   - LIFTING_RAM or JACK\n"
-                            "   - TRANSMISSION_JACK\n"
-                            "   - BEARING\n"
-                            "   - PUMP\n"
-                            "   - MOTOR\n"
-                            "   - Other specific component type in ALL CAPS\n\n"
-                            
-                            "3. Examination Process:\n"
-                            "   - Check title blocks, headers, and document structure first\n"
-                            "   - Look for company logos, document templates, and formatting\n"
-                            "   - Examine tables, dimensions, and technical notations\n"
-                            "   - Be EXTREMELY CONSISTENT in your categorization\n\n"
-                            
-                            "### RESPONSE FORMAT\n"
-                            "You MUST respond in this exact format: 'DOCUMENT_TYPE: COMPONENT_TYPE'\n"
-                            "Examples:\n"
-                            "- 'ENGINEERING_DRAWING: CYLINDER'\n"
-                            "- 'PRODUCT_LISTING: TRANSMISSION_JACK'\n"
-                            "- 'SPECIFICATION_SHEET: VALVE'\n"
-                            "- 'MIXED_DOCUMENT: HYDRAULIC_CYLINDER'\n\n"
-                            
-                            "If you can identify the document type but not the component type, respond with 'DOCUMENT_TYPE: UNKNOWN'.\n"
-                            "If you cannot identify either with confidence, respond with 'UNKNOWN: UNKNOWN'.\n\n"
-                            
-                            "IMPORTANT: Your response must be ONLY the document and component types in the format specified above. No explanations or additional text."
-                        )
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": base64_image
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": 100,
-        "temperature": 0
-    }
-
-    headers = {
-        "Authorization": f"Bearer {st.session_state.current_api_key}",
-        "Content-Type": "application/json"
-    }
+    """Parameters to extract for a drawing type in the session's parameter mode"""
+    return extraction_core.get_extraction_parameters(drawing_type, session_settings())
 
-    try:
-        response = requests.post(API_URL, headers=headers, json=payload)
-        result = process_api_response(response, identify_drawing_type, image_bytes)
-        
-        # Parse the result which should be in format "DOCUMENT_TYPE: COMPONENT_TYPE"
-        if "❌" not in result:
-            result = result.strip().upper()
-            
-            # Store document type information in session state
-            if ':' in result:
-                document_type, component_type = result.split(':', 1)
-                document_type = document_type.strip()
-                component_type = component_type.strip()
-                
-                # Store document type for future reference
-                if 'document_types' not in st.session_state:
-                    st.session_state.document_types = {}
-                
-                # Store the document type information
-                st.session_state.document_types[result] = {
-                    'document_type': document_type,
-                    'component_type': component_type
-                }
-            else:
-                # If no colon found, assume it's just a component type
-                component_type = result
-                document_type = "ENGINEERING_DRAWING"  # Default
-            
-            # Handle standard component types
-            standard_types = ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "JACK", "TRANSMISSION_JACK"]
-            
-            # Store custom component types
-            if component_type not in standard_types and component_type != "UNKNOWN":
-                if 'custom_component_types' not in st.session_state:
-                    st.session_state.custom_component_types = {}
-                
-                st.session_state.custom_component_types[component_type] = {
-                    'document_type': document_type
-                }
-            
-            return component_type
-        
-        return result
-    except Exception as e:
-        return f"❌ Processing Error: {str(e)}"
 
 def submit_feedback_to_company(feedback_data, drawing_info, additional_notes=""):
     """
@@ -1622,536 +73,155 @@ def submit_feedback_to_company(feedback_data, drawing_info, additional_notes="")
     except Exception as e:
         return False, f"Error submitting feedback: {str(e)}"
 
-def convert_pdf_using_pymupdf(pdf_bytes):
-    """Convert PDF to images using PyMuPDF (faster and no external dependencies)"""
-    try:
-        # Load PDF from bytes
-        pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
-        image_bytes_list = []
-        page_count = pdf_document.page_count
-        
-        # Get document details for better naming
-        metadata = pdf_document.metadata
-        document_title = metadata.get('title', '')
+def track_component_type(component_type):
+    """Remember component types outside the built-in lists for this session"""
+    if component_type not in STANDARD_COMPONENT_TYPES:
+        if 'custom_component_types' not in st.session_state:
+            st.session_state.custom_component_types = {}
+        st.session_state.custom_component_types[component_type] = True
 
-        # Convert each page to an image
-        for page_num in range(page_count):
-            page = pdf_document[page_num]
-            
-            # Get the page as a PNG image with higher resolution
-            pix = page.get_pixmap(matrix=fitz.Matrix(2.5, 2.5))  # Higher quality
-            img_data = pix.tobytes("png")
-            
-            # Convert PNG to JPEG for consistency and smaller size
-            img = Image.open(io.BytesIO(img_data))
-            img_byte_arr = io.BytesIO()
-            img = img.convert('RGB')  # Convert to RGB mode for JPEG
-            
-            # Add page number indicator as a subtle overlay
-            draw = ImageDraw.Draw(img)
-            try:
-                # Try to get a font, fallback to default if not available
-                font = ImageFont.truetype("arial.ttf", 24)
-            except IOError:
-                font = ImageFont.load_default()
-                
-            # Add page number indicator in the corner
-            page_text = f"Page {page_num + 1}/{page_count}"
-            text_width = draw.textlength(page_text, font=font) if hasattr(draw, 'textlength') else 150
-            
-            # Position in bottom right with padding
-            draw.rectangle(
-                [(img.width - text_width - 20, img.height - 40), (img.width - 5, img.height - 5)],
-                fill=(50, 50, 50, 180)
-            )
-            draw.text(
-                (img.width - text_width - 10, img.height - 35),
-                page_text,
-                fill=(255, 255, 255),
-                font=font
-            )
-            
-            img.save(img_byte_arr, format='JPEG', quality=90, optimize=True)
-            image_bytes_list.append((img_byte_arr.getvalue(), page_num + 1, page_count, document_title))
-
-        pdf_document.close()
-        return image_bytes_list
-    except Exception as e:
-        st.error(f"Error converting PDF with PyMuPDF: {str(e)}")
-        return None
+def record_drawing(extraction):
+    """Write one extraction into the drawings table and session state. Returns the drawing number or None."""
+    drawing_type = extraction['drawing_type']
 
-def convert_pdf_using_pdf2image_alternative(pdf_bytes):
-    """Try alternative PDF to image conversion using pdf2image with different settings"""
-    try:
-        # Try using pdf2image without poppler first
-        images = convert_from_bytes(
-            pdf_bytes,
-            dpi=300,  # Higher DPI for better quality
-            fmt='jpeg',
-            grayscale=False,
-            size=None,
-            use_pdftocairo=False  # Try without pdftocairo first
+    # Create a unique identifier for this drawing
+    drawing_id = new_drawing_id()
+    
+    # Add to table (internal ID for tracking)
+    st.session_state.drawings_table.add(
+        DrawingRecord(drawing_type, f"Processing{extraction['suffix']}", internal_id=drawing_id)
+    )
+    
+    # Track this component type (and the document type it was identified in) in session state
+    track_component_type(drawing_type)
+    if extraction.get('document_type'):
+        if 'document_types' not in st.session_state:
+            st.session_state.document_types = {}
+        st.session_state.document_types[f"{extraction['document_type']}: {drawing_type}"] = {
+            'document_type': extraction['document_type'],
+            'component_type': drawing_type
+        }
+    
+    # Drawing number, detected type and field counts (also learns custom product parameters)
+    summary = summarize_extraction(extraction, session_settings(), drawing_id)
+    if summary is None:
+        # Update the table row
+        st.session_state.drawings_table.update(
+            drawing_id,
+            status='Failed',
+            confidence='0%',
+            fields_count='0/0'
         )
-        
-        # Convert PIL images to bytes
-        image_bytes_list = []
-        page_count = len(images)
-        
-        for i, image in enumerate(images):
-            img_byte_arr = io.BytesIO()
-            
-            # Add page number indicator
-            draw = ImageDraw.Draw(image)
-            try:
-                # Try to get a font, fallback to default if not available
-                font = ImageFont.truetype("arial.ttf", 24)
-            except IOError:
-                font = ImageFont.load_default()
-                
-            # Add page number indicator in the corner
-            page_text = f"Page {i + 1}/{page_count}"
-            text_width = draw.textlength(page_text, font=font) if hasattr(draw, 'textlength') else 150
-            
-            # Position in bottom right with padding
-            draw.rectangle(
-                [(image.width - text_width - 20, image.height - 40), (image.width - 5, image.height - 5)],
-                fill=(50, 50, 50, 180)
-            )
-            draw.text(
-                (image.width - text_width - 10, image.height - 35),
-                page_text,
-                fill=(255, 255, 255),
-                font=font
-            )
-            
-            image.save(img_byte_arr, format='JPEG', quality=90, optimize=True)
-            image_bytes_list.append((img_byte_arr.getvalue(), i + 1, page_count, ""))
-        
-        return image_bytes_list
-    except Exception as e:
-        st.error(f"Error with alternative PDF conversion: {str(e)}")
         return None
 
-def convert_pdf_to_images(pdf_bytes, filename=""):
-    """Convert PDF bytes to a list of PIL Images using multiple methods"""
-    # Try PyMuPDF first (no external dependencies)
-    result = convert_pdf_using_pymupdf(pdf_bytes)
-    if result:
-        return result
-
-    # Try pdf2image with alternative settings
-    st.info("Attempting PDF conversion with alternative method...")
-    result = convert_pdf_using_pdf2image_alternative(pdf_bytes)
-    if result:
-        return result
-
-    # Finally, try poppler if available
-    if check_poppler_installed():
-        st.info("Attempting PDF conversion with Poppler...")
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
-                temp_pdf.write(pdf_bytes)
-                temp_pdf.seek(0)
-                
-                try:
-                    images = convert_from_bytes(pdf_bytes, dpi=300, fmt='jpeg', 
-                                             grayscale=False, size=None,
-                                             thread_count=2)
-                    
-                    image_bytes_list = []
-                    page_count = len(images)
-                    
-                    for i, image in enumerate(images):
-                        img_byte_arr = io.BytesIO()
-                        
-                        # Add page number indicator
-                        draw = ImageDraw.Draw(image)
-                        try:
-                            # Try to get a font, fallback to default if not available
-                            font = ImageFont.truetype("arial.ttf", 24)
-                        except IOError:
-                            font = ImageFont.load_default()
-                            
-                        # Add page number indicator in the corner
-                        page_text = f"Page {i + 1}/{page_count}"
-                        text_width = draw.textlength(page_text, font=font) if hasattr(draw, 'textlength') else 150
-                        
-                        # Position in bottom right with padding
-                        draw.rectangle(
-                            [(image.width - text_width - 20, image.height - 40), (image.width - 5, image.height - 5)],
-                            fill=(50, 50, 50, 180)
-                        )
-                        draw.text(
-                            (image.width - text_width - 10, image.height - 35),
-                            page_text,
-                            fill=(255, 255, 255),
-                            font=font
-                        )
-                        
-                        image.save(img_byte_arr, format='JPEG', quality=90, optimize=True)
-                        image_bytes_list.append((img_byte_arr.getvalue(), i + 1, page_count, ""))
-                    
-                    return image_bytes_list
-                except Exception as e:
-                    st.error(f"Error converting PDF with Poppler: {str(e)}")
-                    return None
-                finally:
-                    try:
-                        os.unlink(temp_pdf.name)
-                    except Exception:
-                        pass
-        except Exception as e:
-            st.error(f"Error handling PDF file: {str(e)}")
-            return None
-    else:
-        st.warning("""
-        For better PDF conversion quality, you can install Poppler:
-        • On macOS: brew install poppler
-        • On Ubuntu/Debian: sudo apt-get install poppler-utils
-        • On Windows: Download from https://blog.alivate.com.au/poppler-windows/
-        """)
-    
-    return None
-
-def detect_orientation_fallback(image_bytes):
-    """
-    Fallback method to detect orientation using basic image analysis.
-    This is used if the API call fails.
-    """
-    try:
-        # Check if pytesseract is available
-        if not TESSERACT_AVAILABLE:
-            print("Pytesseract not available for fallback orientation detection")
-            return "ROTATE_0"  # Default to no rotation
-            
-        from PIL import Image
-        
-        # Open the image
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Try all four orientations and see which has the most recognized text
-        orientations = {
-            "ROTATE_0": image,
-            "ROTATE_90": image.rotate(-90, expand=True),
-            "ROTATE_180": image.rotate(-180, expand=True),
-            "ROTATE_270": image.rotate(-270, expand=True)
-        }
-        
-        best_orientation = "ROTATE_0"
-        max_text_score = 0
-        
-        for orientation, img in orientations.items():
-            try:
-                # Convert to numpy array for tesseract
-                img_array = np.array(img)
-                
-                # Use tesseract to detect text
-                text_data = pytesseract.image_to_data(img_array, output_type=pytesseract.Output.DICT)
-                
-                # Calculate a score based on confidence of detected text
-                conf_values = [int(conf) for conf in text_data['conf'] if conf != '-1']
-                if conf_values:
-                    avg_conf = sum(conf_values) / len(conf_values)
-                    text_count = len([word for word in text_data['text'] if word.strip()])
-                    text_score = avg_conf * text_count
-                    
-                    if text_score > max_text_score:
-                        max_text_score = text_score
-                        best_orientation = orientation
-            except Exception as inner_error:
-                print(f"Error analyzing orientation {orientation}: {str(inner_error)}")
-                # If tesseract fails, just continue with the next orientation
-                continue
+    drawing_number = summary['drawing_number']
+    
+    # Store results (the full image goes to the shared disk-backed store; the session keeps its key)
+    st.session_state.image_keys[drawing_number] = get_image_store().put(extraction['image'])
+    st.session_state.page_labels[drawing_number] = extraction['label']
+    if extraction.get('orientation'):
+        st.session_state.orientation_reports[drawing_number] = extraction['orientation']
+    st.session_state.all_results[drawing_number] = summary['results']
+    
+    # Also track a detected type that differs from the identified one
+    track_component_type(summary['drawing_type'])
+    
+    # Update the table row
+    st.session_state.drawings_table.update(
+        drawing_id,
+        drawing_type=summary['drawing_type'],  # Update with potentially new detected type
+        drawing_no=drawing_number,
+        status=summary['status'],
+        fields_count=f"{summary['extracted_fields']}",  # Show only the number of extracted fields
+        confidence=f"{summary['confidence']:.0f}%"
+    )
         
-        # Return the best orientation
-        return best_orientation
-    except Exception as e:
-        print(f"Fallback orientation detection failed: {str(e)}")
-        return "ROTATE_0"  # Default to no rotation on error
+    return drawing_number
 
-def detect_and_correct_orientation(image_bytes):
+def submit_files(uploaded_files):
     """
-    Detect and correct the orientation of an image using OpenAI's vision model.
-    Returns the rotated image bytes if rotation is needed, or the original image bytes if not.
+    Queue the given files as background jobs and return the new jobs.
+
+    Files whose content is already queued, running or done in this session are
+    skipped; failed and cancelled ones can be submitted again. The jobs keep
+    running across reruns and are listed in st.session_state.processing_queue.
     """
-    try:
-        # First, decode the image to check if it's already correctly oriented
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Convert to base64 for API call
-        base64_image = encode_image_to_base64(image_bytes)
-        base64_image_data_url = f"data:image/png;base64,{base64_image}"
+    # Settings are read once on the script thread; job threads do not touch session state
+    settings = session_settings()
+    known = {job.digest for job in st.session_state.processing_queue if job.status not in (FAILED, CANCELLED)}
+    jobs = []
+    for uploaded_file in uploaded_files:
+        data = uploaded_file.getvalue()
+        if content_digest(data) in known:
+            continue
+        job = get_job_queue().submit(uploaded_file.name, data, settings, st.session_state.pipeline_concurrency)
+        known.add(job.digest)
+        st.session_state.processing_queue.append(job)
+        jobs.append(job)
+    return jobs
 
-        
-        try:
-            # Call OpenAI API to determine the orientation
-            payload = {
-                "model": "gpt-5.2",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an expert in analyzing engineering drawings and technical documents. Your task is to determine if the image is in the correct orientation for reading."
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "Analyze this engineering drawing or technical document and tell me ONLY if it needs rotation. Respond with EXACTLY ONE of these options:\n1. ROTATE_0 (no rotation needed, image is correctly oriented)\n2. ROTATE_90 (rotate 90 degrees clockwise)\n3. ROTATE_180 (rotate 180 degrees)\n4. ROTATE_270 (rotate 270 degrees clockwise / 90 degrees counter-clockwise)\n\nBe extremely attentive to text orientation, title blocks, and standard engineering drawing layouts. Respond ONLY with one of the four options above, nothing else."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": base64_image_data_url
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "max_tokens": 10,
-                "temperature": 0
-            }
+def deliver_job_results():
+    """
+    Record the pages this session's jobs have finished into the drawings table.
 
-            headers = {
-                "Authorization": f"Bearer {st.session_state.current_api_key}",
-                "Content-Type": "application/json"
-            }
+    Runs on the script thread, in file and page order. Returns the drawing
+    numbers that were added.
+    """
+    drawing_numbers = []
+    for job in st.session_state.processing_queue:
+        for outcome in job.take_results():
+            if outcome["error"] is not None:
+                continue  # already listed in job.errors
+            drawing_number = record_drawing(outcome["value"])
+            if drawing_number:
+                drawing_numbers.append(drawing_number)
+            elif not extraction_failed(outcome["value"]):  # failed API calls are already in job.errors
+                job.add_error(f"{job.file_name}: processing completed but no results were extracted. "
+                              "Please check the drawing and try again.")
+    if drawing_numbers and st.session_state.selected_drawing is None:
+        st.session_state.selected_drawing = drawing_numbers[0]
+    return drawing_numbers
+
+def show_processing_queue(polling=False):
+    """Progress, errors and Cancel buttons for this session's jobs"""
+    drawing_numbers = deliver_job_results()
+    jobs = st.session_state.processing_queue
+    active = [job for job in jobs if job.active]
+    stats = get_job_queue().stats()
+
+    st.markdown("### Processing Queue")
+    st.caption(f"{len(active)} of {len(jobs)} file(s) still processing · server: {stats['running']} running, "
+               f"{stats['queued']} queued on {stats['workers']} worker(s)")
+    for job in jobs:
+        label = f"{job.file_name} - {job.status} · {job.pages_done}/{job.page_count or '?'} page(s) · {job.seconds:.0f}s"
+        if job.pages_resumed:
+            label += f" · {job.pages_resumed} from checkpoint"
+        if job.pages_failed:
+            label += f" · {job.pages_failed} failed"
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.progress(job.progress, text=label)
+        with col2:
+            if job.active and st.button("Cancel", key=f"cancel_job_{job.id}", use_container_width=True):
+                job.cancel()
+        if job.errors:
+            with st.expander(f"❌ {len(job.errors)} error(s) in {job.file_name}"):
+                for error in list(job.errors):
+                    st.error(error)
+    if not active and st.button("Clear Finished Jobs", key="clear_finished_jobs"):
+        st.session_state.processing_queue = []
+        st.rerun()
 
-            response = requests.post(API_URL, headers=headers, json=payload)
-            if response.status_code == 200:
-                response_json = response.json()
-                rotation_result = response_json["choices"][0]["message"]["content"].strip()
-            else:
-                # On API error, use fallback method
-                print(f"API error while checking orientation: {response.status_code}")
-                rotation_result = detect_orientation_fallback(image_bytes)
-        except Exception as api_error:
-            print(f"API call for orientation detection failed: {str(api_error)}")
-            # If API call fails, use fallback method
-            rotation_result = detect_orientation_fallback(image_bytes)
-        
-        # Rotate the image based on API response
-        if rotation_result == "ROTATE_0":
-            print("Image orientation is correct, no rotation needed")
-            return image_bytes  # No rotation needed
-        
-        # Perform rotation
-        if rotation_result == "ROTATE_90":
-            rotated_image = image.rotate(-90, expand=True)  # Negative for clockwise
-            rotation_message = "Rotated 90° clockwise"
-        elif rotation_result == "ROTATE_180":
-            rotated_image = image.rotate(-180, expand=True)
-            rotation_message = "Rotated 180°"
-        elif rotation_result == "ROTATE_270":
-            rotated_image = image.rotate(-270, expand=True)
-            rotation_message = "Rotated 90° counter-clockwise"
-        else:
-            return image_bytes  # Default to original if response is unexpected
-        
-        # Convert rotated image back to bytes
-        img_byte_arr = io.BytesIO()
-        rotated_image.save(img_byte_arr, format=image.format or 'JPEG')
-        rotated_bytes = img_byte_arr.getvalue()
-        
-        # Log the rotation for debugging
-        print(f"Image orientation corrected: {rotation_result} - {rotation_message}")
-        st.info(f" Image orientation corrected: {rotation_message}")
-        
-        return rotated_bytes
-            
-    except Exception as e:
-        print(f"Error in orientation detection: {str(e)}")
-        return image_bytes  # Return original on error
+    if drawing_numbers:
+        st.toast(f"✅ {len(drawing_numbers)} new drawing(s) processed")
+    # New rows for the drawings table, or nothing left to poll: refresh the whole page
+    if polling and (drawing_numbers or not active):
+        st.rerun()
 
-def process_uploaded_file(uploaded_file):
-    """Process uploaded file whether it's an image or PDF"""
-    try:
-        if uploaded_file.type == "application/pdf":
-            # Show processing message
-            with st.spinner('Converting PDF to images...'):
-                # Convert PDF to images
-                pdf_bytes = uploaded_file.read()
-                image_bytes_list = convert_pdf_to_images(pdf_bytes, uploaded_file.name)
-                if not image_bytes_list:
-                    st.error("Failed to convert PDF to images. Please check if the PDF is valid.")
-                    return None
-                
-                # Apply orientation correction to each page
-                corrected_image_bytes_list = []
-                for image_data in image_bytes_list:
-                    image_bytes, page_number, page_count, doc_title = image_data
-                    
-                    # Check and correct orientation
-                    with st.spinner(f'Analyzing orientation of page {page_number}...'):
-                        corrected_bytes = detect_and_correct_orientation(image_bytes)
-                        corrected_image_bytes_list.append((corrected_bytes, page_number, page_count, doc_title))
-                
-                st.success(f"Successfully converted PDF to {len(corrected_image_bytes_list)} images with corrected orientation")
-                return corrected_image_bytes_list
-        else:
-            # Handle direct image upload
-            try:
-                # Verify it's a valid image
-                image_bytes = uploaded_file.read()
-                image = Image.open(io.BytesIO(image_bytes))
-                uploaded_file.seek(0)  # Reset file pointer
-                
-                # Correct orientation
-                with st.spinner('Analyzing image orientation...'):
-                    corrected_bytes = detect_and_correct_orientation(image_bytes)
-                
-                # Return single image with metadata (as a list for consistency)
-                return [(corrected_bytes, 1, 1, uploaded_file.name)]
-            except Exception as e:
-                st.error(f"Invalid image file: {str(e)}")
-                return None
-    except Exception as e:
-        st.error(f"Error processing file: {str(e)}")
-        return None
-
-def process_drawing(drawing_type, image_data, file_name, img_idx=0):
-    """Process a single drawing and update the session state."""
-    # Unpack image data - handle both formats (backwards compatibility)
-    if isinstance(image_data, tuple) and len(image_data) >= 3:
-        image_bytes, page_number, page_count, doc_title = image_data
-        suffix = f"_page_{page_number}_of_{page_count}"
-        if doc_title:
-            file_name = doc_title
-    else:
-        # Legacy format
-        image_bytes = image_data
-        suffix = f"_page_{img_idx + 1}"
-    
-    # Create a unique identifier for this drawing
-    drawing_id = str(uuid.uuid4())[:8]
-    
-    new_drawing = {
-        'Drawing Type': drawing_type,
-        'Drawing No.': f"Processing{suffix}",
-        'Processing Status': 'Processing..',
-        'Extracted Fields Count': '0/0',
-        'Confidence Score': '0%',
-        'Internal ID': drawing_id  # Add internal ID for tracking
-    }
-    
-    # Add to table
-    st.session_state.drawings_table = pd.concat([
-        st.session_state.drawings_table,
-        pd.DataFrame([new_drawing])
-    ], ignore_index=True)
-    
-    # Process the drawing
-    with st.spinner(f'Analyzing {drawing_type.lower()} drawing{suffix}...'):
-        # Track this component type in the custom_component_types session state
-        if drawing_type not in ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "UNKNOWN"]:
-            if 'custom_component_types' not in st.session_state:
-                st.session_state.custom_component_types = {}
-            st.session_state.custom_component_types[drawing_type] = True
-            
-        # Pass the component type to the analyzer for more targeted analysis
-        result = analyze_engineering_drawing(image_bytes, drawing_type)
-        
-        if result and "❌" not in result:
-            parsed_results = parse_ai_response(result)
-            
-            # Get drawing number based on component type
-            if drawing_type == "VALVE":
-                drawing_number = parsed_results.get('MODEL NO', '')
-            else:
-                drawing_number = parsed_results.get('DRAWING NUMBER', '') or parsed_results.get('MODEL NUMBER', '')
-            
-            if not drawing_number or drawing_number == 'Unknown':
-                # Use file name or component type plus suffix and drawing ID for uniqueness
-                drawing_number = f"{file_name.split('.')[0]}{suffix}_{drawing_id}"
-            
-            # Store results
-            st.session_state.current_image[drawing_number] = image_bytes
-            st.session_state.all_results[drawing_number] = parsed_results
-            
-            # Get the detected component type from results and update if different
-            detected_type = parsed_results.get('COMPONENT_TYPE', '')
-            if detected_type and detected_type != drawing_type and detected_type != "UNKNOWN":
-                # Update the drawing type in the table
-                drawing_type = detected_type
-                # Also track this detected type
-                if detected_type not in ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "UNKNOWN"]:
-                    if 'custom_component_types' not in st.session_state:
-                        st.session_state.custom_component_types = {}
-                    st.session_state.custom_component_types[detected_type] = True
-            
-            # Update status
-            parameters = get_extraction_parameters(drawing_type)
-            
-            # Extract all parameters that were detected (excluding justifications and component type)
-            detected_params = [k for k in parsed_results.keys() 
-                              if not k.endswith('_JUSTIFICATION') and k != 'COMPONENT_TYPE']
-            
-            # Count non-empty fields from both standard parameters and any additional detected parameters
-            non_empty_standard = sum(1 for k in parameters if k in parsed_results and parsed_results.get(k, '').strip())
-            non_empty_additional = sum(1 for k in detected_params if k not in parameters and parsed_results.get(k, '').strip())
-            non_empty_fields = non_empty_standard + non_empty_additional
-            
-            # Use the larger of standard parameters or detected parameters for total count
-            total_fields = max(len(parameters), len(detected_params))
-            
-            # Ensure we have valid field counts
-            if total_fields == 0:
-                total_fields = 1  # Avoid division by zero
-            
-            # Add any additional detected parameters to the custom product type if it exists
-            if drawing_type not in ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "UNKNOWN"]:
-                if drawing_type not in st.session_state.custom_products:
-                    # Create a new custom product type with the detected parameters
-                    new_params = [k for k in detected_params if k != 'COMPONENT_TYPE']
-                    st.session_state.custom_products[drawing_type] = {
-                        'parameters': new_params,
-                        'auto_detected': True
-                    }
-                elif isinstance(st.session_state.custom_products[drawing_type], dict):
-                    # Add any new parameters that were detected but not in the current list
-                    current_params = st.session_state.custom_products[drawing_type].get('parameters', [])
-                    for param in detected_params:
-                        if param not in current_params and param != 'COMPONENT_TYPE':
-                            current_params.append(param)
-                    st.session_state.custom_products[drawing_type]['parameters'] = current_params
-            
-            # Calculate confidence percentage with bounds checking
-            confidence_percent = min(100, max(0, (non_empty_fields / total_fields * 100)))
-            
-            new_drawing.update({
-                'Drawing Type': drawing_type,  # Update with potentially new detected type
-                'Drawing No.': drawing_number,
-                'Processing Status': 'Completed' if non_empty_fields >= total_fields * 0.7 else 'Needs Review',
-                'Extracted Fields Count': f"{non_empty_fields}",  # Show only the number of extracted fields
-                'Confidence Score': f"{confidence_percent:.0f}%",
-                'Internal ID': drawing_id  # Keep the internal ID
-            })
-            
-            # Update the table row
-            mask = st.session_state.drawings_table['Internal ID'] == drawing_id
-            if any(mask):
-                st.session_state.drawings_table.loc[mask, new_drawing.keys()] = list(new_drawing.values())
-            else:
-                # Fallback to updating the last row if ID not found (shouldn't happen)
-                st.session_state.drawings_table.iloc[-1] = new_drawing
-                
-            return drawing_number
-        else:
-            new_drawing.update({
-                'Processing Status': 'Failed',
-                'Confidence Score': '0%',
-                'Extracted Fields Count': '0/0'
-            })
-            
-            # Update the table row
-            mask = st.session_state.drawings_table['Internal ID'] == drawing_id
-            if any(mask):
-                st.session_state.drawings_table.loc[mask, new_drawing.keys()] = list(new_drawing.values())
-            else:
-                # Fallback to updating the last row if ID not found (shouldn't happen)
-                st.session_state.drawings_table.iloc[-1] = new_drawing
-                
-            return None
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def poll_processing_queue():
+    """show_processing_queue, refreshed every JOB_POLL_SECONDS while jobs are running"""
+    show_processing_queue(polling=True)
 
 def main():
     # Set page config
@@ -2162,6 +232,10 @@ def main():
         initial_sidebar_state="collapsed"
     )
 
+    if not len(API_KEY_POOL):
+        st.error("❌ No API key provided! Please set OPENAI_API_KEY (or OPENAI_API_KEYS) in the environment.")
+        st.stop()
+
     # Add JSW logo at the top with improved styling
     logo_path = "assets/logojsw.png"
     try:
@@ -2752,21 +826,19 @@ def main():
     """, unsafe_allow_html=True)
 
     # Initialize all session state variables
-    if 'drawings_table' not in st.session_state:
-        st.session_state.drawings_table = pd.DataFrame(columns=[
-            'Drawing Type',
-            'Drawing No.',
-            'Processing Status',
-            'Extracted Fields Count',
-            'Confidence Score',
-            'Internal ID'  # Add internal ID for tracking
-        ])
+    if not isinstance(st.session_state.get('drawings_table'), DrawingStore):
+        st.session_state.drawings_table = DrawingStore()
     if 'all_results' not in st.session_state:
         st.session_state.all_results = {}
     if 'selected_drawing' not in st.session_state:
         st.session_state.selected_drawing = None
-    if 'current_image' not in st.session_state:
-        st.session_state.current_image = {}
+    if 'image_keys' not in st.session_state:
+        st.session_state.image_keys = {}
+    if 'page_labels' not in st.session_state:
+        st.session_state.page_labels = {}
+
+    if 'orientation_reports' not in st.session_state:
+        st.session_state.orientation_reports = {}
     if 'edited_values' not in st.session_state:
         st.session_state.edited_values = {}
     if 'custom_products' not in st.session_state:
@@ -2783,6 +855,11 @@ def main():
         st.session_state.feedback_status = None
     if 'processing_queue' not in st.session_state:
         st.session_state.processing_queue = []
+
+    if 'pipeline_concurrency' not in st.session_state:
+        st.session_state.pipeline_concurrency = PIPELINE_CONCURRENCY
+    if 'structured_output' not in st.session_state:
+        st.session_state.structured_output = STRUCTURED_OUTPUT
     if 'needs_rerun' not in st.session_state:
         st.session_state.needs_rerun = False
     if 'parameter_mode' not in st.session_state:
@@ -2815,12 +892,65 @@ def main():
             - Mac: brew install tesseract
             - Linux: apt-get install tesseract-ocr
             """)
-        
+
+        # Number of pages analyzed at the same time across all files
+        st.session_state.pipeline_concurrency = st.number_input(
+            "Pages processed in parallel",
+            min_value=1,
+            max_value=32,
+            value=st.session_state.pipeline_concurrency,
+            help="Global limit on concurrently analyzed pages (each page makes several API calls)"
+        )
+
+        # Schema-constrained JSON replies instead of free text
+        st.session_state.structured_output = st.checkbox(
+            "Structured output (JSON schema)",
+            value=st.session_state.structured_output,
+            help="Ask for JSON constrained by a schema of the extracted parameters; the text parser is used as a fallback"
+        )
+        structured_stats = parse_stats()
+        if structured_stats["parsed"] or structured_stats["failed"]:
+            parsed_count = structured_stats["parsed"] + structured_stats["failed"]
+            st.caption(
+                f"{structured_stats['parsed']} structured replies parsed, "
+                f"{structured_stats['failed']} fell back to text, "
+                f"{structured_stats['seconds'] / parsed_count * 1000:.2f} ms per parse"
+            )
+
+        # API response cache counters (identical calls are replayed from disk)
+        cache_stats = get_response_cache().stats()
+        st.markdown("#### API Response Cache")
+        cache_hits_col, cache_misses_col = st.columns(2)
+        cache_hits_col.metric("Hits", cache_stats["hits"])
+        cache_misses_col.metric("Misses", cache_stats["misses"])
+        st.caption(
+            f"{cache_stats['entries']} cached responses, "
+            f"{cache_stats['size_bytes'] / (1024 * 1024):.1f} MB on disk, "
+            f"{cache_stats['evictions']} evicted"
+        )
+
+        # Page image store (full images on disk, thumbnails and recently viewed images in memory)
+        image_stats = get_image_store().stats()
+        st.caption(
+            f"Images: {image_stats['images']} on disk ({image_stats['disk_bytes'] / (1024 * 1024):.1f} MB), "
+            f"{image_stats['hot_images']} in memory ({image_stats['memory_bytes'] / (1024 * 1024):.1f} MB "
+            f"of {IMAGE_STORE_MEMORY_MB:.0f} MB)"
+        )
+
+        # API key pool status (masked keys)
+        with st.expander(f"API Keys ({len(API_KEY_POOL)})"):
+            for key_status in API_KEY_POOL.status():
+                parked = f", parked {key_status['parked_for']:.0f}s" if key_status['parked_for'] > 0 else ""
+                st.caption(
+                    f"{key_status['key']}: {key_status['requests']} requests, "
+                    f"{key_status['tokens']} tokens, {key_status['headroom']:.0%} headroom{parked}"
+                )
+
         # Component type filter for listing
         if st.session_state.drawings_table.empty:
             component_types = ["All Types"]
         else:
-            component_types = ["All Types"] + sorted(st.session_state.drawings_table["Drawing Type"].unique().tolist())
+            component_types = ["All Types"] + st.session_state.drawings_table.drawing_types()
         
         selected_filter = st.selectbox("Filter by Component Type", component_types)
         
@@ -2840,9 +970,7 @@ def main():
                 # Prepare data for export
                 export_data = []
                 for drawing_number, results in st.session_state.all_results.items():
-                    drawing_type = st.session_state.drawings_table[
-                        st.session_state.drawings_table['Drawing No.'] == drawing_number
-                    ]['Drawing Type'].iloc[0] if drawing_number in st.session_state.drawings_table['Drawing No.'].values else "Unknown"
+                    drawing_type = st.session_state.drawings_table.drawing_type_of(drawing_number, "Unknown")
                     
                     data_row = {
                         "Drawing Number": drawing_number,
@@ -2858,7 +986,7 @@ def main():
                 
                 # Create dataframe and download link
                 if export_data:
-                    export_df = pd.DataFrame(export_data)
+                    export_df = normalize_table(pd.DataFrame(export_data))
                     csv = export_df.to_csv(index=False)
                     st.download_button(
                         label="Download CSV",
@@ -2881,19 +1009,16 @@ def main():
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("Yes, Clear All", use_container_width=True):
-                        st.session_state.drawings_table = pd.DataFrame(columns=[
-                            'Drawing Type',
-                            'Drawing No.',
-                            'Processing Status', 
-                            'Extracted Fields Count',
-                            'Confidence Score',
-                            'Internal ID'
-                        ])
+                        st.session_state.drawings_table = DrawingStore()
                         st.session_state.all_results = {}
-                        st.session_state.current_image = {}
+                        st.session_state.image_keys = {}
+                        st.session_state.page_labels = {}
+                        st.session_state.orientation_reports = {}
                         st.session_state.edited_values = {}
                         st.session_state.selected_drawing = None
                         st.session_state.show_confirm = False
+                        for job in st.session_state.processing_queue:
+                            job.cancel()
                         st.session_state.processing_queue = []
                         st.experimental_rerun()
                 with col2:
@@ -3002,12 +1127,14 @@ def main():
                 st.info("⚠️ When processing drawings in Custom mode, ONLY these parameters will be extracted.")
 
     if uploaded_files:
-        # Process each uploaded file
-        for uploaded_file in uploaded_files:
-            file_id = f"{uploaded_file.name}_{uploaded_file.size}"
-            existing_files = [f"{f.name}_{f.size}" for f in st.session_state.processing_queue]
-            if file_id not in existing_files:
-                st.session_state.processing_queue.append(uploaded_file)
+        # Queue every uploaded file; the jobs run in the background while the page stays usable
+        if len(uploaded_files) > 1 and st.button("Process All Files", use_container_width=True):
+            try:
+                jobs = submit_files(uploaded_files)
+                st.toast(f"Queued {len(jobs)} file(s) for processing" if jobs else "All files are already queued")
+            except Exception as e:
+                st.error(f"Error processing files: {str(e)}")
+            set_rerun()
 
         # Create a grid display for uploaded files
         st.markdown("""
@@ -3054,23 +1181,10 @@ def main():
                 # Process button for each file
                 if st.button(f"Process", key=f"process_{idx}"):
                     try:
-                        processed_images = process_uploaded_file(file)
-                        if processed_images:
-                            for img_idx, image_data in enumerate(processed_images):
-                                with st.spinner('Identifying drawing type...'):
-                                    drawing_type = identify_drawing_type(image_data[0] if isinstance(image_data, tuple) else image_data)
-                                    if drawing_type and "❌" not in drawing_type:
-                                        drawing_number = process_drawing(drawing_type, image_data, file.name, img_idx)
-                                        # Automatically display results after successful processing
-                                        if drawing_number:
-                                            st.session_state.selected_drawing = drawing_number
-                                            st.success(f"✅ Successfully processed drawing: {drawing_number}")
-                                        else:
-                                            st.error("❌ Processing completed but no results were extracted. Please check the drawing and try again.")
-                                    else:
-                                        st.error(f"❌ Failed to identify drawing type: {drawing_type if drawing_type else 'Unknown error'}")
+                        if submit_files([file]):
+                            st.toast(f"Queued {file.name} for processing")
                         else:
-                            st.error(f"❌ Failed to process file: {file.name}. Please check if it's a valid image or PDF.")
+                            st.toast(f"{file.name} is already queued")
                     except Exception as e:
                         st.error(f"Error processing {file.name}: {str(e)}")
                     set_rerun()
@@ -3080,10 +1194,17 @@ def main():
     # Close the upload card - keep this regardless of whether files are uploaded
     st.markdown("</div>", unsafe_allow_html=True)  
 
+    # Background jobs: polled while any is running, shown once more when all have finished
+    if st.session_state.processing_queue:
+        if any(job.active for job in st.session_state.processing_queue):
+            poll_processing_queue()
+        else:
+            show_processing_queue()
+
     # Display the processed drawings with modern styling
     if not st.session_state.drawings_table.empty:
         # Apply filtering based on sidebar selections if needed
-        filtered_table = st.session_state.drawings_table.copy()
+        filtered_table = st.session_state.drawings_table.to_dataframe()
         
         # Filter by component type if not "All Types"
         if selected_filter != "All Types":
@@ -3156,14 +1277,9 @@ def main():
                     set_rerun()
             else:
                 # Get drawing type from table
-                drawing_type_entries = st.session_state.drawings_table[
-                    st.session_state.drawings_table['Drawing No.'] == st.session_state.selected_drawing
-                ]
-                
-                if drawing_type_entries.empty:
-                    drawing_type = results.get('COMPONENT_TYPE', 'UNKNOWN')
-                else:
-                    drawing_type = drawing_type_entries['Drawing Type'].iloc[0]
+                drawing_type = st.session_state.drawings_table.drawing_type_of(
+                    st.session_state.selected_drawing, results.get('COMPONENT_TYPE', 'UNKNOWN')
+                )
                 
                 # Header
                 st.markdown("""
@@ -3218,11 +1334,24 @@ def main():
                                 <div class="image-container">
                     """, unsafe_allow_html=True)
                 
-                    image_data = st.session_state.current_image.get(st.session_state.selected_drawing)
+                    image_key = st.session_state.image_keys.get(st.session_state.selected_drawing)
+                    image_data = get_image_store().get(image_key) if image_key else None
+                    page_caption = st.session_state.page_labels.get(st.session_state.selected_drawing)
+                    if image_data is None and image_key:
+                        # Full image evicted from disk; the thumbnail is kept in memory
+                        image_data = get_image_store().thumbnail(image_key)
+                        page_caption = f"{page_caption or 'Page'} (thumbnail; full image no longer stored)"
                     if image_data is not None:
                         try:
                             image = Image.open(io.BytesIO(image_data))
-                            st.image(image)
+                            st.image(image, caption=page_caption)
+                            orientation_report = st.session_state.orientation_reports.get(st.session_state.selected_drawing)
+                            if orientation_report:
+                                st.caption(
+                                    f"Orientation: {orientation_report['rotation']} via {orientation_report['method']} "
+                                    f"({orientation_report['confidence']:.0%} confidence, "
+                                    f"{orientation_report['seconds'] * 1000:.0f} ms)"
+                                )
                         except Exception as e:
                             st.error(f"Unable to display image: {str(e)}. Please try processing the drawing again.")
                     else:
@@ -3662,9 +1791,7 @@ def main():
                 # Get current drawing info
                 drawing_info = {
                     "drawing_number": st.session_state.selected_drawing,
-                    "drawing_type": st.session_state.drawings_table[
-                        st.session_state.drawings_table['Drawing No.'] == st.session_state.selected_drawing
-                    ]['Drawing Type'].iloc[0]
+                    "drawing_type": st.session_state.drawings_table.drawing_type_of(st.session_state.selected_drawing)
                 }
                 
                 # Add category to feedback data
@@ -3723,391 +1850,7 @@ def main():
         st.session_state.needs_rerun = False
         st.rerun()
 
-def perform_second_extraction_pass(image_bytes, initial_results, component_type=None):
-    """
-    Perform a second, more focused extraction pass to fill in missing fields.
-    This pass specifically targets fields that were empty in the first extraction,
-    with special focus on reading values from drawings, dimensions, and inferences.
-    
-    Args:
-        image_bytes: The image data
-        initial_results: Results from the first extraction pass
-        component_type: The identified component type
-        
-    Returns:
-        Updated results with previously missing fields filled in where possible
-    """
-    # Get empty fields from initial extraction
-    empty_fields = []
-    table_focused_fields = []
-    
-    for key, value in initial_results.items():
-        # Skip justification fields and metadata fields
-        if key.endswith("_JUSTIFICATION") or key in ["DOCUMENT_TYPE", "COMPONENT_TYPE"]:
-            continue
-            
-        # Check if field is empty
-        if not value or value.strip() == "":
-            empty_fields.append(key)
-        else:
-            # Check if the justification indicates this came from a table
-            justification = initial_results.get(f"{key}_JUSTIFICATION", "").lower()
-            if "table" in justification or "specification" in justification:
-                table_focused_fields.append(key)
-    
-    # If no empty fields and all values came from tables, focus on enhancing the drawing-based extraction
-    if not empty_fields and len(table_focused_fields) > 5:
-        # Select a subset of important fields to try to find additional information from the drawing itself
-        drawing_focus_fields = [
-            "BORE DIAMETER", "ROD DIAMETER", "STROKE LENGTH", "CLOSED LENGTH", "OPEN LENGTH",
-            "CYLINDER ACTION", "PORT TYPE", "PORT LOCATION", "MOUNTING TYPE", "MATERIAL",
-            "SEAL TYPE", "RATED LOAD", "CAPACITY", "DIMENSIONS", "WEIGHT"
-        ]
-        
-        # Filter to fields that actually exist in our results
-        drawing_focus_fields = [field for field in drawing_focus_fields if field in initial_results]
-        
-        # Add some fields to empty_fields to force re-extraction from drawing elements
-        empty_fields = drawing_focus_fields[:5] if drawing_focus_fields else []
-    
-    # If no fields to process, return the original results
-    if not empty_fields:
-        return initial_results
-        
-    # Get component type from results if not provided
-    if not component_type and "COMPONENT_TYPE" in initial_results:
-        component_type = initial_results["COMPONENT_TYPE"]
-    
-    # Format empty fields for the prompt
-    empty_fields_str = "\n".join([f"- {field}" for field in empty_fields])
-    
-    # Convert image to base64
-    base64_image = encode_image_to_base64(image_bytes)
-    
-    # Create a targeted system prompt for the second pass with emphasis on drawing elements
-    system_content = """
-    You are a senior mechanical design engineer with specialized expertise in technical drawing interpretation.
-    Your task is to extract engineering data directly from visual elements of the drawing rather than from text or tables.
-    
-    CORE CAPABILITIES:
-    1. Dimensional Analysis - Extract precise measurements from dimension lines and callouts
-    2. Engineering Symbol Interpretation - Decode GD&T symbols, tolerances, and technical annotations
-    3. Cross-Section Analysis - Evaluate internal features from sectional views
-    4. Visual Engineering Inference - Determine mechanical properties from visual representations
-    5. Manufacturing Assessment - Identify production requirements from drawing details
-    
-    Your expertise as a design engineer allows you to understand not just WHAT is shown, but WHY certain design choices were made.
-    Focus on extracting information from the drawing itself, not from specification tables or text blocks which have already been processed.
-    """
-    
-    # Create user prompt focusing on the missing fields and visual elements
-    user_content = f"""
-    FOCUSED DRAWING ANALYSIS TASK:
-    
-    This is a {component_type} drawing. I need you to extract information DIRECTLY FROM THE DRAWING ELEMENTS (not from specification tables) for these specific parameters:
-    {empty_fields_str}
-    
-    INSTRUCTIONS FOR VISUAL ANALYSIS:
-    
-    1. DIMENSION FOCUS: Carefully examine all dimension lines on the drawing. These appear as lines with arrowheads and numerical values indicating measurements.
-       - Look for dimensions showing lengths, diameters, depths, radii, etc.
-       - Pay attention to the unit symbols (mm, in, etc.) and decimal precision
-    
-    2. ENGINEERING SYMBOLS: Identify and interpret standard engineering symbols:
-       - Ø symbol indicates diameter
-       - R symbol indicates radius
-       - ± indicates tolerance
-       - ▭ indicates square
-       - ⌀ indicates cylindrical feature
-       - Surface finish symbols
-    
-    3. SECTION VIEWS: Examine any cross-sectional views (typically indicated by hatched areas):
-       - These reveal internal features not visible from the outside
-       - Look for wall thicknesses, internal clearances, and nested components
-    
-    4. DETAIL VIEWS: Check for any magnified detail views:
-       - These show specific features at a larger scale
-       - Often indicated by a circled letter or number referencing the main view
-    
-    5. VISUAL INFERENCE: Make professional inferences based on the drawing:
-       - For cylinder action, check for visible ports (one port = single acting, two ports = double acting)
-       - For mounting type, observe how the component connects to other parts
-       - For materials, note any hatching patterns or material symbols
-    
-    6. DRAWING ANNOTATIONS: Look for non-tabular annotations:
-       - Notes directly on the drawing pointing to specific features
-       - Text along dimension lines
-       - Labels on components
-    
-    7. REFERENCE INFORMATION: Check the drawing borders and title blocks for:
-       - Scale information (to verify dimensions)
-       - Drawing standards used
-       - Revision history
-    
-    For each parameter, provide:
-    1. The extracted value with proper units
-    2. A precise justification explaining EXACTLY where in the drawing you found this information
-    3. Description of any visual elements that led to this determination
-    """
-    base64_image_data_url = f"data:image/png;base64,{base64_image}"
-
-    
-    # Make the API call
-    payload = {
-        "model": "gpt-5.2",
-        "messages": [
-            {
-                "role": "system",
-                "content": system_content
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": user_content
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url":  base64_image_data_url
-                        }
-                    }
-                ]
-            }
-        ],
-        "max_tokens": 4000,
-        "temperature": 0.1
-    }
-
-    headers = {
-        "Authorization": f"Bearer {st.session_state.current_api_key}",
-        "Content-Type": "application/json"
-    }
-
-    try:
-        # Make the API call
-        response = requests.post(API_URL, headers=headers, json=payload)
-        result = process_api_response(response)
-        
-        if "❌" not in result:
-            # Parse the results
-            second_pass_results = {}
-            
-            # Process the response line by line
-            lines = result.strip().split("\n")
-            current_field = None
-            current_value = None
-            justification = []
-            
-            for line in lines:
-                line = line.strip()
-                
-                # Skip empty lines
-                if not line:
-                    continue
-                
-                # Check if this is a field header (all caps with colon)
-                if ":" in line and line.split(":")[0].isupper() and any(field in line.split(":")[0] for field in empty_fields):
-                    # If we were processing a previous field, save it
-                    if current_field and current_value is not None:
-                        second_pass_results[current_field] = current_value
-                        if justification:
-                            # Ensure justification mentions the drawing visual elements
-                            just_text = " ".join(justification)
-                            if "table" in just_text.lower() and "specification" in just_text.lower():
-                                # Replace table-focused justification with drawing-focused one
-                                just_text = "Extracted directly from dimension lines and annotations in the drawing."
-                            second_pass_results[f"{current_field}_JUSTIFICATION"] = just_text
-                    
-                    # Start a new field
-                    parts = line.split(":", 1)
-                    current_field = parts[0].strip()
-                    current_value = parts[1].strip() if len(parts) > 1 else ""
-                    justification = []
-                    
-                # If not a field header, this might be a justification or continuation
-                elif current_field:
-                    # Check if this is a justification marker
-                    if "JUSTIFICATION:" in line or "Justification:" in line:
-                        justification = [line.split(":", 1)[1].strip()]
-                    # Otherwise add to justification
-                    else:
-                        justification.append(line)
-            
-            # Add the last field being processed
-            if current_field and current_value is not None:
-                second_pass_results[current_field] = current_value
-                if justification:
-                    # Ensure justification mentions the drawing visual elements
-                    just_text = " ".join(justification)
-                    if "table" in just_text.lower() and "specification" in just_text.lower():
-                        # Replace table-focused justification with drawing-focused one
-                        just_text = "Extracted directly from dimension lines and annotations in the drawing."
-                    second_pass_results[f"{current_field}_JUSTIFICATION"] = just_text
-            
-            # Update the original results with new findings
-            updated_results = initial_results.copy()
-            for key, value in second_pass_results.items():
-                # For non-justification fields, create a combined value if appropriate
-                if not key.endswith("_JUSTIFICATION") and value and value.upper() != "NOT FOUND":
-                    original_value = updated_results.get(key, "")
-                    
-                    # If we have both original and new values, and they're different
-                    if original_value and original_value != value:
-                        # Check if one contains the other
-                        if value in original_value:
-                            # Keep the more complete value
-                            updated_results[key] = original_value
-                        elif original_value in value:
-                            # New value is more complete
-                            updated_results[key] = value
-                        else:
-                            # They are different - if from different sources, keep both with a note
-                            original_justification = updated_results.get(f"{key}_JUSTIFICATION", "").lower()
-                            if "table" in original_justification or "specification" in original_justification:
-                                # Original from table, new from drawing - combine them
-                                updated_results[key] = f"{original_value} [Table]; {value} [Drawing]"
-                            else:
-                                # Just use the new value if it seems more complete
-                                if len(value) > len(original_value):
-                                    updated_results[key] = value
-                    else:
-                        # No original value or they're the same, use the new one
-                        updated_results[key] = value
-                
-                # For justification fields, enhance them to emphasize drawing elements
-                elif key.endswith("_JUSTIFICATION"):
-                    base_key = key.replace("_JUSTIFICATION", "")
-                    original_value = updated_results.get(base_key, "")
-                    
-                    if original_value:
-                        original_justification = updated_results.get(key, "")
-                        
-                        # Only update justification if it's from a specification table
-                        if "table" in original_justification.lower() or "specification" in original_justification.lower():
-                            updated_results[key] = value
-                        elif "drawing" not in original_justification.lower() and "dimension" not in original_justification.lower():
-                            # Enhance justification to include drawing elements
-                            drawing_note = "Also verified from drawing dimensions and visual elements."
-                            updated_results[key] = f"{original_justification} {drawing_note}"
-            
-            # Add engineering analysis section if not already present
-            if "ENGINEERING_ANALYSIS" not in updated_results:
-                # Extract engineering insights from the response
-                engineering_insights = extract_engineering_insights(result)
-                if engineering_insights:
-                    updated_results["ENGINEERING_ANALYSIS"] = engineering_insights
-                    updated_results["ENGINEERING_ANALYSIS_JUSTIFICATION"] = "Derived from detailed analysis of drawing dimensions, proportions, and mechanical design principles."
-            
-            return updated_results
-        
-        # If the API call failed, return the original results
-        return initial_results
-    
-    except Exception as e:
-        print(f"Error in second extraction pass: {str(e)}")
-        return initial_results  # Return original results on error
 
-def extract_engineering_insights(response_text):
-    """
-    Extract engineering insights and analysis from the second pass response.
-    
-    Args:
-        response_text: The raw text response from the second extraction pass
-        
-    Returns:
-        Structured engineering insights as a string
-    """
-    # Look for sections that contain engineering analysis
-    insight_markers = [
-        "ENGINEERING PERFORMANCE", 
-        "PERFORMANCE ANALYSIS",
-        "FUNCTIONAL ANALYSIS",
-        "DESIGN ANALYSIS",
-        "ENGINEERING IMPLICATIONS",
-        "MANUFACTURING CONSIDERATIONS",
-        "FUNCTIONAL SIGNIFICANCE",
-        "STRESS ANALYSIS",
-        "LOAD CAPACITY",
-        "OPERATIONAL CHARACTERISTICS"
-    ]
-    
-    insights = []
-    lines = response_text.split('\n')
-    in_insight_section = False
-    current_insight = []
-    
-    for line in lines:
-        # Check if this line starts a new insight section
-        if any(marker.lower() in line.lower() for marker in insight_markers):
-            # If we were already in an insight section, save it
-            if in_insight_section and current_insight:
-                insights.append('\n'.join(current_insight))
-                current_insight = []
-            
-            # Start new insight section
-            in_insight_section = True
-            current_insight.append(line.strip())
-        
-        # If we're in an insight section, add the line
-        elif in_insight_section:
-            # Check if this line might end the section (empty line or new section header)
-            if not line.strip() or line.strip().isupper() or ":" in line and line.split(":")[0].isupper():
-                # End the current section
-                if current_insight:
-                    insights.append('\n'.join(current_insight))
-                    current_insight = []
-                in_insight_section = False
-            else:
-                # Add to current insight
-                current_insight.append(line.strip())
-    
-    # Add the last insight section if it exists
-    if in_insight_section and current_insight:
-        insights.append('\n'.join(current_insight))
-    
-    # If no specific insight sections were found, try to extract any engineering analysis paragraphs
-    if not insights:
-        # Look for paragraphs that mention engineering concepts
-        engineering_terms = [
-            "load", "stress", "capacity", "efficiency", "performance", 
-            "durability", "safety factor", "design", "operation", 
-            "pressure rating", "temperature", "material properties",
-            "wear", "fatigue", "failure mode", "lifecycle", "maintenance"
-        ]
-        
-        # Extract paragraphs with engineering terms
-        paragraphs = []
-        current_para = []
-        
-        for line in lines:
-            if not line.strip():
-                if current_para:
-                    paragraph = ' '.join(current_para)
-                    if any(term in paragraph.lower() for term in engineering_terms):
-                        paragraphs.append(paragraph)
-                    current_para = []
-            else:
-                current_para.append(line.strip())
-        
-        # Add the last paragraph if it exists
-        if current_para:
-            paragraph = ' '.join(current_para)
-            if any(term in paragraph.lower() for term in engineering_terms):
-                paragraphs.append(paragraph)
-        
-        # Use the extracted paragraphs as insights
-        insights = paragraphs
-    
-    # Format the insights as a single string
-    if insights:
-        formatted_insights = "ENGINEERING ANALYSIS:\n\n"
-        for i, insight in enumerate(insights):
-            formatted_insights += f"{i+1}. {insight}\n\n"
-        return formatted_insights
-    
-    return ""
 
 def process_raw_results(raw_results, drawing_id, file_name, image_bytes):
     """Process the raw results from the API and update the session state."""
@@ -4144,13 +1887,15 @@ def process_raw_results(raw_results, drawing_id, file_name, image_bytes):
             drawing_no = file_name if file_name else f"Drawing {drawing_id}"
         
         # Update drawings table with results
-        idx = st.session_state.drawings_table.index[st.session_state.drawings_table["Internal ID"] == drawing_id].tolist()
-        if idx:
-            st.session_state.drawings_table.at[idx[0], "Drawing Type"] = component_type
-            st.session_state.drawings_table.at[idx[0], "Drawing No."] = drawing_no
-            st.session_state.drawings_table.at[idx[0], "Processing Status"] = "✅ Completed"
-            st.session_state.drawings_table.at[idx[0], "Extracted Fields Count"] = f"{filled_fields}/{total_fields}"
-            st.session_state.drawings_table.at[idx[0], "Confidence Score"] = f"{confidence_score}%"
+        record = st.session_state.drawings_table.update(
+            drawing_id,
+            drawing_type=component_type,
+            drawing_no=drawing_no,
+            status="✅ Completed",
+            fields_count=f"{filled_fields}/{total_fields}",
+            confidence=f"{confidence_score}%"
+        )
+        if record is not None:
             
             # Format the extracted_parameters for display
             formatted_params = []
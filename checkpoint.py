@@ -0,0 +1,180 @@
+"""
+Append-only checkpoint journal for resumable extraction runs.
+
+Every page that finishes successfully appends one JSON line to the journal,
+flushed and fsynced before the run moves on, so a run that dies (expired
+key, laptop sleep, server restart) loses at most the pages that were in
+flight. A restarted run reads the journal back and skips every page it
+already holds: pages are keyed by the SHA-256 of their file's bytes, the
+page index and a fingerprint of the extraction settings, so a file that was
+renamed or moved is still recognized and a run with different settings is
+not. Once every page of a file is journaled a file line is appended too,
+and later runs skip that file without rendering it.
+
+Stages inside a page (orientation, identification, extraction, second pass)
+are not journaled separately: their API responses are already replayed from
+response_cache, so re-running an interrupted page costs no new requests for
+the stages it had finished.
+
+A line cut short by a crash is ignored when the journal is read back. The
+module has no Streamlit dependency.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from image_store import get_image_store
+
+# Journal of the Streamlit job queue (batch runs keep one next to their output)
+CHECKPOINT_PATH = os.getenv(
+    "CHECKPOINT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".checkpoints", "jobs.jsonl")
+)
+
+
+def settings_fingerprint(settings):
+    """Short hash of the settings that change what is extracted from a page"""
+    fields = {
+        "parameter_mode": settings.parameter_mode,
+        "custom_parameters": settings.custom_parameters,
+        "structured_output": settings.structured_output,
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def page_key(file_digest, page_index, fingerprint):
+    return f"{file_digest}:{page_index}:{fingerprint}"
+
+
+class CheckpointJournal:
+    """Finished pages of earlier and current runs, backed by a JSONL file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._pages = {}  # page key -> entry
+        self._files = {}  # (file digest, fingerprint) -> page count, for completed files
+        self._journaled = {}  # (file digest, fingerprint) -> number of pages journaled
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # line cut short by a crash
+                    self._load(entry)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pages)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._pages
+
+    def _load(self, entry):
+        if entry.get("kind") == "file":
+            self._files[(entry["file_digest"], entry["fingerprint"])] = entry["page_count"]
+        elif entry.get("kind") == "page" and entry["key"] not in self._pages:
+            self._pages[entry["key"]] = entry
+            file_id = (entry["file_digest"], entry["fingerprint"])
+            self._journaled[file_id] = self._journaled.get(file_id, 0) + 1
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._load(entry)
+
+    def get(self, file_digest, page_index, fingerprint):
+        """The journaled data of a finished page, or None"""
+        with self._lock:
+            entry = self._pages.get(page_key(file_digest, page_index, fingerprint))
+        return entry["data"] if entry is not None else None
+
+    def completed_file(self, file_digest, fingerprint):
+        """Journaled data of every page, in page order, if the whole file is finished; otherwise None"""
+        with self._lock:
+            page_count = self._files.get((file_digest, fingerprint))
+            if page_count is None:
+                return None
+            entries = [self._pages.get(page_key(file_digest, index, fingerprint)) for index in range(page_count)]
+        if any(entry is None for entry in entries):
+            return None
+        return [entry["data"] for entry in entries]
+
+    def record_page(self, file_digest, page_index, page_count, fingerprint, data, file_name=""):
+        """
+        Journal a finished page; data is any JSON-serializable value.
+
+        When this completes the file (all page_count pages journaled), the
+        file line is appended as well.
+        """
+        with self._lock:
+            self._append({
+                "kind": "page",
+                "key": page_key(file_digest, page_index, fingerprint),
+                "file": file_name,
+                "file_digest": file_digest,
+                "fingerprint": fingerprint,
+                "page": page_index,
+                "data": data,
+            })
+            file_id = (file_digest, fingerprint)
+            if page_count and file_id not in self._files and self._journaled.get(file_id) == page_count:
+                self._append({
+                    "kind": "file",
+                    "file": file_name,
+                    "file_digest": file_digest,
+                    "fingerprint": fingerprint,
+                    "page_count": page_count,
+                })
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def dump_extraction(extraction):
+    """
+    JSON-serializable form of an analyze_page extraction.
+
+    The page image goes to the shared image store and only its key is kept.
+    """
+    data = {key: value for key, value in extraction.items() if key != "image"}
+    data["image_key"] = get_image_store().put(extraction["image"])
+    return data
+
+
+def load_extraction(data):
+    """The extraction saved by dump_extraction, or None if its image is no longer stored"""
+    image = get_image_store().get(data["image_key"])
+    if image is None:
+        return None
+    extraction = {key: value for key, value in data.items() if key != "image_key"}
+    extraction["image"] = image
+    return extraction
+
+
+_default_journal = None
+_default_journal_lock = threading.Lock()
+
+
+def get_checkpoint_journal():
+    """Process-wide journal of the Streamlit job queue"""
+    global _default_journal
+    with _default_journal_lock:
+        if _default_journal is None:
+            _default_journal = CheckpointJournal(CHECKPOINT_PATH)
+        return _default_journal
@@ -0,0 +1,179 @@
+"""
+Encode-once image handle shared by every pipeline stage.
+
+A DrawingImage wraps the encoded bytes of one page and computes everything
+derived from them - content hash, dimensions, base64 data URL, thumbnail and
+grayscale variants, rotated copies - at most once, on first use. Stages pass
+the handle along instead of raw bytes, so a page is never re-encoded or
+re-hashed within a run.
+
+Handles are immutable; derived values are memoized per instance and are safe
+to read from several worker threads (a race at worst computes a value twice).
+The module has no Streamlit dependency.
+"""
+import base64
+import hashlib
+import io
+
+from PIL import Image
+
+# Default longest side of thumbnails shown in the UI
+THUMBNAIL_MAX_SIDE = 300
+
+_MEDIA_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+    "BMP": "image/bmp",
+    "TIFF": "image/tiff",
+}
+
+
+class DrawingImage:
+    """Immutable encoded page image with memoized encodings and variants"""
+
+    __slots__ = ("_data", "_memo")
+
+    def __init__(self, data):
+        if isinstance(data, DrawingImage):
+            data = data.data
+        object.__setattr__(self, "_data", bytes(data))
+        object.__setattr__(self, "_memo", {})
+
+    @classmethod
+    def of(cls, image):
+        """Return image itself if it already is a DrawingImage, otherwise wrap the bytes"""
+        return image if isinstance(image, cls) else cls(image)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DrawingImage is immutable")
+
+    def _memoized(self, key, compute):
+        memo = self._memo
+        if key not in memo:
+            memo[key] = compute()
+        return memo[key]
+
+    # --- Raw data and identity ---------------------------------------------
+
+    @property
+    def data(self):
+        """The encoded image bytes"""
+        return self._data
+
+    def __bytes__(self):
+        return self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def digest(self):
+        """SHA-256 of the encoded bytes (raw digest)"""
+        return self._memoized("digest", lambda: hashlib.sha256(self._data).digest())
+
+    @property
+    def sha256(self):
+        """SHA-256 of the encoded bytes (hex)"""
+        return self._memoized("sha256", lambda: self.digest.hex())
+
+    def __eq__(self, other):
+        return isinstance(other, DrawingImage) and self.digest == other.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        width, height = self.size
+        return f"DrawingImage({self.format} {width}x{height}, {len(self._data)} bytes, {self.sha256[:12]})"
+
+    # --- Header information ------------------------------------------------
+
+    def _header(self):
+        # Image.open only parses the header; pixels are not decoded here
+        def read():
+            with Image.open(io.BytesIO(self._data)) as image:
+                return image.size, image.format or "JPEG"
+        return self._memoized("header", read)
+
+    @property
+    def size(self):
+        """(width, height) in pixels"""
+        return self._header()[0]
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    @property
+    def format(self):
+        """PIL format name, e.g. JPEG or PNG"""
+        return self._header()[1]
+
+    @property
+    def media_type(self):
+        return _MEDIA_TYPES.get(self.format, "image/jpeg")
+
+    # --- Encodings ---------------------------------------------------------
+
+    @property
+    def base64(self):
+        """Base64 text of the encoded bytes"""
+        return self._memoized("base64", lambda: base64.b64encode(self._data).decode("ascii"))
+
+    @property
+    def data_url(self):
+        """data: URL with the correct media type, ready for an image_url message part"""
+        return self._memoized("data_url", lambda: f"data:{self.media_type};base64,{self.base64}")
+
+    # --- Derived variants --------------------------------------------------
+
+    def pil(self):
+        """A fresh decoded PIL image (callers may modify it)"""
+        image = Image.open(io.BytesIO(self._data))
+        image.load()
+        return image
+
+    def thumbnail(self, max_side=THUMBNAIL_MAX_SIDE):
+        """JPEG thumbnail bytes whose longest side is at most max_side"""
+        def make():
+            image = Image.open(io.BytesIO(self._data))
+            if image.format == "JPEG":
+                image.draft("RGB", (max_side, max_side))
+            image = image.convert("RGB")
+            image.thumbnail((max_side, max_side))
+            out = io.BytesIO()
+            image.save(out, format="JPEG", quality=85)
+            return out.getvalue()
+        return self._memoized(("thumbnail", max_side), make)
+
+    def grayscale(self, max_side=None):
+        """Grayscale PIL image, optionally downscaled so the longest side is at most max_side"""
+        def make():
+            image = Image.open(io.BytesIO(self._data))
+            if max_side and image.format == "JPEG":
+                scale = max_side / max(image.size)
+                if scale < 1:
+                    image.draft("L", (int(image.width * scale) + 1, int(image.height * scale) + 1))
+            gray = image.convert("L")
+            if max_side and max(gray.size) > max_side:
+                scale = max_side / max(gray.size)
+                gray = gray.resize((max(1, int(gray.width * scale)), max(1, int(gray.height * scale))), Image.BILINEAR)
+            return gray
+        # Returned images are shared; callers must copy before modifying
+        return self._memoized(("grayscale", max_side), make)
+
+    def rotated(self, rotation):
+        """
+        Copy turned by a rotation token (ROTATE_0/90/180/270, clockwise).
+        ROTATE_0 returns self; other rotations are encoded once and memoized.
+        """
+        if rotation not in ("ROTATE_90", "ROTATE_180", "ROTATE_270"):
+            return self
+        from orientation import rotate_image_bytes
+        return self._memoized(("rotated", rotation), lambda: DrawingImage(rotate_image_bytes(self._data, rotation)))
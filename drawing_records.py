@@ -0,0 +1,129 @@
+"""
+Record store for the processed-drawings table.
+
+Each processed page is one DrawingRecord (a __slots__ row) kept in insertion
+order and indexed by Internal ID and by Drawing No., so adding a drawing or
+updating its status is O(1) instead of copying the whole table with
+pd.concat and boolean masks. The pandas view of the table is built lazily,
+only when something renders or exports it, and is reused until the next
+change.
+
+The module has no Streamlit dependency.
+"""
+import pandas as pd
+
+# Table column -> DrawingRecord attribute, in display order
+COLUMNS = {
+    "Drawing Type": "drawing_type",
+    "Drawing No.": "drawing_no",
+    "Processing Status": "status",
+    "Extracted Fields Count": "fields_count",
+    "Confidence Score": "confidence",
+    "Internal ID": "internal_id",
+}
+
+
+class DrawingRecord:
+    """One row of the drawings table"""
+
+    __slots__ = tuple(COLUMNS.values())
+
+    def __init__(self, drawing_type, drawing_no, status="Processing..", fields_count="0/0",
+                 confidence="0%", internal_id=""):
+        self.drawing_type = drawing_type
+        self.drawing_no = drawing_no
+        self.status = status
+        self.fields_count = fields_count
+        self.confidence = confidence
+        self.internal_id = internal_id
+
+    def __repr__(self):
+        return f"DrawingRecord({self.internal_id!r}, {self.drawing_no!r}, {self.status!r})"
+
+
+class DrawingStore:
+    """Ordered drawing records with O(1) lookup by Internal ID and Drawing No."""
+
+    def __init__(self):
+        self._records = []
+        self._by_id = {}
+        # Drawing No. -> records carrying it, in the order they were given it
+        self._by_number = {}
+        self._frame = None
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    @property
+    def empty(self):
+        return not self._records
+
+    def add(self, record):
+        """Append a record; its Internal ID must be new"""
+        if record.internal_id in self._by_id:
+            raise KeyError(f"Drawing {record.internal_id} is already in the table")
+        self._records.append(record)
+        self._by_id[record.internal_id] = record
+        self._by_number.setdefault(record.drawing_no, []).append(record)
+        self._frame = None
+        return record
+
+    def update(self, internal_id, **fields):
+        """
+        Set fields (DrawingRecord attribute names) on the record with this Internal ID.
+
+        Returns the record, or None if no record has that ID.
+        """
+        record = self._by_id.get(internal_id)
+        if record is None:
+            return None
+        old_number = record.drawing_no
+        for attribute, value in fields.items():
+            setattr(record, attribute, value)
+        if record.drawing_no != old_number:
+            holders = self._by_number[old_number]
+            holders.remove(record)
+            if not holders:
+                del self._by_number[old_number]
+            self._by_number.setdefault(record.drawing_no, []).append(record)
+        self._frame = None
+        return record
+
+    def get(self, internal_id):
+        return self._by_id.get(internal_id)
+
+    def find(self, drawing_no):
+        """The record that was given this Drawing No. first, or None"""
+        holders = self._by_number.get(drawing_no)
+        return holders[0] if holders else None
+
+    def drawing_type_of(self, drawing_no, default=None):
+        record = self.find(drawing_no)
+        return record.drawing_type if record is not None else default
+
+    def drawing_types(self):
+        """Sorted distinct drawing types"""
+        return sorted({record.drawing_type for record in self._records})
+
+    def clear(self):
+        self._records.clear()
+        self._by_id.clear()
+        self._by_number.clear()
+        self._frame = None
+
+    def to_dataframe(self):
+        """
+        The table as a DataFrame, built on first use after a change.
+
+        The frame is shared between calls; filter or copy it rather than
+        modifying it in place.
+        """
+        if self._frame is None:
+            self._frame = pd.DataFrame(
+                [[getattr(record, attribute) for attribute in COLUMNS.values()] for record in self._records],
+                columns=list(COLUMNS)
+            )
+        return self._frame
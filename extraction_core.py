@@ -0,0 +1,1987 @@
+"""
+Streamlit-free extraction core.
+
+Everything one drawing page goes through - PDF rendering, orientation
+correction, document/component identification, the vision extraction with
+its second pass, and parsing of the reply - lives here, so the Streamlit app
+(cad_final.py), the batch runner (batch_extract.py) and any other front end
+call the same code. Choices that used to be read from st.session_state are
+passed in as an ExtractionSettings; errors are printed and returned as "❌"
+messages, never shown through Streamlit. The module has no Streamlit
+dependency.
+"""
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from PIL import Image
+from pdf2image import convert_from_bytes
+
+from api_keys import get_key_pool
+from drawing_image import DrawingImage
+from orientation import ORIENTATION_MIN_CONFIDENCE, ROTATIONS, detect_orientation
+from pdf_render import iter_pdf_pages, page_label
+from quantities import column_kind, normalize_value
+from response_cache import cached_post
+from response_parser import parse_response
+from structured_output import (
+    STRUCTURED_OUTPUT, STRUCTURED_PROMPT_SUFFIX, StructuredOutputError,
+    extraction_response_format, parse_structured_response
+)
+from text_layer import format_text_hints, merge_text_layer_fields, unresolved_parameters
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass  # dotenv not installed, will use system environment variables
+
+# Try to import pytesseract, but make it optional
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+# Point pytesseract at a local Windows install only where that path exists
+TESSERACT_WINDOWS_CMD = r"C:\Users\shrey\Downloads\tesseract-ocr-w64-setup-v5.3.0.20221214.exe"
+if TESSERACT_AVAILABLE and os.path.exists(TESSERACT_WINDOWS_CMD):
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_WINDOWS_CMD
+
+# OpenAI API URL for GPT-4o
+API_URL = "https://api.openai.com/v1/chat/completions"
+
+# Longest side of the image sent at low detail when the text layer already resolves
+# every requested parameter (the API scales low-detail images to 512 px anyway)
+LOW_DETAIL_MAX_SIDE = 512
+
+# === Load API Keys from Environment ===
+# OPENAI_API_KEYS (comma-separated), OPENAI_API_KEY and OPENAI_API_KEY_1..N all feed the pool
+API_KEY_POOL = get_key_pool()
+
+PARAMETER_MODES = ("Default", "Custom", "Cylinder, Hyd/Pneumatic")
+
+# Component types with built-in parameter lists
+STANDARD_COMPONENT_TYPES = ["CYLINDER", "VALVE", "GEARBOX", "NUT", "LIFTING_RAM", "UNKNOWN"]
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+class ExtractionSettings:
+    """
+    Extraction choices shared by every stage of a run.
+
+    parameter_mode: "Default", "Custom" or "Cylinder, Hyd/Pneumatic"
+    custom_parameters: {"GENERIC" or component type: [parameter names]} (Custom mode)
+    custom_products: {component type: {"parameters": [...]}} learned from earlier drawings
+    structured_output: request schema-constrained JSON replies
+    """
+
+    __slots__ = ("parameter_mode", "custom_parameters", "custom_products", "structured_output")
+
+    def __init__(self, parameter_mode="Default", custom_parameters=None, custom_products=None,
+                 structured_output=STRUCTURED_OUTPUT):
+        self.parameter_mode = parameter_mode
+        self.custom_parameters = custom_parameters if custom_parameters is not None else {}
+        self.custom_products = custom_products if custom_products is not None else {}
+        self.structured_output = structured_output
+
+    def __repr__(self):
+        return f"ExtractionSettings({self.parameter_mode!r}, structured_output={self.structured_output!r})"
+
+
+def check_poppler_installed():
+    """Check if poppler is installed on the system"""
+    try:
+        if sys.platform.startswith('win'):
+            # On Windows, check if path contains poppler
+            return any('poppler' in path.lower() for path in os.environ.get('PATH', '').split(os.pathsep))
+        else:
+            # On Unix-like systems, try to run pdftoppm
+            subprocess.run(['pdftoppm', '-v'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return True
+    except (FileNotFoundError, subprocess.SubprocessError):
+        return False
+
+
+def handle_api_response(response_json, retry_func=None, *args, **kwargs):
+    """
+    Report API errors (printed; the caller returns them as a "❌" result).
+
+    Rate limits and transient failures are already retried (with backoff and a
+    retry budget) inside api_client.post, so anything that reaches this point
+    is final and is not retried again here. retry_func is accepted for
+    backwards compatibility only.
+    """
+    if 'error' in response_json:
+        error = response_json.get('error', {})
+        if isinstance(error, dict):
+            error_type = error.get('type', '')
+            error_code = error.get('code', '')
+            error_message = error.get('message', '')
+            
+            # Check for rate limit error
+            if error_type == 'rate_limit_exceeded' or error_code == 'rate_limit_exceeded' or 'rate limit' in error_message.lower():
+                print("❌ API rate limit reached and the retry budget is exhausted. Please try again shortly.")
+                return None
+            # Handle other specific error codes
+            elif error_code == 'invalid_api_key' or error_type == 'invalid_request_error' and 'api key' in error_message.lower():
+                print("❌ Authentication failed: Please check your API key")
+                return None
+            elif error_type == 'invalid_request_error':
+                print(f"❌ Invalid request: {error_message}")
+                return None
+            elif error_type == 'server_error':
+                print(f"❌ Server error: Please try again later. {error_message}")
+                return None
+            else:
+                print(f"❌ API Error: {error_message}")
+                return None
+    return response_json
+
+
+def format_response_content(content):
+    """
+    Normalize the message content of a text-mode reply: keep the KEY: value
+    block if there is one, convert a ```json block to that format, and
+    otherwise return the content unchanged (structured-output JSON included).
+    """
+    # First, check if there's a parameter-justification format after the JSON
+    # This is our preferred format as it already has justifications
+    if "DOCUMENT_TYPE:" in content and "DOCUMENT_TYPE_JUSTIFICATION:" in content:
+        # Find where the parameter format starts
+        param_start = content.find("DOCUMENT_TYPE:")
+        if param_start > 0:
+            return content[param_start:]
+    
+    # If no parameter format, check for JSON
+    if "```json" in content and "```" in content.split("```json", 1)[1]:
+        # Extract JSON content
+        json_content = content.split("```json", 1)[1].split("```", 1)[0].strip()
+        # Try to parse it as JSON
+        try:
+            import json
+            parsed_json = json.loads(json_content)
+            # Convert JSON to parameter format
+            formatted_content = []
+            for key, value in parsed_json.items():
+                # Skip null or N/A values
+                if value is None or value == "N/A":
+                    continue
+                # Format key properly
+                formatted_key = key.upper().replace(" ", "_")
+                formatted_content.append(f"{formatted_key}: {value}")
+                # Add justification
+                if key == "Document Type":
+                    formatted_content.append(f"{formatted_key}_JUSTIFICATION: Determined based on document format and content.")
+                elif key == "Component Type":
+                    formatted_content.append(f"{formatted_key}_JUSTIFICATION: Identified from component characteristics in the document.")
+                elif key == "Notes":
+                    continue  # Skip justification for notes
+                else:
+                    formatted_content.append(f"{formatted_key}_JUSTIFICATION: Extracted from the document. Specific location unspecified.")
+            return "\n".join(formatted_content)
+        except Exception as e:
+            # If JSON parsing fails, return the original content
+            print(f"JSON parsing error: {str(e)}")
+    
+    # If no JSON or parameter format found, return the original content
+    return content
+
+
+def process_api_response(response, retry_func=None, *args, **kwargs):
+    """Process API response and handle errors"""
+    try:
+        response_json = response.json()
+        
+        # Check if response is successful and contains choices for OpenAI
+        if response.status_code == 200 and "choices" in response_json:
+            return format_response_content(response_json["choices"][0]["message"]["content"])
+            
+        # Handle API errors
+        handled_response = handle_api_response(response_json, retry_func, *args, **kwargs)
+        if handled_response and "choices" in handled_response:
+            return format_response_content(handled_response["choices"][0]["message"]["content"])
+            
+        # If we get here, something went wrong
+        error_info = response_json.get('error', {})
+        if isinstance(error_info, dict):
+            error_msg = error_info.get('message', 'Unknown error occurred')
+        else:
+            error_msg = str(error_info)
+        
+        return f"❌ API Error: {error_msg}"
+        
+    except Exception as e:
+        return f"❌ Processing Error: {str(e)}"
+
+
+def encode_image_to_base64(image):
+    """data: URL for an image (bytes or DrawingImage); the encoding is memoized on the DrawingImage"""
+    return DrawingImage.of(image).data_url
+
+
+def parse_ai_response(response_text, settings=None):
+    """Parse the AI response into a structured format with enhanced handling for mixed document types."""
+    settings = settings or ExtractionSettings()
+    # Debug the raw response
+    print(f"Raw AI response: {response_text[:200]}...")
+    # Single-pass compiled parser (response_parser.py); the mode comes from the settings
+    return parse_response(
+        response_text,
+        parameter_mode=settings.parameter_mode,
+        custom_parameters=settings.custom_parameters
+    )
+
+
+def validate_and_improve_justifications(parsed_results):
+    """
+    Validate that all parameters have proper justifications and improve the quality of the data.
+    Returns the improved parsed_results.
+    """
+    # Make a copy to avoid modifying the original during iteration
+    results = parsed_results.copy()
+    
+    # Get all parameter keys (excluding justifications and component type)
+    param_keys = [k for k in results.keys() if not k.endswith('_JUSTIFICATION') and k != 'COMPONENT_TYPE']
+    
+    # Drawing-specific justifications for common parameters
+    drawing_specific_justifications = {
+        "BORE_DIAMETER": "Measured from the internal diameter dimension line in the cylinder cross-section view.",
+        "OUTSIDE_DIAMETER": "Measured from the external diameter dimension line in the drawing views.",
+        "ROD_DIAMETER": "Extracted from the piston rod dimension line, typically shown in the side view or cross-section.",
+        "STROKE_LENGTH": "Determined from the stroke dimension line between fully retracted and extended positions.",
+        "CLOSED_LENGTH": "Measured from the overall length dimension in the fully retracted position.",
+        "OPEN_LENGTH": "Calculated from the closed length plus stroke distance shown in the drawing.",
+        "CYLINDER_ACTION": "Determined by examining the port configuration in the drawing (single vs. double acting).",
+        "MOUNTING_TYPE": "Identified from the mounting detail view showing the attachment method.",
+        "PORT_TYPE": "Read from the port detail view or cross-section showing the connection type.",
+        "PORT_LOCATION": "Observed from the port positions shown in the main drawing views.",
+        "SEAL_TYPE": "Identified from the seal detail section view showing the seal configuration.",
+        "DIMENSIONS": "Extracted from the primary dimension lines showing length, width, and height.",
+        "WEIGHT": "Inferred from material and volume calculations based on dimensions in the drawing."
+    }
+    
+    for key in param_keys:
+        justification_key = f"{key}_JUSTIFICATION"
+        value = results.get(key, "").strip()
+        justification = results.get(justification_key, "").strip()
+        
+        # Format the key for matching against our dictionary (standardize format)
+        formatted_key = key.upper().replace(' ', '_')
+        
+        # Check if justification exists and is meaningful
+        if not justification or justification.lower() in ["not available", "not specified", "unknown", "not provided", "not visible"]:
+            if value:
+                # If we have a value but no good justification, provide a better default
+                if formatted_key in drawing_specific_justifications:
+                    # Use our specific drawing-based justification
+                    results[justification_key] = drawing_specific_justifications[formatted_key]
+                else:
+                    results[justification_key] = f"Extracted from dimension lines and annotations in the drawing for {key.replace('_', ' ').lower()}."
+            else:
+                # If no value and no good justification, provide a clear explanation
+                results[justification_key] = f"This parameter ({key}) is not visible in any dimension lines or annotations in the drawing."
+        
+        # Check if justification is too generic
+        elif "extracted" in justification.lower() and "from" in justification.lower() and len(justification.split()) < 8:
+            # If we have a specific drawing-based justification, use it
+            if formatted_key in drawing_specific_justifications:
+                results[justification_key] = drawing_specific_justifications[formatted_key]
+            # Otherwise improve generic justifications
+            else:
+                results[justification_key] = f"Extracted from dimension lines and visual elements in the drawing showing {key.replace('_', ' ').lower()} specifications."
+        
+        # If justification mentions tables but we want to emphasize drawings
+        elif "table" in justification.lower() or "specification table" in justification.lower():
+            # If we have a specific drawing-based justification, add it
+            if formatted_key in drawing_specific_justifications:
+                results[justification_key] = f"{justification} Also verified from {drawing_specific_justifications[formatted_key].lower()}"
+            else:
+                results[justification_key] = f"{justification} Also verified from dimension lines in the drawing."
+        
+        # If no specific location is mentioned in the justification, note this
+        elif "top" not in justification.lower() and "bottom" not in justification.lower() and \
+             "left" not in justification.lower() and "right" not in justification.lower() and \
+             "center" not in justification.lower() and "table" not in justification.lower() and \
+             "dimension" not in justification.lower() and "title" not in justification.lower() and \
+             "label" not in justification.lower() and "section" not in justification.lower():
+            if len(justification.split()) < 12:  # If justification is short and lacks location details
+                # If we have a specific drawing-based justification, use it
+                if formatted_key in drawing_specific_justifications:
+                    results[justification_key] = drawing_specific_justifications[formatted_key]
+                else:
+                    results[justification_key] = f"{justification} (Located in the drawing dimension lines and annotations)"
+        
+        # Ensure all values have proper formatting
+        kind = column_kind(key)
+        if kind in ("pressure", "temperature") and value:
+            results[key] = normalize_value(value, kind)
+        
+        # Remove any values that are clearly guesses
+        if "approximately" in value.lower() or "about" in value.lower() or "around" in value.lower() or \
+           "estimated" in value.lower() or "appears to be" in value.lower():
+            results[key] = ""
+            results[justification_key] = "Unable to determine with certainty from the drawing. No clear dimension line or annotation found."
+    
+    return results
+
+
+def analyze_engineering_drawing(image, component_type=None, text_layer=None, settings=None):
+    """
+    Universal analyzer for all types of engineering drawings using mode-specific prompts.
+    When the page came from a vector PDF, text_layer holds its embedded text and the
+    fields already resolved from it; they are sent as a hint block and fill any
+    parameters the model leaves empty, so the second pass does not chase them.
+    If the mode has a fixed parameter list and the text layer resolves all of it,
+    the page is sent as a small low-detail image (see LOW_DETAIL_MAX_SIDE).
+    image may be raw bytes or a DrawingImage; its data URL is encoded only once.
+    settings (ExtractionSettings) selects the parameter mode; defaults apply when omitted.
+    """
+    settings = settings or ExtractionSettings()
+    image = DrawingImage.of(image)
+    base64_image = image.data_url
+    
+    # If component type is provided, use a more targeted prompt
+    system_content = "You are an expert mechanical engineer with extensive experience in engineering design, manufacturing, and technical documentation analysis. Your task is to extract ALL technical specifications and provide insightful engineering analysis based on the design elements in the document. Always assume the document has been properly oriented for reading. Extract parameter names EXACTLY as they appear in the drawing, without categorizing them or using predefined parameter names."
+    
+    # Base prompt parts that are common to all modes
+    base_prompt_part1 = (
+        "TASK: Analyze this engineering document as a professional mechanical engineer. "
+        
+        "STEP 1. DOCUMENT TYPE IDENTIFICATION\n"
+        "  - Determine the document type:\n"
+        "    (A) Engineering Drawing\n"
+        "    (B) Product Listing/Catalog\n"
+        "    (C) Specification Sheet\n"
+        "    (D) Mixed Document (contains both drawings and tables)\n"
+        "  - Document this determination as \"Document Type\" in your output.\n\n"
+        
+        "STEP 2. COMPONENT IDENTIFICATION\n"
+        "  - Determine if the document describes one of these component types:\n"
+        "      • Cylinder (hydraulic, pneumatic)\n"
+        "      • Gearbox/Gear (transmission, reducer)\n"
+        "      • Valve (ball, check, control)\n"
+        "      • Nut/Bolt/Fastener\n"
+        "      • Lifting Ram or Jack (hydraulic, transmission)\n"
+        "      • Bearing\n"
+        "      • Pump\n"
+        "      • Motor\n"
+        "  - If the component type is obvious but not in the list above, specify the exact type.\n"
+        "  - If the type is ambiguous, mark the \"Component Type\" as \"UNKNOWN\" without guessing.\n\n"
+    )
+    
+    # Create different prompts based on the parameter mode
+    if settings.parameter_mode == "Cylinder, Hyd/Pneumatic":
+        # Create a cylinder-specific prompt focused on the 23 specified parameters
+        user_content = base_prompt_part1 + (
+            "STEP 3. CYLINDER-SPECIFIC PARAMETER EXTRACTION\n"
+            "  - Extract ONLY these specific parameters for this cylinder:\n"
+            "    1. CYLINDER_TYPE: Identify the exact type of cylinder shown in this drawing (e.g. single action/double action).\n"
+            "    2. STROKE_LENGTH: Extract the total stroke length of the rod or piston in millimeters (e.g., Stroke = 900mm).\n"
+            "    3. ROD_DIAMETER: Find the rod or shaft diameter in millimeters (look for values like 'Rod Seal 150mm').\n"
+            "    4. WORKING_PRESSURE: What is the maximum working pressure rating (in BAR or PSI) of this component?\n"
+            "    5. TEST_PRESSURE: What is the test pressure (in BAR) used for this component, if specified?\n"
+            "    6. OPERATING_TEMPERATURE: Extract the operating temperature range or any specified temperature limits.\n"
+            "    7. MATERIAL_SPECIFICATIONS: List all material specifications used for major parts (e.g., cylinder body, piston rod, seals). Include ASTM, IS codes, or GR grades.\n"
+            "    8. MOUNTING_TYPE: Identify the mounting type used in this assembly (e.g., Flange, Rear Clevis, Foot Mount).\n"
+            "    9. DRAWING_NUMBER: Provide the reference or drawing number (e.g., BHUSHAN REFERENCE DRAWING NO.: 6BRv-71170-A).\n"
+            "    10. STANDARD_CODES: Extract any manufacturing or industry standard codes followed (e.g., IS:2062 GR. B, ASTM A106 GR B).\n"
+            "    11. SPECIAL_FEATURES: List any special features, custom fittings, or non-standard components mentioned (e.g., Banjo fitting, Ball valve, Cushioning).\n"
+            "    12. MANUFACTURER: What is the manufacturer's or vendor's name (e.g., RA SPECTRUM ENGINEERING, SERMCES PVT LTD)?\n"
+            "    13. MODEL_NUMBER: Is there any model number or part number uniquely identifying this configuration?\n"
+            "    14. TECHNICAL_NOTES: Include any additional technical notes, installation requirements, or warnings present in the drawing.\n"
+            "  - EXTREMELY IMPORTANT: Do NOT extract any parameters not in this list\n"
+            "  - Search thoroughly for these specific parameters throughout the document\n"
+            "  - If a parameter in this list is not found, still include it with an empty value\n\n"
+            
+            "STEP 4. COMPREHENSIVE VISUAL SCANNING FOR CYLINDER PARAMETERS\n"
+            "  - Methodically scan EVERY part of the document in this order:\n"
+            "      1. Tables & Specification Boxes (highest priority)\n"
+            "      2. Title Blocks & Headers\n"
+            "      3. Dimensions & Callouts (annotations on drawings)\n"
+            "      4. Notes & Footnotes\n"
+            "      5. Text in Margins & Stamps\n"
+            "  - Extract ALL numeric values along with units EXACTLY as they appear\n"
+            "  - For dimensions, capture the complete value including tolerances\n\n"
+            
+            "STEP 5. ENGINEERING SYMBOL INTERPRETATION\n"
+            "  - Identify engineering symbols relevant to the cylinder parameters:\n"
+            "      • Ø or ⌀: Diameter\n" 
+            "      • R: Radius\n"
+            "      • ±: Tolerance\n"
+            "      • ▭: Square\n"
+            "      • Surface finish marks\n"
+            "      • GD&T symbols\n"
+            "  - Relate symbols to the dimensional values they qualify\n\n"
+            
+            "STEP 6. OUTPUT FORMAT\n"
+            "  - Format your extraction with the EXACT parameter names as they appear in the list above\n"
+            "  - DO NOT add dashes or bullet points before parameter names\n"
+            "  - For each parameter, include a value and detailed justification explaining its source\n"
+            "  - Format as PARAMETER_NAME: value and PARAMETER_NAME_JUSTIFICATION: explanation\n"
+            "  - For empty parameters, explain why the information couldn't be found\n\n"
+            
+            "CRITICAL REMINDER: Your output MUST ONLY include DOCUMENT_TYPE, COMPONENT_TYPE, and the 14 cylinder parameters listed above. DO NOT include any other parameters even if they are clearly visible in the document."
+        )
+    elif settings.parameter_mode == "Custom":
+        # Get custom parameters for this component type or generic parameters
+        custom_params = []
+        if component_type and component_type in settings.custom_parameters:
+            custom_params = settings.custom_parameters[component_type]
+        elif "GENERIC" in settings.custom_parameters:
+            custom_params = settings.custom_parameters["GENERIC"]
+        
+        if custom_params:
+            # Create a custom mode prompt focused only on the specified parameters
+            param_list = "\n".join([f"  - {param}" for param in custom_params])
+            user_content = base_prompt_part1 + (
+                f"STEP 3. CUSTOM PARAMETER EXTRACTION\n"
+                f"  - Extract ONLY these specific parameters:\n{param_list}\n"
+                f"  - EXTREMELY IMPORTANT: Do NOT extract any parameters not in this list\n"
+                f"  - Search thoroughly for these specific parameters throughout the document\n"
+                f"  - If a parameter in this list is not found, still include it with an empty value\n\n"
+                
+                "STEP 4. COMPREHENSIVE VISUAL SCANNING FOR CUSTOM PARAMETERS\n"
+                "  - Methodically scan EVERY part of the document in this order:\n"
+                "      1. Tables & Specification Boxes (highest priority)\n"
+                "      2. Title Blocks & Headers\n"
+                "      3. Dimensions & Callouts (annotations on drawings)\n"
+                "      4. Notes & Footnotes\n"
+                "      5. Text in Margins & Stamps\n"
+                "  - Extract ALL numeric values along with units EXACTLY as they appear\n"
+                "  - For dimensions, capture the complete value including tolerances\n\n"
+                
+                "STEP 5. ENGINEERING SYMBOL INTERPRETATION\n"
+                "  - Identify engineering symbols relevant to the custom parameters:\n"
+                "      • Ø or ⌀: Diameter\n" 
+                "      • R: Radius\n"
+                "      • ±: Tolerance\n"
+                "      • ▭: Square\n"
+                "      • Surface finish marks\n"
+                "      • GD&T symbols\n"
+                "  - Relate symbols to the dimensional values they qualify\n\n"
+                
+                "STEP 6. OUTPUT FORMAT\n"
+                "  - Format your extraction with the EXACT parameter names as they appear in the list above\n"
+                "  - DO NOT add dashes or bullet points before parameter names\n"
+                "  - For each parameter, include a value and detailed justification explaining its source\n"
+                "  - Format as PARAMETER_NAME: value and PARAMETER_NAME_JUSTIFICATION: explanation\n"
+                "  - For empty parameters, explain why the information couldn't be found\n\n"
+                
+                "CRITICAL REMINDER: Your output MUST ONLY include DOCUMENT_TYPE, COMPONENT_TYPE, and the custom parameters listed above. DO NOT include any other parameters even if they are clearly visible in the document."
+            )
+            
+            # Add component type for filtering if available
+            if component_type:
+                user_content += f"\n\nCOMPONENT_TYPE_FOR_FILTERING: {component_type}\n"
+        else:
+            # No custom parameters defined, use extracted mode prompt
+            user_content = create_extracted_mode_prompt()
+    else:
+        # Use extracted mode prompt for any other mode value
+        user_content = create_extracted_mode_prompt()
+    
+    # If component type is provided, use a more targeted prompt
+    if component_type and component_type not in ["UNKNOWN"]:
+        user_content = f"This is a {component_type} drawing. Analyze it as a professional mechanical engineer.\n\n" + user_content
+    
+    # Add component-specific parameter lists
+    component_params = {
+        "CYLINDER": (
+            "For hydraulic/pneumatic Cylinders, look for these parameters using the EXACT names as they appear in the drawing:\n"
+            "- Cylinder action type (single/double acting)\n"
+            "- Bore (sometimes labeled as 'Bore', 'Bore Dia', or similar)\n"
+            "- Outside diameter\n"
+            "- Rod diameter (may be labeled as 'Piston Rod' or similar)\n"
+            "- Stroke (the travel distance)\n"
+            "- Closed length\n"
+            "- Extended/Open length\n"
+            "- Working/Operating pressure\n"
+            "- Test pressure\n"
+            "- Temperature range\n"
+            "- Mounting type/method\n"
+            "- Rod end type\n"
+            "- Fluid medium\n"
+            "- Drawing number\n"
+            "- Materials (body, rod, etc.)\n"
+            "- Load capacity\n"
+            "- Compliance standards\n"
+            "- Surface finishes\n"
+            "- Coating types\n"
+            "- Port specifications (type, size, location)\n"
+            "- Sealing system\n"
+            "- Manufacturer\n"
+            "- Model/part number\n"
+            "- Cushioning features\n"
+            "IMPORTANT: Extract the parameter names EXACTLY as shown in the drawing, not using this list's terminology\n\n"
+        ),
+        "VALVE": (
+            "For Valves, extract these critical parameters:\n"
+            "MODEL/PART NUMBER (specific identifier)\n"
+            "VALVE TYPE (ball, check, control, directional, etc.)\n"
+            "VALVE SIZE/PORT SIZE (connection dimensions)\n"
+            "PRESSURE RATING (max operating pressure)\n"
+            "FLOW CAPACITY (flow rate, Cv)\n"
+            "FLOW DIRECTION (indicated direction)\n"
+            "OPERATING MEDIUM (fluid, gas type)\n"
+            "CONNECTION TYPE (threaded, flanged, etc.)\n"
+            "BODY MATERIAL (valve body material)\n"
+            "SEAT/SEAL MATERIAL (soft seat, metal seat)\n"
+            "OPERATING TEMPERATURE (temperature range)\n"
+            "ACTUATION TYPE (manual, pneumatic, electric)\n"
+            "OPERATION PATTERN (2-way, 3-way, 4-way)\n"
+            "LEAKAGE CLASS (if specified)\n"
+            "MANUFACTURER/MAKE (brand name)\n"
+            "SPECIAL FEATURES (fire safe, anti-static, etc.)\n\n"
+        ),
+        "GEARBOX": (
+            "For Gearboxes, extract these critical parameters:\n"
+            "GEAR TYPE (helical, bevel, planetary, etc.)\n"
+            "INPUT POWER (kW, HP)\n"
+            "INPUT SPEED (RPM)\n"
+            "OUTPUT SPEED (RPM)\n"
+            "GEAR RATIO (reduction ratio)\n"
+            "SERVICE FACTOR (load/duty factor)\n"
+            "MOUNTING ARRANGEMENT (foot, flange, shaft)\n"
+            "SHAFT ORIENTATION (parallel, right angle, etc.)\n"
+            "INPUT SHAFT TYPE (solid, hollow, splined, etc.)\n"
+            "OUTPUT SHAFT TYPE (solid, hollow, splined, etc.)\n"
+            "SHAFT DIAMETER (input and output)\n"
+            "BACKLASH (if specified)\n"
+            "EFFICIENCY (percentage)\n"
+            "COOLING ARRANGEMENT (fan, cooling fins)\n"
+            "LUBRICATION SYSTEM (oil bath, grease, etc.)\n"
+            "HOUSING MATERIAL (cast iron, aluminum, etc.)\n"
+            "SEALING TYPE (lip seal, labyrinth, etc.)\n"
+            "WEIGHT (kg, lbs)\n"
+            "DIMENSIONS (LxWxH)\n"
+            "MANUFACTURER/MAKE (brand name)\n"
+            "MODEL/PART NUMBER (specific identifier)\n\n"
+        ),
+        "NUT": (
+            "For Nuts/Bolts/Fasteners, extract these critical parameters:\n"
+            "TYPE (hex, square, flange, etc.)\n"
+            "SIZE/DIMENSION (thread diameter, length)\n"
+            "THREAD TYPE (metric, imperial, etc.)\n"
+            "THREAD PITCH (thread spacing)\n"
+            "PROPERTY/STRENGTH CLASS (e.g., 8.8, 10.9)\n"
+            "MATERIAL (steel grade, stainless, etc.)\n"
+            "COATING/FINISH (zinc, cadmium, etc.)\n"
+            "STANDARD COMPLIANCE (ISO, DIN, ANSI, etc.)\n"
+            "HEAD DIMENSIONS (across flats, height)\n"
+            "TORQUE SPECIFICATION (if provided)\n"
+            "MANUFACTURER/MAKE (if branded)\n"
+            "SPECIAL FEATURES (locking, self-tapping, etc.)\n\n"
+        ),
+        "LIFTING_RAM": (
+            "For Lifting Rams/Jacks, extract these critical parameters:\n"
+            "LOAD CAPACITY (maximum lifting weight)\n"
+            "MINIMUM HEIGHT (collapsed height)\n"
+            "MAXIMUM HEIGHT (extended height)\n"
+            "CLOSED LENGTH (retracted length)\n"
+            "OPEN LENGTH (extended length)\n"
+            "LIFT RANGE/STROKE (travel distance)\n"
+            "OPERATING PRESSURE (hydraulic pressure)\n"
+            "PISTON DIAMETER (ram diameter)\n"
+            "WEIGHT (unit weight)\n"
+            "DIMENSIONS (LxWxH)\n"
+            "MATERIAL (body material)\n"
+            "ACTIVATION TYPE (manual, hydraulic, pneumatic)\n"
+            "MANUFACTURER/BRAND (make)\n"
+            "MODEL/PART NUMBER (specific identifier)\n"
+            "SPECIAL FEATURES (quick lift, safety valve, etc.)\n"
+            "PRICE (if listed in product catalog)\n\n"
+        ),
+        "BEARING": (
+            "For Bearings, extract these critical parameters:\n"
+            "BEARING TYPE (ball, roller, needle, etc.)\n"
+            "DIMENSIONS (inner dia, outer dia, width)\n"
+            "LOAD RATING (dynamic, static)\n"
+            "SPEED RATING (maximum RPM)\n"
+            "MATERIAL (bearing material)\n"
+            "LUBRICATION TYPE (grease, oil, etc.)\n"
+            "SEAL TYPE (shielded, sealed, open)\n"
+            "MANUFACTURER/BRAND (make)\n"
+            "MODEL/PART NUMBER (specific identifier)\n\n"
+        )
+    }
+    
+    # Only add component-specific parameter lists for non-custom and non-cylinder modes
+    if settings.parameter_mode != "Custom" and settings.parameter_mode != "Cylinder, Hyd/Pneumatic":
+        # Add component-specific parameter lists
+        if component_type and component_type.upper() in component_params:
+            user_content += component_params[component_type.upper()]
+        else:
+            # If component type is not in our standard list or is unknown, add all parameter lists
+            for params in component_params.values():
+                user_content += params
+    
+    # Add the PDF text layer (if any) as a compact hint block
+    user_content += format_text_hints(text_layer)
+    
+    # Parameter names are fixed only in Custom and Cylinder modes
+    fixed_parameters = None
+    if settings.parameter_mode in ("Custom", "Cylinder, Hyd/Pneumatic"):
+        fixed_parameters = get_extraction_parameters(component_type, settings)
+
+    # Structured-output mode: the reply is JSON constrained by a schema built from the
+    # fixed parameter list, if there is one
+    structured = settings.structured_output
+    schema_parameters = fixed_parameters if structured else None
+    if structured:
+        user_content += STRUCTURED_PROMPT_SUFFIX
+
+    # Text-layer fast path: every requested value is already known, so the model only
+    # needs the page's overall look (document and component type), not its small print
+    image_url = {"url": base64_image}
+    stage = "analysis"
+    if text_layer and fixed_parameters and not unresolved_parameters(text_layer, fixed_parameters):
+        image_url = {"url": DrawingImage.of(image.thumbnail(LOW_DETAIL_MAX_SIDE)).data_url, "detail": "low"}
+        stage = "analysis_low_detail"
+    
+    # Make the initial API call
+    payload = {
+        "model": "gpt-4o",
+        "messages": [
+            {
+                "role": "system",
+                "content": system_content
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": user_content
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": image_url
+                    }
+                ]
+            }
+        ],
+        "max_tokens": 4000,
+        "temperature": 0.1
+    }
+    if structured:
+        payload["response_format"] = extraction_response_format(schema_parameters)
+
+    # Authorization is added per request from the API key pool (api_keys.py)
+    headers = {
+        "Content-Type": "application/json"
+    }
+
+    try:
+        response = cached_post(stage, API_URL, headers, payload, image)
+        result = process_api_response(response, analyze_engineering_drawing, image, component_type, text_layer, settings)
+        
+        if "❌" not in result:
+            # Parse results from first pass (one json.loads in structured mode; the
+            # text parser remains the fallback for replies that are not schema JSON)
+            if structured:
+                try:
+                    first_pass_results = parse_structured_response(result, schema_parameters).to_results()
+                except StructuredOutputError as e:
+                    print(f"Structured output unavailable ({e}); using the text parser")
+                    first_pass_results = parse_ai_response(result, settings)
+            else:
+                first_pass_results = parse_ai_response(result, settings)
+            
+            # Fill anything the model missed from the PDF text layer (exact, no extra vision call)
+            merge_text_layer_fields(first_pass_results, text_layer, fixed_parameters)
+            
+            # Normalize pressure and temperature values (units converted to BAR / DEG C,
+            # ranges written "X to Y"); values that are not quantities are left as written
+            for key, value in list(first_pass_results.items()):
+                kind = column_kind(key)
+                if kind in ("pressure", "temperature") and value:
+                    first_pass_results[key] = normalize_value(value.strip(), kind)
+            
+            # Perform second pass for any missing fields without showing messages
+            # Only perform second pass if params have empty values
+            if settings.parameter_mode == "Custom" and any(not first_pass_results.get(param.strip().upper(), "") for param in (settings.custom_parameters.get("GENERIC", []) or [])):
+                final_results = perform_second_extraction_pass(image, first_pass_results, component_type)
+            elif settings.parameter_mode == "Cylinder, Hyd/Pneumatic" and any(not first_pass_results.get(param, "") for param in ["BORE_DIAMETER", "MOUNTING", "OPERATING_TEMPERATURE", "OPERATING_PRESSURE", "CLOSE_LENGTH", "DRAWING_NUMBER", "FLUID", "ROD_END", "CYLINDER_ACTION", "STROKE_LENGTH", "ROD_DIAMETER", "OUTSIDE_DIAMETER", "BODY_MATERIAL", "OPEN_LENGTH", "RATED_LOAD", "PISTON_MATERIAL", "STANDARD", "SURFACE_FINISH", "COATING_THICKNESS", "SPECIAL_FEATURES", "CYLINDER_CONFIGURATION", "CYLINDER_STYLE", "CONCENTRICITY_OF_ROD_AND_TUBE"]):
+                final_results = perform_second_extraction_pass(image, first_pass_results, component_type)
+            else:
+                final_results = first_pass_results
+            
+            # Validate and improve justifications
+            final_results = validate_and_improve_justifications(final_results)
+            
+            # Get component type
+            component_type = final_results.get('COMPONENT_TYPE', '')
+            if not component_type:
+                # Try to determine component type from other parameters
+                if 'CYLINDER ACTION' in final_results:
+                    component_type = 'CYLINDER'
+                elif 'GEAR TYPE' in final_results:
+                    component_type = 'GEARBOX'
+                elif 'MODEL NO' in final_results and 'SIZE OF VALVE' in final_results:
+                    component_type = 'VALVE'
+                elif 'PROPERTY CLASS' in final_results and 'NUT STANDARD' in final_results:
+                    component_type = 'NUT'
+                elif 'PISTON LIFTING FORCE' in final_results:
+                    component_type = 'LIFTING_RAM'
+                else:
+                    component_type = 'UNKNOWN'
+            
+            # Add component type to results
+            final_results['COMPONENT_TYPE'] = component_type
+            
+            # Compare first and second pass results to count how many fields were improved
+            improved_fields = 0
+            for key, value in final_results.items():
+                if not key.endswith("_JUSTIFICATION") and key not in ["DOCUMENT_TYPE", "COMPONENT_TYPE"]:
+                    # If second pass found a value where first pass had none
+                    if value and (key not in first_pass_results or not first_pass_results[key]):
+                        improved_fields += 1
+            
+            return '\n'.join([f"{k}: {v}" for k, v in final_results.items()])
+        return result
+    except Exception as e:
+        return f"❌ Processing Error: {str(e)}"
+
+
+# Helper function to create the extracted mode prompt
+def create_extracted_mode_prompt():
+    """Create the prompt for extracted mode"""
+    return (
+        "TASK: Analyze this engineering document as a professional mechanical engineer. Extract all technical specifications and provide insightful engineering analysis based on the design elements in the document. The image has been automatically oriented correctly for you.\n\n"
+        
+        "STEP 1. DOCUMENT TYPE IDENTIFICATION\n"
+        "  - Determine the document type:\n"
+        "    (A) Engineering Drawing\n"
+        "    (B) Product Listing/Catalog\n"
+        "    (C) Specification Sheet\n"
+        "    (D) Mixed Document (contains both drawings and tables)\n"
+        "  - Document this determination as \"Document Type\" in your output.\n\n"
+        
+        "STEP 2. COMPREHENSIVE VISUAL SCANNING\n"
+        "  - Methodically scan EVERY part of the document in this order:\n"
+        "      1. Tables & Specification Boxes (highest priority)\n"
+        "      2. Title Blocks & Headers\n"
+        "      3. Dimensions & Callouts (annotations on drawings)\n"
+        "      4. Notes & Footnotes\n"
+        "      5. Text in Margins & Stamps\n"
+        "  - Pay SPECIAL ATTENTION to data in tables, as they often contain the most critical specifications.\n"
+        "  - Extract ALL numeric values along with units EXACTLY as they appear.\n"
+        "  - For dimensions, capture the complete value including tolerances.\n"
+        "  - Look for small text and specification tables that may be placed anywhere in the document.\n"
+        "  - For product listings, examine ALL fields in the specifications section.\n\n"
+        
+        "STEP 3. EXTRACTION OF IDENTIFYING INFORMATION\n"
+        "  - Look for and extract ALL of these identifying details:\n"
+        "      • Manufacturer/Brand name\n"
+        "      • Model numbers & Part numbers\n"
+        "      • Drawing numbers & Revision information\n"
+        "      • Standards & Certification references\n"
+        "      • Serial numbers & Batch codes\n"
+        "  - If a detail appears in multiple places, record it from the most authoritative location.\n\n"
+        
+        "STEP 4. COMPONENT IDENTIFICATION\n"
+        "  - Determine if the document describes one of these component types:\n"
+        "      • Cylinder (hydraulic, pneumatic)\n"
+        "      • Gearbox/Gear (transmission, reducer)\n"
+        "      • Valve (ball, check, control)\n"
+        "      • Nut/Bolt/Fastener\n"
+        "      • Lifting Ram or Jack (hydraulic, transmission)\n"
+        "      • Bearing\n"
+        "      • Pump\n"
+        "      • Motor\n"
+        "  - If the component type is obvious but not in the list above, specify the exact type.\n"
+        "  - If the type is ambiguous, mark the \"Component Type\" as \"UNKNOWN\" without guessing.\n\n"
+        
+        "STEP 5. ENGINEERING SYMBOL INTERPRETATION\n"
+        "  - Identify ALL engineering symbols present in the drawing:\n"
+        "      • Ø or ⌀: Diameter\n" 
+        "      • R: Radius\n"
+        "      • ±: Tolerance\n"
+        "      • ▭: Square\n"
+        "      • Surface finish marks (✓, ✗)\n"
+        "      • Weld symbols\n"
+        "      • GD&T symbols (straightness, flatness, circularity, etc.)\n"
+        "      • Thread symbols and callouts\n"
+        "  - For each symbol found, explain its significance in this specific design\n"
+        "  - Relate symbols to the dimensional values they qualify\n\n"
+        
+        "STEP 6. PARAMETER EXTRACTION\n"
+        "  - Extract each parameter name EXACTLY as it appears in the drawing\n"
+        "  - Do NOT use generic parameter categories like 'PRIMARY PHYSICAL DIMENSIONS'\n"
+        "  - Instead, use the exact labels from the drawing like 'Bore Diameter', 'Rod Diameter', 'Working Pressure', etc.\n"
+        "  - Maintain the exact parameter names shown in the technical document\n"
+        "  - Do not categorize parameters into groups\n\n"
+        
+        "PARAMETER EXTRACTION MODE: Full Extraction\n"
+        "  - Extract ALL parameters visible in the document, even if uncommon or non-standard.\n"
+        "  - Be exhaustive and thorough in your search for any technical specifications.\n\n"
+        
+        "STEP 7. DETAILED PARAMETER EXTRACTION\n"
+        "  - Extract parameters with their EXACT names as they appear in the drawing\n"
+        "  - Do not rename, reformat, or categorize parameters\n"
+        "  - For cylinder drawings, look for parameter names like 'Bore', 'Rod Diameter', 'Stroke', etc.\n"
+        "  - Use the same formatting, capitalization, and terminology as shown in the drawing\n\n"
+        
+        "STEP 8. ENGINEERING INSIGHTS & ANALYSIS\n"
+        "  - After extracting numerical parameters, analyze their engineering implications:\n"
+        "      • What does the bore/rod diameter ratio suggest about stability and load capacity?\n"
+        "      • How do the material choices impact longevity, corrosion resistance, and thermal properties?\n"
+        "      • Based on dimensions and pressure ratings, estimate the operational force capabilities\n"
+        "      • Analyze the safety factor implied by test pressure vs. operating pressure\n"
+        "      • Evaluate the design for maintenance accessibility and service life\n\n"
+        
+        "STEP 9. PERFORMANCE-BASED DESIGN ANALYSIS\n"
+        "  - Based on extracted values and drawing structure, determine:\n"
+        "      • Expected load-bearing capacity and mechanical stress points\n"
+        "      • Sealing mechanism effectiveness and potential failure modes\n"
+        "      • Thermal expansion considerations and temperature management\n"
+        "      • Potential wear points and fatigue-prone areas\n\n"
+        
+        "STEP 10. FUNCTIONALITY MAPPING\n"
+        "  - Based on mounting type, expected movement, and connection points:\n"
+        "      • Infer the component's operational purpose in a larger system\n"
+        "      • Determine if this is a fixed or dynamic system\n"
+        "      • Identify if it allows axial movement or rotational flexibility\n"
+        "      • Analyze operational constraints based on design features\n\n"
+        
+        "STEP 11. MANUFACTURING & ASSEMBLY CONSIDERATIONS\n"
+        "  - Evaluate complexity in manufacturing based on:\n"
+        "      • Tolerance levels and their impact on production costs\n"
+        "      • Thread specifications and special machining requirements\n"
+        "      • Number of unique components and assembly complexity\n"
+        "      • Potential fabrication challenges based on materials and geometries\n\n"
+        
+        "STEP 12. OUTPUT FORMAT\n"
+        "  - Format your extraction with the EXACT parameter names as they appear in the drawing\n"
+        "  - DO NOT use generic category names like 'PRIMARY PHYSICAL DIMENSIONS'\n"
+        "  - DO NOT add dashes or bullet points before parameter names\n"
+        "  - Instead use the drawing's original parameter names like 'Bore Diameter', 'Rod Diameter', etc.\n"
+        "  - For each parameter, include a value and detailed justification explaining its source\n"
+        "  - Use the parameter-justification format where each parameter is followed by its justification\n"
+        "  - Format as PARAMETER_NAME: value and PARAMETER_NAME_JUSTIFICATION: explanation\n"
+        "  - For empty parameters, explain why the information couldn't be found\n"
+    )
+
+
+def get_parameters_for_type(drawing_type, settings=None):
+    """Return the list of parameters to extract based on drawing type"""
+    settings = settings or ExtractionSettings()
+    drawing_type = drawing_type.upper() if drawing_type else ""
+    
+    # Handle multiple variations of component types
+    if "CYLINDER" in drawing_type:
+        return [
+            "CYLINDER ACTION",
+            "BORE DIAMETER",
+            "OUTSIDE DIAMETER",
+            "ROD DIAMETER",
+            "STROKE LENGTH",
+            "CLOSED LENGTH",
+            "OPEN LENGTH",
+            "OPERATING PRESSURE",
+            "TEST PRESSURE",
+            "OPERATING TEMPERATURE",
+            "MOUNTING TYPE",
+            "ROD END TYPE",
+            "FLUID TYPE",
+            "DRAWING NUMBER",
+            "BODY MATERIAL",
+            "ROD MATERIAL",
+            "PISTON MATERIAL",
+            "RATED LOAD/CAPACITY",
+            "STANDARD COMPLIANCE",
+            "SURFACE FINISH",
+            "COATING/PLATING",
+            "CONCENTRICITY OF ROD AND TUBE",
+            "PORT TYPE",
+            "PORT SIZE",
+            "PORT LOCATION",
+            "SEAL TYPE",
+            "MANUFACTURER/MAKE",
+            "MODEL/PART NUMBER",
+            "CUSHIONING"
+        ]
+    elif "GEARBOX" in drawing_type:
+        return [
+            "GEAR TYPE",
+            "INPUT POWER",
+            "INPUT SPEED",
+            "OUTPUT SPEED",
+            "GEAR RATIO",
+            "SERVICE FACTOR",
+            "MOUNTING ARRANGEMENT",
+            "SHAFT ORIENTATION",
+            "INPUT SHAFT TYPE",
+            "OUTPUT SHAFT TYPE",
+            "SHAFT DIAMETER",
+            "BACKLASH",
+            "EFFICIENCY",
+            "DUTY",
+            "COOLING ARRANGEMENT",
+            "LUBRICATION SYSTEM",
+            "HOUSING MATERIAL",
+            "SEALING TYPE",
+            "WEIGHT",
+            "DIMENSIONS",
+            "DRAWING NUMBER",
+            "MANUFACTURER/MAKE",
+            "MODEL/PART NUMBER"
+        ]
+    elif "VALVE" in drawing_type:
+        return [
+            "MODEL/PART NUMBER",
+            "VALVE TYPE",
+            "VALVE SIZE/PORT SIZE",
+            "PRESSURE RATING",
+            "FLOW CAPACITY",
+            "FLOW DIRECTION",
+            "OPERATING MEDIUM",
+            "CONNECTION TYPE",
+            "BODY MATERIAL",
+            "SEAT/SEAL MATERIAL",
+            "OPERATING TEMPERATURE",
+            "ACTUATION TYPE",
+            "OPERATION PATTERN",
+            "LEAKAGE CLASS",
+            "MANUFACTURER/MAKE",
+            "SPECIAL FEATURES"
+        ]
+    elif "NUT" in drawing_type or "BOLT" in drawing_type or "FASTENER" in drawing_type:
+        return [
+            "TYPE",
+            "SIZE/DIMENSION",
+            "THREAD TYPE",
+            "THREAD PITCH",
+            "PROPERTY/STRENGTH CLASS",
+            "MATERIAL",
+            "COATING/FINISH",
+            "STANDARD COMPLIANCE",
+            "HEAD DIMENSIONS",
+            "TORQUE SPECIFICATION",
+            "MANUFACTURER/MAKE",
+            "DRAWING NUMBER",
+            "SPECIAL FEATURES"
+        ]
+    elif "LIFTING_RAM" in drawing_type or "JACK" in drawing_type or "TRANSMISSION_JACK" in drawing_type:
+        return [
+            "LOAD CAPACITY",
+            "MINIMUM HEIGHT",
+            "MAXIMUM HEIGHT",
+            "CLOSED HEIGHT",
+            "OPEN HEIGHT",
+            "LIFT RANGE/STROKE",
+            "OPERATING PRESSURE",
+            "PISTON DIAMETER",
+            "WEIGHT",
+            "DIMENSIONS",
+            "MATERIAL",
+            "ACTIVATION TYPE",
+            "MANUFACTURER/BRAND",
+            "MODEL/PART NUMBER",
+            "PRICE",
+            "SPECIAL FEATURES",
+            "HYDRAULIC SYSTEM",
+            "OIL VOLUME",
+            "PRODUCT FEATURES",
+            "WARRANTY INFORMATION",
+            "ITEM DIMENSIONS",
+            "SIZE VARIATIONS",
+            "CONSTRUCTION MATERIAL",
+            "PRODUCT CODE"
+        ]
+    elif "BEARING" in drawing_type:
+        return [
+            "BEARING TYPE",
+            "INNER DIAMETER",
+            "OUTER DIAMETER",
+            "WIDTH/THICKNESS",
+            "LOAD RATING DYNAMIC",
+            "LOAD RATING STATIC",
+            "SPEED RATING",
+            "MATERIAL",
+            "LUBRICATION TYPE",
+            "SEAL TYPE",
+            "MANUFACTURER/BRAND",
+            "MODEL/PART NUMBER",
+            "STANDARD COMPLIANCE"
+        ]
+    elif drawing_type in settings.custom_products and isinstance(settings.custom_products[drawing_type], dict):
+        # Return parameters for custom product type
+        return settings.custom_products[drawing_type].get('parameters', [])
+    else:
+        # For unknown or custom component types, return comprehensive list of parameters
+        return [
+            "MODEL/PART NUMBER",
+            "DIMENSIONS",
+            "MATERIAL",
+            "WEIGHT",
+            "STANDARD/SPECIFICATION",
+            "MANUFACTURER/MAKE",
+            "DRAWING NUMBER",
+            "OPERATING CONDITIONS",
+            "SPECIAL FEATURES",
+            "MOUNTING DETAILS",
+            "CONNECTIONS",
+            "RATED CAPACITY/LOAD",
+            "PRICE",
+            "BRAND",
+            "ITEM DIMENSIONS",
+            "LOAD CAPACITY",
+            "PRODUCT CODE",
+            "WARRANTY INFORMATION",
+            "OPERATING TEMPERATURE",
+            "OPERATING PRESSURE",
+            "CONSTRUCTION MATERIAL"
+        ]
+
+
+def get_extraction_parameters(drawing_type, settings=None):
+    """
+    Get the parameters to extract based on the selected parameter mode.
+    
+    Modes:
+    - Custom: Use user-specified parameters
+    - Cylinder, Hyd/Pneumatic: Use 23 specific cylinder parameters
+    """
+    settings = settings or ExtractionSettings()
+    # If in custom mode, use the user-defined parameters
+    if settings.parameter_mode == "Custom":
+        # Use generic custom parameters
+        if "GENERIC" in settings.custom_parameters:
+            return settings.custom_parameters.get("GENERIC", [])
+        else:
+            # If no custom parameters defined, fall back to default
+            return get_parameters_for_type(drawing_type, settings)
+    
+    # If in cylinder mode, use the predefined cylinder parameters
+    elif settings.parameter_mode == "Cylinder, Hyd/Pneumatic":
+        return [
+            "BORE_DIAMETER", "MOUNTING", "OPERATING_TEMPERATURE", "OPERATING_PRESSURE",
+            "CLOSE_LENGTH", "DRAWING_NUMBER", "FLUID", "ROD_END", "CYLINDER_ACTION",
+            "STROKE_LENGTH", "ROD_DIAMETER", "OUTSIDE_DIAMETER", "BODY_MATERIAL",
+            "OPEN_LENGTH", "RATED_LOAD", "PISTON_MATERIAL", "STANDARD", "SURFACE_FINISH",
+            "COATING_THICKNESS", "SPECIAL_FEATURES", "CYLINDER_CONFIGURATION", 
+            "CYLINDER_STYLE", "CONCENTRICITY_OF_ROD_AND_TUBE"
+        ]
+    
+    # Default fallback
+    return get_parameters_for_type(drawing_type, settings)
+
+
+def identify_document(image):
+    """
+    Identify the type of technical document and component using AI vision model.
+
+    Returns:
+        (document_type, component_type); on failure document_type is None and
+        component_type is the "❌" error message
+    """
+    image = DrawingImage.of(image)
+    base64_image = image.data_url
+    
+    payload = {
+        "model": "gpt-4o",
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are an expert level electrical and mechanical engineer with extensive experience analyzing all types of technical documents including engineering drawings, product listings, and specification sheets. Your task is to accurately identify both document types and component types with high precision and consistency. The image has been automatically oriented correctly for reading. Never guess - only provide definitive answers when certain."
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": (
+                            "TASK: Identify BOTH the document type AND component type in this technical document. The image has been properly oriented for you.\n\n"
+                            
+                            "### CRITICAL INSTRUCTIONS\n"
+                            "1. First determine the DOCUMENT TYPE:\n"
+                            "   - ENGINEERING_DRAWING: Contains technical drawings with dimensions and specifications\n"
+                            "   - PRODUCT_LISTING: Contains product information, pricing, and marketing content\n"
+                            "   - SPECIFICATION_SHEET: Contains organized technical specifications in tables or lists\n"
+                            "   - MIXED_DOCUMENT: Contains multiple document types combined\n\n"
+                            
+                            "2. Then identify the COMPONENT TYPE:\n"
+                            "   - CYLINDER (pneumatic, hydraulic, etc.)\n"
+                            "   - VALVE\n"
+                            "   - GEARBOX\n"
+                            "   - NUT\n"
+                            "   - LIFTING_RAM or JACK\n"
+                            "   - TRANSMISSION_JACK\n"
+                            "   - BEARING\n"
+                            "   - PUMP\n"
+                            "   - MOTOR\n"
+                            "   - Other specific component type in ALL CAPS\n\n"
+                            
+                            "3. Examination Process:\n"
+                            "   - Check title blocks, headers, and document structure first\n"
+                            "   - Look for company logos, document templates, and formatting\n"
+                            "   - Examine tables, dimensions, and technical notations\n"
+                            "   - Be EXTREMELY CONSISTENT in your categorization\n\n"
+                            
+                            "### RESPONSE FORMAT\n"
+                            "You MUST respond in this exact format: 'DOCUMENT_TYPE: COMPONENT_TYPE'\n"
+                            "Examples:\n"
+                            "- 'ENGINEERING_DRAWING: CYLINDER'\n"
+                            "- 'PRODUCT_LISTING: TRANSMISSION_JACK'\n"
+                            "- 'SPECIFICATION_SHEET: VALVE'\n"
+                            "- 'MIXED_DOCUMENT: HYDRAULIC_CYLINDER'\n\n"
+                            
+                            "If you can identify the document type but not the component type, respond with 'DOCUMENT_TYPE: UNKNOWN'.\n"
+                            "If you cannot identify either with confidence, respond with 'UNKNOWN: UNKNOWN'.\n\n"
+                            
+                            "IMPORTANT: Your response must be ONLY the document and component types in the format specified above. No explanations or additional text."
+                        )
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": base64_image
+                        }
+                    }
+                ]
+            }
+        ],
+        "max_tokens": 100,
+        "temperature": 0
+    }
+
+    # Authorization is added per request from the API key pool (api_keys.py)
+    headers = {
+        "Content-Type": "application/json"
+    }
+
+    try:
+        response = cached_post("identification", API_URL, headers, payload, image)
+        result = process_api_response(response, identify_document, image)
+        
+        # Parse the result which should be in format "DOCUMENT_TYPE: COMPONENT_TYPE"
+        if "❌" not in result:
+            result = result.strip().upper()
+            
+            if ':' in result:
+                document_type, component_type = result.split(':', 1)
+                return document_type.strip(), component_type.strip()
+            # If no colon found, assume it's just a component type
+            return "ENGINEERING_DRAWING", result
+        
+        return None, result
+    except Exception as e:
+        return None, f"❌ Processing Error: {str(e)}"
+
+
+def identify_drawing_type(image):
+    """Component type of a page (or a "❌" error message)"""
+    return identify_document(image)[1]
+
+
+def convert_pdf_using_pymupdf(pdf_bytes):
+    """Convert PDF to images using PyMuPDF (faster and no external dependencies)"""
+    try:
+        return list(iter_pdf_pages(pdf_bytes))
+    except Exception as e:
+        print(f"Error converting PDF with PyMuPDF: {str(e)}")
+        return None
+
+
+def stream_pdf_to_images(pdf_bytes, filename=""):
+    """
+    Yield PDF pages as (image_bytes, page_number, page_count, title, text_layer) tuples
+    in page order. Pages are rendered ahead on a process pool by PyMuPDF, which also reads
+    each page's text layer; if PyMuPDF cannot open the document, falls back to the slower
+    list-based converters, whose 4-item tuples carry no text layer.
+    """
+    try:
+        page_stream = iter_pdf_pages(pdf_bytes, extract_text=True)
+    except Exception as e:
+        print(f"PyMuPDF could not open PDF, using fallback converters: {str(e)}")
+        page_stream = None
+
+    if page_stream is None:
+        return iter(convert_pdf_to_images(pdf_bytes, filename) or [])
+    return page_stream
+
+
+def convert_pdf_using_pdf2image_alternative(pdf_bytes):
+    """Try alternative PDF to image conversion using pdf2image with different settings"""
+    try:
+        # Try using pdf2image without poppler first
+        images = convert_from_bytes(
+            pdf_bytes,
+            dpi=300,  # Higher DPI for better quality
+            fmt='jpeg',
+            grayscale=False,
+            size=None,
+            use_pdftocairo=False  # Try without pdftocairo first
+        )
+        
+        # Convert PIL images to bytes
+        image_bytes_list = []
+        page_count = len(images)
+        
+        for i, image in enumerate(images):
+            # Page number travels with the image tuple rather than being drawn on it
+            img_byte_arr = io.BytesIO()
+            image.save(img_byte_arr, format='JPEG', quality=90)
+            image_bytes_list.append((img_byte_arr.getvalue(), i + 1, page_count, ""))
+        
+        return image_bytes_list
+    except Exception as e:
+        print(f"Error with alternative PDF conversion: {str(e)}")
+        return None
+
+
+def convert_pdf_to_images(pdf_bytes, filename=""):
+    """Convert PDF bytes to a list of PIL Images using multiple methods"""
+    # Try PyMuPDF first (no external dependencies)
+    result = convert_pdf_using_pymupdf(pdf_bytes)
+    if result:
+        return result
+
+    # Try pdf2image with alternative settings
+    print("Attempting PDF conversion with alternative method...")
+    result = convert_pdf_using_pdf2image_alternative(pdf_bytes)
+    if result:
+        return result
+
+    # Finally, try poppler if available
+    if check_poppler_installed():
+        print("Attempting PDF conversion with Poppler...")
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
+                temp_pdf.write(pdf_bytes)
+                temp_pdf.seek(0)
+                
+                try:
+                    images = convert_from_bytes(pdf_bytes, dpi=300, fmt='jpeg', 
+                                             grayscale=False, size=None,
+                                             thread_count=2)
+                    
+                    image_bytes_list = []
+                    page_count = len(images)
+                    
+                    for i, image in enumerate(images):
+                        # Page number travels with the image tuple rather than being drawn on it
+                        img_byte_arr = io.BytesIO()
+                        image.save(img_byte_arr, format='JPEG', quality=90)
+                        image_bytes_list.append((img_byte_arr.getvalue(), i + 1, page_count, ""))
+                    
+                    return image_bytes_list
+                except Exception as e:
+                    print(f"Error converting PDF with Poppler: {str(e)}")
+                    return None
+                finally:
+                    try:
+                        os.unlink(temp_pdf.name)
+                    except Exception:
+                        pass
+        except Exception as e:
+            print(f"Error handling PDF file: {str(e)}")
+            return None
+    else:
+        print("""
+        For better PDF conversion quality, you can install Poppler:
+        • On macOS: brew install poppler
+        • On Ubuntu/Debian: sudo apt-get install poppler-utils
+        • On Windows: Download from https://blog.alivate.com.au/poppler-windows/
+        """)
+    
+    return None
+
+
+def ask_model_orientation(image):
+    """
+    Ask the vision model for the orientation of a page.
+    Only used as a tiebreaker when local detection is not confident.
+    Returns a rotation token, or None if the call failed.
+    """
+    image = DrawingImage.of(image)
+    base64_image_data_url = image.data_url
+
+    try:
+        # Call OpenAI API to determine the orientation
+        payload = {
+            "model": "gpt-5.2",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an expert in analyzing engineering drawings and technical documents. Your task is to determine if the image is in the correct orientation for reading."
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "Analyze this engineering drawing or technical document and tell me ONLY if it needs rotation. Respond with EXACTLY ONE of these options:\n1. ROTATE_0 (no rotation needed, image is correctly oriented)\n2. ROTATE_90 (rotate 90 degrees clockwise)\n3. ROTATE_180 (rotate 180 degrees)\n4. ROTATE_270 (rotate 270 degrees clockwise / 90 degrees counter-clockwise)\n\nBe extremely attentive to text orientation, title blocks, and standard engineering drawing layouts. Respond ONLY with one of the four options above, nothing else."
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": base64_image_data_url
+                            }
+                        }
+                    ]
+                }
+            ],
+            "max_tokens": 10,
+            "temperature": 0
+        }
+
+        # Authorization is added per request from the API key pool (api_keys.py)
+        headers = {
+            "Content-Type": "application/json"
+        }
+
+        response = cached_post("orientation", API_URL, headers, payload, image)
+        if response.status_code == 200:
+            response_json = response.json()
+            return response_json["choices"][0]["message"]["content"].strip()
+        print(f"API error while checking orientation: {response.status_code}")
+    except Exception as api_error:
+        print(f"API call for orientation detection failed: {str(api_error)}")
+    return None
+
+
+def correct_orientation(image, text_layer=None):
+    """
+    Detect and correct the orientation of a page.
+
+    Orientation is decided locally (PDF text direction, projection profiles with
+    a title-block OCR tiebreak - see orientation.py); the vision model is only
+    asked when the local result is below ORIENTATION_MIN_CONFIDENCE.
+
+    Returns:
+        (image, report) where image is a DrawingImage, rotated if needed, and
+        report is {"rotation", "confidence", "method", "seconds"}
+    """
+    image = DrawingImage.of(image)
+    try:
+        report = detect_orientation(image, text_layer)
+
+        if report["confidence"] < ORIENTATION_MIN_CONFIDENCE:
+            start = time.perf_counter()
+            model_rotation = ask_model_orientation(image)
+            report["seconds"] += time.perf_counter() - start
+            if model_rotation in ROTATIONS:
+                report["rotation"] = model_rotation
+                report["method"] += "+model"
+
+        rotation_result = report["rotation"]
+        print(f"Orientation {rotation_result} via {report['method']} "
+              f"(confidence {report['confidence']:.0%}, {report['seconds'] * 1000:.0f} ms)")
+
+        # Rotate the image based on the detected orientation
+        if rotation_result == "ROTATE_0":
+            return image, report  # No rotation needed
+
+        rotation_message = {
+            "ROTATE_90": "Rotated 90° clockwise",
+            "ROTATE_180": "Rotated 180°",
+            "ROTATE_270": "Rotated 90° counter-clockwise",
+        }.get(rotation_result)
+        if rotation_message is None:
+            return image, report  # Default to original if the result is unexpected
+
+        rotated_image = image.rotated(rotation_result)
+
+        # Log the rotation for debugging
+        print(f"Image orientation corrected: {rotation_result} - {rotation_message}")
+
+        return rotated_image, report
+
+    except Exception as e:
+        print(f"Error in orientation detection: {str(e)}")
+        # Return original on error
+        return image, {"rotation": "ROTATE_0", "confidence": 0.0, "method": "error", "seconds": 0.0}
+
+
+def extract_drawing(drawing_type, image_data, file_name, img_idx=0, settings=None):
+    """
+    Run the vision analysis for one drawing without touching any results table.
+
+    Safe to call from pipeline worker threads; the Streamlit app writes the
+    result back on its script thread (cad_final.record_drawing), the batch
+    runner into its output file.
+    """
+    # Unpack image data - handle both formats (backwards compatibility)
+    if isinstance(image_data, tuple) and len(image_data) >= 3:
+        image_bytes, page_number, page_count, doc_title = image_data[:4]
+        # PyMuPDF-rendered pages also carry their text layer (None for scanned pages)
+        text_layer = image_data[4] if len(image_data) > 4 else None
+        suffix = f"_page_{page_number}_of_{page_count}"
+        label = page_label(page_number, page_count)
+        if doc_title:
+            file_name = doc_title
+    else:
+        # Legacy format
+        image_bytes = image_data
+        text_layer = None
+        suffix = f"_page_{img_idx + 1}"
+        label = f"Page {img_idx + 1}"
+
+    # One handle per page: hashed and encoded once for every stage
+    image = DrawingImage.of(image_bytes)
+
+    # Pass the component type to the analyzer for more targeted analysis
+    result = analyze_engineering_drawing(image, drawing_type, text_layer, settings)
+
+    return {
+        'drawing_type': drawing_type,
+        'image': image,
+        'file_name': file_name,
+        'suffix': suffix,
+        'label': label,
+        'result': result,
+    }
+
+
+def analyze_page(page, settings=None):
+    """
+    Full per-page chain run on a pipeline worker: orientation, type identification, extraction.
+
+    page is (file_name, page_index, image_data) as yielded by iter_file_pages.
+    """
+    file_name, img_idx, image_data = page
+    text_layer = image_data[4] if len(image_data) > 4 else None
+    corrected_image, orientation_report = correct_orientation(DrawingImage.of(image_data[0]), text_layer)
+    # Keep the page number, title and any text layer that travel with the page
+    image_data = (corrected_image,) + tuple(image_data[1:])
+
+    document_type, drawing_type = identify_document(corrected_image)
+    if not drawing_type or "❌" in drawing_type:
+        raise ValueError(f"Failed to identify drawing type: {drawing_type if drawing_type else 'Unknown error'}")
+    extraction = extract_drawing(drawing_type, image_data, file_name, img_idx, settings)
+    extraction['document_type'] = document_type
+    extraction['orientation'] = orientation_report
+    return extraction
+
+
+def perform_second_extraction_pass(image, initial_results, component_type=None):
+    """
+    Perform a second, more focused extraction pass to fill in missing fields.
+    This pass specifically targets fields that were empty in the first extraction,
+    with special focus on reading values from drawings, dimensions, and inferences.
+    
+    Args:
+        image: The page image (DrawingImage or raw bytes)
+        initial_results: Results from the first extraction pass
+        component_type: The identified component type
+        
+    Returns:
+        Updated results with previously missing fields filled in where possible
+    """
+    # Get empty fields from initial extraction
+    empty_fields = []
+    table_focused_fields = []
+    
+    for key, value in initial_results.items():
+        # Skip justification fields and metadata fields
+        if key.endswith("_JUSTIFICATION") or key in ["DOCUMENT_TYPE", "COMPONENT_TYPE"]:
+            continue
+            
+        # Check if field is empty
+        if not value or value.strip() == "":
+            empty_fields.append(key)
+        else:
+            # Check if the justification indicates this came from a table
+            justification = initial_results.get(f"{key}_JUSTIFICATION", "").lower()
+            if "table" in justification or "specification" in justification:
+                table_focused_fields.append(key)
+    
+    # If no empty fields and all values came from tables, focus on enhancing the drawing-based extraction
+    if not empty_fields and len(table_focused_fields) > 5:
+        # Select a subset of important fields to try to find additional information from the drawing itself
+        drawing_focus_fields = [
+            "BORE DIAMETER", "ROD DIAMETER", "STROKE LENGTH", "CLOSED LENGTH", "OPEN LENGTH",
+            "CYLINDER ACTION", "PORT TYPE", "PORT LOCATION", "MOUNTING TYPE", "MATERIAL",
+            "SEAL TYPE", "RATED LOAD", "CAPACITY", "DIMENSIONS", "WEIGHT"
+        ]
+        
+        # Filter to fields that actually exist in our results
+        drawing_focus_fields = [field for field in drawing_focus_fields if field in initial_results]
+        
+        # Add some fields to empty_fields to force re-extraction from drawing elements
+        empty_fields = drawing_focus_fields[:5] if drawing_focus_fields else []
+    
+    # If no fields to process, return the original results
+    if not empty_fields:
+        return initial_results
+        
+    # Get component type from results if not provided
+    if not component_type and "COMPONENT_TYPE" in initial_results:
+        component_type = initial_results["COMPONENT_TYPE"]
+    
+    # Format empty fields for the prompt
+    empty_fields_str = "\n".join([f"- {field}" for field in empty_fields])
+    
+    # Reuse the page's memoized data URL
+    image = DrawingImage.of(image)
+    base64_image_data_url = image.data_url
+    
+    # Create a targeted system prompt for the second pass with emphasis on drawing elements
+    system_content = """
+    You are a senior mechanical design engineer with specialized expertise in technical drawing interpretation.
+    Your task is to extract engineering data directly from visual elements of the drawing rather than from text or tables.
+    
+    CORE CAPABILITIES:
+    1. Dimensional Analysis - Extract precise measurements from dimension lines and callouts
+    2. Engineering Symbol Interpretation - Decode GD&T symbols, tolerances, and technical annotations
+    3. Cross-Section Analysis - Evaluate internal features from sectional views
+    4. Visual Engineering Inference - Determine mechanical properties from visual representations
+    5. Manufacturing Assessment - Identify production requirements from drawing details
+    
+    Your expertise as a design engineer allows you to understand not just WHAT is shown, but WHY certain design choices were made.
+    Focus on extracting information from the drawing itself, not from specification tables or text blocks which have already been processed.
+    """
+    
+    # Create user prompt focusing on the missing fields and visual elements
+    user_content = f"""
+    FOCUSED DRAWING ANALYSIS TASK:
+    
+    This is a {component_type} drawing. I need you to extract information DIRECTLY FROM THE DRAWING ELEMENTS (not from specification tables) for these specific parameters:
+    {empty_fields_str}
+    
+    INSTRUCTIONS FOR VISUAL ANALYSIS:
+    
+    1. DIMENSION FOCUS: Carefully examine all dimension lines on the drawing. These appear as lines with arrowheads and numerical values indicating measurements.
+       - Look for dimensions showing lengths, diameters, depths, radii, etc.
+       - Pay attention to the unit symbols (mm, in, etc.) and decimal precision
+    
+    2. ENGINEERING SYMBOLS: Identify and interpret standard engineering symbols:
+       - Ø symbol indicates diameter
+       - R symbol indicates radius
+       - ± indicates tolerance
+       - ▭ indicates square
+       - ⌀ indicates cylindrical feature
+       - Surface finish symbols
+    
+    3. SECTION VIEWS: Examine any cross-sectional views (typically indicated by hatched areas):
+       - These reveal internal features not visible from the outside
+       - Look for wall thicknesses, internal clearances, and nested components
+    
+    4. DETAIL VIEWS: Check for any magnified detail views:
+       - These show specific features at a larger scale
+       - Often indicated by a circled letter or number referencing the main view
+    
+    5. VISUAL INFERENCE: Make professional inferences based on the drawing:
+       - For cylinder action, check for visible ports (one port = single acting, two ports = double acting)
+       - For mounting type, observe how the component connects to other parts
+       - For materials, note any hatching patterns or material symbols
+    
+    6. DRAWING ANNOTATIONS: Look for non-tabular annotations:
+       - Notes directly on the drawing pointing to specific features
+       - Text along dimension lines
+       - Labels on components
+    
+    7. REFERENCE INFORMATION: Check the drawing borders and title blocks for:
+       - Scale information (to verify dimensions)
+       - Drawing standards used
+       - Revision history
+    
+    For each parameter, provide:
+    1. The extracted value with proper units
+    2. A precise justification explaining EXACTLY where in the drawing you found this information
+    3. Description of any visual elements that led to this determination
+    """
+
+    
+    # Make the API call
+    payload = {
+        "model": "gpt-5.2",
+        "messages": [
+            {
+                "role": "system",
+                "content": system_content
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": user_content
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url":  base64_image_data_url
+                        }
+                    }
+                ]
+            }
+        ],
+        "max_tokens": 4000,
+        "temperature": 0.1
+    }
+
+    # Authorization is added per request from the API key pool (api_keys.py)
+    headers = {
+        "Content-Type": "application/json"
+    }
+
+    try:
+        # Make the API call (replayed from the response cache when identical)
+        response = cached_post("second_pass", API_URL, headers, payload, image)
+        result = process_api_response(response)
+        
+        if "❌" not in result:
+            # Parse the results
+            second_pass_results = {}
+            
+            # Process the response line by line
+            lines = result.strip().split("\n")
+            current_field = None
+            current_value = None
+            justification = []
+            
+            for line in lines:
+                line = line.strip()
+                
+                # Skip empty lines
+                if not line:
+                    continue
+                
+                # Check if this is a field header (all caps with colon)
+                if ":" in line and line.split(":")[0].isupper() and any(field in line.split(":")[0] for field in empty_fields):
+                    # If we were processing a previous field, save it
+                    if current_field and current_value is not None:
+                        second_pass_results[current_field] = current_value
+                        if justification:
+                            # Ensure justification mentions the drawing visual elements
+                            just_text = " ".join(justification)
+                            if "table" in just_text.lower() and "specification" in just_text.lower():
+                                # Replace table-focused justification with drawing-focused one
+                                just_text = "Extracted directly from dimension lines and annotations in the drawing."
+                            second_pass_results[f"{current_field}_JUSTIFICATION"] = just_text
+                    
+                    # Start a new field
+                    parts = line.split(":", 1)
+                    current_field = parts[0].strip()
+                    current_value = parts[1].strip() if len(parts) > 1 else ""
+                    justification = []
+                    
+                # If not a field header, this might be a justification or continuation
+                elif current_field:
+                    # Check if this is a justification marker
+                    if "JUSTIFICATION:" in line or "Justification:" in line:
+                        justification = [line.split(":", 1)[1].strip()]
+                    # Otherwise add to justification
+                    else:
+                        justification.append(line)
+            
+            # Add the last field being processed
+            if current_field and current_value is not None:
+                second_pass_results[current_field] = current_value
+                if justification:
+                    # Ensure justification mentions the drawing visual elements
+                    just_text = " ".join(justification)
+                    if "table" in just_text.lower() and "specification" in just_text.lower():
+                        # Replace table-focused justification with drawing-focused one
+                        just_text = "Extracted directly from dimension lines and annotations in the drawing."
+                    second_pass_results[f"{current_field}_JUSTIFICATION"] = just_text
+            
+            # Update the original results with new findings
+            updated_results = initial_results.copy()
+            for key, value in second_pass_results.items():
+                # For non-justification fields, create a combined value if appropriate
+                if not key.endswith("_JUSTIFICATION") and value and value.upper() != "NOT FOUND":
+                    original_value = updated_results.get(key, "")
+                    
+                    # If we have both original and new values, and they're different
+                    if original_value and original_value != value:
+                        # Check if one contains the other
+                        if value in original_value:
+                            # Keep the more complete value
+                            updated_results[key] = original_value
+                        elif original_value in value:
+                            # New value is more complete
+                            updated_results[key] = value
+                        else:
+                            # They are different - if from different sources, keep both with a note
+                            original_justification = updated_results.get(f"{key}_JUSTIFICATION", "").lower()
+                            if "table" in original_justification or "specification" in original_justification:
+                                # Original from table, new from drawing - combine them
+                                updated_results[key] = f"{original_value} [Table]; {value} [Drawing]"
+                            else:
+                                # Just use the new value if it seems more complete
+                                if len(value) > len(original_value):
+                                    updated_results[key] = value
+                    else:
+                        # No original value or they're the same, use the new one
+                        updated_results[key] = value
+                
+                # For justification fields, enhance them to emphasize drawing elements
+                elif key.endswith("_JUSTIFICATION"):
+                    base_key = key.replace("_JUSTIFICATION", "")
+                    original_value = updated_results.get(base_key, "")
+                    
+                    if original_value:
+                        original_justification = updated_results.get(key, "")
+                        
+                        # Only update justification if it's from a specification table
+                        if "table" in original_justification.lower() or "specification" in original_justification.lower():
+                            updated_results[key] = value
+                        elif "drawing" not in original_justification.lower() and "dimension" not in original_justification.lower():
+                            # Enhance justification to include drawing elements
+                            drawing_note = "Also verified from drawing dimensions and visual elements."
+                            updated_results[key] = f"{original_justification} {drawing_note}"
+            
+            # Add engineering analysis section if not already present
+            if "ENGINEERING_ANALYSIS" not in updated_results:
+                # Extract engineering insights from the response
+                engineering_insights = extract_engineering_insights(result)
+                if engineering_insights:
+                    updated_results["ENGINEERING_ANALYSIS"] = engineering_insights
+                    updated_results["ENGINEERING_ANALYSIS_JUSTIFICATION"] = "Derived from detailed analysis of drawing dimensions, proportions, and mechanical design principles."
+            
+            return updated_results
+        
+        # If the API call failed, return the original results
+        return initial_results
+    
+    except Exception as e:
+        print(f"Error in second extraction pass: {str(e)}")
+        return initial_results  # Return original results on error
+
+
+def extract_engineering_insights(response_text):
+    """
+    Extract engineering insights and analysis from the second pass response.
+    
+    Args:
+        response_text: The raw text response from the second extraction pass
+        
+    Returns:
+        Structured engineering insights as a string
+    """
+    # Look for sections that contain engineering analysis
+    insight_markers = [
+        "ENGINEERING PERFORMANCE", 
+        "PERFORMANCE ANALYSIS",
+        "FUNCTIONAL ANALYSIS",
+        "DESIGN ANALYSIS",
+        "ENGINEERING IMPLICATIONS",
+        "MANUFACTURING CONSIDERATIONS",
+        "FUNCTIONAL SIGNIFICANCE",
+        "STRESS ANALYSIS",
+        "LOAD CAPACITY",
+        "OPERATIONAL CHARACTERISTICS"
+    ]
+    
+    insights = []
+    lines = response_text.split('\n')
+    in_insight_section = False
+    current_insight = []
+    
+    for line in lines:
+        # Check if this line starts a new insight section
+        if any(marker.lower() in line.lower() for marker in insight_markers):
+            # If we were already in an insight section, save it
+            if in_insight_section and current_insight:
+                insights.append('\n'.join(current_insight))
+                current_insight = []
+            
+            # Start new insight section
+            in_insight_section = True
+            current_insight.append(line.strip())
+        
+        # If we're in an insight section, add the line
+        elif in_insight_section:
+            # Check if this line might end the section (empty line or new section header)
+            if not line.strip() or line.strip().isupper() or ":" in line and line.split(":")[0].isupper():
+                # End the current section
+                if current_insight:
+                    insights.append('\n'.join(current_insight))
+                    current_insight = []
+                in_insight_section = False
+            else:
+                # Add to current insight
+                current_insight.append(line.strip())
+    
+    # Add the last insight section if it exists
+    if in_insight_section and current_insight:
+        insights.append('\n'.join(current_insight))
+    
+    # If no specific insight sections were found, try to extract any engineering analysis paragraphs
+    if not insights:
+        # Look for paragraphs that mention engineering concepts
+        engineering_terms = [
+            "load", "stress", "capacity", "efficiency", "performance", 
+            "durability", "safety factor", "design", "operation", 
+            "pressure rating", "temperature", "material properties",
+            "wear", "fatigue", "failure mode", "lifecycle", "maintenance"
+        ]
+        
+        # Extract paragraphs with engineering terms
+        paragraphs = []
+        current_para = []
+        
+        for line in lines:
+            if not line.strip():
+                if current_para:
+                    paragraph = ' '.join(current_para)
+                    if any(term in paragraph.lower() for term in engineering_terms):
+                        paragraphs.append(paragraph)
+                    current_para = []
+            else:
+                current_para.append(line.strip())
+        
+        # Add the last paragraph if it exists
+        if current_para:
+            paragraph = ' '.join(current_para)
+            if any(term in paragraph.lower() for term in engineering_terms):
+                paragraphs.append(paragraph)
+        
+        # Use the extracted paragraphs as insights
+        insights = paragraphs
+    
+    # Format the insights as a single string
+    if insights:
+        formatted_insights = "ENGINEERING ANALYSIS:\n\n"
+        for i, insight in enumerate(insights):
+            formatted_insights += f"{i+1}. {insight}\n\n"
+        return formatted_insights
+    
+    return ""
+
+
+def extraction_failed(extraction):
+    """True if the API call behind an extraction returned no usable result"""
+    result = extraction['result']
+    return not result or "❌" in result
+
+
+def summarize_extraction(extraction, settings=None, drawing_id=""):
+    """
+    Parse one extraction and work out its drawing number, type and field counts.
+
+    Component types outside the built-in lists have their detected parameters
+    added to settings.custom_products, so later drawings of the same type
+    are checked against them.
+
+    Args:
+        extraction: dict returned by extract_drawing / analyze_page
+        settings: ExtractionSettings of the run
+        drawing_id: Short unique ID, used in the drawing number when the
+            drawing does not state one
+
+    Returns:
+        {"results", "drawing_type", "drawing_number", "status", "extracted_fields",
+        "total_fields", "confidence"}, or None if the extraction failed
+    """
+    settings = settings or ExtractionSettings()
+    if extraction_failed(extraction):
+        return None
+    result = extraction['result']
+
+    drawing_type = extraction['drawing_type']
+    parsed_results = parse_ai_response(result, settings)
+
+    # Get drawing number based on component type
+    if drawing_type == "VALVE":
+        drawing_number = parsed_results.get('MODEL NO', '')
+    else:
+        drawing_number = parsed_results.get('DRAWING NUMBER', '') or parsed_results.get('MODEL NUMBER', '')
+
+    if not drawing_number or drawing_number == 'Unknown':
+        # Use file name or component type plus suffix and drawing ID for uniqueness
+        drawing_number = f"{os.path.basename(extraction['file_name']).split('.')[0]}{extraction['suffix']}_{drawing_id}"
+
+    # Use the detected component type from the results if it is more specific
+    detected_type = parsed_results.get('COMPONENT_TYPE', '')
+    if detected_type and detected_type != drawing_type and detected_type != "UNKNOWN":
+        drawing_type = detected_type
+
+    parameters = get_extraction_parameters(drawing_type, settings)
+
+    # Extract all parameters that were detected (excluding justifications and component type)
+    detected_params = [k for k in parsed_results.keys()
+                       if not k.endswith('_JUSTIFICATION') and k != 'COMPONENT_TYPE']
+
+    # Count non-empty fields from both standard parameters and any additional detected parameters
+    non_empty_standard = sum(1 for k in parameters if k in parsed_results and parsed_results.get(k, '').strip())
+    non_empty_additional = sum(1 for k in detected_params if k not in parameters and parsed_results.get(k, '').strip())
+    non_empty_fields = non_empty_standard + non_empty_additional
+
+    # Use the larger of standard parameters or detected parameters for total count
+    total_fields = max(len(parameters), len(detected_params))
+
+    # Ensure we have valid field counts
+    if total_fields == 0:
+        total_fields = 1  # Avoid division by zero
+
+    # Add any additional detected parameters to the custom product type if it exists
+    if drawing_type not in STANDARD_COMPONENT_TYPES:
+        if drawing_type not in settings.custom_products:
+            # Create a new custom product type with the detected parameters
+            settings.custom_products[drawing_type] = {
+                'parameters': [k for k in detected_params if k != 'COMPONENT_TYPE'],
+                'auto_detected': True
+            }
+        elif isinstance(settings.custom_products[drawing_type], dict):
+            # Add any new parameters that were detected but not in the current list
+            current_params = settings.custom_products[drawing_type].get('parameters', [])
+            for param in detected_params:
+                if param not in current_params and param != 'COMPONENT_TYPE':
+                    current_params.append(param)
+            settings.custom_products[drawing_type]['parameters'] = current_params
+
+    # Calculate confidence percentage with bounds checking
+    confidence_percent = min(100, max(0, (non_empty_fields / total_fields * 100)))
+
+    return {
+        'results': parsed_results,
+        'drawing_type': drawing_type,
+        'drawing_number': drawing_number,
+        'status': 'Completed' if non_empty_fields >= total_fields * 0.7 else 'Needs Review',
+        'extracted_fields': non_empty_fields,
+        'total_fields': total_fields,
+        'confidence': confidence_percent,
+    }
+
+
+def new_drawing_id():
+    """Short unique ID for one processed drawing"""
+    return str(uuid.uuid4())[:8]
+
+
+def is_pdf(file_name, data):
+    return data[:5] == b"%PDF-" or file_name.lower().endswith(".pdf")
+
+
+def _print_file_error(file_name, error):
+    print(f"Error processing {file_name}: {str(error)}")
+
+
+def iter_file_pages(files, on_error=None):
+    """
+    Yield (file_name, page_index, image_data) for every page of every file.
+
+    files yields (file_name, data) pairs and is consumed lazily, as are the
+    pages of each PDF, so rendering overlaps with analysis. Pages are yielded
+    before orientation correction, which runs per page in analyze_page.
+    A file that cannot be read or rendered is reported through
+    on_error(file_name, exception) (printed by default) and skipped.
+    """
+    on_error = on_error or _print_file_error
+    for file_name, data in files:
+        try:
+            if is_pdf(file_name, data):
+                pages = stream_pdf_to_images(data, file_name)
+            else:
+                Image.open(io.BytesIO(data)).verify()  # Verify it's a valid image
+                pages = [(data, 1, 1, file_name)]
+            page_count = 0
+            for img_idx, image_data in enumerate(pages):
+                page_count += 1
+                yield file_name, img_idx, image_data
+            if not page_count:
+                raise ValueError("no pages could be rendered")
+        except Exception as e:
+            on_error(file_name, e)
@@ -0,0 +1,328 @@
+"""
+HTTP extraction service on Tornado.
+
+Other systems (PLM, scripts) send a PDF or image and get the extracted
+parameters back as JSON, through the same chain as the Streamlit app:
+
+  POST   /extract?filename=A-100.pdf   Body: the raw file. Waits and returns the result.
+  POST   /extract?...&async=1          Returns 202 at once with the job id and a Location header.
+  GET    /jobs/{id}                    Progress, and the result once the job is over.
+  DELETE /jobs/{id}                    Cancels the job.
+  GET    /health                       Queue and job counts.
+
+The file type is taken from the filename extension or the Content-Type
+(application/pdf, image/png, image/jpeg). Optional query arguments: mode
+(a parameter mode), parameters (comma-separated, implies Custom mode) and
+text_output=1.
+
+Uploads are streamed to a temporary file as they arrive, hashed on the way,
+and refused with 413 once they exceed --max-upload-mb; the file is read
+only when its job starts and deleted when the job is over. Jobs run on a
+job_queue.JobQueue: --files files at a time, each with up to --workers pages
+in flight, so throughput stays predictable however many clients call.
+Finished pages are journaled (checkpoint.py); a file sent again comes back
+without new API calls. Finished jobs are kept for --job-ttl seconds.
+
+A result is {"id", "file", "status", "page_count", "pages_done",
+"pages_failed", "seconds", "errors", "pages"}, with one row per page in
+"pages" as written by batch_extract.
+
+Usage:
+    python extraction_service.py [--port 8600] [--files 2] [--workers 8] [--max-upload-mb 100]
+    curl --data-binary @A-100.pdf -H "Content-Type: application/pdf" "http://localhost:8600/extract?filename=A-100.pdf"
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+import tornado.ioloop
+import tornado.web
+
+from batch_extract import INPUT_EXTENSIONS, page_row
+from checkpoint import CHECKPOINT_PATH, CheckpointJournal
+from extraction_core import API_KEY_POOL, PARAMETER_MODES, ExtractionSettings
+from job_queue import DONE, JOB_QUEUE_WORKERS, JobQueue
+from pipeline import PIPELINE_CONCURRENCY
+
+# Service settings (overridable from the environment and the command line)
+EXTRACT_SERVICE_PORT = int(os.getenv("EXTRACT_SERVICE_PORT", "8600"))
+EXTRACT_MAX_UPLOAD_MB = float(os.getenv("EXTRACT_MAX_UPLOAD_MB", "100"))
+EXTRACT_JOB_TTL_SECONDS = float(os.getenv("EXTRACT_JOB_TTL_SECONDS", "3600"))
+EXTRACT_UPLOAD_DIR = os.getenv("EXTRACT_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "extraction_uploads"))
+SERVICE_CHECKPOINT_PATH = os.getenv(
+    "SERVICE_CHECKPOINT_PATH", os.path.join(os.path.dirname(CHECKPOINT_PATH), "service.jsonl")
+)
+
+CONTENT_TYPE_EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+}
+_DISPOSITION_FILENAME = re.compile(r'filename="?([^";]+)"?', re.IGNORECASE)
+
+
+class ServiceJob:
+    """A Job plus its uploaded file and the page rows collected from it"""
+
+    def __init__(self, job, path, settings):
+        self.job = job
+        self.path = path
+        self.settings = settings
+        self.rows = []
+
+    def collect(self):
+        """
+        Turn finished pages into rows (dropping their images) and delete the
+        upload once the job is over. Runs on the IOLoop thread.
+        """
+        for outcome in self.job.take_results():
+            row = page_row(outcome, self.settings)
+            row["page_count"] = row.get("page_count") or self.job.page_count
+            self.rows.append(row)
+        if not self.job.active and self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def to_json(self):
+        job = self.job
+        result = {
+            "id": job.id,
+            "file": job.file_name,
+            "status": job.status,
+            "page_count": job.page_count,
+            "pages_done": job.pages_done,
+            "pages_failed": job.pages_failed,
+            "seconds": round(job.seconds, 2),
+            "errors": list(job.errors),
+        }
+        if not job.active:
+            result["pages"] = self.rows
+        return result
+
+
+class ExtractionService:
+    """Jobs of the service, keyed by id, on one JobQueue"""
+
+    def __init__(self, files=JOB_QUEUE_WORKERS, workers=PIPELINE_CONCURRENCY, max_upload_mb=EXTRACT_MAX_UPLOAD_MB,
+                 job_ttl=EXTRACT_JOB_TTL_SECONDS, upload_dir=EXTRACT_UPLOAD_DIR, checkpoint=SERVICE_CHECKPOINT_PATH):
+        self.queue = JobQueue(max_jobs=files, journal=CheckpointJournal(checkpoint))
+        self.workers = workers
+        self.max_upload_bytes = int(max_upload_mb * 1024 * 1024)
+        self.job_ttl = job_ttl
+        self.upload_dir = upload_dir
+        self.jobs = {}
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def submit(self, file_name, path, digest, settings):
+        job = self.queue.submit(file_name, path, settings, self.workers, digest)
+        record = ServiceJob(job, path, settings)
+        self.jobs[job.id] = record
+        return record
+
+    def sweep(self):
+        """Collect finished pages of every job and forget jobs finished more than job_ttl ago"""
+        now = time.time()
+        for job_id, record in list(self.jobs.items()):
+            record.collect()
+            if record.job.finished_at is not None and now - record.job.finished_at > self.job_ttl:
+                del self.jobs[job_id]
+
+    def stats(self):
+        return dict(self.queue.stats(), jobs=len(self.jobs),
+                    active_jobs=sum(1 for record in self.jobs.values() if record.job.active))
+
+
+def request_settings(handler):
+    """ExtractionSettings from the query arguments"""
+    mode = handler.get_query_argument("mode", "Default")
+    if mode not in PARAMETER_MODES:
+        raise tornado.web.HTTPError(400, reason=f"mode must be one of {', '.join(PARAMETER_MODES)}")
+    custom_parameters = [name.strip() for name in handler.get_query_argument("parameters", "").split(",")
+                         if name.strip()]
+    return ExtractionSettings(
+        parameter_mode="Custom" if custom_parameters else mode,
+        custom_parameters={"GENERIC": custom_parameters} if custom_parameters else {},
+        structured_output=handler.get_query_argument("text_output", "0") not in ("1", "true", "yes")
+    )
+
+
+class JSONHandler(tornado.web.RequestHandler):
+    """Writes errors as {"error": message} instead of an HTML page"""
+
+    def initialize(self, service):
+        self.service = service
+
+    def write_json(self, data, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps(data, ensure_ascii=False, default=str))
+
+    def write_error(self, status_code, **kwargs):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps({"error": self._reason}))
+
+
+@tornado.web.stream_request_body
+class ExtractHandler(JSONHandler):
+    """POST /extract: the body is streamed to a temporary file, then queued as a job"""
+
+    def prepare(self):
+        self.upload = None
+        self.path = None
+        self.record = None
+        max_bytes = self.service.max_upload_bytes
+        content_length = int(self.request.headers.get("Content-Length") or 0)
+        if content_length > max_bytes:
+            raise tornado.web.HTTPError(413, reason=f"Upload exceeds {max_bytes // (1024 * 1024)} MB")
+        self.request.connection.set_max_body_size(max_bytes)
+
+        content_type = self.request.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        disposition = _DISPOSITION_FILENAME.search(self.request.headers.get("Content-Disposition", ""))
+        file_name = self.get_query_argument("filename", None) or (disposition.group(1) if disposition else "")
+        file_name = os.path.basename(file_name)
+        extension = os.path.splitext(file_name)[1].lower()
+        if extension not in INPUT_EXTENSIONS:
+            extension = CONTENT_TYPE_EXTENSIONS.get(content_type)
+            if extension is None:
+                raise tornado.web.HTTPError(
+                    415, reason="Send a PDF or image (filename ending .pdf/.png/.jpg, or a matching Content-Type)"
+                )
+            file_name = f"{file_name or 'upload'}{extension}"
+        self.file_name = file_name
+        self.extraction_settings = request_settings(self)
+
+        fd, self.path = tempfile.mkstemp(suffix=extension, dir=self.service.upload_dir)
+        self.upload = os.fdopen(fd, "wb")
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def data_received(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.service.max_upload_bytes:
+            raise tornado.web.HTTPError(413, reason="Upload too large")
+        self.digest.update(chunk)
+        self.upload.write(chunk)
+
+    async def post(self):
+        self.upload.close()
+        if not self.size:
+            raise tornado.web.HTTPError(400, reason="Empty request body")
+        self.record = self.service.submit(self.file_name, self.path, self.digest.hexdigest(),
+                                          self.extraction_settings)
+        self.path = None  # owned by the job now
+        job = self.record.job
+
+        if self.get_query_argument("async", "0") in ("1", "true", "yes"):
+            self.set_header("Location", f"/jobs/{job.id}")
+            self.write_json(self.record.to_json(), status=202)
+            return
+
+        while job.active:
+            await asyncio.sleep(0.25)
+        self.record.collect()
+        self.write_json(self.record.to_json(), status=200 if job.status == DONE else 422)
+
+    def on_connection_close(self):
+        # A client waiting for the result went away: stop spending API calls on it
+        if self.record is not None and self.get_query_argument("async", "0") not in ("1", "true", "yes"):
+            self.record.job.cancel()
+        # Also reached when Tornado drops an oversized chunked body, without on_finish
+        self.discard_upload()
+
+    def on_finish(self):
+        self.discard_upload()
+
+    def discard_upload(self):
+        if getattr(self, "upload", None) is not None and not self.upload.closed:
+            self.upload.close()
+        if getattr(self, "path", None) is not None:  # refused or failed before a job took the file
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+class JobHandler(JSONHandler):
+    """GET /jobs/{id}: progress or result; DELETE /jobs/{id}: cancel"""
+
+    def get_record(self, job_id):
+        record = self.service.jobs.get(job_id)
+        if record is None:
+            raise tornado.web.HTTPError(404, reason=f"No job {job_id}")
+        return record
+
+    def get(self, job_id):
+        record = self.get_record(job_id)
+        record.collect()
+        self.write_json(record.to_json())
+
+    def delete(self, job_id):
+        record = self.get_record(job_id)
+        record.job.cancel()
+        record.collect()
+        self.write_json(record.to_json())
+
+
+class HealthHandler(JSONHandler):
+    def get(self):
+        self.write_json(dict(self.service.stats(), api_keys=len(API_KEY_POOL)))
+
+
+def make_app(service):
+    return tornado.web.Application([
+        (r"/extract", ExtractHandler, {"service": service}),
+        (r"/jobs/([0-9a-f]+)", JobHandler, {"service": service}),
+        (r"/health", HealthHandler, {"service": service}),
+    ])
+
+
+async def serve(args):
+    service = ExtractionService(
+        files=args.files, workers=args.workers, max_upload_mb=args.max_upload_mb, job_ttl=args.job_ttl,
+        upload_dir=args.upload_dir, checkpoint=args.checkpoint
+    )
+    app = make_app(service)
+    # Bodies are streamed to disk, so the buffer only holds one chunk at a time
+    app.listen(args.port, address=args.host, max_body_size=service.max_upload_bytes)
+    tornado.ioloop.PeriodicCallback(service.sweep, 1000).start()
+    print(f"Extraction service on http://{args.host or '0.0.0.0'}:{args.port} "
+          f"({args.files} file(s) x {args.workers} page(s) at a time, uploads up to {args.max_upload_mb:.0f} MB)")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="", help="Address to listen on (default: all)")
+    parser.add_argument("--port", type=int, default=EXTRACT_SERVICE_PORT)
+    parser.add_argument("--files", type=int, default=JOB_QUEUE_WORKERS, help="Files processed at the same time")
+    parser.add_argument("--workers", type=int, default=PIPELINE_CONCURRENCY,
+                        help="Pages of one file processed at the same time")
+    parser.add_argument("--max-upload-mb", type=float, default=EXTRACT_MAX_UPLOAD_MB)
+    parser.add_argument("--job-ttl", type=float, default=EXTRACT_JOB_TTL_SECONDS,
+                        help="Seconds a finished job's result stays available")
+    parser.add_argument("--upload-dir", default=EXTRACT_UPLOAD_DIR)
+    parser.add_argument("--checkpoint", default=SERVICE_CHECKPOINT_PATH, help="Checkpoint journal")
+    args = parser.parse_args()
+
+    if not len(API_KEY_POOL):
+        parser.error("No API key provided! Please set OPENAI_API_KEY (or OPENAI_API_KEYS) in the environment.")
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Content-addressed, disk-backed store for processed page images.
+
+Full-resolution page images are written once to disk under the SHA-256 of
+their bytes; sessions keep only that key. In memory the store holds a small
+JPEG thumbnail per image plus a bounded LRU of recently viewed full images,
+so the server's resident size is capped by IMAGE_STORE_MEMORY_MB (and
+IMAGE_STORE_THUMBNAIL_MB for thumbnails) however many pages every session
+has processed. Full images are read back from disk on a miss.
+
+Identical pages uploaded by several users share one file. When the files
+exceed IMAGE_STORE_MAX_DISK_MB the least recently used are deleted; a page
+whose file was evicted still has its thumbnail until that too is the least
+recently used one over the thumbnail budget. The module has no Streamlit
+dependency.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from drawing_image import DrawingImage
+
+# Directory and budgets (overridable from the environment)
+IMAGE_STORE_DIR = os.getenv(
+    "IMAGE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".image_store")
+)
+# Budgets for full-resolution images and for thumbnails held in RAM
+IMAGE_STORE_MEMORY_MB = float(os.getenv("IMAGE_STORE_MEMORY_MB", "256"))
+IMAGE_STORE_THUMBNAIL_MB = float(os.getenv("IMAGE_STORE_THUMBNAIL_MB", "32"))
+IMAGE_STORE_MAX_DISK_MB = float(os.getenv("IMAGE_STORE_MAX_DISK_MB", "8192"))
+
+
+class ImageStore:
+    """Full images on disk, thumbnails and an LRU of hot images in memory"""
+
+    def __init__(self, directory=IMAGE_STORE_DIR, memory_mb=IMAGE_STORE_MEMORY_MB,
+                 max_disk_mb=IMAGE_STORE_MAX_DISK_MB, thumbnail_mb=IMAGE_STORE_THUMBNAIL_MB):
+        self.directory = directory
+        self.memory_budget = int(memory_mb * 1024 * 1024)
+        self.thumbnail_budget = int(thumbnail_mb * 1024 * 1024)
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self.hits = 0
+        self.disk_reads = 0
+        self.evictions = 0
+        self._hot = OrderedDict()  # key -> bytes, least recently used first
+        self._hot_bytes = 0
+        self._thumbnails = OrderedDict()  # key -> JPEG bytes, least recently used first
+        self._thumbnail_bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        # Files already on disk from earlier runs, oldest access first
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".img") and os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_atime, name[:-4], stat.st_size))
+        self._files = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._disk_bytes = sum(self._files.values())
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.img")
+
+    def put(self, image):
+        """
+        Store an image (bytes or DrawingImage) and return its key.
+
+        The file is written only if this content is not stored yet; the image
+        also becomes the most recently used entry in memory.
+        """
+        image = DrawingImage.of(image)
+        key = image.sha256
+        thumbnail = image.thumbnail()
+        with self._lock:
+            if key not in self._files:
+                path = self._path(key)
+                temp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(image.data)
+                os.replace(temp_path, path)
+                self._files[key] = len(image)
+                self._disk_bytes += len(image)
+                self._evict_disk()
+            else:
+                self._files.move_to_end(key)
+            self._remember_thumbnail(key, thumbnail)
+            self._remember(key, image.data)
+        return key
+
+    def get(self, key):
+        """Full image bytes for key, or None if it is not (or no longer) stored"""
+        with self._lock:
+            data = self._hot.get(key)
+            if data is not None:
+                self._hot.move_to_end(key)
+                self.hits += 1
+                return data
+            if key not in self._files:
+                return None
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                self._forget_file(key)
+                return None
+            self.disk_reads += 1
+            self._files.move_to_end(key)
+            self._remember(key, data)
+        return data
+
+    def thumbnail(self, key):
+        """JPEG thumbnail bytes for key, or None"""
+        with self._lock:
+            thumbnail = self._thumbnails.get(key)
+            if thumbnail is not None:
+                self._thumbnails.move_to_end(key)
+            return thumbnail
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._files or key in self._thumbnails
+
+    def _remember(self, key, data):
+        """Make key the most recently used hot image and trim the LRU to the memory budget"""
+        if key in self._hot:
+            self._hot.move_to_end(key)
+            return
+        if len(data) > self.memory_budget:
+            return
+        self._hot[key] = data
+        self._hot_bytes += len(data)
+        while self._hot_bytes > self.memory_budget:
+            _, evicted = self._hot.popitem(last=False)
+            self._hot_bytes -= len(evicted)
+
+    def _remember_thumbnail(self, key, thumbnail):
+        """Make key the most recently used thumbnail and trim them to the thumbnail budget"""
+        previous = self._thumbnails.pop(key, None)
+        if previous is not None:
+            self._thumbnail_bytes -= len(previous)
+        self._thumbnails[key] = thumbnail
+        self._thumbnail_bytes += len(thumbnail)
+        while self._thumbnail_bytes > self.thumbnail_budget and len(self._thumbnails) > 1:
+            _, evicted = self._thumbnails.popitem(last=False)
+            self._thumbnail_bytes -= len(evicted)
+
+    def _forget_file(self, key):
+        self._disk_bytes -= self._files.pop(key, 0)
+
+    def _evict_disk(self):
+        """Delete least recently used files until the store fits its disk budget"""
+        while self._disk_bytes > self.max_disk_bytes and len(self._files) > 1:
+            key = next(iter(self._files))
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self._forget_file(key)
+            data = self._hot.pop(key, None)
+            if data is not None:
+                self._hot_bytes -= len(data)
+            self.evictions += 1
+
+    def stats(self):
+        """Counters plus the memory and disk currently used"""
+        with self._lock:
+            return {
+                "images": len(self._files),
+                "hot_images": len(self._hot),
+                "memory_bytes": self._hot_bytes,
+                "thumbnails": len(self._thumbnails),
+                "thumbnail_bytes": self._thumbnail_bytes,
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "disk_reads": self.disk_reads,
+                "evictions": self.evictions,
+            }
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """Process-wide image store shared by every Streamlit session"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ImageStore()
+        return _default_store
@@ -0,0 +1,144 @@
+"""
+How page images reach the vision model.
+
+Every strategy turns a DrawingImage into the URL placed in an image_url message
+part:
+
+  inline  - a base64 data: URL embedded in the request. No extra round trip;
+            the default because it has the lowest latency.
+  static  - the image is written once to a content-addressed directory served
+            by a small local HTTP server (for private deployments where the
+            model endpoint can reach this host, e.g. behind a gateway).
+  upload  - the image is uploaded once to imgbb and the public URL is memoized
+            by content hash, so repeated calls for the same page reuse it.
+
+Select a strategy with IMAGE_TRANSPORT (inline / static / upload) or per call.
+Each call records its timing, which is logged and available from
+transport_stats(). The module has no Streamlit dependency.
+"""
+import functools
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import api_client
+from drawing_image import DrawingImage
+
+IMAGE_TRANSPORT = os.getenv("IMAGE_TRANSPORT", "inline")
+
+# Static strategy: where images are stored and how the model reaches them
+STATIC_IMAGE_DIR = os.getenv(
+    "STATIC_IMAGE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".image_store", "static")
+)
+STATIC_IMAGE_HOST = os.getenv("STATIC_IMAGE_HOST", "127.0.0.1")
+STATIC_IMAGE_PORT = int(os.getenv("STATIC_IMAGE_PORT", "8765"))
+STATIC_IMAGE_BASE_URL = os.getenv("STATIC_IMAGE_BASE_URL", "")
+
+# Upload strategy (get a key from https://api.imgbb.com/)
+IMGBB_API_KEY = os.getenv("IMGBB_API_KEY", "02b10ba01695e9bb477f0155e4b7a3a0")
+IMGBB_UPLOAD_URL = "https://api.imgbb.com/1/upload"
+
+_stats = {}
+_stats_lock = threading.Lock()
+_uploaded_urls = {}
+_static_server = None
+_static_server_lock = threading.Lock()
+
+
+def _record(strategy, seconds, image):
+    with _stats_lock:
+        entry = _stats.setdefault(strategy, {"calls": 0, "seconds": 0.0, "bytes": 0})
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        entry["bytes"] += len(image)
+    print(f"[image transport] {strategy}: {seconds * 1000:.1f} ms for {len(image)} bytes ({image.sha256[:12]})")
+
+
+def transport_stats():
+    """Per-strategy call counts, total seconds and bytes since start-up"""
+    with _stats_lock:
+        return {strategy: dict(entry) for strategy, entry in _stats.items()}
+
+
+def _inline_url(image):
+    return image.data_url
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _ensure_static_server():
+    """Start the static file server once per process"""
+    global _static_server
+    with _static_server_lock:
+        if _static_server is None:
+            os.makedirs(STATIC_IMAGE_DIR, exist_ok=True)
+            handler = functools.partial(_QuietHandler, directory=STATIC_IMAGE_DIR)
+            server = ThreadingHTTPServer((STATIC_IMAGE_HOST, STATIC_IMAGE_PORT), handler)
+            threading.Thread(target=server.serve_forever, name="static-images", daemon=True).start()
+            _static_server = server
+        return _static_server
+
+
+def _static_url(image):
+    server = _ensure_static_server()
+    extension = "png" if image.format == "PNG" else "jpg"
+    filename = f"{image.sha256}.{extension}"
+    path = os.path.join(STATIC_IMAGE_DIR, filename)
+    # Content-addressed: an existing file already holds exactly these bytes
+    if not os.path.exists(path):
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(image.data)
+        os.replace(temp_path, path)
+    base_url = STATIC_IMAGE_BASE_URL or f"http://{server.server_address[0]}:{server.server_address[1]}"
+    return f"{base_url.rstrip('/')}/{filename}"
+
+
+def _upload_url(image):
+    url = _uploaded_urls.get(image.sha256)
+    if url:
+        return url
+    response = api_client.post(
+        "upload",
+        IMGBB_UPLOAD_URL,
+        params={"key": IMGBB_API_KEY},
+        files={"image": (f"{image.sha256[:16]}.jpg", image.data, image.media_type)}
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"imgbb upload failed: {response.text}")
+    url = response.json()["data"]["url"]
+    _uploaded_urls[image.sha256] = url
+    return url
+
+
+_STRATEGIES = {
+    "inline": _inline_url,
+    "static": _static_url,
+    "upload": _upload_url,
+}
+
+
+def image_url(image, strategy=None):
+    """
+    URL for an image_url message part using the chosen transport strategy.
+
+    Args:
+        image: DrawingImage or raw image bytes
+        strategy: inline, static or upload (defaults to IMAGE_TRANSPORT)
+
+    Returns:
+        The URL string; raises on failure
+    """
+    image = DrawingImage.of(image)
+    strategy = strategy or IMAGE_TRANSPORT
+    if strategy not in _STRATEGIES:
+        raise ValueError(f"Unknown image transport '{strategy}' (expected one of {', '.join(_STRATEGIES)})")
+    start = time.perf_counter()
+    url = _STRATEGIES[strategy](image)
+    _record(strategy, time.perf_counter() - start, image)
+    return url
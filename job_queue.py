@@ -0,0 +1,291 @@
+"""
+Background job queue for drawing files.
+
+Each submitted file becomes a Job that runs on a process-wide pool of job
+threads, independent of any Streamlit script run: a rerun, another click or
+a browser tab going to sleep does not stop or block it. A running job pushes
+its pages through pipeline.run_pipeline (extraction_core.analyze_page per
+page) and counts them as they finish. The UI polls the job for progress and
+collects the finished pages with take_results(), in page order, to write
+them into its own tables on the script thread.
+
+Finished pages are journaled to the checkpoint journal (checkpoint.py) with
+their image in the image store. A file submitted again - after a server
+restart, or by another session - has its journaled pages delivered without
+rendering them or calling the API, and only its remaining pages are run.
+
+Cancelling a queued job removes it before it starts. Cancelling a running
+job stops it from pulling further pages; pages already in flight finish and
+are still delivered. The module has no Streamlit dependency.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from checkpoint import dump_extraction, get_checkpoint_journal, load_extraction, settings_fingerprint
+from extraction_core import analyze_page, extraction_failed, iter_file_pages
+from pipeline import PIPELINE_CONCURRENCY, run_pipeline
+
+# Files processed at the same time; each runs up to its own page concurrency
+JOB_QUEUE_WORKERS = max(1, int(os.getenv("JOB_QUEUE_WORKERS", "2")))
+# How often the UI refreshes its view of running jobs
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+def content_digest(data):
+    """SHA-256 of a file's bytes, used to recognize a file that is already queued"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_source(source):
+    """A job's file: its bytes as given, or read from the path it was given as"""
+    if isinstance(source, (bytes, bytearray)):
+        return source
+    with open(source, "rb") as f:
+        return f.read()
+
+
+class Job:
+    """
+    One file being processed in the background.
+
+    data is the file's bytes, or the path of a file that is only read when
+    the job starts (digest should then be given, to avoid reading it twice).
+    """
+
+    def __init__(self, file_name, data, settings, page_concurrency=None, journal=None, digest=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.file_name = file_name
+        self.digest = digest or content_digest(read_source(data))
+        self.settings = settings
+        self.page_concurrency = page_concurrency or PIPELINE_CONCURRENCY
+        self.journal = journal
+        self.fingerprint = settings_fingerprint(settings)
+        self.status = QUEUED
+        self.page_count = None
+        self.pages_done = 0
+        self.pages_failed = 0
+        self.pages_resumed = 0  # delivered from the checkpoint journal
+        self.errors = []
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._data = data
+        self._cancel = threading.Event()
+        self._ready = {}  # page index -> outcome, until taken
+        self._next_index = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.file_name!r}, {self.status}, {self.pages_done}/{self.page_count or '?'})"
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def progress(self):
+        """Fraction of pages finished (0.0 until the page count is known)"""
+        if self.status == DONE:
+            return 1.0
+        return self.pages_done / self.page_count if self.page_count else 0.0
+
+    @property
+    def seconds(self):
+        """Run time so far (or in total once finished)"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def cancel(self):
+        """Stop the job: a queued job never starts, a running one stops pulling pages"""
+        self._cancel.set()
+        with self._lock:
+            if self.status == QUEUED:
+                self.status = CANCELLED
+                self.finished_at = time.time()
+                self._data = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def take_results(self):
+        """
+        Finished page outcomes not taken yet, in page order.
+
+        Outcomes are the run_pipeline outcome dicts ("item", "value" - the
+        extraction - "error", "seconds"); a page is only returned once all
+        pages before it have been returned. Pages taken from the journal have
+        no page image in "item".
+        """
+        with self._lock:
+            results = []
+            while self._next_index in self._ready:
+                results.append(self._ready.pop(self._next_index))
+                self._next_index += 1
+            return results
+
+    def add_error(self, message):
+        """Attach a message for a page the caller could not use"""
+        with self._lock:
+            self.errors.append(message)
+
+    @property
+    def has_results(self):
+        with self._lock:
+            return self._next_index in self._ready
+
+    # --- Called from the job thread ---------------------------------------
+
+    def _journaled(self, page_data):
+        """The extraction journaled for a page, or None if the page has to be run"""
+        if self.journal is None or page_data is None:
+            return None
+        return load_extraction(page_data)
+
+    def _resume(self, page_index, extraction):
+        extraction["file_name"] = self.file_name  # the journal may hold it under another name
+        with self._lock:
+            self.pages_done += 1
+            self.pages_resumed += 1
+            self._ready[page_index] = {
+                "index": page_index,
+                "item": (self.file_name, page_index, None),
+                "value": extraction,
+                "error": None,
+                "seconds": 0.0,
+            }
+
+    def _pages(self):
+        """The file's pages not in the journal, stopping as soon as the job is cancelled"""
+        def file_error(file_name, error):
+            self.add_error(f"{file_name}: {str(error)}")
+
+        if self.journal is not None:
+            journaled = self.journal.completed_file(self.digest, self.fingerprint) or []
+            extractions = [self._journaled(page_data) for page_data in journaled]
+            if extractions and all(extractions):
+                # The whole file is journaled: nothing to render
+                self.page_count = len(extractions)
+                for page_index, extraction in enumerate(extractions):
+                    self._resume(page_index, extraction)
+                return
+
+        try:
+            data = read_source(self._data)
+        except OSError as e:
+            file_error(self.file_name, e)
+            return
+        for page in iter_file_pages([(self.file_name, data)], on_error=file_error):
+            if self._cancel.is_set():
+                return
+            _, page_index, image_data = page
+            if self.page_count is None and isinstance(image_data, tuple) and len(image_data) >= 3:
+                self.page_count = image_data[2]
+            if self.journal is not None:
+                extraction = self._journaled(self.journal.get(self.digest, page_index, self.fingerprint))
+                if extraction is not None:
+                    self._resume(page_index, extraction)
+                    continue
+            yield page
+
+    def _page_done(self, outcome, completed):
+        page_index = outcome["item"][1]
+        error = outcome["error"]
+        if error is None and extraction_failed(outcome["value"]):
+            # The API call failed without raising: its result holds the ❌ message
+            error = outcome["value"]["result"] or "no result from the API"
+        if self.journal is not None and error is None:
+            self.journal.record_page(self.digest, page_index, self.page_count or 1, self.fingerprint,
+                                     dump_extraction(outcome["value"]), self.file_name)
+        with self._lock:
+            self.pages_done += 1
+            if error is not None:
+                self.pages_failed += 1
+                self.errors.append(f"{self.file_name}: {str(error)}")
+            # Keyed by page, since pages taken from the journal never enter the pipeline
+            self._ready[page_index] = outcome
+
+    def _run(self):
+        with self._lock:
+            if self.status != QUEUED:
+                return  # cancelled while waiting
+            self.status = RUNNING
+            self.started_at = time.time()
+        try:
+            run_pipeline(
+                self._pages(),
+                lambda page: analyze_page(page, self.settings),
+                max_concurrency=self.page_concurrency,
+                on_complete=self._page_done
+            )
+            # pages_done includes the pages that raised; a job with errors and no page that succeeded failed
+            succeeded = self.pages_done - self.pages_failed
+            status = CANCELLED if self._cancel.is_set() else (FAILED if self.errors and not succeeded else DONE)
+        except Exception as e:
+            print(f"Job {self.id} ({self.file_name}) failed: {str(e)}")
+            self.add_error(f"{self.file_name}: {str(e)}")
+            status = FAILED
+        with self._lock:
+            self.status = status
+            self.finished_at = time.time()
+            self._data = None  # the file bytes are no longer needed
+
+
+class JobQueue:
+    """Thread pool running Jobs outside any Streamlit script run"""
+
+    def __init__(self, max_jobs=JOB_QUEUE_WORKERS, journal=None):
+        self.max_jobs = max_jobs
+        self.journal = journal
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="job")
+        self._jobs = {}  # active jobs by id
+        self._lock = threading.Lock()
+
+    def submit(self, file_name, data, settings, page_concurrency=None, digest=None):
+        """Queue one file (bytes or a path, see Job) and return its Job"""
+        job = Job(file_name, data, settings, page_concurrency, self.journal, digest)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        try:
+            job._run()
+        finally:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+
+    def stats(self):
+        """Number of queued and running jobs across all sessions"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "queued": sum(1 for job in jobs if job.status == QUEUED),
+            "running": sum(1 for job in jobs if job.status == RUNNING),
+            "workers": self.max_jobs,
+        }
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide job queue shared by every Streamlit session"""
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue(journal=get_checkpoint_journal())
+        return _default_queue
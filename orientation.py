@@ -0,0 +1,289 @@
+"""
+Local page orientation detection.
+
+Orientation is decided on this machine instead of by a vision-model call per
+page. The engine tries, in order:
+
+  1. the PDF text layer - character-weighted text direction in the rendered
+     page, which already accounts for the PDF /Rotate entry (exact, ~free)
+  2. a fast ink projection-profile heuristic on a downsampled array (always
+     available); when it is inconclusive and Tesseract is installed, OCR of
+     the title-block corner decides between its two leading candidates
+
+and stops at the first method that is confident. Each result carries a
+confidence in [0, 1], the method that produced it and how long detection took,
+so callers can fall back to the remote model only for low-confidence pages.
+
+Rotations use the same tokens as the vision prompt: ROTATE_0, ROTATE_90
+(clockwise), ROTATE_180 and ROTATE_270 (90 degrees counter-clockwise).
+The module has no Streamlit dependency.
+"""
+import functools
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+# Results at or above this confidence are trusted without asking the vision model
+ORIENTATION_MIN_CONFIDENCE = 0.75
+
+# Text-layer votes need at least this many characters to count
+MIN_DIRECTION_CHARS = 20
+
+# Working size of the projection-profile heuristic
+PROJECTION_MAX_SIDE = 800
+
+# Projection margins treated as a clear text axis / a clear direction along it
+AXIS_CLEAR = 0.15
+DIRECTION_CLEAR = 0.25
+
+# Share of the direction score taken from the title-block corner (rest: ink centroid)
+DIRECTION_CORNER_WEIGHT = 0.7
+
+# Direction margin at which the projection answer is trusted on its own, and the
+# confidence it then gets. Measured on synthetic sheets in all four rotations:
+# pages with a title block score margins of 0.9-1.3, pages with only geometry
+# (where the heuristic has nothing to go on) at most about 0.45
+DIRECTION_DECISIVE = 0.7
+PROJECTION_MAX_CONFIDENCE = 0.9
+
+# Title-block tiebreak: crop (fraction of width, height) of the bottom-right
+# corner, working size of the page it is cut from, and its maximum confidence
+TITLE_BLOCK_CROP = (0.35, 0.3)
+TITLE_BLOCK_OCR_MAX_SIDE = 2400
+OCR_MAX_CONFIDENCE = 0.8
+
+ROTATIONS = ("ROTATE_0", "ROTATE_90", "ROTATE_180", "ROTATE_270")
+
+# Degrees to rotate clockwise -> rotation token
+_ROTATION_BY_DEGREES = {0: "ROTATE_0", 90: "ROTATE_90", 180: "ROTATE_180", 270: "ROTATE_270"}
+
+
+@functools.lru_cache(maxsize=1)
+def tesseract_available():
+    """Whether pytesseract is installed and can run the tesseract binary"""
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def _downscale(image, max_side):
+    """Grayscale copy whose longest side is at most max_side"""
+    gray = image.convert("L")
+    scale = max_side / max(gray.size)
+    if scale < 1:
+        gray = gray.resize((max(1, int(gray.width * scale)), max(1, int(gray.height * scale))), Image.BILINEAR)
+    return gray
+
+
+def text_layer_orientation(text_layer):
+    """Orientation from the character-weighted text directions of a PDF text layer"""
+    directions = (text_layer or {}).get("directions")
+    if not directions:
+        return None
+    total = sum(directions.values())
+    if total < MIN_DIRECTION_CHARS:
+        return None
+    rotation = max(ROTATIONS, key=lambda key: directions.get(key, 0))
+    return rotation, directions[rotation] / total
+
+
+def _open_gray(image, max_side):
+    """
+    Grayscale copy of an image with its longest side at most max_side.
+
+    JPEGs are decoded directly at a reduced DCT scale (Image.draft), which
+    skips most of the decode work on large rendered sheets.
+    """
+    if hasattr(image, "grayscale"):
+        # DrawingImage: reuse its memoized grayscale variant
+        return image.grayscale(max_side)
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(image))
+    scale = max_side / max(image.size)
+    if scale < 1 and image.format == "JPEG" and image.mode in ("RGB", "L"):
+        image.draft("L", (int(image.width * scale) + 1, int(image.height * scale) + 1))
+    return _downscale(image, max_side)
+
+
+def _ink_mask(gray):
+    """Boolean ink mask thresholded relative to the paper level"""
+    gray = np.asarray(gray, dtype=np.uint8)
+    # Thin strokes turn light grey when downscaled, so threshold relative to the paper
+    return gray < min(200, int(np.percentile(gray, 90)) - 30)
+
+
+def _axis_term(ink):
+    """
+    +1 when text lines run horizontally, -1 when vertically.
+
+    Horizontal text lines make the row profile alternate sharply between ink
+    and paper, while the column profile stays smooth.
+    """
+    row_roughness = np.abs(np.diff(ink.mean(axis=1))).mean()
+    col_roughness = np.abs(np.diff(ink.mean(axis=0))).mean()
+    return (row_roughness - col_roughness) / max(row_roughness + col_roughness, 1e-9)
+
+
+def _direction_term(upright):
+    """
+    How much an upright-candidate view looks like an upright sheet, in [-1, 1].
+
+    The title block sits bottom-right and notes and tables gather along the
+    bottom edge, so upright sheets carry the most ink in the bottom-right
+    corner and have their ink centroid below the middle.
+    """
+    height, width = upright.shape
+    ch, cw = max(1, height // 4), max(1, width // 4)
+    bottom_right = upright[-ch:, -cw:].mean()
+    others = (upright[:ch, :cw].mean() + upright[:ch, -cw:].mean() + upright[-ch:, :cw].mean()) / 3
+    corner = (bottom_right - others) / max(bottom_right + others, 1e-9)
+
+    rows = upright.sum(axis=1)
+    centroid = (rows * np.arange(height)).sum() / max(rows.sum(), 1) / max(height - 1, 1)
+    return DIRECTION_CORNER_WEIGHT * corner + (1 - DIRECTION_CORNER_WEIGHT) * (centroid - 0.5) * 2
+
+
+def _title_block_ocr_score(gray, rotation):
+    """Tesseract word-confidence score of the title-block corner if the page were turned by rotation"""
+    import pytesseract
+    upright = gray.transpose(_TRANSPOSE[rotation]) if rotation in _TRANSPOSE else gray
+    width, height = upright.size
+    crop = upright.crop((int(width * (1 - TITLE_BLOCK_CROP[0])), int(height * (1 - TITLE_BLOCK_CROP[1])), width, height))
+    try:
+        data = pytesseract.image_to_data(crop, output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        print(f"Title-block OCR failed: {str(e)}")
+        return 0.0
+    return float(sum(
+        float(conf) for conf, word in zip(data["conf"], data["text"])
+        if float(conf) > 0 and len(word.strip()) >= 2 and any(char.isalnum() for char in word)
+    ))
+
+
+# np.rot90 turns counter-clockwise for positive k; these k values apply each fix
+_ROT90_K = {"ROTATE_0": 0, "ROTATE_90": -1, "ROTATE_180": 2, "ROTATE_270": 1}
+
+# Clockwise rotations expressed as PIL transposes (which turn counter-clockwise)
+_TRANSPOSE = {
+    "ROTATE_90": Image.Transpose.ROTATE_270,
+    "ROTATE_180": Image.Transpose.ROTATE_180,
+    "ROTATE_270": Image.Transpose.ROTATE_90,
+}
+
+
+def _projection_confidence(margin, axis):
+    """Confidence of a projection answer from its direction margin and axis term"""
+    return float(PROJECTION_MAX_CONFIDENCE * min(1.0, margin / DIRECTION_DECISIVE) * min(1.0, abs(axis) / AXIS_CLEAR))
+
+
+def projection_orientation(image, use_tesseract=True):
+    """
+    Fast orientation estimate from ink projection profiles.
+
+    Works on a downsampled grayscale array: the row/column profile statistics
+    decide the text axis, then corner and centroid statistics decide the
+    direction along it. It stops as soon as one orientation clearly wins; only
+    when the answer stays below ORIENTATION_MIN_CONFIDENCE is Tesseract run,
+    and then only on the title-block corner crop of the two leading candidates.
+
+    Args:
+        image: PIL image, DrawingImage or encoded image bytes
+        use_tesseract: Allow the title-block OCR tiebreak when Tesseract is installed
+
+    Returns:
+        (rotation, confidence)
+    """
+    if isinstance(image, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(image))
+    gray = _open_gray(image, PROJECTION_MAX_SIDE)
+    ink = _ink_mask(gray)
+    if not ink.any():
+        return "ROTATE_0", 0.0
+
+    axis = _axis_term(ink)
+    if axis >= AXIS_CLEAR:
+        candidates = ["ROTATE_0", "ROTATE_180"]
+    elif axis <= -AXIS_CLEAR:
+        candidates = ["ROTATE_90", "ROTATE_270"]
+    else:
+        candidates = list(ROTATIONS)
+
+    scores = {}
+    for rotation in candidates:
+        upright = np.rot90(ink, _ROT90_K[rotation])
+        # Axis evidence counts for the candidates whose text would end up horizontal
+        axis_sign = 1 if rotation in ("ROTATE_0", "ROTATE_180") else -1
+        scores[rotation] = _direction_term(upright) + axis * axis_sign
+        # Early exit: the upright reading is checked first and usually wins outright
+        if rotation == "ROTATE_0" and axis >= AXIS_CLEAR and scores[rotation] - axis >= DIRECTION_CLEAR:
+            # ROTATE_180 mirrors the direction term, so the margin over it is about twice this one
+            confidence = _projection_confidence(2 * (scores[rotation] - axis), axis)
+            if confidence >= ORIENTATION_MIN_CONFIDENCE:
+                return rotation, confidence
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    best, runner_up = ranked[0], ranked[1]
+    margin = scores[best] - scores[runner_up]
+    confidence = _projection_confidence(margin, axis)
+    if confidence >= ORIENTATION_MIN_CONFIDENCE or not (use_tesseract and tesseract_available()):
+        return best, confidence
+
+    # Inconclusive: read the title-block corner of the two leading candidates
+    ocr_gray = _open_gray(image, TITLE_BLOCK_OCR_MAX_SIDE)
+    ocr_scores = {rotation: _title_block_ocr_score(ocr_gray, rotation) for rotation in (best, runner_up)}
+    ocr_best = max(ocr_scores, key=ocr_scores.get)
+    total = sum(ocr_scores.values())
+    if total <= 0:
+        return best, confidence
+    return ocr_best, float(OCR_MAX_CONFIDENCE * ocr_scores[ocr_best] / total)
+
+
+def detect_orientation(image_bytes, text_layer=None, min_confidence=ORIENTATION_MIN_CONFIDENCE):
+    """
+    Detect page orientation locally.
+
+    Args:
+        image_bytes: Rendered page or uploaded image (bytes or DrawingImage)
+        text_layer: Optional text-layer dict from text_layer.extract_text_layer
+        min_confidence: Stop at the first method at least this confident
+
+    Returns:
+        {"rotation": "ROTATE_0".., "confidence": float, "method": str, "seconds": float}
+        with the most confident result found.
+    """
+    start = time.perf_counter()
+    best = {"rotation": "ROTATE_0", "confidence": 0.0, "method": "default"}
+
+    for method in ("text_layer", "projection"):
+        if method == "text_layer":
+            estimate = text_layer_orientation(text_layer)
+        else:
+            image = image_bytes if hasattr(image_bytes, "grayscale") else Image.open(io.BytesIO(image_bytes))
+            estimate = projection_orientation(image)
+        if estimate is None:
+            continue
+        rotation, confidence = estimate
+        if confidence > best["confidence"]:
+            best = {"rotation": rotation, "confidence": confidence, "method": method}
+        if confidence >= min_confidence:
+            break
+
+    best["seconds"] = time.perf_counter() - start
+    return best
+
+
+def rotate_image_bytes(image_bytes, rotation):
+    """Apply a rotation token to encoded image bytes; ROTATE_0 returns the input unchanged"""
+    transpose = _TRANSPOSE.get(rotation)
+    if transpose is None:
+        return image_bytes
+    image = Image.open(io.BytesIO(image_bytes))
+    rotated = image.transpose(transpose)
+    out = io.BytesIO()
+    rotated.save(out, format=image.format or 'JPEG')
+    return out.getvalue()
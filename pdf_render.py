@@ -0,0 +1,185 @@
+"""
+Page rasterisation for uploaded PDFs.
+
+Pages are rendered on a process pool and handed back to the caller as a
+generator in page order, so analysis of page 1 can start while later pages are
+still being rendered. One pool serves every PDF for the life of the process.
+Its workers are spawned rather than forked: the callers are threads of a
+multithreaded server, and a forked child can inherit locks held by other
+threads. Each PDF is written once to a temporary file that the workers open
+by path. The module has no Streamlit dependency so it can be imported safely
+by pool workers.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from text_layer import extract_text_layer
+
+# Zoom factor used for every rendered page (2.5x ~ 180 DPI)
+RENDER_ZOOM = 2.5
+
+# JPEG quality used when encoding rendered pages
+RENDER_JPEG_QUALITY = 90
+
+# Number of render processes and how many pages may be rendered ahead of the consumer
+RENDER_WORKERS = max(1, min(4, os.cpu_count() or 1))
+RENDER_WORK_AHEAD = RENDER_WORKERS * 2
+
+# Documents each worker process keeps open, most recently used last
+RENDER_WORKER_OPEN_DOCUMENTS = 2
+_worker_documents = OrderedDict()  # path -> fitz.Document
+
+
+def page_label(page_number, page_count):
+    """Human-readable page label carried alongside the image instead of drawn on it"""
+    return f"Page {page_number}/{page_count}"
+
+
+def render_page(page, zoom=RENDER_ZOOM):
+    """
+    Render a single PyMuPDF page straight to JPEG bytes.
+
+    PIL wraps the Pixmap samples buffer without copying it and encodes it once;
+    there is no intermediate PNG encode/decode. The page label is not burned
+    into the pixels - callers get the page number and count next to the image
+    and can build it with page_label().
+    """
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    img = Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='JPEG', quality=RENDER_JPEG_QUALITY, optimize=True)
+    return img_byte_arr.getvalue()
+
+
+def _worker_document(path):
+    """The document at path, opened once per worker process rather than once per page"""
+    document = _worker_documents.get(path)
+    if document is not None:
+        _worker_documents.move_to_end(path)
+        return document
+    document = fitz.open(path)
+    _worker_documents[path] = document
+    while len(_worker_documents) > RENDER_WORKER_OPEN_DOCUMENTS:
+        _, closed = _worker_documents.popitem(last=False)
+        closed.close()
+    return document
+
+
+def _render_worker_page(path, page_num, zoom, extract_text):
+    """Render one page of the PDF at path (runs inside the pool)"""
+    return _render_document_page(_worker_document(path), page_num, zoom, extract_text)
+
+
+def _render_document_page(document, page_num, zoom, extract_text):
+    """Render a page and, if requested, read its text layer while the page is loaded"""
+    page = document[page_num]
+    image_bytes = render_page(page, zoom)
+    text_layer = extract_text_layer(page) if extract_text else None
+    return image_bytes, text_layer
+
+
+def iter_pdf_pages(pdf_bytes, zoom=RENDER_ZOOM, max_workers=None, work_ahead=None, extract_text=False):
+    """
+    Render a PDF page by page and yield results in page order.
+
+    The document is opened eagerly so an invalid PDF raises here rather than on
+    the first iteration; rendering itself happens lazily as the caller consumes
+    the generator.
+
+    Args:
+        pdf_bytes: Raw PDF file contents
+        zoom: Render zoom factor
+        max_workers: 1 renders in the calling process; otherwise pages go to the
+            shared pool of RENDER_WORKERS processes (see get_render_pool)
+        work_ahead: Maximum number of pages rendered ahead of the consumer
+            (defaults to RENDER_WORK_AHEAD)
+        extract_text: Also extract each page's text layer (see text_layer.py)
+
+    Returns:
+        Generator of (image_bytes, page_number, page_count, title) tuples, with a
+        fifth text_layer item (dict or None) when extract_text is set
+    """
+    pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    page_count = pdf_document.page_count
+    document_title = (pdf_document.metadata or {}).get('title', '')
+
+    max_workers = max_workers or RENDER_WORKERS
+    work_ahead = max(1, work_ahead or RENDER_WORK_AHEAD)
+
+    # A pool is not worth starting for single-page documents
+    if page_count <= 1 or max_workers <= 1:
+        return _iter_pages_inline(pdf_document, page_count, document_title, zoom, extract_text)
+
+    pdf_document.close()
+    return _iter_pages_pooled(pdf_bytes, page_count, document_title, zoom, work_ahead, extract_text)
+
+
+def _page_tuple(rendered, page_num, page_count, document_title, extract_text):
+    """Shape a rendered page into the tuple handed to callers"""
+    image_bytes, text_layer = rendered
+    if extract_text:
+        return (image_bytes, page_num + 1, page_count, document_title, text_layer)
+    return (image_bytes, page_num + 1, page_count, document_title)
+
+
+def _iter_pages_inline(pdf_document, page_count, document_title, zoom, extract_text):
+    """Render pages sequentially in the calling process"""
+    try:
+        for page_num in range(page_count):
+            rendered = _render_document_page(pdf_document, page_num, zoom, extract_text)
+            yield _page_tuple(rendered, page_num, page_count, document_title, extract_text)
+    finally:
+        pdf_document.close()
+
+
+def _iter_pages_pooled(pdf_bytes, page_count, document_title, zoom, work_ahead, extract_text):
+    """Render pages on the shared pool, keeping at most work_ahead pages in flight"""
+    executor = get_render_pool()
+    with tempfile.NamedTemporaryFile(prefix="render-", suffix=".pdf", delete=False) as f:
+        f.write(pdf_bytes)
+    path = f.name
+    pending = deque()
+    next_page = 0
+    try:
+        while next_page < page_count or pending:
+            # Top up the work-ahead window
+            while next_page < page_count and len(pending) < work_ahead:
+                future = executor.submit(_render_worker_page, path, next_page, zoom, extract_text)
+                pending.append((next_page, future))
+                next_page += 1
+
+            # Always wait on the oldest page so results come back in order
+            page_num, future = pending.popleft()
+            yield _page_tuple(future.result(), page_num, page_count, document_title, extract_text)
+    finally:
+        # Stop rendering if the consumer abandons the generator early
+        for _, future in pending:
+            future.cancel()
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # still open in a worker (Windows); the system temp cleanup removes it
+
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """Process-wide render pool of RENDER_WORKERS spawned processes, started on first use"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _render_pool
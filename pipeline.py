@@ -0,0 +1,100 @@
+"""
+Concurrent page pipeline.
+
+Each page goes through its chain of blocking stages (orientation, type
+identification, extraction, second pass) on a worker thread, and many pages -
+from one or many files - are in flight at once under a global concurrency
+limit. Pages are pulled lazily from the input iterator, so PDF rendering
+overlaps with analysis and at most max_concurrency pages are held in memory
+waiting for the API.
+
+Results are returned in input order regardless of completion order, so the
+caller can write them back deterministically. The module has no Streamlit
+dependency; Streamlit callers attach their script context through
+thread_initializer.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Maximum number of pages processed at the same time (across all files)
+PIPELINE_CONCURRENCY = max(1, int(os.getenv("PIPELINE_CONCURRENCY", "8")))
+
+_END = object()
+
+
+def run_pipeline(items, process_item, max_concurrency=None, thread_initializer=None, on_complete=None):
+    """
+    Run process_item over items concurrently and return the outcomes in input order.
+
+    Args:
+        items: Iterable of work items (may be a lazy generator)
+        process_item: Blocking callable applied to each item on a worker thread
+        max_concurrency: Maximum number of items in flight (defaults to PIPELINE_CONCURRENCY)
+        thread_initializer: Called once in every worker thread before it runs any work
+        on_complete: Called on the calling thread as each item finishes, with
+            (outcome, completed_count)
+
+    Returns:
+        List of outcome dicts, one per item, in input order:
+            {"index": int, "item": ..., "value": ..., "error": Exception or None, "seconds": float}
+    """
+    max_concurrency = max(1, max_concurrency or PIPELINE_CONCURRENCY)
+    # One extra thread pulls items from the (possibly rendering) input iterator
+    executor = ThreadPoolExecutor(
+        max_workers=max_concurrency + 1,
+        thread_name_prefix="pipeline",
+        initializer=thread_initializer
+    )
+    try:
+        return asyncio.run(_run_all(iter(items), process_item, max_concurrency, executor, on_complete))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def _run_all(iterator, process_item, max_concurrency, executor, on_complete):
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max_concurrency)
+    outcomes = []
+    tasks = []
+    completed = 0
+
+    async def run_one(index, item):
+        nonlocal completed
+        start = time.perf_counter()
+        try:
+            value = await loop.run_in_executor(executor, process_item, item)
+            error = None
+        except Exception as exc:
+            value, error = None, exc
+        finally:
+            slots.release()
+        outcome = {
+            "index": index,
+            "item": item,
+            "value": value,
+            "error": error,
+            "seconds": time.perf_counter() - start,
+        }
+        outcomes.append(outcome)
+        completed += 1
+        if on_complete:
+            on_complete(outcome, completed)
+
+    index = 0
+    try:
+        while True:
+            # Wait for a free slot before pulling the next item so input is consumed lazily
+            await slots.acquire()
+            item = await loop.run_in_executor(executor, next, iterator, _END)
+            if item is _END:
+                slots.release()
+                break
+            tasks.append(asyncio.create_task(run_one(index, item)))
+            index += 1
+    finally:
+        # Let pages already in flight finish even if the input iterator failed
+        if tasks:
+            await asyncio.gather(*tasks)
+    return sorted(outcomes, key=lambda outcome: outcome["index"])
@@ -0,0 +1,273 @@
+"""
+Typed pressure, temperature and length values.
+
+One compiled pattern reads values such as "160 bar", "10...160 BAR",
+"-10°C +60°C", "max 80 DEG C", "2000 psi" or "Ø110 mm" into a Range (numeric
+min/max, either of which may be open) or a Quantity (min == max) in the
+canonical unit of its kind:
+
+  pressure     BAR     (psi, MPa, kPa, mbar and kg/cm² are converted)
+  temperature  DEG C   (°F is converted)
+  length       mm      (cm, m and inches are converted)
+
+Each end of a range is converted with its own unit ("10 bar to 2 MPa" is
+10 to 20 BAR); a range whose ends are of different kinds is not a quantity.
+
+Text that is not a quantity of the expected kind - "ISO VG46", "Ambient",
+"see table" - is never rewritten. normalize_value() handles a single value;
+normalize_series() / normalize_table() run the same pattern over whole pandas
+columns at once for batch exports. The module has no Streamlit dependency.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+CANONICAL_UNITS = {
+    "pressure": "BAR",
+    "temperature": "DEG C",
+    "length": "mm",
+}
+
+# Unit token (upper case, without spaces, dots, degree signs and DEG words) -> (kind, scale, offset)
+UNITS = {
+    "BAR": ("pressure", 1.0, 0.0),
+    "BARG": ("pressure", 1.0, 0.0),
+    "BAR(G)": ("pressure", 1.0, 0.0),
+    "MBAR": ("pressure", 0.001, 0.0),
+    "PSI": ("pressure", 0.0689476, 0.0),
+    "PSIG": ("pressure", 0.0689476, 0.0),
+    "MPA": ("pressure", 10.0, 0.0),
+    "KPA": ("pressure", 0.01, 0.0),
+    "KG/CM2": ("pressure", 0.980665, 0.0),
+    "KG/CM²": ("pressure", 0.980665, 0.0),
+    "KGF/CM2": ("pressure", 0.980665, 0.0),
+    "KGF/CM²": ("pressure", 0.980665, 0.0),
+    "C": ("temperature", 1.0, 0.0),
+    "F": ("temperature", 5.0 / 9.0, -32.0 * 5.0 / 9.0),
+    "MM": ("length", 1.0, 0.0),
+    "CM": ("length", 10.0, 0.0),
+    "M": ("length", 1000.0, 0.0),
+    "IN": ("length", 25.4, 0.0),
+    "INCH": ("length", 25.4, 0.0),
+    '"': ("length", 25.4, 0.0),
+}
+
+# Result columns normalized by normalize_table, by kind (matched ignoring case, "_" and "-")
+COLUMN_KINDS = {
+    "OPERATING PRESSURE": "pressure",
+    "OPERATING PRESSURE MAX": "pressure",
+    "WORKING PRESSURE": "pressure",
+    "PRESSURE RATING": "pressure",
+    "TEST PRESSURE": "pressure",
+    "MAX PRESSURE": "pressure",
+    "OPERATING TEMPERATURE": "temperature",
+    "OPERATING TEMPERATURE RANGE": "temperature",
+    "BORE DIAMETER": "length",
+    "ROD DIAMETER": "length",
+    "OUTSIDE DIAMETER": "length",
+    "STROKE LENGTH": "length",
+    "CLOSE LENGTH": "length",
+    "CLOSED LENGTH": "length",
+    "OPEN LENGTH": "length",
+}
+
+_NUMBER = r"[-+−]?\d+(?:\.\d+)?"
+_UNIT = (
+    r"(?:KGF?\s*/\s*CM(?:2|²)|MBAR|BAR\s*\(G\)|BARG?|PSIG?|MPA|KPA"
+    r"|(?:DEG(?:REES?)?\.?\s*)?[°º]?\s*[CF]|MM|CM|INCH|IN|M|\")"
+)
+_QUALIFIER = r"(?:MAX(?:IMUM)?\.?|MIN(?:IMUM)?\.?|UP\s+TO|≤|<=|<|≥|>=|>)"
+_SEPARATOR = r"(?:\s*(?:TO|–|—|-|~|\.{2,3}|…)\s*|\s+(?=[+]))"
+
+QUANTITY_PATTERN = re.compile(
+    rf"^\s*(?P<pre>{_QUALIFIER})?\s*[ØΦ⌀]?\s*(?P<low>{_NUMBER})\s*(?P<low_unit>{_UNIT})?"
+    rf"(?:{_SEPARATOR}(?P<high>{_NUMBER})\s*(?P<high_unit>{_UNIT})?)?"
+    rf"\s*(?P<post>{_QUALIFIER})?\s*$",
+    re.IGNORECASE
+)
+_UNIT_NOISE = re.compile(r"[\s.°º]|DEG(?:REES?)?", re.IGNORECASE)
+_UPPER_BOUND = {"MAX", "MAXIMUM", "UP TO", "≤", "<=", "<"}
+
+# Column-wise lookups for normalize_series
+_UNIT_KINDS = {unit: entry[0] for unit, entry in UNITS.items()}
+_UNIT_SCALES = {unit: entry[1] for unit, entry in UNITS.items()}
+_UNIT_OFFSETS = {unit: entry[2] for unit, entry in UNITS.items()}
+
+
+class Range:
+    """Numeric range in a canonical unit; min or max is None for an open bound"""
+
+    __slots__ = ("min", "max", "unit")
+
+    def __init__(self, min, max, unit):
+        self.min = min
+        self.max = max
+        self.unit = unit
+
+    def __eq__(self, other):
+        return isinstance(other, Range) and (self.min, self.max, self.unit) == (other.min, other.max, other.unit)
+
+    def __hash__(self):
+        return hash((self.min, self.max, self.unit))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.min!r}, {self.max!r}, {self.unit!r})"
+
+    def __str__(self):
+        if self.min is None:
+            return f"max {format_number(self.max)} {self.unit}"
+        if self.max is None:
+            return f"min {format_number(self.min)} {self.unit}"
+        if self.min == self.max:
+            return f"{format_number(self.min)} {self.unit}"
+        return f"{format_number(self.min)} to {format_number(self.max)} {self.unit}"
+
+
+class Quantity(Range):
+    """A single value (a Range whose min and max are equal)"""
+
+    __slots__ = ()
+
+    def __init__(self, value, unit):
+        super().__init__(value, value, unit)
+
+    @property
+    def value(self):
+        return self.min
+
+
+def format_number(number):
+    """Up to three decimals, without trailing zeros"""
+    text = f"{number:.3f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def _unit_key(unit):
+    return _UNIT_NOISE.sub("", unit).upper() if unit else ""
+
+
+def _to_float(number):
+    return float(number.replace("−", "-"))
+
+
+def parse_quantity(text, kind):
+    """
+    Read text as a quantity of the given kind.
+
+    Returns:
+        A Quantity or Range in the canonical unit of kind, or None if text is
+        not a quantity of that kind (it should then be left as written)
+    """
+    match = QUANTITY_PATTERN.match(text or "")
+    if not match:
+        return None
+    # Each end of a range is converted with its own unit; an end without one shares the other's
+    low_unit = _unit_key(match.group("low_unit") or match.group("high_unit"))
+    high_unit = _unit_key(match.group("high_unit") or match.group("low_unit"))
+    low_kind, low_scale, low_offset = UNITS.get(low_unit, (None, 1.0, 0.0)) if low_unit else (kind, 1.0, 0.0)
+    high_kind, high_scale, high_offset = UNITS.get(high_unit, (None, 1.0, 0.0)) if high_unit else (kind, 1.0, 0.0)
+    if low_kind != kind or (match.group("high") is not None and high_kind != kind):
+        return None
+
+    canonical = CANONICAL_UNITS[kind]
+    low = _to_float(match.group("low")) * low_scale + low_offset
+    if match.group("high") is not None:
+        high = _to_float(match.group("high")) * high_scale + high_offset
+        return Range(min(low, high), max(low, high), canonical)
+
+    qualifier = (match.group("pre") or match.group("post") or "").upper().rstrip(".")
+    qualifier = " ".join(qualifier.split())
+    if qualifier:
+        return Range(None, low, canonical) if qualifier in _UPPER_BOUND else Range(low, None, canonical)
+    return Quantity(low, canonical)
+
+
+def normalize_value(text, kind):
+    """Canonical text for a quantity of the given kind; anything else is returned unchanged"""
+    quantity = parse_quantity(text, kind)
+    return str(quantity) if quantity is not None else text
+
+
+def _format_numbers(numbers):
+    """Vectorized format_number"""
+    text = numbers.round(3).map("{:.3f}".format, na_action="ignore").astype("string")
+    text = text.str.replace(r"\.?0+$", "", regex=True)
+    return text.where(text != "-0", "0")
+
+
+def normalize_series(series, kind):
+    """
+    Normalize a whole column of values of one kind at once.
+
+    The column is factorized first, so each distinct value is parsed once
+    however many rows repeat it; the distinct values go through the same
+    compiled pattern with pandas' vectorized string methods. Values that are
+    not quantities of this kind are kept as they are.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    if not len(uniques):
+        return series.copy()
+    normalized = np.asarray(_normalize_distinct(pd.Series(uniques, dtype=object), kind), dtype=object)
+    values = np.where(codes >= 0, normalized[np.maximum(codes, 0)], series.to_numpy(dtype=object))
+    return pd.Series(values, index=series.index, name=series.name, dtype=object)
+
+
+def _normalize_distinct(series, kind):
+    text = series.astype("string")
+    parts = text.str.extract(QUANTITY_PATTERN)
+
+    # Each end of a range is converted with its own unit; an end without one shares the other's
+    low_units = parts["low_unit"].fillna(parts["high_unit"]).str.replace(_UNIT_NOISE, "", regex=True).str.upper()
+    high_units = parts["high_unit"].fillna(parts["low_unit"]).str.replace(_UNIT_NOISE, "", regex=True).str.upper()
+    # Values without a unit take the canonical unit of the column's kind
+    low_kinds = low_units.map(_UNIT_KINDS).where(low_units.notna(), kind)
+    high_kinds = high_units.map(_UNIT_KINDS).where(high_units.notna(), kind)
+
+    valid = parts["low"].notna() & (low_kinds == kind) & (parts["high"].isna() | (high_kinds == kind))
+    low = (pd.to_numeric(parts["low"].str.replace("−", "-"), errors="coerce")
+           * low_units.map(_UNIT_SCALES).fillna(1.0).astype(float)
+           + low_units.map(_UNIT_OFFSETS).fillna(0.0).astype(float))
+    high = (pd.to_numeric(parts["high"].str.replace("−", "-"), errors="coerce")
+            * high_units.map(_UNIT_SCALES).fillna(1.0).astype(float)
+            + high_units.map(_UNIT_OFFSETS).fillna(0.0).astype(float))
+    low, high = np.fmin(low, high).where(high.notna(), low), np.fmax(low, high).where(high.notna(), high)
+
+    qualifiers = parts["pre"].fillna(parts["post"]).str.upper().str.rstrip(".").str.replace(r"\s+", " ", regex=True)
+    upper_bound = qualifiers.isin(_UPPER_BOUND)
+    lower_bound = qualifiers.notna() & ~upper_bound
+
+    unit = " " + CANONICAL_UNITS[kind]
+    low_text = _format_numbers(low)
+    high_text = _format_numbers(high)
+    formatted = pd.Series(
+        np.select(
+            [high.notna() & (low != high), high.notna(), upper_bound, lower_bound],
+            [low_text + " to " + high_text + unit, low_text + unit, "max " + low_text + unit, "min " + low_text + unit],
+            default=low_text + unit
+        ),
+        index=series.index
+    )
+    return series.where(~valid.fillna(False).astype(bool), formatted)
+
+
+def column_kind(column):
+    """Quantity kind of a results column (e.g. "OPERATING_PRESSURE" -> "pressure"), or None"""
+    return COLUMN_KINDS.get(str(column).upper().replace("_", " ").replace("-", " ").strip())
+
+
+def normalize_table(df, columns=None):
+    """
+    Copy of a results table with every pressure, temperature and length column normalized.
+
+    Args:
+        df: DataFrame with one row per drawing
+        columns: Optional {column: kind}; defaults to the columns recognized by column_kind
+    """
+    if columns is None:
+        columns = {column: column_kind(column) for column in df.columns}
+    df = df.copy()
+    for column, kind in columns.items():
+        if kind and column in df.columns:
+            df[column] = normalize_series(df[column], kind)
+    return df
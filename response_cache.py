@@ -0,0 +1,213 @@
+"""
+Content-addressed, persistent cache for OpenAI chat-completion responses.
+
+Every vision call is keyed by the SHA-256 of the page image bytes, the prompt
+text, the model, the temperature and the pipeline stage name. Re-uploading a
+drawing, or a Streamlit rerun that repeats a call, then replays the stored
+response instead of paying for a new request.
+
+Entries live in a small SQLite file with a total size cap; when the cap is
+exceeded the least recently used entries are evicted.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Location and size cap of the on-disk cache (overridable from the environment)
+RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".response_cache", "responses.sqlite3")
+)
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", "512"))
+
+
+def prompt_text(payload):
+    """Concatenate all text parts of a chat payload's messages (images excluded)"""
+    parts = []
+    for message in payload.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            parts.append(f"{message.get('role', '')}:{content}")
+        else:
+            for item in content:
+                if item.get("type") == "text":
+                    parts.append(f"{message.get('role', '')}:{item.get('text', '')}")
+    return "\n".join(parts)
+
+
+def make_cache_key(stage, image, payload):
+    """
+    SHA-256 over (image bytes, prompt text, model, temperature, response
+    format if any, stage name).
+    image may be raw bytes or a DrawingImage, whose memoized hash is reused.
+    """
+    digest = hashlib.sha256()
+    image_digest = getattr(image, "digest", None)
+    digest.update(image_digest if image_digest is not None else hashlib.sha256(image or b"").digest())
+    digest.update(prompt_text(payload).encode("utf-8"))
+    digest.update(str(payload.get("model", "")).encode("utf-8"))
+    digest.update(repr(payload.get("temperature")).encode("utf-8"))
+    if "response_format" in payload:
+        # Structured-output replies differ from text replies to the same prompt
+        digest.update(json.dumps(payload["response_format"], sort_keys=True).encode("utf-8"))
+    digest.update(stage.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CachedResponse:
+    """Minimal stand-in for a successful requests.Response replayed from the cache"""
+
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, response_json):
+        self._response_json = response_json
+        self.headers = {}
+
+    def json(self):
+        return self._response_json
+
+    @property
+    def text(self):
+        return json.dumps(self._response_json)
+
+
+class ResponseCache:
+    """SQLite-backed LRU cache of chat-completion response bodies"""
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_mb=RESPONSE_CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " stage TEXT,"
+            " body TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached response JSON for key, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, stage, response_json):
+        """Store a response and evict least recently used entries beyond the size cap"""
+        body = json.dumps(response_json)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, stage, body, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, body, len(body), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop the least recently used entries until the cache fits its size cap"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Hit/miss counters plus the current number of entries and bytes on disk"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+        }
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide cache instance shared by every pipeline stage and Streamlit session"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
+
+
+def cached_post(stage, url, headers, payload, image, post=None, refresh=False):
+    """
+    POST a chat-completion payload, replaying an identical earlier call from the cache.
+
+    Only successful responses that contain choices are stored, so errors and
+    rate limits are always retried against the API.
+
+    Args:
+        stage: Pipeline stage name (part of the cache key)
+        url: API endpoint
+        headers: Request headers
+        payload: Chat-completion payload
+        image: DrawingImage (or raw bytes) of the image sent with the payload
+        post: Callable used for the real request, called as
+            post(stage, url, headers, payload) (defaults to api_client.post_json)
+        refresh: Skip the lookup and always call the API; a successful
+            response replaces the cached one
+
+    Returns:
+        A requests.Response, or a CachedResponse on a cache hit
+    """
+    cache = get_response_cache()
+    key = make_cache_key(stage, image, payload)
+    cached = None if refresh else cache.get(key)
+    if cached is not None:
+        return CachedResponse(cached)
+
+    if post is None:
+        from api_client import post_json as post
+    response = post(stage, url, headers, payload)
+    if response.status_code == 200:
+        try:
+            response_json = response.json()
+        except ValueError:
+            return response
+        if "choices" in response_json:
+            cache.put(key, stage, response_json)
+    return response
@@ -0,0 +1,319 @@
+"""
+Single-pass parser for "KEY: value" extraction replies.
+
+tokenize_response() walks the reply once and collects the document info
+(DOCUMENT_TYPE / COMPONENT_TYPE), the parameter values and their
+justifications together. All patterns are compiled at import time, the
+"not specified" phrases are matched with one regex, and unit spellings are
+standardized with one substitution instead of a loop over a pattern dict.
+parse_response() adds the post-processing of the original parser (custom
+parameter filtering, related-parameter de-duplication, dimension splitting
+and default justifications).
+
+The module has no Streamlit dependency; extraction_core.parse_ai_response
+passes in the parameter mode and custom parameters from ExtractionSettings.
+"""
+import re
+
+DOCUMENT_KEYS = ("DOCUMENT_TYPE", "COMPONENT_TYPE")
+JUSTIFICATION_SUFFIX = "_JUSTIFICATION"
+
+# Any of these phrases anywhere in a value means the model did not find it
+NOT_SPECIFIED_PHRASES = (
+    "NOT SPECIFIED", "NOT AVAILABLE", "NOT VISIBLE", "UNKNOWN", "N/A", "NONE",
+    "NOT FOUND", "NOT INDICATED", "NOT MARKED", "NOT GIVEN", "MISSING"
+)
+_NOT_SPECIFIED = re.compile("|".join(re.escape(phrase) for phrase in NOT_SPECIFIED_PHRASES))
+_PLACEHOLDER = re.compile(r"\[values?\]", re.IGNORECASE)
+
+# Unit spellings standardized in values (case-sensitive, whole words)
+UNIT_REPLACEMENTS = {
+    "t": "tons",
+    "bar": "BAR",
+    "psi": "PSI",
+    "mpa": "MPa",
+    "MPA": "MPa",
+    "C": "°C",
+    "F": "°F",
+}
+_UNIT = re.compile(r"\b(?:" + "|".join(re.escape(unit) for unit in UNIT_REPLACEMENTS) + r")\b")
+
+# 'key': 'value' pairs inside dict-like values
+_QUOTED_PAIR = re.compile(r'[\'"]([^\'"]*)[\'"]\s*:\s*[\'"]([^\'"]*)[\'"]\s*(?:,|$)')
+
+_DIMENSIONS_LWH = re.compile(r'(\d+(?:\.\d+)?)\s*(?:x|×)\s*(\d+(?:\.\d+)?)\s*(?:x|×)\s*(\d+(?:\.\d+)?)')
+_DIMENSIONS_UNIT = re.compile(r'(?:x|×)\s*\d+(?:\.\d+)?\s*([a-zA-Z]+)')
+_HEIGHT_FOR_CAPACITY = re.compile(r'(\d+(?:\.\d+)?(?:\s*[a-zA-Z]+)?)\s+FOR\s+([\d\.]+\s*TON)', re.IGNORECASE)
+
+# Related parameter names; a related parameter is dropped when its main parameter has a value
+PARAMETER_RELATIONSHIPS = {
+    "HEIGHT": ["HEIGHT", "ITEM HEIGHT", "TOTAL HEIGHT"],
+    "LENGTH": ["LENGTH", "ITEM LENGTH", "TOTAL LENGTH"],
+    "WIDTH": ["WIDTH", "ITEM WIDTH", "TOTAL WIDTH"],
+    "WEIGHT": ["WEIGHT", "ITEM WEIGHT", "UNIT WEIGHT", "PRODUCT WEIGHT"],
+    "CLOSED HEIGHT": ["CLOSED HEIGHT", "MINIMUM HEIGHT", "MIN HEIGHT", "COLLAPSED HEIGHT"],
+    "OPEN HEIGHT": ["OPEN HEIGHT", "MAXIMUM HEIGHT", "MAX HEIGHT", "EXTENDED HEIGHT"],
+    "BORE DIAMETER": ["BORE DIAMETER", "BORE DIA", "INSIDE DIAMETER", "INNER DIAMETER", "BORE"],
+    "ROD DIAMETER": ["ROD DIAMETER", "ROD DIA", "SHAFT DIAMETER", "PISTON ROD DIAMETER"],
+    "LOAD CAPACITY": ["LOAD CAPACITY", "RATED CAPACITY", "RATED CAPACITY/LOAD", "RATED LOAD", "CAPACITY", "MAX LOAD"],
+    "OPERATING PRESSURE": ["OPERATING PRESSURE", "PRESSURE RATING", "WORKING PRESSURE", "MAX PRESSURE"],
+    "DIMENSIONS": ["DIMENSIONS", "ITEM DIMENSIONS", "OVERALL DIMENSIONS", "PRODUCT DIMENSIONS"],
+    "MAKE": ["MAKE", "MANUFACTURER", "MANUFACTURER/MAKE", "BRAND", "MANUFACTURER/BRAND"],
+    "MODEL": ["MODEL", "MODEL NUMBER", "MODEL/PART NUMBER", "PART NUMBER", "MODEL NO", "PART NO"],
+    "MATERIAL": ["MATERIAL", "BODY MATERIAL", "CONSTRUCTION MATERIAL", "HOUSING MATERIAL"]
+}
+# Parameter name -> main parameters it is related to
+_MAIN_PARAMETERS = {}
+for _main, _related in PARAMETER_RELATIONSHIPS.items():
+    for _name in _related:
+        _MAIN_PARAMETERS.setdefault(_name, []).append(_main)
+
+PORT_PARAMETERS = ("PORT SIZE", "PORT TYPE", "PORT LOCATION")
+HEIGHT_FIELDS = ("CLOSED HEIGHT", "OPEN HEIGHT", "MINIMUM HEIGHT", "MAXIMUM HEIGHT")
+
+
+def _is_dict_like(value):
+    return ((value.startswith('{') and value.endswith('}')) or
+            (value.startswith('[{') and value.endswith('}]')) or
+            (value.startswith("'") and ":" in value))
+
+
+def _dict_like_body(value):
+    """Strip the outer brackets of {...} and [{...}] values"""
+    if value.startswith('[{') and value.endswith('}]'):
+        return value[1:-1]
+    if value.startswith('{') and value.endswith('}'):
+        return value.strip('{}')
+    return value
+
+
+def _flatten_dict_like(value):
+    """
+    Values of a dict-like value such as {'Mounting': 'Rear Clevis'} or
+    [{'key': 'value'}], one per line; value unchanged if nothing can be read.
+    """
+    body = _dict_like_body(value)
+    pairs = _QUOTED_PAIR.findall(body)
+    if pairs:
+        return "\n".join(pair_value for _, pair_value in pairs)
+
+    # Fall back to simple splitting if the pair pattern did not match
+    if ',' in body:
+        parts = [
+            part.split(':', 1)[1].strip().strip('\'"')
+            for part in body.split(',') if ':' in part
+        ]
+        if parts:
+            return "\n".join(parts)
+    return value
+
+
+def clean_value(value):
+    """Blank out placeholders and "not specified" answers, flatten dict-like values, standardize units"""
+    if _PLACEHOLDER.search(value) or _NOT_SPECIFIED.search(value.upper()):
+        return ""
+    if _is_dict_like(value):
+        value = _flatten_dict_like(value)
+    if value:
+        value = _UNIT.sub(lambda match: UNIT_REPLACEMENTS[match.group(0)], value.replace('ø', 'Ø'))
+    return value
+
+
+def tokenize_response(response_text):
+    """
+    One pass over the reply.
+
+    Returns:
+        (document_info, values, justifications) - three dicts keyed by upper-case
+        parameter name; values are cleaned (see clean_value)
+    """
+    document_info = {}
+    values = {}
+    justifications = {}
+
+    for line in response_text.split('\n'):
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        key = key.strip().upper()
+        value = value.strip()
+
+        # Document type information (as written, before any ** clean-up)
+        if key in DOCUMENT_KEYS:
+            document_info[key] = value
+            continue
+
+        # Remove Markdown bold markers from names and the start of values
+        if '*' in key:
+            key = key.replace('*', '')
+            if key in DOCUMENT_KEYS:
+                continue
+        if value.startswith('**'):
+            value = value[2:].strip()
+
+        if key.endswith(JUSTIFICATION_SUFFIX):
+            justifications[key.replace(JUSTIFICATION_SUFFIX, '')] = value
+        else:
+            values[key] = clean_value(value)
+
+    return document_info, values, justifications
+
+
+def _filter_custom_parameters(results, custom_params):
+    """Keep document info plus only the requested parameters (and their justifications)"""
+    filtered_results = {
+        "DOCUMENT_TYPE": results.get("DOCUMENT_TYPE", ""),
+        "COMPONENT_TYPE": results.get("COMPONENT_TYPE", ""),
+    }
+    # Normalized name -> first matching result key
+    normalized_keys = {}
+    for key in results:
+        if not key.endswith(JUSTIFICATION_SUFFIX) and key not in DOCUMENT_KEYS:
+            normalized_keys.setdefault(key.upper().replace('_', ' ').replace('-', ' '), key)
+
+    for param in custom_params:
+        param_key = param.strip().upper()
+        matching_key = normalized_keys.get(param_key.replace('_', ' ').replace('-', ' '))
+        if matching_key:
+            filtered_results[matching_key] = results[matching_key]
+            just_key = f"{matching_key}{JUSTIFICATION_SUFFIX}"
+            if just_key in results:
+                filtered_results[just_key] = results[just_key]
+        else:
+            filtered_results[param_key] = ""
+            filtered_results[f"{param_key}{JUSTIFICATION_SUFFIX}"] = "Parameter not found in the document."
+    return filtered_results
+
+
+def _split_dimensions(results):
+    """Fill LENGTH / WIDTH / HEIGHT from an L x W x H dimensions value"""
+    for dim_param in ("DIMENSIONS", "ITEM DIMENSIONS", "OVERALL DIMENSIONS"):
+        dimensions = results.get(dim_param)
+        if not dimensions:
+            continue
+        match = _DIMENSIONS_LWH.search(dimensions.lower())
+        if not match:
+            continue
+        unit_match = _DIMENSIONS_UNIT.search(dimensions.lower())
+        unit = unit_match.group(1) if unit_match else "cm"  # Default to cm if no unit found
+        for name, amount in zip(("LENGTH", "WIDTH", "HEIGHT"), match.groups()):
+            if not results.get(name):
+                results[name] = f"{amount} {unit}"
+                results[f"{name}{JUSTIFICATION_SUFFIX}"] = "Extracted from overall dimensions."
+
+
+def _drop_related_duplicates(results):
+    """Blank related parameters (e.g. BORE when BORE DIAMETER is set) and flatten leftover dict-like values"""
+    normalized_results = {}
+    for key in list(results.keys()):
+        value = results[key]
+        if key.endswith(JUSTIFICATION_SUFFIX) or not value.strip():
+            continue
+        if _is_dict_like(value):
+            pairs = _QUOTED_PAIR.findall(_dict_like_body(value))
+            if pairs:
+                results[key] = "\n".join(pair_value for _, pair_value in pairs)
+
+        norm_key = key.upper()
+        normalized_results[norm_key] = results[key]
+        for main_param in _MAIN_PARAMETERS.get(norm_key, ()):
+            if main_param != norm_key and normalized_results.get(main_param):
+                # Transfer the justification to the main parameter and drop the duplicate
+                just_key = f"{key}{JUSTIFICATION_SUFFIX}"
+                if just_key in results:
+                    results[f"{main_param}{JUSTIFICATION_SUFFIX}"] = results[just_key]
+                results[key] = ""
+
+
+def _split_item_dimensions(results):
+    """Fill LENGTH / WIDTH / HEIGHT from a "93 x 55 x 29 Centimeters" DIMENSIONS value"""
+    dimensions = results.get("DIMENSIONS")
+    if not dimensions or not ("x" in dimensions.lower() or "×" in dimensions):
+        return
+    dim_parts = [part.strip() for part in dimensions.lower().replace('×', 'x').split("x")]
+
+    # Split the unit off the last part
+    unit = ""
+    last_part = dim_parts[-1]
+    for i, char in enumerate(last_part):
+        if not (char.isdigit() or char == "." or char.isspace()):
+            if i > 0:
+                unit = last_part[i:].strip()
+                dim_parts[-1] = last_part[:i].strip()
+            break
+
+    for name, part in zip(("LENGTH", "WIDTH", "HEIGHT"), dim_parts):
+        if not results.get(name):
+            results[name] = f"{part} {unit}" if unit else part
+            results[f"{name}{JUSTIFICATION_SUFFIX}"] = "Extracted from item dimensions."
+
+
+def _structure_heights(results):
+    """Rewrite "200mm FOR 1 TON, 750mm FOR 1.5TON" heights as "200mm @ 1 TON, ..." """
+    for height_field in HEIGHT_FIELDS:
+        height_value = results.get(height_field)
+        if height_value is None or "FOR" not in height_value.upper():
+            continue
+        height_matches = _HEIGHT_FOR_CAPACITY.findall(height_value)
+        if height_matches:
+            results[height_field] = ", ".join(f"{height} @ {capacity}" for height, capacity in height_matches)
+            results[f"{height_field}{JUSTIFICATION_SUFFIX}"] = "Structured from height specifications that vary by capacity."
+
+
+def _default_justification(doc_type, found):
+    """Contextual justification for a parameter the model gave none for"""
+    if "PRODUCT_LISTING" in doc_type or "CATALOG" in doc_type:
+        return "Extracted from the product listing specifications." if found else "Not provided in the product listing."
+    if "SPECIFICATION" in doc_type:
+        return "Extracted from the specification sheet." if found else "Not included in the specification sheet."
+    if "MIXED" in doc_type:
+        return "Extracted from the document. Exact location unspecified." if found else "Not found in any part of the document."
+    return "Extracted directly from the drawing." if found else "Not visible in the drawing."
+
+
+def parse_response(response_text, parameter_mode="Default", custom_parameters=None):
+    """
+    Parse an extraction reply into a flat results dict.
+
+    Args:
+        response_text: The reply in "KEY: value" / "KEY_JUSTIFICATION: ..." format
+        parameter_mode: The app's parameter mode; in "Custom" mode only the
+            custom parameters are kept
+        custom_parameters: The custom parameter lists ({"GENERIC": [...]})
+
+    Returns:
+        Dict with DOCUMENT_TYPE / COMPONENT_TYPE (when present), every
+        parameter and a KEY_JUSTIFICATION entry for each parameter
+    """
+    document_info, values, justifications = tokenize_response(response_text)
+    results = dict(document_info)
+    results.update(values)
+
+    if parameter_mode == "Custom" and "GENERIC" in (custom_parameters or {}):
+        results = _filter_custom_parameters(results, custom_parameters["GENERIC"])
+
+    _split_dimensions(results)
+
+    # Combine port type and size into one specification
+    port_type = results.get("PORT TYPE")
+    port_size = results.get("PORT SIZE")
+    if port_type and port_size:
+        results["PORT_SPECIFICATION"] = f"{port_type} {port_size}"
+        results["PORT_SPECIFICATION_JUSTIFICATION"] = "Combined from port type and port size information."
+
+    _drop_related_duplicates(results)
+    _split_item_dimensions(results)
+    _structure_heights(results)
+
+    # Add justifications, with a contextual default where the model gave none
+    doc_type = document_info.get("DOCUMENT_TYPE", "").upper()
+    for key in list(results.keys()):
+        if key in DOCUMENT_KEYS or key.endswith(JUSTIFICATION_SUFFIX):
+            continue
+        if key not in justifications:
+            justifications[key] = _default_justification(doc_type, bool(results[key]))
+        just_key = f"{key}{JUSTIFICATION_SUFFIX}"
+        if just_key not in results:
+            results[just_key] = justifications.get(key, "")
+
+    return results
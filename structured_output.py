@@ -0,0 +1,183 @@
+"""
+Structured-output extraction mode.
+
+Instead of free "KEY: value" text that has to be recovered with layered
+heuristics, the analysis request carries a JSON-schema response_format built
+from the parameters being extracted. The model's reply is then parsed with a
+single json.loads into an ExtractionResult. Replies that are not valid
+schema JSON (older cached responses, models without structured outputs)
+raise StructuredOutputError so the caller can fall back to the text parser.
+
+Parse timings and failures are counted and available from parse_stats().
+The module has no Streamlit dependency.
+"""
+import json
+import os
+import threading
+import time
+
+# Ask for schema-constrained JSON by default (set STRUCTURED_OUTPUT=0 for the text format)
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1") not in ("0", "false", "False")
+
+SCHEMA_NAME = "drawing_extraction"
+
+# Values that mean "not found" (compared after upper-casing)
+EMPTY_VALUES = frozenset({
+    "", "NA", "N/A", "NONE", "NULL", "UNKNOWN", "NOT SPECIFIED", "NOT AVAILABLE",
+    "NOT VISIBLE", "NOT FOUND", "NOT INDICATED", "NOT MARKED", "NOT GIVEN", "MISSING"
+})
+
+NOT_FOUND_JUSTIFICATION = "Parameter not found in the document."
+
+STRUCTURED_PROMPT_SUFFIX = (
+    "\n\nOUTPUT FORMAT: Return a single JSON object matching the provided schema. "
+    "Put every parameter in \"parameters\" with its name, its value exactly as written "
+    "(empty string if it is not in the document) and a one-sentence justification "
+    "saying where it was found."
+)
+
+_stats = {"parsed": 0, "failed": 0, "seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+class StructuredOutputError(ValueError):
+    """The response content is not valid structured-output JSON"""
+
+
+def build_extraction_schema(parameters=None):
+    """
+    JSON schema for one extraction reply.
+
+    Args:
+        parameters: Parameter names to extract. When given, names are limited
+            to this list (Custom and Cylinder modes); otherwise any name is
+            allowed so open-ended extraction keeps every parameter it finds.
+    """
+    name_schema = {"type": "string"}
+    if parameters:
+        name_schema["enum"] = list(dict.fromkeys(parameters))
+    return {
+        "type": "object",
+        "properties": {
+            "document_type": {"type": "string"},
+            "component_type": {"type": "string"},
+            "parameters": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": name_schema,
+                        "value": {"type": "string"},
+                        "justification": {"type": "string"},
+                    },
+                    "required": ["name", "value", "justification"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["document_type", "component_type", "parameters"],
+        "additionalProperties": False,
+    }
+
+
+def extraction_response_format(parameters=None):
+    """response_format entry for a chat-completion payload"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": SCHEMA_NAME,
+            "strict": True,
+            "schema": build_extraction_schema(parameters),
+        },
+    }
+
+
+class ExtractionResult:
+    """Typed result of one structured extraction reply"""
+
+    __slots__ = ("document_type", "component_type", "values", "justifications")
+
+    def __init__(self, document_type="", component_type="", values=None, justifications=None):
+        self.document_type = document_type
+        self.component_type = component_type
+        # Parameter name (upper case) -> value ("" when not found)
+        self.values = values if values is not None else {}
+        self.justifications = justifications if justifications is not None else {}
+
+    def __repr__(self):
+        found = sum(1 for value in self.values.values() if value)
+        return f"ExtractionResult({self.component_type or '?'}, {found}/{len(self.values)} values)"
+
+    def to_results(self):
+        """The flat results dict produced by the text parser: KEY, KEY_JUSTIFICATION, DOCUMENT_TYPE, COMPONENT_TYPE"""
+        results = {"DOCUMENT_TYPE": self.document_type, "COMPONENT_TYPE": self.component_type}
+        for key, value in self.values.items():
+            results[key] = value
+            results[f"{key}_JUSTIFICATION"] = self.justifications.get(key, "")
+        return results
+
+    def to_text(self):
+        """The same result in the "KEY: value" text format"""
+        return "\n".join(f"{key}: {value}" for key, value in self.to_results().items())
+
+
+def _record(seconds, ok):
+    with _stats_lock:
+        _stats["parsed" if ok else "failed"] += 1
+        _stats["seconds"] += seconds
+
+
+def parse_stats():
+    """Replies parsed and failed, and total parse seconds, since start-up"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def parse_structured_response(content, parameters=None):
+    """
+    Parse a structured-output reply with a single json.loads.
+
+    Args:
+        content: Message content of the reply
+        parameters: Requested parameter names; any the reply omits are added
+            as empty values so the result always covers the full list
+
+    Returns:
+        ExtractionResult; raises StructuredOutputError if content is not schema JSON
+    """
+    start = time.perf_counter()
+    try:
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError) as e:
+            raise StructuredOutputError(f"Reply is not JSON: {e}") from None
+        if not isinstance(data, dict) or not isinstance(data.get("parameters"), list):
+            raise StructuredOutputError("Reply does not match the extraction schema")
+
+        values = {}
+        justifications = {}
+        for item in data["parameters"]:
+            if not isinstance(item, dict) or not item.get("name"):
+                continue
+            key = str(item["name"]).strip().upper()
+            value = str(item.get("value") or "").strip()
+            values[key] = "" if value.upper() in EMPTY_VALUES else value
+            justifications[key] = str(item.get("justification") or "").strip()
+
+        for name in parameters or ():
+            key = name.strip().upper()
+            if key not in values:
+                values[key] = ""
+                justifications[key] = NOT_FOUND_JUSTIFICATION
+
+        result = ExtractionResult(
+            str(data.get("document_type") or ""),
+            str(data.get("component_type") or ""),
+            values,
+            justifications,
+        )
+    except StructuredOutputError:
+        _record(time.perf_counter() - start, False)
+        raise
+    _record(time.perf_counter() - start, True)
+    return result
@@ -0,0 +1,73 @@
+import io
+import time
+
+import fitz
+import pytest
+from PIL import Image
+
+import job_queue
+from extraction_core import ExtractionSettings
+from job_queue import DONE, FAILED, JobQueue
+
+
+def pdf_with_pages(count):
+    document = fitz.open()
+    for number in range(count):
+        document.new_page().insert_text((72, 72), f"Sheet {number + 1}")
+    return document.tobytes()
+
+
+def png_page():
+    out = io.BytesIO()
+    Image.new("RGB", (200, 150), "white").save(out, format="PNG")
+    return out.getvalue()
+
+
+def extraction(page, result):
+    file_name, page_index, image_data = page
+    return {"file_name": file_name, "result": result, "image": image_data[0], "drawing_type": "CYLINDER"}
+
+
+def run_job(monkeypatch, analyze, file_name, data):
+    monkeypatch.setattr(job_queue, "analyze_page", analyze)
+    job = JobQueue(max_jobs=1).submit(file_name, data, ExtractionSettings(), page_concurrency=2)
+    deadline = time.monotonic() + 30
+    while job.active and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not job.active
+    return job
+
+
+def test_every_page_failing_at_the_api_fails_the_job(monkeypatch):
+    job = run_job(monkeypatch, lambda page, settings: extraction(page, "❌ API Error: 500"),
+                  "set.pdf", pdf_with_pages(3))
+    assert job.status == FAILED
+    assert (job.pages_done, job.pages_failed) == (3, 3)
+    assert job.errors == ["set.pdf: ❌ API Error: 500"] * 3
+    assert len(job.take_results()) == 3
+
+
+def test_every_page_raising_fails_the_job(monkeypatch):
+    def analyze(page, settings):
+        raise RuntimeError("connection reset")
+
+    job = run_job(monkeypatch, analyze, "sheet.png", png_page())
+    assert job.status == FAILED
+    assert job.errors == ["sheet.png: connection reset"]
+
+
+def test_some_pages_failing_leaves_the_job_done(monkeypatch):
+    def analyze(page, settings):
+        return extraction(page, "❌ API Error: 429" if page[1] == 1 else "DRAWING_NUMBER: HC-1")
+
+    job = run_job(monkeypatch, analyze, "set.pdf", pdf_with_pages(3))
+    assert job.status == DONE
+    assert (job.pages_done, job.pages_failed) == (3, 1)
+    assert job.errors == ["set.pdf: ❌ API Error: 429"]
+
+
+@pytest.mark.parametrize("result", ["", None])
+def test_empty_result_counts_as_failed(monkeypatch, result):
+    job = run_job(monkeypatch, lambda page, settings: extraction(page, result), "sheet.png", png_page())
+    assert job.status == FAILED
+    assert job.errors == ["sheet.png: no result from the API"]
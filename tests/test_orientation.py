@@ -0,0 +1,89 @@
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+import orientation
+from orientation import ORIENTATION_MIN_CONFIDENCE, TITLE_BLOCK_OCR_MAX_SIDE, detect_orientation
+
+# Transposes that turn an upright sheet into one needing each rotation token
+TURN_BY = {
+    "ROTATE_0": None,
+    "ROTATE_90": Image.Transpose.ROTATE_90,
+    "ROTATE_180": Image.Transpose.ROTATE_180,
+    "ROTATE_270": Image.Transpose.ROTATE_270,
+}
+
+
+def sheet(title_block=True):
+    """Landscape drawing: a frame, some views and, optionally, a lettered title block bottom-right"""
+    image = Image.new("L", (2400, 1700), 255)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((20, 20, 2380, 1680), outline=0, width=4)
+    for x, y in ((150, 150), (700, 250), (1200, 120)):
+        draw.rectangle((x, y, x + 400, y + 300), outline=0, width=3)
+        draw.ellipse((x + 50, y + 50, x + 200, y + 200), outline=0, width=3)
+    if title_block:
+        draw.rectangle((1550, 1250, 2380, 1680), outline=0, width=4)
+        for row in range(11):
+            top = 1256 + row * 38
+            draw.line((1550, top - 6, 2380, top - 6), fill=0, width=2)
+            # Runs of letter-sized blocks stand in for the title-block text
+            for left in range(1570, 2300, 26):
+                draw.rectangle((left, top, left + 16, top + 20), fill=0)
+    return image
+
+
+def encoded(image):
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def ocr_calls(monkeypatch):
+    """Pretend Tesseract is installed; the title-block OCR reads text only on the upright crop"""
+    calls = []
+
+    def title_block_ocr_score(gray, rotation):
+        calls.append((max(gray.size), rotation))
+        return 400.0 if rotation == "ROTATE_0" else 10.0
+
+    monkeypatch.setattr(orientation, "tesseract_available", lambda: True)
+    monkeypatch.setattr(orientation, "_title_block_ocr_score", title_block_ocr_score)
+    return calls
+
+
+@pytest.mark.parametrize("rotation", list(TURN_BY))
+def test_clear_sheet_is_decided_by_projection(rotation, ocr_calls):
+    image = sheet()
+    if TURN_BY[rotation] is not None:
+        image = image.transpose(TURN_BY[rotation])
+    report = detect_orientation(encoded(image))
+    assert report["rotation"] == rotation
+    assert report["method"] == "projection"
+    assert report["confidence"] >= ORIENTATION_MIN_CONFIDENCE
+    assert ocr_calls == []
+
+
+def test_inconclusive_sheet_uses_title_block_tiebreak(ocr_calls):
+    # Without a title block the ink profile points the wrong way, but not decisively
+    report = detect_orientation(encoded(sheet(title_block=False)))
+    assert report["rotation"] == "ROTATE_0"
+    assert len(ocr_calls) == 2
+    assert "ROTATE_0" in [rotation for _, rotation in ocr_calls]
+    assert all(side <= TITLE_BLOCK_OCR_MAX_SIDE for side, _ in ocr_calls)
+
+
+def test_inconclusive_sheet_without_tesseract(monkeypatch):
+    monkeypatch.setattr(orientation, "tesseract_available", lambda: False)
+    report = detect_orientation(encoded(sheet(title_block=False)))
+    assert report["confidence"] < ORIENTATION_MIN_CONFIDENCE
+
+
+def test_text_layer_wins_without_looking_at_pixels(ocr_calls):
+    text_layer = {"directions": {"ROTATE_90": 180, "ROTATE_0": 20}}
+    report = detect_orientation(encoded(sheet()), text_layer=text_layer)
+    assert report["rotation"] == "ROTATE_90"
+    assert report["method"] == "text_layer"
+    assert ocr_calls == []
@@ -0,0 +1,62 @@
+import glob
+import os
+import tempfile
+import threading
+
+import fitz
+
+import pdf_render
+from pdf_render import get_render_pool, iter_pdf_pages
+
+
+def pdf_with_pages(count, tag):
+    document = fitz.open()
+    for number in range(count):
+        document.new_page().insert_text((72, 72), f"{tag} sheet {number + 1} of the hydraulic cylinder set")
+    return document.tobytes()
+
+
+def render_files():
+    return set(glob.glob(os.path.join(tempfile.gettempdir(), "render-*.pdf")))
+
+
+def test_pages_come_back_in_order_from_concurrent_callers():
+    before = render_files()
+    results = {}
+
+    def render(tag):
+        results[tag] = list(iter_pdf_pages(pdf_with_pages(9, tag), max_workers=2, extract_text=True))
+
+    threads = [threading.Thread(target=render, args=(f"DOC{index}",)) for index in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for tag, pages in results.items():
+        assert [page[1] for page in pages] == list(range(1, 10))
+        assert all(page[2] == 9 for page in pages)
+        assert all(page[4]["lines"][0].startswith(tag) for page in pages)
+    assert render_files() == before
+
+
+def test_one_pool_serves_every_pdf():
+    pool = get_render_pool()
+    list(iter_pdf_pages(pdf_with_pages(3, "FIRST"), max_workers=2))
+    list(iter_pdf_pages(pdf_with_pages(3, "SECOND"), max_workers=2))
+    assert get_render_pool() is pool
+    assert pool._mp_context.get_start_method() == "spawn"
+
+
+def test_abandoned_generator_removes_its_file():
+    before = render_files()
+    pages = iter_pdf_pages(pdf_with_pages(20, "ABANDONED"), max_workers=2, work_ahead=2)
+    next(pages)
+    pages.close()
+    assert render_files() == before
+
+
+def test_single_page_renders_inline(monkeypatch):
+    monkeypatch.setattr(pdf_render, "get_render_pool", lambda: None)
+    pages = list(iter_pdf_pages(pdf_with_pages(1, "ONLY")))
+    assert [page[1:3] for page in pages] == [(1, 1)]
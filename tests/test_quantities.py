@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from quantities import Quantity, Range, normalize_series, normalize_value, parse_quantity
+
+CASES = [
+    # Single values and ranges in one unit
+    ("160 bar", "pressure", "160 BAR"),
+    ("10...160 BAR", "pressure", "10 to 160 BAR"),
+    ("2000 psi", "pressure", "137.895 BAR"),
+    ("max 80 DEG C", "temperature", "max 80 DEG C"),
+    ("-10°C +60°C", "temperature", "-10 to 60 DEG C"),
+    ("Ø110 mm", "length", "110 mm"),
+    ("10 to 20 bar", "pressure", "10 to 20 BAR"),
+    # Mixed-unit ranges: each end is converted with its own unit
+    ("10 bar to 2 MPa", "pressure", "10 to 20 BAR"),
+    ("-20°C to 176°F", "temperature", "-20 to 80 DEG C"),
+    ("100 mm to 1 m", "length", "100 to 1000 mm"),
+    ("1 MPa to 50 bar", "pressure", "10 to 50 BAR"),
+    # Ends of different kinds, or another kind than the column's: left as written
+    ("10 bar to 60 °C", "pressure", "10 bar to 60 °C"),
+    ("10 mm to 5 bar", "length", "10 mm to 5 bar"),
+    ("160 bar", "temperature", "160 bar"),
+    # Not quantities
+    ("ISO VG46", "pressure", "ISO VG46"),
+    ("Ambient", "temperature", "Ambient"),
+    ("see table", "length", "see table"),
+    ("", "pressure", ""),
+]
+
+
+@pytest.mark.parametrize("text, kind, expected", CASES)
+def test_normalize_value(text, kind, expected):
+    assert normalize_value(text, kind) == expected
+
+
+@pytest.mark.parametrize("kind", ["pressure", "temperature", "length"])
+def test_normalize_series_matches_normalize_value(kind):
+    texts = [text for text, case_kind, _ in CASES if case_kind == kind]
+    series = pd.Series(texts + texts[:2] + [None], index=range(10, 10 + len(texts) + 3))
+    normalized = normalize_series(series, kind)
+    assert list(normalized.index) == list(series.index)
+    assert list(normalized[:-1]) == [normalize_value(text, kind) for text in series[:-1]]
+    assert pd.isna(normalized.iloc[-1])
+
+
+def test_parse_quantity_types():
+    assert parse_quantity("160 bar", "pressure") == Quantity(160.0, "BAR")
+    assert parse_quantity("10 bar to 2 MPa", "pressure") == Range(10.0, 20.0, "BAR")
+    assert parse_quantity("10 bar to 60 °C", "pressure") is None
+    assert parse_quantity("ISO VG46", "pressure") is None
@@ -0,0 +1,72 @@
+import pytest
+
+from text_layer import merge_text_layer_fields, resolve_fields, unresolved_parameters
+
+
+def lines_of(*texts):
+    """Text lines stacked down the page, as _page_lines returns them"""
+    return [{"text": text, "bbox": (10.0, 20.0 * row, 300.0, 20.0 * row + 12)} for row, text in enumerate(texts)]
+
+
+@pytest.mark.parametrize("texts, expected", [
+    (["DRAWING NO: HC-1042-A", "REV: C"], {"DRAWING NUMBER": "HC-1042-A", "REVISION": "C"}),
+    (["DRG.NO. 55-210", "REV. 2"], {"DRAWING NUMBER": "55-210", "REVISION": "2"}),
+    (["BORE DIA: Ø80 mm", "ROD DIA 45 mm", "STROKE 200"],
+     {"BORE DIAMETER": "Ø80 mm", "ROD DIAMETER": "45 mm", "STROKE LENGTH": "200"}),
+    (["TEST PRESSURE: 250 bar", "WORKING PRESSURE: 160 bar"],
+     {"TEST PRESSURE": "250 bar", "OPERATING PRESSURE": "160 bar"}),
+    (["FLUID: Mineral oil HLP46"], {"FLUID": "Mineral oil HLP46"}),
+    (["OIL: HLP68"], {"FLUID": "HLP68"}),
+])
+def test_labelled_fields(texts, expected):
+    assert resolve_fields(lines_of(*texts)) == expected
+
+
+# Words that only start with a label must not claim the field
+def test_revisions_table_does_not_hide_the_revision():
+    fields = resolve_fields(lines_of("REVISIONS", "ZONE DESCRIPTION DATE", "REV B"))
+    assert fields["REVISION"] == "B"
+
+
+def test_drawing_notes_are_not_a_drawing_number():
+    fields = resolve_fields(lines_of("DRAWING NOTES: ALL EDGES CHAMFERED", "DRAWING NO. HC-77"))
+    assert fields["DRAWING NUMBER"] == "HC-77"
+
+
+def test_oil_seal_kit_is_not_a_fluid():
+    assert "FLUID" not in resolve_fields(lines_of("OIL SEAL KIT", "PART NO 1234"))
+    assert resolve_fields(lines_of("OIL SEAL KIT", "MEDIUM: HLP46"))["FLUID"] == "HLP46"
+
+
+def test_label_only_cell_takes_the_cell_below():
+    lines = [
+        {"text": "REV", "bbox": (10.0, 10.0, 40.0, 22.0)},
+        {"text": "D", "bbox": (12.0, 26.0, 20.0, 38.0)},
+    ]
+    assert resolve_fields(lines) == {"REVISION": "D"}
+
+
+TEXT_LAYER = {
+    "fields": {"DRAWING NUMBER": "HC-1042", "CLOSED LENGTH": "640 mm", "TEST PRESSURE": "250 bar"},
+    "lines": [], "word_count": 20, "directions": {},
+}
+
+
+def test_merge_fills_only_the_modes_parameters():
+    results = {"DRAWING_NUMBER": "", "STROKE_LENGTH": "200 mm"}
+    merge_text_layer_fields(results, TEXT_LAYER, ["DRAWING_NUMBER", "STROKE_LENGTH", "CLOSE_LENGTH"])
+    assert results["DRAWING_NUMBER"] == "HC-1042"
+    assert results["STROKE_LENGTH"] == "200 mm"
+    assert "CLOSED LENGTH" not in results and "TEST PRESSURE" not in results
+
+
+def test_merge_without_a_parameter_list_adds_missing_fields():
+    results = merge_text_layer_fields({"DRAWING NUMBER": ""}, TEXT_LAYER)
+    assert results["DRAWING NUMBER"] == "HC-1042"
+    assert results["TEST PRESSURE"] == "250 bar"
+
+
+def test_unresolved_parameters():
+    assert unresolved_parameters(TEXT_LAYER, ["Drawing Number", "TEST_PRESSURE"]) == []
+    assert unresolved_parameters(TEXT_LAYER, ["DRAWING_NUMBER", "REVISION"]) == ["REVISION"]
+    assert unresolved_parameters(None, ["REVISION"]) == ["REVISION"]
@@ -0,0 +1,253 @@
+"""
+Text-layer extraction for vector (CAD-exported) PDFs.
+
+Most drawings exported from CAD keep their text as real PDF text. Reading it
+with PyMuPDF is exact and essentially free, so title-block fields such as the
+drawing number or revision can be resolved before any vision call, and the
+remaining text is passed to the model as a compact hint block.
+
+The text layer is a plain dict so it can travel back from render workers:
+    {"fields": {"DRAWING NUMBER": "...", ...}, "lines": ["...", ...], "word_count": int,
+     "directions": {"ROTATE_0": chars, "ROTATE_90": chars, ...}}
+"directions" counts characters by the rotation that would make them read
+left-to-right in the rendered image; orientation.py uses it as its first vote.
+Pages without a usable text layer produce None and keep the raster-only path.
+"""
+import re
+
+# Pages with fewer words than this are treated as scanned / raster-only
+MIN_TEXT_LAYER_WORDS = 5
+
+# Maximum number of characters of free page text included in the prompt hint
+MAX_HINT_TEXT_CHARS = 2000
+
+# Value shapes used by the field patterns below
+_NUMBER = r"[Ø⌀]?\s*[+-]?\d+(?:[.,]\d+)?"
+_UNIT = r"(?:\s*(?:mm|MM|bar|BAR|Bar|psi|PSI|MPa|MPA|kgf/cm2|°\s*C|DEG\.?\s*C|°\s*F|C\b))?"
+_NUMERIC_VALUE = rf"({_NUMBER}{_UNIT}(?:\s*(?:-|TO|to|\.\.+|~|/)\s*{_NUMBER}{_UNIT})?)"
+_CODE_VALUE = r"([A-Z0-9][A-Z0-9\-_/.]*[A-Z0-9])"
+_REVISION_VALUE = r"([A-Z0-9]{1,3})\b"
+_TEXT_VALUE = r"([A-Za-z][^:;|]{1,40}?)\s*(?:$|[;|])"
+
+# (canonical field, label pattern, value pattern) in priority order.
+# TEST PRESSURE must come before OPERATING PRESSURE so the latter does not claim it.
+# Every label must end a word and be followed by a separator (see _LABEL_END),
+# so REVISIONS, DRAWING NOTES or PRESSFIT do not read as labels.
+_FIELD_PATTERNS = [
+    ("DRAWING NUMBER", r"\b(?:DRAWING|DRG|DWG)\.?\s*(?:NO|NUMBER|NUM|#)\.?", _CODE_VALUE),
+    ("REVISION", r"\bREV(?:ISION)?\.?(?:\s*NO\.?)?", _REVISION_VALUE),
+    ("BORE DIAMETER", r"\b(?:CYLINDER\s+)?BORE(?:\s*(?:DIA(?:METER)?|SIZE))?\.?", _NUMERIC_VALUE),
+    ("ROD DIAMETER", r"\b(?:PISTON\s+)?ROD(?:\s*(?:DIA(?:METER)?|SIZE))?\.?(?!\s*END)", _NUMERIC_VALUE),
+    ("STROKE LENGTH", r"\bSTROKE(?:\s*LENGTH)?\.?", _NUMERIC_VALUE),
+    ("CLOSED LENGTH", r"\b(?:CLOSED?|RETRACTED)\s*LENGTH", _NUMERIC_VALUE),
+    ("TEST PRESSURE", r"\bTEST\s*PRESS(?:URE)?\.?", _NUMERIC_VALUE),
+    ("OPERATING PRESSURE", r"(?<!TEST )\b(?:(?:WORKING|OPERATING|WORK\.?|OP\.?|MAX\.?|NOMINAL)\s*)?PRESS(?:URE)?\.?", _NUMERIC_VALUE),
+    ("OPERATING TEMPERATURE", r"\b(?:(?:WORKING|OPERATING)\s*)?TEMP(?:ERATURE)?\.?(?:\s*RANGE)?", _NUMERIC_VALUE),
+    # OIL alone is a label only before ':' / '=' or on its own (OIL SEAL KIT is not a fluid)
+    ("FLUID", r"\b(?:FLUID|MEDIUM|OIL(?=\s*(?:[:=]|$)))", _TEXT_VALUE),
+    ("MOUNTING", r"\bMOUNTING(?:\s*TYPE)?", _TEXT_VALUE),
+]
+
+# What may follow a label: whitespace, ':', '.', '=' or the end of the line
+_LABEL_END = r"(?=[\s:.=]|$)"
+
+_COMPILED_FIELDS = [
+    (field, re.compile(rf"(?:{label}){_LABEL_END}", re.IGNORECASE),
+     re.compile(rf"^\s*(?:[:=.]|-\s)?\s*{value}", re.IGNORECASE))
+    for field, label, value in _FIELD_PATTERNS
+]
+
+
+def _page_lines(page):
+    """Group PyMuPDF words into text lines with their bounding boxes, in reading order"""
+    lines = {}
+    for x0, y0, x1, y1, word, block_no, line_no, _ in page.get_text("words", sort=True):
+        key = (block_no, line_no)
+        if key not in lines:
+            lines[key] = {"words": [], "bbox": [x0, y0, x1, y1]}
+        line = lines[key]
+        line["words"].append(word)
+        bbox = line["bbox"]
+        bbox[0], bbox[1] = min(bbox[0], x0), min(bbox[1], y0)
+        bbox[2], bbox[3] = max(bbox[2], x1), max(bbox[3], y1)
+
+    return [
+        {"text": " ".join(line["words"]), "bbox": tuple(line["bbox"])}
+        for line in lines.values()
+    ]
+
+
+def _is_label(text):
+    """Whether a line starts with one of the known field labels"""
+    return any(label_re.match(text) for _, label_re, _ in _COMPILED_FIELDS)
+
+
+def _neighbour_texts(lines, index):
+    """
+    Candidate value cells for a label-only line: the nearest line to its right
+    on the same row, then the nearest line directly below it. Cells that are
+    themselves labels are skipped.
+    """
+    x0, y0, x1, y1 = lines[index]["bbox"]
+    mid_y = (y0 + y1) / 2
+    height = max(y1 - y0, 1)
+
+    right = [
+        line for i, line in enumerate(lines)
+        if i != index and line["bbox"][0] >= x1 and line["bbox"][1] <= mid_y <= line["bbox"][3]
+    ]
+    below = [
+        line for i, line in enumerate(lines)
+        if i != index and y1 <= line["bbox"][1] <= y1 + 3 * height
+        and line["bbox"][0] < x1 and line["bbox"][2] > x0
+    ]
+
+    candidates = []
+    if right:
+        candidates.append(min(right, key=lambda line: line["bbox"][0])["text"])
+    if below:
+        candidates.append(min(below, key=lambda line: line["bbox"][1])["text"])
+    return [text for text in candidates if not _is_label(text)]
+
+
+def resolve_fields(lines):
+    """Resolve known title-block and specification fields from text lines"""
+    fields = {}
+    for index, line in enumerate(lines):
+        text = line["text"]
+        for field, label_re, value_re in _COMPILED_FIELDS:
+            if field in fields:
+                continue
+            for label_match in label_re.finditer(text):
+                remainder = text[label_match.end():]
+                value_match = value_re.match(remainder)
+                # Label on its own: the value sits in a neighbouring table cell
+                if not value_match and not remainder.strip(" :=-."):
+                    for neighbour in _neighbour_texts(lines, index):
+                        value_match = value_re.match(neighbour)
+                        if value_match:
+                            break
+                if value_match:
+                    fields[field] = " ".join(value_match.group(1).split())
+                    break
+    return fields
+
+
+def _text_directions(page):
+    """
+    Count characters by the rotation that makes them upright in the rendered image.
+
+    PyMuPDF reports line directions in unrotated page space, so they are mapped
+    through the page's /Rotate first.
+    """
+    rotation = page.rotation_matrix
+    directions = {"ROTATE_0": 0, "ROTATE_90": 0, "ROTATE_180": 0, "ROTATE_270": 0}
+    for block in page.get_text("dict", flags=0)["blocks"]:
+        for line in block.get("lines", []):
+            cos, sin = line["dir"]
+            # Direction in rendered image space (y grows downwards)
+            dx = cos * rotation.a + sin * rotation.c
+            dy = cos * rotation.b + sin * rotation.d
+            if abs(dx) >= abs(dy):
+                key = "ROTATE_0" if dx > 0 else "ROTATE_180"
+            else:
+                # Reading downwards needs a 90 degree counter-clockwise turn, upwards a clockwise one
+                key = "ROTATE_270" if dy > 0 else "ROTATE_90"
+            directions[key] += sum(len(span["text"].strip()) for span in line["spans"])
+    return directions
+
+
+def extract_text_layer(page):
+    """
+    Extract words, lines and resolved fields from a PyMuPDF page.
+
+    Returns:
+        Text-layer dict, or None when the page has no usable text layer
+    """
+    lines = _page_lines(page)
+    word_count = sum(len(line["text"].split()) for line in lines)
+    if word_count < MIN_TEXT_LAYER_WORDS:
+        return None
+
+    return {
+        "fields": resolve_fields(lines),
+        "lines": [line["text"] for line in lines],
+        "word_count": word_count,
+        "directions": _text_directions(page),
+    }
+
+
+def format_text_hints(text_layer):
+    """Build the compact prompt block describing a page's text layer"""
+    if not text_layer:
+        return ""
+
+    hint_lines = [
+        "",
+        "PDF TEXT LAYER HINTS",
+        "  - The following text was read directly from the PDF's embedded text layer and is character-exact.",
+    ]
+    if text_layer["fields"]:
+        hint_lines.append("  - These fields are already resolved; use the values verbatim unless the drawing clearly contradicts them:")
+        for field, value in text_layer["fields"].items():
+            hint_lines.append(f"      {field}: {value}")
+
+    page_text = " | ".join(text_layer["lines"])
+    if len(page_text) > MAX_HINT_TEXT_CHARS:
+        page_text = page_text[:MAX_HINT_TEXT_CHARS] + " ..."
+    hint_lines.append("  - Page text in reading order (cells separated by |):")
+    hint_lines.append(f"      {page_text}")
+    return "\n".join(hint_lines) + "\n"
+
+
+def _normalize_key(key):
+    """Parameter name with underscores, dashes and case ignored (DRAWING_NUMBER == Drawing number)"""
+    return key.upper().replace('_', ' ').replace('-', ' ').strip()
+
+
+def unresolved_parameters(text_layer, parameters):
+    """The parameters (names as in the prompt or schema) the text layer did not resolve"""
+    resolved = {_normalize_key(field) for field in ((text_layer or {}).get("fields") or {})}
+    return [name for name in parameters if _normalize_key(name) not in resolved]
+
+
+def merge_text_layer_fields(results, text_layer, parameters=None):
+    """
+    Fill empty parameters in parsed results with values resolved from the text layer.
+
+    Keys are matched ignoring underscores, dashes and case so cylinder-mode keys
+    such as DRAWING_NUMBER line up with DRAWING NUMBER. Values the model already
+    extracted are left alone.
+
+    Args:
+        results: Parsed parameter dict (modified in place and returned)
+        text_layer: Text-layer dict from extract_text_layer, or None
+        parameters: The mode's fixed parameter list, if it has one; only those
+            parameters are filled. Without one, fields the model did not
+            mention at all are added too.
+
+    Returns:
+        The updated results dict
+    """
+    if not text_layer or not text_layer["fields"]:
+        return results
+
+    existing = {
+        _normalize_key(key): key for key in results
+        if not key.endswith('_JUSTIFICATION')
+    }
+    allowed = None
+    if parameters is not None:
+        allowed = {_normalize_key(name): name.strip().upper() for name in parameters}
+    for field, value in text_layer["fields"].items():
+        normalized = _normalize_key(field)
+        if allowed is not None:
+            if normalized not in allowed:
+                continue
+            key = existing.get(normalized, allowed[normalized])
+        else:
+            key = existing.get(normalized, field)
+        if not str(results.get(key, "")).strip():
+            results[key] = value
+            results[f"{key}_JUSTIFICATION"] = "Read directly from the PDF text layer."
+    return results
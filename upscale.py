@@ -0,0 +1,194 @@
+"""
+Local adaptive upscaling and enhancement of drawings before analysis.
+
+Every image is measured first on a grayscale array:
+
+  text_height  - cap height of the text, from the vertical ink runs through
+                 character stems (px)
+  stroke       - typical stroke thickness, the median vertical ink run (px)
+  sharpness    - variance of the Laplacian
+  ink          - fraction of ink pixels
+
+Only when the text is too small (or the image is blurry) is the image
+enhanced: Lanczos resampling by the factor that brings the text up to
+TARGET_TEXT_HEIGHT, an unsharp mask and contrast normalization. Sharp,
+high-resolution renders and blank pages are passed through untouched, and
+no image is made larger than the vision model's own input size. The decision, the
+measurements and the time taken are returned with the image so they can be
+stored with each result. The module has no Streamlit dependency.
+"""
+import io
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+# Cap heights below this (px) are considered too small to read reliably. text_height
+# was calibrated on text rendered at known sizes (DejaVu Sans/Serif/Mono, regular and
+# bold, with and without drawing lines): 10/16/20/27/40 px type, whose cap heights are
+# 7/12/15/20/29 px, measures 7/12/15/20/29 px.
+MIN_TEXT_HEIGHT = 12
+# Cap height the upscale factor aims for
+TARGET_TEXT_HEIGHT = 18
+# Strokes thinner than this (px) also call for upscaling
+MIN_STROKE = 1.5
+
+# Laplacian variance below which an image is treated as blurry
+BLURRY_SHARPNESS = 150.0
+
+# Never upscale by more than this, nor beyond this longest side: high-detail vision
+# input is scaled down to fit 2048 px anyway, so larger output only grows the payload
+MAX_UPSCALE_FACTOR = 3.0
+MAX_OUTPUT_SIDE = 2048
+# Factors below this are not worth a resample
+MIN_UPSCALE_FACTOR = 1.15
+
+# Large images are measured on their bottom-right (title block) region only
+MEASURE_MAX_PIXELS = 4_000_000
+# Pages with less ink than this are blank (or nearly) and left alone
+MIN_INK_FRACTION = 0.001
+
+# Enhancement settings
+UNSHARP_RADIUS = 2
+UNSHARP_PERCENT = 120
+UNSHARP_PERCENT_BLURRY = 200
+UNSHARP_THRESHOLD = 3
+AUTOCONTRAST_CUTOFF = 1
+OUTPUT_JPEG_QUALITY = 95
+
+
+def _measure_region(gray):
+    """Region that carries text: the whole image, or the title-block quadrant of large sheets"""
+    height, width = gray.shape
+    if height * width <= MEASURE_MAX_PIXELS:
+        return gray
+    side = int(MEASURE_MAX_PIXELS ** 0.5)
+    return gray[max(0, height - side):, max(0, width - side):]
+
+
+def _vertical_ink_runs(ink):
+    """Lengths of all vertical runs of ink pixels, column by column"""
+    padded = np.zeros((ink.shape[0] + 2, ink.shape[1]), dtype=np.int8)
+    padded[1:-1] = ink
+    # Column-major flattening keeps each column's run starts and ends paired
+    edges = np.diff(padded, axis=0).T.ravel()
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+
+def measure(image):
+    """
+    Measure text height, stroke thickness, sharpness and ink coverage of a PIL image.
+
+    Returns:
+        {"text_height": float or None, "stroke": float or None, "sharpness": float, "ink": float}
+    """
+    gray = _measure_region(np.asarray(image.convert("L"), dtype=np.float32))
+
+    laplacian = (-4 * gray[1:-1, 1:-1] + gray[:-2, 1:-1] + gray[2:, 1:-1]
+                 + gray[1:-1, :-2] + gray[1:-1, 2:])
+    sharpness = float(laplacian.var()) if laplacian.size else 0.0
+
+    paper = np.percentile(gray, 90)
+    ink = gray < min(200.0, paper - 40)
+    ink_fraction = float(ink.mean()) if ink.size else 0.0
+    runs = _vertical_ink_runs(ink)
+    # Long runs are drawing lines, not text
+    runs = runs[runs <= max(4, gray.shape[0] // 20)]
+    if runs.size < 50:
+        return {"text_height": None, "stroke": None, "sharpness": sharpness, "ink": ink_fraction}
+
+    stroke = float(np.median(runs))
+    # Most runs cross horizontal strokes and lines; the runs clearly longer than a
+    # stroke go through character stems, which span the cap height
+    stems = runs[runs > 2 * stroke]
+    text_height = np.percentile(stems, 90) if stems.size >= 20 else np.percentile(runs, 98)
+    return {
+        "text_height": float(text_height),
+        "stroke": stroke,
+        "sharpness": sharpness,
+        "ink": ink_fraction,
+    }
+
+
+def upscale_decision(size, metrics):
+    """
+    Decide whether and how much to upscale.
+
+    Returns:
+        (factor, reason) - factor 1.0 means no resample; reason explains the choice
+    """
+    text_height, stroke, sharpness = metrics["text_height"], metrics["stroke"], metrics["sharpness"]
+    if metrics.get("ink", 1.0) < MIN_INK_FRACTION:
+        return 1.0, "no ink (blank page)"
+    factor = 1.0
+    reasons = []
+    if text_height is not None and text_height < MIN_TEXT_HEIGHT:
+        factor = max(factor, TARGET_TEXT_HEIGHT / max(text_height, 1.0))
+        reasons.append(f"text height {text_height:.0f}px < {MIN_TEXT_HEIGHT}px")
+    if stroke is not None and stroke < MIN_STROKE:
+        factor = max(factor, MIN_STROKE / max(stroke, 0.5))
+        reasons.append(f"stroke {stroke:.1f}px < {MIN_STROKE}px")
+
+    wanted = factor
+    factor = min(factor, MAX_UPSCALE_FACTOR, MAX_OUTPUT_SIDE / max(size))
+    if factor < MIN_UPSCALE_FACTOR:
+        factor = 1.0
+        if wanted >= MIN_UPSCALE_FACTOR:
+            reasons.append(f"already at the {MAX_OUTPUT_SIDE}px model input size")
+    if sharpness < BLURRY_SHARPNESS:
+        reasons.append(f"sharpness {sharpness:.0f} < {BLURRY_SHARPNESS:.0f}")
+
+    if not reasons:
+        return 1.0, "legible as is"
+    return factor, "; ".join(reasons)
+
+
+def enhance_for_analysis(image_bytes):
+    """
+    Upscale and enhance a drawing only when its measurements call for it.
+
+    Returns:
+        (image_bytes, decision) where decision is
+        {"upscaled": bool, "enhanced": bool, "factor": float, "reason": str,
+         "text_height": ..., "stroke": ..., "sharpness": ..., "size": (w, h), "seconds": float}
+    """
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(image_bytes))
+    metrics = measure(image)
+    factor, reason = upscale_decision(image.size, metrics)
+    blurry = metrics["sharpness"] < BLURRY_SHARPNESS and metrics["ink"] >= MIN_INK_FRACTION
+    decision = dict(metrics, upscaled=factor > 1.0, enhanced=factor > 1.0 or blurry,
+                    factor=round(factor, 2), reason=reason, size=image.size)
+
+    if decision["enhanced"]:
+        enhanced = image.convert("RGB")
+        if factor > 1.0:
+            enhanced = enhanced.resize(
+                (round(image.width * factor), round(image.height * factor)), Image.LANCZOS
+            )
+        enhanced = enhanced.filter(ImageFilter.UnsharpMask(
+            radius=UNSHARP_RADIUS,
+            percent=UNSHARP_PERCENT_BLURRY if blurry else UNSHARP_PERCENT,
+            threshold=UNSHARP_THRESHOLD
+        ))
+        enhanced = ImageOps.autocontrast(enhanced, cutoff=AUTOCONTRAST_CUTOFF)
+        out = io.BytesIO()
+        enhanced.save(out, format="JPEG", quality=OUTPUT_JPEG_QUALITY)
+        image_bytes = out.getvalue()
+        decision["size"] = enhanced.size
+
+    decision["seconds"] = time.perf_counter() - start
+    return image_bytes, decision
+
+
+def describe_decision(decision):
+    """One-line human-readable summary of an enhancement decision"""
+    if not decision:
+        return ""
+    if decision["upscaled"]:
+        action = f"Upscaled x{decision['factor']:.2f} to {decision['size'][0]}x{decision['size'][1]}"
+    elif decision["enhanced"]:
+        action = "Sharpened"
+    else:
+        action = "Not upscaled"
+    return f"{action} ({decision['reason']}, {decision['seconds'] * 1000:.0f} ms)"
@@ -0,0 +1,280 @@
+"""
+Watch-folder ingestion: extract every drawing dropped into a folder.
+
+A watchdog observer reports files created, modified or moved into the
+watched folders. A file is picked up once it has had no events for
+--settle seconds and its size and modification time did not change over
+that period, so PDFs still being copied or saved are not read half
+written. Its bytes are hashed: content that was already extracted (by this
+daemon, or before a restart - see below) is not sent again, whatever the
+file is called; a copy gets the result of the first file with that content.
+
+Files go to a job queue (job_queue.py) that runs --files of them at a time,
+each with up to --workers pages in flight, through the same chain as the
+Streamlit app. Finished pages are journaled to a checkpoint journal, so
+stopping the daemon (Ctrl+C) or a crash costs at most the pages in flight.
+
+Results are written next to each source file as <file>.extraction.json (one
+row per page, as in batch_extract, plus any errors), or appended to a JSONL
+results store with --output. A source whose .extraction.json already holds
+the results for its current content is skipped on start-up.
+
+Usage:
+    python watch_folder.py //fileserver/released [more folders] [--recursive]
+        [--output results.jsonl] [--files 2] [--workers 8] [--scan-existing]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from batch_extract import INPUT_EXTENSIONS, page_row
+from checkpoint import CHECKPOINT_PATH, CheckpointJournal
+from extraction_core import API_KEY_POOL, PARAMETER_MODES, ExtractionSettings
+from job_queue import DONE, JOB_QUEUE_WORKERS, JobQueue
+from pipeline import PIPELINE_CONCURRENCY
+
+# Seconds a file must stay unchanged before it is read (overridable from the environment)
+WATCH_SETTLE_SECONDS = float(os.getenv("WATCH_SETTLE_SECONDS", "5"))
+WATCH_CHECKPOINT_PATH = os.getenv(
+    "WATCH_CHECKPOINT_PATH", os.path.join(os.path.dirname(CHECKPOINT_PATH), "watch.jsonl")
+)
+RESULT_SUFFIX = ".extraction.json"
+
+
+def result_path(path):
+    return path + RESULT_SUFFIX
+
+
+def has_current_result(path, digest):
+    """True if the file's .extraction.json was written for exactly this content"""
+    try:
+        with open(result_path(path), "r", encoding="utf-8") as f:
+            return json.load(f).get("sha256") == digest
+    except (OSError, ValueError):
+        return False
+
+
+def write_result_file(path, result):
+    """Write <path>.extraction.json atomically, so readers never see a partial file"""
+    target = result_path(path)
+    temp_path = f"{target}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(temp_path, target)
+
+
+class SettlingFiles(FileSystemEventHandler):
+    """
+    Drawing files with recent filesystem events, released once they settle.
+
+    Watchdog callbacks run on the observer thread; ready_files() is called
+    from the daemon's loop.
+    """
+
+    def __init__(self, settle_seconds=WATCH_SETTLE_SECONDS):
+        self.settle_seconds = settle_seconds
+        self._pending = {}  # path -> (time of the last event or change, (size, mtime) when last checked)
+        self._lock = threading.Lock()
+
+    def touch(self, path):
+        name = os.path.basename(path)
+        if name.startswith(".") or not path.lower().endswith(INPUT_EXTENSIONS):
+            return
+        with self._lock:
+            self._pending[os.path.normpath(path)] = (time.monotonic(), None)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.touch(event.src_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.touch(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.touch(event.dest_path)
+
+    def ready_files(self):
+        """Paths that had no events and kept the same size and mtime for settle_seconds"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, (last_change, signature) in list(self._pending.items()):
+                if now - last_change < self.settle_seconds:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    del self._pending[path]  # deleted or moved away before it settled
+                    continue
+                current = (stat.st_size, stat.st_mtime_ns)
+                if current != signature:
+                    # First check, or still being written: wait another settle period
+                    self._pending[path] = (now, current)
+                    continue
+                del self._pending[path]
+                ready.append(path)
+        return sorted(ready)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folders", nargs="+", help="Folders to watch")
+    parser.add_argument("--recursive", action="store_true", help="Also watch subfolders")
+    parser.add_argument("--output", help="Append result rows to this JSONL file instead of writing "
+                                         f"<file>{RESULT_SUFFIX} next to each source")
+    parser.add_argument("--files", type=int, default=JOB_QUEUE_WORKERS, help="Files processed at the same time")
+    parser.add_argument("--workers", type=int, default=PIPELINE_CONCURRENCY,
+                        help="Pages of one file processed at the same time")
+    parser.add_argument("--settle", type=float, default=WATCH_SETTLE_SECONDS,
+                        help="Seconds a file must stay unchanged before it is read")
+    parser.add_argument("--scan-existing", action="store_true",
+                        help="Also process files already in the folders at start-up")
+    parser.add_argument("--checkpoint", default=WATCH_CHECKPOINT_PATH, help="Checkpoint journal")
+    parser.add_argument("--mode", choices=PARAMETER_MODES, default="Default", help="Parameter extraction mode")
+    parser.add_argument("--parameters", default="",
+                        help="Comma-separated parameters to extract (implies --mode Custom)")
+    parser.add_argument("--text-output", action="store_true",
+                        help="Ask for KEY: value text instead of schema-constrained JSON")
+    args = parser.parse_args()
+
+    if args.output and not args.output.lower().endswith(".jsonl"):
+        parser.error("--output must be a .jsonl file")
+    if not len(API_KEY_POOL):
+        parser.error("No API key provided! Please set OPENAI_API_KEY (or OPENAI_API_KEYS) in the environment.")
+    for folder in args.folders:
+        if not os.path.isdir(folder):
+            parser.error(f"Not a folder: {folder}")
+
+    custom_parameters = [name.strip() for name in args.parameters.split(",") if name.strip()]
+    settings = ExtractionSettings(
+        parameter_mode="Custom" if custom_parameters else args.mode,
+        custom_parameters={"GENERIC": custom_parameters} if custom_parameters else {},
+        structured_output=not args.text_output
+    )
+
+    journal = CheckpointJournal(args.checkpoint)
+    queue = JobQueue(max_jobs=args.files, journal=journal)
+    files = SettlingFiles(args.settle)
+    seen = {}  # digest -> result of content submitted by this daemon (None while it runs)
+    copies = {}  # digest -> further paths with the same content, written with the first one
+    jobs = []  # (path, job, rows) of submitted files not written yet
+    store = open(args.output, "a", encoding="utf-8") if args.output else None
+
+    if args.scan_existing:
+        for folder in args.folders:
+            for root, _, names in os.walk(folder):
+                for name in names:
+                    files.touch(os.path.join(root, name))
+                if not args.recursive:
+                    break
+
+    def submit(path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            print(f"❌ {path}: {str(e)}")
+            return
+        digest = hashlib.sha256(data).hexdigest()
+        if store is None and has_current_result(path, digest):
+            print(f"Skipped {path}: already extracted")
+            return
+        if digest in seen:
+            if store is not None:
+                print(f"Skipped {path}: same content as a file already extracted")
+            elif seen[digest] is None:
+                copies.setdefault(digest, []).append(path)
+            else:
+                write_result_file(path, dict(seen[digest], file=path))
+                print(f"✅ {path}: same content as {seen[digest]['file']}, result copied")
+            return
+        seen[digest] = None
+        jobs.append((path, queue.submit(path, data, settings, args.workers), []))
+        print(f"Queued {path} ({len(data) / 1024:.0f} KB)")
+
+    def collect(path, job, rows):
+        """Summarize the job's finished pages; write the result once the job is over. Returns True when written."""
+        for outcome in job.take_results():
+            row = page_row(outcome, settings)
+            row["page_count"] = row.get("page_count") or job.page_count
+            rows.append(row)
+        if job.active:
+            return False
+
+        if store is not None:
+            for row in rows:
+                store.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            for error in job.errors:
+                store.write(json.dumps({"file": path, "status": "Error", "error": error}, ensure_ascii=False) + "\n")
+            store.flush()
+        elif job.status == DONE:
+            result = {
+                "file": path,
+                "sha256": job.digest,
+                "status": job.status,
+                "page_count": job.page_count,
+                "seconds": round(job.seconds, 2),
+                "pages": rows,
+                "errors": job.errors,
+            }
+            seen[job.digest] = result
+            for target in [path] + copies.pop(job.digest, []):
+                write_result_file(target, dict(result, file=target))
+        statuses = {}
+        for row in rows:
+            statuses[row["status"]] = statuses.get(row["status"], 0) + 1
+        summary = ", ".join(f"{count} {status}" for status, count in sorted(statuses.items())) or "no pages"
+        print(f"{'✅' if job.status == DONE and not job.errors else '❌'} {path}: {job.status}, {summary}"
+              + (f" ({job.pages_resumed} from checkpoint)" if job.pages_resumed else "")
+              + (f", {len(job.errors)} error(s)" if job.errors else ""))
+        if job.status != DONE:
+            seen.pop(job.digest, None)  # let a later event retry it
+            copies.pop(job.digest, None)
+        return True
+
+    observer = Observer()
+    for folder in args.folders:
+        observer.schedule(files, folder, recursive=args.recursive)
+    observer.start()
+    print(f"Watching {', '.join(args.folders)} ({args.files} file(s) x {args.workers} page(s) at a time, "
+          f"{args.settle:.0f}s settle); results "
+          + (f"appended to {args.output}" if store else f"written next to each file as *{RESULT_SUFFIX}"))
+
+    try:
+        while True:
+            for path in files.ready_files():
+                submit(path)
+            jobs[:] = [entry for entry in jobs if not collect(*entry)]
+            time.sleep(min(1.0, max(args.settle / 2, 0.1)))
+    except KeyboardInterrupt:
+        print(f"Stopping; {sum(1 for _, job, _ in jobs if job.active)} file(s) unfinished "
+              "(their finished pages are in the checkpoint journal)")
+        for _, job, _ in jobs:
+            job.cancel()
+    finally:
+        observer.stop()
+        observer.join()
+        if store is not None:
+            store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())